@@ -0,0 +1,36 @@
+import io
+
+import pytest
+
+from benchmarks import corpus
+from hypocrite import hypofile
+from hypocrite import template
+
+# The corpora to benchmark against
+SPECS = {
+    'small': corpus.CorpusSpec(mocks=10, tests=20, fixtures=5),
+    'medium': corpus.CorpusSpec(mocks=50, tests=200, fixtures=20),
+    'large': corpus.CorpusSpec(mocks=200, args=6, tests=1000, fixtures=50,
+                               fixtures_per_test=4, body_lines=20),
+}
+
+
+def parse_text(text, path='synthetic.hypo'):
+    """
+    Parse the text of a hypocrite input file, without touching the
+    filesystem.
+    """
+
+    values = hypofile.HypoParser().parse(io.StringIO(text), path)
+    return hypofile.HypoFile(path, **values)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def templates():
+    # Keep template loading out of the measurements
+    return template.Template.preload()
+
+
+@pytest.fixture(scope='session', params=sorted(SPECS))
+def corpus_text(request):
+    return request.param, corpus.build(SPECS[request.param])
@@ -0,0 +1,239 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+from __future__ import print_function
+
+import argparse
+import random
+import sys
+
+# Argument types to draw from when building mocks
+ARG_TYPES = ['int', 'unsigned long', 'const char *', 'void *', 'size_t']
+
+# Return types to draw from when building mocks; "void" selects the
+# void mock template
+RETURN_TYPES = ['int', 'void *', 'void', 'long']
+
+
+class CorpusSpec(object):
+    """
+    Describe a synthetic hypocrite input file.
+    """
+
+    def __init__(self, mocks=10, args=3, tests=20, fixtures=5,
+                 fixtures_per_test=2, body_lines=10, comment_density=0.2,
+                 seed=0):
+        """
+        Initialize a ``CorpusSpec`` instance.
+
+        :param int mocks: The number of ``%mock`` directives.
+        :param int args: The maximum number of arguments for each
+                         mock.
+        :param int tests: The number of ``%test`` directives.
+        :param int fixtures: The number of ``%fixture`` directives.
+        :param int fixtures_per_test: The maximum number of fixtures
+                                      used by each test.
+        :param int body_lines: The number of lines in the body of each
+                               test.
+        :param float comment_density: The probability that a comment
+                                      is emitted before each
+                                      directive.
+        :param int seed: The seed for the random number generator, so
+                         that the corpus is reproducible.
+        """
+
+        self.mocks = mocks
+        self.args = args
+        self.tests = tests
+        self.fixtures = fixtures
+        self.fixtures_per_test = min(fixtures_per_test, fixtures)
+        self.body_lines = body_lines
+        self.comment_density = comment_density
+        self.seed = seed
+
+    def __repr__(self):
+        """
+        Return a representation of the spec, used to name benchmarks.
+        """
+
+        return ('%d mocks, %d tests, %d fixtures' %
+                (self.mocks, self.tests, self.fixtures))
+
+
+def _comment(rand, density):
+    """
+    Randomly generate a comment.
+
+    :param rand: The random number generator.
+    :param float density: The probability of generating a comment.
+
+    :returns: A list of lines.
+    """
+
+    if rand.random() >= density:
+        return []
+
+    if rand.random() < 0.5:
+        return ['// A one-line comment %d' % rand.randint(0, 1000)]
+
+    return [
+        '/* A multi-line comment',
+        ' * spanning several lines',
+        ' */',
+    ]
+
+
+def build(spec):
+    """
+    Build a synthetic hypocrite input file.
+
+    :param spec: The description of the input file to build.
+    :type spec: ``CorpusSpec``
+
+    :returns: The text of the input file.
+    :rtype: ``str``
+    """
+
+    rand = random.Random(spec.seed)
+
+    # Describe the mocks
+    mocks = []
+    for i in range(spec.mocks):
+        name = 'mock_func_%d' % i
+        ret = rand.choice(RETURN_TYPES)
+        args = [
+            (rand.choice(ARG_TYPES), 'arg%d' % j)
+            for j in range(rand.randint(0, spec.args))
+        ]
+        mocks.append((name, ret, args))
+
+    def decl(name, ret, args):
+        return '%s %s(%s)' % (
+            ret, name,
+            ', '.join('%s %s' % arg for arg in args) if args else 'void',
+        )
+
+    # The preamble declares the mocked functions, so the generated
+    # file may be compiled
+    lines = [
+        '// -*- c -*-',
+        '',
+        '%target "synthetic.c"',
+        '',
+        '%preamble {',
+        '#include <stdlib.h>',
+        '#include <string.h>',
+        '',
+    ]
+    lines.extend('%s;' % decl(*mock) for mock in mocks)
+    lines.extend(['%}', ''])
+
+    # Build the mocks
+    for mock in mocks:
+        lines.extend(_comment(rand, spec.comment_density))
+        lines.append('%%mock %s' % decl(*mock))
+    lines.append('')
+
+    # Build the fixtures
+    fixtures = []
+    for i in range(spec.fixtures):
+        name = 'fixture_%d' % i
+        fixtures.append(name)
+
+        lines.extend(_comment(rand, spec.comment_density))
+        lines.extend([
+            '%%fixture int %s {' % name,
+            '  return %d;' % i,
+        ])
+        if rand.random() < 0.5:
+            lines.extend([
+                '%} teardown {',
+                '  (void)%s;' % name,
+            ])
+        lines.extend(['%}', ''])
+
+    # Build the tests
+    for i in range(spec.tests):
+        used = rand.sample(fixtures, rand.randint(0, spec.fixtures_per_test))
+
+        lines.extend(_comment(rand, spec.comment_density))
+        lines.append('%%test test_%d%s {' % (
+            i, '(%s)' % ', '.join(used) if used else '',
+        ))
+        lines.append('  int result = 0;')
+        for j in range(spec.body_lines):
+            if mocks and rand.random() < 0.3:
+                name, ret, _args = rand.choice(mocks)
+                if ret == 'void':
+                    lines.append('  hypo_mock_nospy_%s();' % name)
+                else:
+                    lines.append('  hypo_mock_addreturn_%s(0);' % name)
+            elif rand.random() < spec.comment_density / 2.0:
+                lines.append('  /* Step %d of the test */' % j)
+            else:
+                lines.append('  result += %d;' % j)
+        lines.extend([
+            '  hypo_assert(result >= 0);',
+            '%}',
+            '',
+        ])
+
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    """
+    Build a synthetic hypocrite input file from the command line.
+    This is useful for profiling the generator on inputs larger than
+    those used by the benchmarks.
+
+    :param list argv: The command line arguments.  Defaults to
+                      ``sys.argv[1:]``.
+    """
+
+    defaults = CorpusSpec()
+    parser = argparse.ArgumentParser(
+        description='Build a synthetic hypocrite input file.',
+    )
+    for name in ('mocks', 'args', 'tests', 'fixtures', 'fixtures_per_test',
+                 'body_lines', 'seed'):
+        parser.add_argument(
+            '--' + name.replace('_', '-'), type=int,
+            default=getattr(defaults, name),
+        )
+    parser.add_argument(
+        '--comment-density', type=float, default=defaults.comment_density,
+    )
+    parser.add_argument(
+        '--output', '-o',
+        help='The file to write the input file to.  Defaults to standard '
+        'output.',
+    )
+    args = parser.parse_args(argv)
+
+    text = build(CorpusSpec(
+        args.mocks, args.args, args.tests, args.fixtures,
+        args.fixtures_per_test, args.body_lines, args.comment_density,
+        args.seed,
+    ))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,56 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import os
+import shlex
+import shutil
+import subprocess
+
+import pytest
+
+from benchmarks import conftest
+
+# The C compiler and flags to use
+CC = os.environ.get('CC', 'cc')
+CFLAGS = shlex.split(os.environ.get('CFLAGS', '-O2'))
+
+pytestmark = pytest.mark.skipif(
+    not shutil.which(CC), reason='C compiler %r not available' % CC,
+)
+
+
+def test_compile(benchmark, corpus_text, tmpdir):
+    name, text = corpus_text
+    benchmark.group = 'compile'
+    benchmark.name = 'compile[%s]' % name
+
+    # Write out the generated test file and an empty target
+    source = tmpdir.join('test_synthetic.c')
+    with open(str(source), 'w') as stream:
+        conftest.parse_text(text).render('test_synthetic').output(
+            stream, str(source)
+        )
+    tmpdir.join('synthetic.c').write('/* Nothing to test */\n')
+    obj = tmpdir.join('test_synthetic.o')
+
+    def compile_():
+        subprocess.check_call(
+            [CC] + CFLAGS + ['-c', '-o', str(obj), str(source)],
+            cwd=str(tmpdir),
+        )
+
+    benchmark.pedantic(compile_, rounds=3)
+
+    benchmark.extra_info['object_bytes'] = obj.size()
+    benchmark.extra_info['source_lines'] = len(source.readlines())
@@ -0,0 +1,40 @@
+import io
+
+from benchmarks import conftest
+
+
+def test_parse(benchmark, corpus_text):
+    name, text = corpus_text
+    benchmark.group = 'parse'
+    benchmark.name = 'parse[%s]' % name
+
+    result = benchmark(conftest.parse_text, text)
+
+    assert result.tests
+
+
+def test_render(benchmark, corpus_text):
+    name, text = corpus_text
+    benchmark.group = 'render'
+    benchmark.name = 'render[%s]' % name
+    hfile = conftest.parse_text(text)
+
+    result = benchmark(hfile.render, 'synthetic')
+
+    assert len(result)
+
+
+def test_output(benchmark, corpus_text):
+    name, text = corpus_text
+    benchmark.group = 'output'
+    benchmark.name = 'output[%s]' % name
+    rendered = conftest.parse_text(text).render('synthetic')
+
+    def output():
+        stream = io.StringIO()
+        rendered.output(stream, 'synthetic.c')
+        return stream
+
+    result = benchmark(output)
+
+    assert result.getvalue()
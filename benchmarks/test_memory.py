@@ -0,0 +1,58 @@
+import tracemalloc
+
+from benchmarks import conftest
+
+
+def _measure(func, *args):
+    """
+    Measure the peak memory and the number of live allocations
+    resulting from a call to a function.
+    """
+
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(
+            stat.count for stat in
+            tracemalloc.take_snapshot().statistics('filename')
+        )
+    finally:
+        tracemalloc.stop()
+
+    return result, current, peak, blocks
+
+
+def test_parse_memory(benchmark, corpus_text):
+    name, text = corpus_text
+    benchmark.group = 'parse-memory'
+    benchmark.name = 'parse-memory[%s]' % name
+
+    # Measure once, outside of the timing loop
+    hfile, current, peak, blocks = _measure(conftest.parse_text, text)
+    benchmark.extra_info['retained_bytes'] = current
+    benchmark.extra_info['peak_bytes'] = peak
+    benchmark.extra_info['retained_blocks'] = blocks
+    benchmark.extra_info['lines'] = text.count('\n')
+
+    benchmark.pedantic(conftest.parse_text, (text,), rounds=3)
+
+    assert hfile.tests
+
+
+def test_render_memory(benchmark, corpus_text):
+    name, text = corpus_text
+    benchmark.group = 'render-memory'
+    benchmark.name = 'render-memory[%s]' % name
+    hfile = conftest.parse_text(text)
+
+    # Measure once, outside of the timing loop
+    rendered, current, peak, blocks = _measure(hfile.render, 'synthetic')
+    benchmark.extra_info['retained_bytes'] = current
+    benchmark.extra_info['peak_bytes'] = peak
+    benchmark.extra_info['retained_blocks'] = blocks
+    benchmark.extra_info['lines'] = len(rendered)
+
+    benchmark.pedantic(hfile.render, ('synthetic',), rounds=3)
+
+    assert len(rendered)
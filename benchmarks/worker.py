@@ -0,0 +1,117 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import timeit
+
+
+# The command used to start the worker by default
+WORKER_CMD = 'hypocrite --persistent-worker'
+
+
+def requests(infiles, outdir, repeat):
+    """
+    Build the work requests for a set of hypocrite input files.
+
+    :param list infiles: The paths of the hypocrite input files.
+    :param str outdir: The directory to write the C test files to.
+    :param int repeat: The number of times to request each file.
+
+    :returns: An iterator over the work requests.
+    """
+
+    request_id = 0
+    for _i in range(repeat):
+        for infile in infiles:
+            request_id += 1
+            outfile = os.path.join(
+                outdir,
+                os.path.splitext(os.path.basename(infile))[0] + '.c',
+            )
+            yield {
+                'arguments': [infile, '--output', outfile],
+                'inputs': [{'path': infile}],
+                'requestId': request_id,
+            }
+
+
+def main(argv=None):
+    """
+    Drive a persistent hypocrite worker from the command line.  Each
+    input file is sent to the worker as a work request, the requested
+    number of times, and the response and round-trip time of each
+    request are reported.  This is useful for checking the worker by
+    hand and for seeing the benefit of a warm worker.
+
+    :param list argv: The command line arguments.  Defaults to
+                      ``sys.argv[1:]``.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Drive a persistent hypocrite worker.',
+    )
+    parser.add_argument(
+        'infiles', nargs='+',
+        help='The hypocrite input files to generate.',
+    )
+    parser.add_argument(
+        '--outdir', '-o', default='.',
+        help='The directory to write the C test files to.',
+    )
+    parser.add_argument(
+        '--repeat', '-r', type=int, default=3,
+        help='The number of times to request each file.',
+    )
+    parser.add_argument(
+        '--command', '-c', default=WORKER_CMD,
+        help='The command to start the worker.  Default: "%(default)s".',
+    )
+    args = parser.parse_args(argv)
+
+    proc = subprocess.Popen(
+        shlex.split(args.command),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True,
+    )
+
+    failed = False
+    try:
+        for request in requests(args.infiles, args.outdir, args.repeat):
+            start = timeit.default_timer()
+            proc.stdin.write(json.dumps(request) + '\n')
+            proc.stdin.flush()
+            response = json.loads(proc.stdout.readline())
+            elapsed = timeit.default_timer() - start
+
+            failed = failed or response['exitCode'] != 0
+            print('%4d %-40s %3d %9.3f ms%s' % (
+                response['requestId'], request['arguments'][0],
+                response['exitCode'], elapsed * 1000.0,
+                ' ' + response['output'] if response['output'] else '',
+            ))
+    finally:
+        proc.stdin.close()
+        proc.wait()
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
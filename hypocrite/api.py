@@ -0,0 +1,131 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import os
+
+from hypocrite import hypofile
+from hypocrite import template
+
+
+def preload():
+    """
+    Load all the templates.  Long-lived processes should call this
+    once at startup; after that, generation performs no filesystem
+    access, and retrieves the templates without locking.  The
+    generation functions call this themselves, so it need not be
+    called before them.
+
+    :returns: A list of the names of the templates.
+    :rtype: ``list`` of ``str``
+    """
+
+    return template.Template.preload()
+
+
+def output_names(infile, outfile=None):
+    """
+    Determine the base name of the test file and the name of the
+    output file, in the same way as the ``hypocrite`` program.
+
+    :param str infile: The name of the input file.
+    :param str outfile: The name of the output file.  If not provided,
+                        the name of the input file is altered by
+                        changing the extension to ".c", and the file
+                        is placed in the current directory.
+
+    :returns: A tuple of the base name of the test file and the name
+              of the output file.
+    :rtype: ``tuple`` of ``str``
+    """
+
+    if not outfile:
+        test_fname = os.path.splitext(os.path.basename(infile))[0]
+        return test_fname, test_fname + '.c'
+
+    return os.path.splitext(os.path.basename(outfile))[0], outfile
+
+
+def generate_iter(text, source_name, test_fname, output_name=None):
+    """
+    Generate a C test file from the text of a hypocrite input file,
+    yielding the lines of the C test file as they are produced.  This
+    function is thread-safe, and performs no filesystem access once
+    the templates have been loaded.
+
+    :param text: The text of the hypocrite input file.  If ``bytes``,
+                 it will be decoded as UTF-8.
+    :param str source_name: The path to the hypocrite input file.
+                            This is used for error reporting and for
+                            generating ``#line`` directives; the file
+                            need not exist.
+    :param str test_fname: The base name of the test file; this
+                           appears in the test output of the generated
+                           program.
+    :param str output_name: The path of the C test file.  This is used
+                            to generate ``#line`` directives.
+                            Defaults to ``test_fname`` with a ".c"
+                            extension.
+
+    :returns: An iterator yielding each line of the C test file,
+              including the trailing newline.
+
+    :raises hypocrite.perfile.ParseException:
+        An error occurred while parsing the input file.
+    """
+
+    # Make sure the templates are loaded, so rendering need not lock
+    template.Template.preload()
+
+    # Parse and render the file
+    hfile = hypofile.HypoFile.parse_text(text, source_name)
+    rendered = hfile.render(test_fname)
+
+    return rendered.iter_output(output_name or test_fname + '.c')
+
+
+def generate(text, source_name, test_fname, output_name=None,
+             encoding=None):
+    """
+    Generate a C test file from the text of a hypocrite input file.
+    This function is thread-safe, and performs no filesystem access
+    once the templates have been loaded.
+
+    :param text: The text of the hypocrite input file.  If ``bytes``,
+                 it will be decoded as UTF-8.
+    :param str source_name: The path to the hypocrite input file.
+                            This is used for error reporting and for
+                            generating ``#line`` directives; the file
+                            need not exist.
+    :param str test_fname: The base name of the test file; this
+                           appears in the test output of the generated
+                           program.
+    :param str output_name: The path of the C test file.  This is used
+                            to generate ``#line`` directives.
+                            Defaults to ``test_fname`` with a ".c"
+                            extension.
+    :param str encoding: If provided, the result will be encoded to
+                         ``bytes`` using this encoding.
+
+    :returns: The text of the C test file.  This will be ``bytes`` if
+              ``encoding`` is given.
+
+    :raises hypocrite.perfile.ParseException:
+        An error occurred while parsing the input file.
+    """
+
+    result = ''.join(
+        generate_iter(text, source_name, test_fname, output_name)
+    )
+
+    return result.encode(encoding) if encoding else result
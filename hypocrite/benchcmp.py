@@ -0,0 +1,319 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+from __future__ import print_function
+
+import collections
+import json
+import math
+import os
+
+import six
+
+# The status of a benchmark compared with its baseline
+SAME = 'same'
+SLOWER = 'slower'
+FASTER = 'faster'
+NEW = 'new'
+
+# Represent the comparison of a benchmark with its baseline
+Comparison = collections.namedtuple('Comparison', [
+    'suite', 'name', 'baseline', 'current', 'delta', 'pvalue', 'status',
+])
+
+
+def _finite(value):
+    """
+    Test if a value is a finite number.
+
+    :param value: The value to test.
+
+    :returns: ``True`` if the value is a finite number, ``False``
+              otherwise.
+    :rtype: ``bool``
+    """
+
+    return (isinstance(value, (float,) + six.integer_types) and
+            not isinstance(value, bool) and
+            not (math.isinf(value) or math.isnan(value)))
+
+
+def load(path):
+    """
+    Load benchmark results.  The file may be either the results
+    written by a test program, when the ``HYPO_BENCH_JSON``
+    environment variable is set, or a baseline file; both contain a
+    "suites" object mapping the names of test files to objects
+    mapping the names of benchmarks to their results.  The results of
+    a benchmark contain the number of iterations of each sample and
+    the time per iteration of each sample, in nanoseconds.
+
+    :param str path: The path of the file to load.
+
+    :returns: A dictionary mapping suite names to dictionaries
+              mapping benchmark names to their results.
+    :rtype: ``dict``
+
+    :raises ValueError:
+        The file cannot be read, or is not a valid benchmark results
+        file.  Each benchmark must have at least one sample, and all
+        its samples must be finite.
+    """
+
+    try:
+        with open(path) as stream:
+            data = json.load(stream)
+    except (IOError, OSError, ValueError) as exc:
+        raise ValueError('%s: not a benchmark results file: %s' %
+                         (path, exc))
+
+    if not isinstance(data, dict) or not isinstance(data.get('suites'),
+                                                    dict):
+        raise ValueError('%s: not a benchmark results file' % path)
+
+    # Check the samples of each benchmark
+    for suite, benches in data['suites'].items():
+        if not isinstance(benches, dict):
+            raise ValueError('%s: not a benchmark results file' % path)
+        for name, result in benches.items():
+            samples = (result.get('samples')
+                       if isinstance(result, dict) else None)
+            if (not isinstance(samples, list) or not samples or
+                    not all(_finite(sample) for sample in samples)):
+                raise ValueError('%s: benchmark %s::%s has no valid samples'
+                                 % (path, suite, name))
+
+    return data['suites']
+
+
+def merge(suites, results):
+    """
+    Merge benchmark results into a set of suites.  The results of
+    each benchmark replace any existing results of the same suite and
+    benchmark; other benchmarks are left alone.
+
+    :param dict suites: The suites to merge the results into.  This
+                        dictionary is updated in place.
+    :param dict results: The results to merge, in the same format.
+
+    :returns: The updated suites.
+    :rtype: ``dict``
+    """
+
+    for suite, benches in results.items():
+        suites.setdefault(suite, {}).update(benches)
+
+    return suites
+
+
+def save(path, suites):
+    """
+    Save benchmark results as a baseline file.
+
+    :param str path: The path of the file to write.
+    :param dict suites: A dictionary mapping suite names to
+                        dictionaries mapping benchmark names to their
+                        results.
+    """
+
+    with open(path, 'w') as stream:
+        json.dump({'suites': suites}, stream, indent=2, sort_keys=True)
+        stream.write('\n')
+
+
+def median(samples):
+    """
+    Compute the median of a list of samples.
+
+    :param list samples: The samples.  Must not be empty.
+
+    :returns: The median.
+    :rtype: ``float``
+    """
+
+    ordered = sorted(samples)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return float(ordered[mid])
+    return (ordered[mid - 1] + ordered[mid]) / 2.0
+
+
+def mann_whitney(baseline, current):
+    """
+    Perform a one-sided Mann-Whitney U test of the hypothesis that the
+    current samples tend to be larger than the baseline samples.  The
+    p-value is computed using the normal approximation, corrected for
+    ties and continuity; this is reasonable for the 20 samples a test
+    program takes by default, but is conservative for very few
+    samples.
+
+    :param list baseline: The baseline samples.
+    :param list current: The current samples.
+
+    :returns: The p-value; small values indicate the current samples
+              are larger.
+    :rtype: ``float``
+    """
+
+    n1, n2 = len(current), len(baseline)
+    n = n1 + n2
+    if not n1 or not n2:
+        return 1.0
+
+    # Rank the combined samples, giving ties their average rank
+    combined = sorted([(value, 0) for value in current] +
+                      [(value, 1) for value in baseline])
+    rank_sum = 0.0
+    ties = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j < n and combined[j][0] == combined[i][0]:
+            j += 1
+        count = j - i
+        ties += count ** 3 - count
+        rank = (i + j + 1) / 2.0
+        rank_sum += rank * sum(1 for _value, which in combined[i:j]
+                               if not which)
+        i = j
+
+    # Compute U for the current samples and its distribution
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    mean = n1 * n2 / 2.0
+    variance = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(baseline, results, alpha=0.05, threshold=0.0):
+    """
+    Compare benchmark results with a baseline.  A benchmark is slower
+    (or faster) if the Mann-Whitney U test finds its samples larger
+    (or smaller) than those of the baseline at the given significance
+    level, and its median has changed by more than the threshold.
+
+    :param dict baseline: The baseline suites.
+    :param dict results: The current suites.
+    :param float alpha: The significance level.
+    :param float threshold: The smallest relative change of the
+                            median considered significant, e.g.,
+                            ``0.05`` for 5%.
+
+    :returns: A list of the comparisons of each benchmark in the
+              results, ordered by suite and benchmark name.
+    :rtype: ``list`` of ``Comparison``
+    """
+
+    comparisons = []
+    for suite, benches in sorted(results.items()):
+        for name, result in sorted(benches.items()):
+            current = median(result['samples'])
+
+            # Benchmarks may be new
+            base = baseline.get(suite, {}).get(name)
+            if not base:
+                comparisons.append(Comparison(
+                    suite, name, None, current, None, None, NEW,
+                ))
+                continue
+
+            # Compare the medians and the distributions
+            base_median = median(base['samples'])
+            delta = current / base_median - 1.0 if base_median else 0.0
+            slower = mann_whitney(base['samples'], result['samples'])
+            faster = mann_whitney(result['samples'], base['samples'])
+
+            status = SAME
+            if slower < alpha and delta > threshold:
+                status = SLOWER
+            elif faster < alpha and delta < -threshold:
+                status = FASTER
+
+            comparisons.append(Comparison(
+                suite, name, base_median, current, delta,
+                min(slower, faster), status,
+            ))
+
+    return comparisons
+
+
+def report(stream, comparisons):
+    """
+    Report the comparisons of benchmarks with their baselines, as a
+    table of the median times per iteration and their changes.
+
+    :param stream: The stream to write the report to.
+    :param list comparisons: A list of ``Comparison`` instances.
+    """
+
+    rows = [('benchmark', 'baseline', 'current', 'delta', 'p', 'status')]
+    for comp in comparisons:
+        rows.append((
+            '%s::%s' % (comp.suite, comp.name),
+            '-' if comp.baseline is None else '%.2f ns' % comp.baseline,
+            '%.2f ns' % comp.current,
+            '-' if comp.delta is None else '%+.1f%%' % (comp.delta * 100),
+            '-' if comp.pvalue is None else '%.3f' % comp.pvalue,
+            comp.status,
+        ))
+
+    # Left-align the names, and right-align the numbers
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print(' '.join(
+            [row[0].ljust(widths[0])] +
+            [cell.rjust(width) for cell, width in zip(row[1:-1], widths[1:])] +
+            [row[-1]]
+        ), file=stream)
+
+
+def run(baseline_path, result_paths, stream, save_baseline=False,
+        alpha=0.05, threshold=0.0):
+    """
+    Compare benchmark results with a baseline file, or save them to
+    it.
+
+    :param str baseline_path: The path of the baseline file.
+    :param list result_paths: The paths of the results files written
+                              by the test programs.
+    :param stream: The stream to write the report to.
+    :param bool save_baseline: If ``True``, merge the results into
+                               the baseline file, creating it if
+                               necessary, rather than comparing them.
+    :param float alpha: The significance level.
+    :param float threshold: The smallest relative change of the
+                            median considered significant.
+
+    :returns: 1 if any benchmark is significantly slower than its
+              baseline, otherwise 0.
+    :rtype: ``int``
+    """
+
+    # Collect all the results
+    results = {}
+    for path in result_paths:
+        merge(results, load(path))
+
+    if save_baseline:
+        suites = load(baseline_path) if os.path.exists(baseline_path) else {}
+        save(baseline_path, merge(suites, results))
+        return 0
+
+    comparisons = compare(load(baseline_path), results, alpha, threshold)
+    report(stream, comparisons)
+
+    return 1 if any(comp.status == SLOWER for comp in comparisons) else 0
@@ -0,0 +1,53 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import re
+
+# Characters which must be escaped with a backslash in a make rule
+_ESCAPE_RE = re.compile(r'([ \t#\\])')
+
+
+def escape(path):
+    """
+    Escape a path for use in a make rule.  The escaping matches that
+    performed by GCC, and is understood by both make and ninja.
+
+    :param str path: The path to escape.
+
+    :returns: The escaped path.
+    :rtype: ``str``
+    """
+
+    return _ESCAPE_RE.sub(r'\\\1', path).replace('$', '$$')
+
+
+def write(stream, target, deps):
+    """
+    Write a make-compatible dependency file.
+
+    :param stream: The stream to write the dependency file to.
+    :param str target: The target of the rule; usually the name of
+                       the generated file.
+    :param list deps: The names of the files the target depends on.
+                      Duplicates are omitted.
+    """
+
+    seen = set()
+    stream.write('%s:' % escape(target))
+    for dep in deps:
+        if dep in seen:
+            continue
+        seen.add(dep)
+        stream.write(' \\\n  %s' % escape(dep))
+    stream.write('\n')
@@ -0,0 +1,175 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+from __future__ import print_function
+
+import collections
+import os
+import subprocess
+
+
+def load(path, samples=None):
+    """
+    Load a profile written by a test program, when the
+    ``HYPO_PROFILE`` environment variable is set.  Each line of the
+    profile gives the test, the file containing a sampled address and
+    the address within it, and the number of samples; e.g.,
+    "test.hypo::check_count;/path/to/test+0x1189 42".
+
+    :param str path: The path of the profile to load.
+    :param samples: A counter to add the samples to.  If not given, a
+                    new counter is created.
+    :type samples: ``collections.Counter``
+
+    :returns: A counter mapping tuples of the test, the file, and the
+              address to the number of samples.  The file is ``None``
+              if the address could not be attributed to a file.
+    :rtype: ``collections.Counter``
+
+    :raises ValueError:
+        The file is not a valid profile.
+    """
+
+    if samples is None:
+        samples = collections.Counter()
+
+    with open(path) as stream:
+        for lno, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                stack, count = line.rsplit(' ', 1)
+                test, frame = stack.rsplit(';', 1)
+                fname, _sep, addr = frame.rpartition('+0x')
+                samples[(test, fname or None, int(addr, 16))] += int(count)
+            except ValueError:
+                raise ValueError('%s:%d: invalid profile line' % (path, lno))
+
+    return samples
+
+
+def symbolize(addresses, addr2line='addr2line'):
+    """
+    Look up the functions containing a set of addresses, using
+    ``addr2line``.  Inlined functions are included.
+
+    :param dict addresses: A dictionary mapping file names to sets of
+                           addresses within them.
+    :param str addr2line: The ``addr2line`` program to use.
+
+    :returns: A dictionary mapping tuples of the file name and the
+              address to lists of the names of the functions
+              containing the address, outermost first.  Addresses
+              which could not be symbolized are omitted.
+    :rtype: ``dict``
+    """
+
+    symbols = {}
+    for fname, addrs in sorted(addresses.items()):
+        # Pseudo-files, such as "[vdso]", have no symbols
+        if not os.path.isfile(fname):
+            continue
+
+        # Feed the addresses in, so the command line cannot overflow
+        try:
+            proc = subprocess.Popen(
+                [addr2line, '-a', '-f', '-C', '-i', '-e', fname],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                universal_newlines=True,
+            )
+        except OSError:
+            continue
+        output, _err = proc.communicate(
+            ''.join('0x%x\n' % addr for addr in sorted(addrs))
+        )
+        if proc.returncode:
+            continue
+
+        # Each address is followed by pairs of function and location,
+        # innermost first
+        addr = None
+        lines = output.splitlines()
+        while lines:
+            line = lines.pop(0)
+            if line.startswith('0x'):
+                addr = int(line, 16)
+                continue
+
+            if lines:
+                lines.pop(0)
+            if addr is not None and line != '??':
+                symbols.setdefault((fname, addr), []).insert(0, line)
+
+    return symbols
+
+
+def fold(samples, symbols):
+    """
+    Fold samples into stacks for rendering as a flame graph.  Each
+    stack consists of the test followed by the functions containing
+    the sampled address.
+
+    :param samples: A counter mapping tuples of the test, the file,
+                    and the address to the number of samples.
+    :type samples: ``collections.Counter``
+    :param dict symbols: A dictionary mapping tuples of the file name
+                         and the address to lists of the names of the
+                         functions containing the address, outermost
+                         first.
+
+    :returns: A counter mapping stacks, with the frames separated by
+              semicolons, to the number of samples.  Addresses which
+              were not symbolized are given as the base name of their
+              file and the address.
+    :rtype: ``collections.Counter``
+    """
+
+    stacks = collections.Counter()
+    for (test, fname, addr), count in samples.items():
+        frames = symbols.get((fname, addr))
+        if not frames:
+            frames = ['%s+0x%x' % (
+                os.path.basename(fname) if fname else '[unknown]', addr
+            )]
+        stacks[';'.join([test] + frames)] += count
+
+    return stacks
+
+
+def run(paths, stream, addr2line='addr2line'):
+    """
+    Symbolize and fold the profiles written by test programs, and
+    write the folded stacks, suitable for a flame graph tool.
+
+    :param list paths: The paths of the profiles.
+    :param stream: The stream to write the folded stacks to.
+    :param str addr2line: The ``addr2line`` program to use.
+    """
+
+    # Load all the samples
+    samples = collections.Counter()
+    for path in paths:
+        load(path, samples)
+
+    # Look up all the addresses
+    addresses = {}
+    for _test, fname, addr in samples:
+        if fname:
+            addresses.setdefault(fname, set()).add(addr)
+    symbols = symbolize(addresses, addr2line)
+
+    for stack, count in sorted(fold(samples, symbols).items()):
+        print('%s %d' % (stack, count), file=stream)
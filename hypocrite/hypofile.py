@@ -13,11 +13,15 @@
 # permissions and limitations under the License.
 
 import collections
+import io
 import os
+import re
 
 import six
 
+from hypocrite import metrics
 from hypocrite import perfile
+from hypocrite import runtime
 from hypocrite import template
 
 # Represent an argument
@@ -28,6 +32,101 @@ HypoFixtureInjection = collections.namedtuple(
     'HypoFixtureInjection', ['fixture', 'inject']
 )
 
+# Regular expressions for finding references to the mock helpers
+MOCK_HELPER_RE = re.compile(
+    r'\bhypo_mock_([a-z]+)_([a-zA-Z_][a-zA-Z0-9_]*)'
+)
+MOCK_ANYARG_RE = re.compile(r'\bANYARG_([A-Z0-9_]+)')
+
+# Regular expression for finding references to the allocation helpers
+ALLOC_RE = re.compile(
+    r'\bhypo_(?:alloc_stats|assert_max_allocs|assert_max_bytes|'
+    r'assert_max_peak|assert_no_leaks)\b'
+)
+
+# Regular expressions for finding references to the virtual clock and
+# the in-memory I/O
+CLOCK_RE = re.compile(r'\bhypo_clock_[a-z_]+\b')
+FAKE_IO_RE = re.compile(r'\bhypo_io_[a-z_]+\b')
+
+# The functions the in-memory I/O may serve the target's calls to, in
+# the order they are installed
+FAKE_IO_FUNCS = ('open', 'close', 'read', 'write', 'lseek', 'pipe',
+                 'socketpair')
+
+# The words of the integral types, and the names of the common integral
+# typedefs; arguments of these types, and pointers, may be compared
+# byte for byte
+INTEGRAL_WORDS = {
+    'signed', 'unsigned', 'char', 'short', 'int', 'long', '_Bool', 'bool',
+}
+INTEGRAL_TYPEDEFS = {
+    'size_t', 'ssize_t', 'off_t', 'ptrdiff_t', 'wchar_t', 'pid_t', 'uid_t',
+    'gid_t', 'mode_t', 'socklen_t',
+}
+INTEGRAL_TYPEDEF_RE = re.compile(r'^u?int(?:_least|_fast)?'
+                                 r'(?:8|16|32|64|max|ptr)_t$')
+
+
+def _memory(text):
+    """
+    Convert a memory limit to a number of bytes.
+
+    :param str text: The limit, as a number of bytes optionally
+                     followed by "K", "M", or "G".
+
+    :returns: The number of bytes.
+    :rtype: ``int``
+
+    :raises ValueError:
+        The limit is not valid.
+    """
+
+    # Apply the multiplier of the unit, if any
+    unit = text[-1:].upper()
+    if unit and unit in 'KMG':
+        return int(text[:-1]) * 1024 ** ('KMG'.index(unit) + 1)
+
+    return int(text)
+
+
+def _bytewise(type_):
+    """
+    Determine if arguments of a type may be compared byte for byte.
+    This is true of pointers and of the integral types; other types,
+    such as floating point types, structures, and unrecognized
+    typedefs, must be compared by the C compiler.
+
+    :param str type_: The type string.
+
+    :returns: A ``True`` value if the type may be compared byte for
+              byte.
+    :rtype: ``bool``
+    """
+
+    # Pointers may always be compared byte for byte
+    if '*' in type_:
+        return True
+
+    # So may enumerations and integers
+    words = [word for word in type_.split()
+             if word not in ('const', 'volatile')]
+    if words[:1] == ['enum']:
+        return True
+    if len(words) == 1 and (words[0] in INTEGRAL_TYPEDEFS or
+                            INTEGRAL_TYPEDEF_RE.match(words[0])):
+        return True
+    return bool(words) and all(word in INTEGRAL_WORDS for word in words)
+
+
+# The limits which may be placed on a test, mapping their names to
+# functions to convert their values
+LIMITS = {
+    'timeout': float,
+    'cpu': int,
+    'memory': _memory,
+}
+
 
 def _extract_type(toks, delims):
     """
@@ -137,7 +236,8 @@ class HypocriteTest(object):
 
     TEMPLATE = 'test.c.tmpl'
 
-    def __init__(self, coord_range, name, code, fixtures):
+    def __init__(self, coord_range, name, code, fixtures, cases=None,
+                 limits=None):
         """
         Initialize a ``HypocriteTest`` instance.
 
@@ -150,12 +250,20 @@ class HypocriteTest(object):
         :param list fixtures: A list of ``HypoFixtureInjection``
                               instances indicating fixtures that
                               should be used with the test.
+        :param str cases: The name of a C array of test cases.  If
+                          provided, the test is run once for each
+                          element of the array.
+        :param dict limits: A dictionary mapping the names of the
+                            limits placed on the test ("timeout",
+                            "cpu", and "memory") to their values.
         """
 
         self.coord_range = coord_range
         self.name = name
         self.code = code
         self.fixtures = fixtures
+        self.cases = cases
+        self.limits = limits or {}
 
     def render(self, hfile, ctxt):
         """
@@ -173,9 +281,75 @@ class HypocriteTest(object):
             (hfile.fixtures[fix], inject) for fix, inject in self.fixtures
         ]
 
+        # Tests using the same fixtures share the setup and teardown
+        # thunks of the first such test
+        owner = hfile.fixture_owners[
+            tuple(fix for fix, _inject in self.fixtures)
+        ]
+
+        # Determine which thunks the test needs in the test table
+        args = {}
+        if any(fix.scope == 'file' for fix, _inject in fixtures):
+            args['file_setup'] = owner
+            if owner == self.name:
+                args['file_setup_owner'] = True
+        if any(fix.scope == 'test' for fix, _inject in fixtures):
+            args['setup'] = owner
+            if owner == self.name:
+                args['setup_owner'] = True
+        if any(inject and fix.return_type for fix, inject in fixtures):
+            args['run'] = True
+        if any(fix.teardown and fix.scope == 'test'
+               for fix, _inject in fixtures):
+            args['teardown'] = owner
+            if owner == self.name:
+                args['teardown_owner'] = True
+        if self.cases:
+            args['cases'] = self.cases
+
+        # Load the template and render it
+        tmpl = template.Template.get_tmpl(self.TEMPLATE)
+        tmpl.render(ctxt, name=self.name, code=self.code, fixtures=fixtures,
+                    limits=self.limits, path=self.coord_range.path,
+                    line=self.coord_range.start, **args)
+
+
+class HypocriteBench(HypocriteTest):
+    """
+    Represent a "bench" directive.  These directives contain the body
+    of a loop to be timed.
+    """
+
+    TEMPLATE = 'bench.c.tmpl'
+
+    def render(self, hfile, ctxt):
+        """
+        Render a benchmark.  This uses a template to render the
+        benchmark into actual output code.
+
+        :param hfile: The hypocrite input file.
+        :type hfile: ``HypocriteFile``
+        :param ctxt: The render context.
+        :type ctxt: ``hypocrite.template.RenderContext``
+        """
+
+        # Resolve all the fixtures
+        fixtures = [
+            (hfile.fixtures[fix], inject) for fix, inject in self.fixtures
+        ]
+
+        # Determine which thunks the benchmark needs
+        args = {}
+        if fixtures:
+            args['setup'] = True
+        if any(fix.teardown and fix.scope == 'test'
+               for fix, _inject in fixtures):
+            args['teardown'] = True
+
         # Load the template and render it
         tmpl = template.Template.get_tmpl(self.TEMPLATE)
-        tmpl.render(ctxt, name=self.name, code=self.code, fixtures=fixtures)
+        tmpl.render(ctxt, name=self.name, code=self.code, fixtures=fixtures,
+                    **args)
 
 
 class HypocriteMock(object):
@@ -187,7 +361,27 @@ class HypocriteMock(object):
     TEMPLATE_VOID = 'mock-void.c.tmpl'
     TEMPLATE = 'mock.c.tmpl'
 
-    def __init__(self, coord_range, name, return_type, args):
+    # The optional helpers of a mock, mapped to the other helpers
+    # they require
+    HELPERS = {
+        'addreturn': (),
+        'setreturns': (),
+        'nospy': (),
+        'expectcalls': (),
+        'argtable': (),
+        'checkcalls': ('expectcalls', 'argtable'),
+        'checkunordered': ('expectcalls', 'argtable'),
+        'findcall': ('expectcalls', 'argtable'),
+        'countcalls': ('expectcalls', 'argtable'),
+        'callcount': (),
+        'getreturn': (),
+        'getcall': (),
+        'getfile': ('getcall',),
+        'getline': ('getcall',),
+        'getarg': ('getcall',),
+    }
+
+    def __init__(self, coord_range, name, return_type, args, fake=None):
         """
         Initialize a ``HypocriteMock`` instance.
 
@@ -198,14 +392,20 @@ class HypocriteMock(object):
         :param str return_type: The type of the function return value.
         :param list args: A list of ``HypoMockArg`` instances giving
                           the type and name of each function argument.
+        :param str fake: The name of a function to call in place of
+                         the mocked function when the mock is in spy
+                         mode, e.g., one of the virtual clock
+                         functions.  If ``None`` (the default), the
+                         mocked function itself is called.
         """
 
         self.coord_range = coord_range
         self.name = name
         self.return_type = return_type
         self.args = args
+        self.fake = fake
 
-    def render(self, hfile, ctxt):
+    def render(self, hfile, ctxt, helpers=None):
         """
         Render a mock.  This uses a template to render the mock into
         actual output code.
@@ -214,6 +414,11 @@ class HypocriteMock(object):
         :type hfile: ``HypocriteFile``
         :param ctxt: The render context.
         :type ctxt: ``hypocrite.template.RenderContext``
+        :param set helpers: The names of the optional helpers to
+                            emit, e.g., "addreturn" or "checkcalls".
+                            Helpers required by those named are
+                            emitted as well.  If ``None`` (the
+                            default), all helpers are emitted.
         """
 
         # First, pick the correct template and load it
@@ -221,9 +426,26 @@ class HypocriteMock(object):
             self.TEMPLATE_VOID if self.return_type == 'void' else self.TEMPLATE
         )
 
+        # Select the helpers to emit
+        if helpers is None:
+            helpers = set(self.HELPERS)
+        else:
+            helpers = set(helpers)
+            for helper in list(helpers):
+                helpers.update(self.HELPERS.get(helper, ()))
+        uses = dict(('use_%s' % helper, True) for helper in helpers)
+
+        # The argument table needs to know which arguments the C
+        # compiler must compare
+        if 'argtable' in helpers:
+            uses['typed'] = set(
+                arg.name for arg in self.args if not _bytewise(arg.type_)
+            )
+
         # Render the template
         tmpl.render(
-            ctxt, name=self.name, return_type=self.return_type, args=self.args
+            ctxt, name=self.name, return_type=self.return_type,
+            args=self.args, fake=self.fake, **uses
         )
 
 
@@ -236,7 +458,16 @@ class Fixture(object):
 
     TEMPLATE = 'fixture.c.tmpl'
 
-    def __init__(self, coord_range, name, return_type, code, teardown=None):
+    # The recognized fixture scopes, mapped to the canonical name of
+    # the scope
+    SCOPES = {
+        'test': 'test',
+        'file': 'file',
+        'suite': 'file',
+    }
+
+    def __init__(self, coord_range, name, return_type, code, teardown=None,
+                 scope='test'):
         """
         Initialize a ``Fixture`` instance.
 
@@ -252,6 +483,11 @@ class Fixture(object):
         :param teardown: The cleanup code for the fixture.  May be
                          ``None``.
         :type teardown: ``hypocrite.linelist.LineList``
+        :param str scope: The scope of the fixture.  A "test" fixture
+                          is set up and torn down around every test
+                          that uses it; a "file" fixture is set up
+                          the first time a test uses it and torn down
+                          after all the tests have run.
         """
 
         self.coord_range = coord_range
@@ -259,6 +495,7 @@ class Fixture(object):
         self.return_type = return_type
         self.code = code
         self.teardown = teardown
+        self.scope = scope
 
     def render(self, hfile, ctxt):
         """
@@ -277,11 +514,14 @@ class Fixture(object):
         # Set up the correct arguments
         args = {
             'name': self.name,
-            'return_type': self.return_type,
             'code': self.code,
         }
+        if self.return_type:
+            args['return_type'] = self.return_type
         if self.teardown:
             args['teardown'] = self.teardown
+        if self.scope == 'file':
+            args['file_scope'] = True
 
         # Render the template
         tmpl.render(ctxt, **args)
@@ -326,6 +566,44 @@ def target_directive(values, start_coord, toks):
     return None
 
 
+@HypoParser.directive(False, 'fakeio', 'fake_io')
+def fakeio_directive(values, start_coord, toks):
+    """
+    The ``%fakeio`` directive.  May contain a list of TOK_WORD tokens
+    naming the functions to redirect; if none are given, all of them
+    are.  Causes the target's file descriptor I/O, such as ``read()``
+    and ``write()``, to be served from in-memory files, pipes, and
+    socket pairs.
+
+    :param dict values: The values dictionary that the directive's
+                        return value may be placed in.
+    :param start_coord: The coordinates the directive started at.
+    :type start_coord: ``hypocrite.location.Coordinate``
+    :param list toks: A list of tokens.
+
+    :returns: A ``None`` value to indicate no further processing is
+              necessary.
+
+    :raises hypocrite.perfile.ParseException:
+        An error occurred while parsing the directive.
+    """
+
+    # Make sure the token list is correct
+    for tok in toks:
+        if tok.type_ != perfile.TOK_WORD or tok.value not in FAKE_IO_FUNCS:
+            raise perfile.ParseException(
+                'Invalid %%fakeio directive at %s' % start_coord
+            )
+
+    # Enable the in-memory I/O for the selected functions
+    names = set(tok.value for tok in toks)
+    values['fake_io'] = [
+        func for func in FAKE_IO_FUNCS if not names or func in names
+    ]
+
+    return None
+
+
 @HypoParser.directive(lambda: [], 'preamble')
 class PreambleDirective(object):
     """
@@ -409,7 +687,10 @@ def mock(values, start_coord, toks):
     """
     The ``%mock`` directive.  Should contain a sequence of tokens
     declaring a function to be mocked, excluding any trailing
-    semicolon (';').
+    semicolon (';').  The declaration may be followed by '=' and the
+    name of a function to call in place of the mocked function, e.g.,
+    "%mock unsigned int sleep(unsigned int seconds) =
+    hypo_clock_sleep".
 
     :param dict values: The values dictionary that the directive's
                         return value may be placed in.
@@ -424,6 +705,16 @@ def mock(values, start_coord, toks):
         An error occurred while parsing the directive.
     """
 
+    # Split off the fake function, if any
+    fake = None
+    if len(toks) >= 2 and toks[-2] == (perfile.TOK_CHAR, '='):
+        if toks[-1].type_ != perfile.TOK_WORD or not toks[-1].value:
+            raise perfile.ParseException(
+                'Invalid %%mock directive at %s' % start_coord
+            )
+        fake = toks[-1].value
+        toks = toks[:-2]
+
     # Initialize the type iterator
     type_iter = _extract_type(toks, _mock_type_delims)
 
@@ -494,7 +785,7 @@ def mock(values, start_coord, toks):
 
     # Construct and save the mock
     values['mocks'][func_name] = HypocriteMock(
-        start_coord - start_coord, func_name, return_type, args
+        start_coord - start_coord, func_name, return_type, args, fake
     )
 
 
@@ -504,10 +795,22 @@ class TestDirective(object):
     The ``%test`` directive.  This is a multi-line directive that
     describes a single test to be included in the generated test file.
     Should contain a TOK_WORD token giving the name of the test,
-    followed by a TOK_CHAR token with the value '{'.  Will be ended by
-    a '%}' directive, which must appear at the beginning of a line.
+    followed by a TOK_CHAR token with the value '{'.  The name may be
+    followed by the name of a C array of test cases, enclosed in
+    brackets, to parameterize the test.  The fixtures may be followed
+    by limits on the test, each a name followed by its value enclosed
+    in parentheses, e.g., "timeout(2.5)".  Will be ended by a '%}'
+    directive, which must appear at the beginning of a line.
     """
 
+    # The directive name and the value key
+    DIRECTIVE = 'test'
+    KEY = 'tests'
+
+    # Whether the directive may be parameterized or limited
+    CASES = True
+    LIMITS = True
+
     def __init__(self, values, start_coord, toks):
         """
         Initialize a ``TestDirective`` instance.
@@ -526,30 +829,49 @@ class TestDirective(object):
         if (len(toks) < 2 or toks[0].type_ != perfile.TOK_WORD or
                 not toks[0].value or toks[-1] != (perfile.TOK_CHAR, '{')):
             raise perfile.ParseException(
-                'Invalid %%test directive at %s' % start_coord
+                'Invalid %%%s directive at %s' %
+                (self.DIRECTIVE, start_coord)
             )
 
         # Save the gunk we need for __call__()
         self.name = toks[0].value
+        self.cases = None
         self.fixtures = []
+        self.limits = {}
         self.values = values
         self.start_coord = start_coord
 
+        # Extract the optional array of test cases
+        if toks[1] == (perfile.TOK_CHAR, '['):
+            if (not self.CASES or len(toks) < 5 or
+                    toks[2].type_ != perfile.TOK_WORD or not toks[2].value or
+                    toks[3] != (perfile.TOK_CHAR, ']')):
+                raise perfile.ParseException(
+                    'Invalid %%%s directive at %s' %
+                    (self.DIRECTIVE, start_coord)
+                )
+
+            self.cases = toks[2].value
+            toks = toks[:1] + toks[4:]
+
         # Extract the optional fixtures
-        if len(toks) > 2:
-            if (toks[1] != (perfile.TOK_CHAR, '(') or
-                    toks[-2] != (perfile.TOK_CHAR, ')')):
+        toks = toks[1:-1]
+        if toks and toks[0] == (perfile.TOK_CHAR, '('):
+            if (perfile.TOK_CHAR, ')') not in toks:
                 raise perfile.ParseException(
-                    'Invalid %%test directive at %s' % start_coord
+                    'Invalid %%%s directive at %s' %
+                    (self.DIRECTIVE, start_coord)
                 )
 
-            for fix_toks in perfile.split_toks(toks[2:-2],
+            end = toks.index((perfile.TOK_CHAR, ')'))
+            fixtures, toks = toks[1:end], toks[end + 1:]
+            for fix_toks in perfile.split_toks(fixtures,
                                                {(perfile.TOK_CHAR, ',')}):
                 # Sanity-check the tokens
                 if len(fix_toks) < 1 or len(fix_toks) > 2:
                     raise perfile.ParseException(
-                        'Invalid fixture specification in %%test directive '
-                        'at %s' % start_coord
+                        'Invalid fixture specification in %%%s directive '
+                        'at %s' % (self.DIRECTIVE, start_coord)
                     )
 
                 # Determine if it's an injectable
@@ -563,8 +885,8 @@ class TestDirective(object):
                         fix_toks[0].type_ != perfile.TOK_WORD or
                         not fix_toks[0].value):
                     raise perfile.ParseException(
-                        'Invalid fixture specification in %%test directive '
-                        'at %s' % start_coord
+                        'Invalid fixture specification in %%%s directive '
+                        'at %s' % (self.DIRECTIVE, start_coord)
                     )
 
                 # Add the fixture injection
@@ -572,6 +894,34 @@ class TestDirective(object):
                     fix_toks[0].value, inject
                 ))
 
+        # Extract the optional limits
+        while toks:
+            if (not self.LIMITS or len(toks) < 3 or
+                    toks[0].type_ != perfile.TOK_WORD or
+                    toks[0].value not in LIMITS or
+                    toks[1] != (perfile.TOK_CHAR, '(') or
+                    (perfile.TOK_CHAR, ')') not in toks):
+                raise perfile.ParseException(
+                    'Invalid %%%s directive at %s' %
+                    (self.DIRECTIVE, start_coord)
+                )
+
+            # The value may have been split into several tokens
+            end = toks.index((perfile.TOK_CHAR, ')'))
+            text = ''.join(tok.value for tok in toks[2:end])
+            try:
+                value = LIMITS[toks[0].value](text)
+            except ValueError:
+                value = 0
+            if not 0 < value < float('inf'):
+                raise perfile.ParseException(
+                    'Invalid %s limit "%s" in %%%s directive at %s' %
+                    (toks[0].value, text, self.DIRECTIVE, start_coord)
+                )
+
+            self.limits[toks[0].value] = value
+            toks = toks[end + 1:]
+
     def __call__(self, end_coord, buf, toks):
         """
         Called once processing of the directive is complete.
@@ -594,21 +944,73 @@ class TestDirective(object):
         # Check for errors
         if toks is None:
             raise perfile.ParseException(
-                'Unclosed %%test directive at end of file; starts at %s' %
-                self.start_coord
+                'Unclosed %%%s directive at end of file; starts at %s' %
+                (self.DIRECTIVE, self.start_coord)
             )
         elif len(toks) != 0:
             raise perfile.ParseException(
-                'Invalid end of %%test directive at %s' % end_coord
+                'Invalid end of %%%s directive at %s' %
+                (self.DIRECTIVE, end_coord)
             )
 
         # Save the test data
-        self.values['tests'][self.name] = HypocriteTest(
-            self.start_coord - end_coord, self.name, buf, self.fixtures
+        self.values[self.KEY][self.name] = self.element(
+            self.start_coord - end_coord, buf
         )
 
         return None
 
+    def element(self, coord_range, buf):
+        """
+        Construct the description of the test.
+
+        :param coord_range: The range of coordinates associated with
+                            the test in the hypocrite input file.
+        :type coord_range: ``hypocrite.location.CoordinateRange``
+        :param list buf: A list of lines, including trailing newlines,
+                         enclosed within the directive.
+
+        :returns: The test description.
+        :rtype: ``HypocriteTest``
+        """
+
+        return HypocriteTest(
+            coord_range, self.name, buf, self.fixtures, self.cases,
+            self.limits,
+        )
+
+
+@HypoParser.directive(collections.OrderedDict, 'bench', 'benches')
+class BenchDirective(TestDirective):
+    """
+    The ``%bench`` directive.  This is a multi-line directive that
+    describes a single benchmark to be included in the generated test
+    file.  It is identical to the ``%test`` directive, save that it
+    may not be parameterized or limited; the code is the body of the
+    loop to be timed.
+    """
+
+    DIRECTIVE = 'bench'
+    KEY = 'benches'
+    CASES = False
+    LIMITS = False
+
+    def element(self, coord_range, buf):
+        """
+        Construct the description of the benchmark.
+
+        :param coord_range: The range of coordinates associated with
+                            the benchmark in the hypocrite input file.
+        :type coord_range: ``hypocrite.location.CoordinateRange``
+        :param list buf: A list of lines, including trailing newlines,
+                         enclosed within the directive.
+
+        :returns: The benchmark description.
+        :rtype: ``HypocriteBench``
+        """
+
+        return HypocriteBench(coord_range, self.name, buf, self.fixtures)
+
 
 @HypoParser.directive(lambda: {}, 'fixture', 'fixtures')
 class FixtureDirective(object):
@@ -616,7 +1018,8 @@ class FixtureDirective(object):
     The ``%fixture`` directive.  This is a multi-line directive that
     describes a named fixture to execute before a test.  The directive
     may be followed by another multiline directive to provide cleanup
-    code.
+    code.  The scope of the fixture may be given in parentheses
+    immediately following the directive name, e.g., "%fixture(file)".
     """
 
     def __init__(self, values, start_coord, toks):
@@ -633,6 +1036,19 @@ class FixtureDirective(object):
             An error occurred while parsing the directive.
         """
 
+        # Check for a scope
+        self.scope = 'test'
+        if toks and toks[0] == (perfile.TOK_CHAR, '('):
+            if (len(toks) < 3 or toks[1].type_ != perfile.TOK_WORD or
+                    toks[1].value not in Fixture.SCOPES or
+                    toks[2] != (perfile.TOK_CHAR, ')')):
+                raise perfile.ParseException(
+                    'Invalid %%fixture scope at %s' % start_coord
+                )
+
+            self.scope = Fixture.SCOPES[toks[1].value]
+            toks = toks[3:]
+
         # Parse the directive
         end_expected = False
         for type_, name, delim in _extract_type(toks,
@@ -715,7 +1131,8 @@ class FixtureDirective(object):
 
         # Create the fixture
         self.values['fixtures'][self.name] = Fixture(
-            self.start_coord - end_coord, self.name, self.type_, buf
+            self.start_coord - end_coord, self.name, self.type_, buf,
+            scope=self.scope,
         )
 
         return None
@@ -752,7 +1169,8 @@ class FixtureDirective(object):
 
         # Create the fixture
         self.values['fixtures'][self.name] = Fixture(
-            self.start_coord - end_coord, self.name, self.type_, self.code, buf
+            self.start_coord - end_coord, self.name, self.type_, self.code,
+            buf, scope=self.scope,
         )
 
         return None
@@ -786,16 +1204,65 @@ class HypoFile(object):
             An error occurred while parsing the input file.
         """
 
+        # Parse the input file; io.open() provides universal newlines
+        with io.open(path) as stream:
+            return cls.parse_stream(stream, path)
+
+    @classmethod
+    def parse_text(cls, text, path):
+        """
+        Parse the text of a hypocrite input file into a ``HypoFile``
+        instance.  No filesystem access is performed.
+
+        :param text: The text of the hypocrite input file.  If
+                     ``bytes``, it will be decoded as UTF-8.
+        :param str path: The path to the hypocrite input file.  This
+                         is used for error reporting and for
+                         generating ``#line`` directives.
+
+        :returns: An initialized hypocrite file representation.
+        :rtype: ``HypoFile``
+
+        :raises hypocrite.perfile.ParseException:
+            An error occurred while parsing the input file.
+        """
+
+        # Make sure we have text
+        if isinstance(text, six.binary_type):
+            text = text.decode('utf-8')
+
+        # Wrap it in a stream with universal newlines
+        return cls.parse_stream(
+            io.StringIO(six.text_type(text), newline=None), path
+        )
+
+    @classmethod
+    def parse_stream(cls, stream, path):
+        """
+        Parse a stream into a ``HypoFile`` instance.
+
+        :param stream: A stream, as opened with ``open()``.  The
+                       stream should be opened in text mode with
+                       universal newlines.
+        :param str path: The path to the hypocrite input file.
+
+        :returns: An initialized hypocrite file representation.
+        :rtype: ``HypoFile``
+
+        :raises hypocrite.perfile.ParseException:
+            An error occurred while parsing the input file.
+        """
+
         # Grab a parser instance
         parser = HypoParser()
 
-        # Parse the input file
-        with open(path, 'rU') as stream:
-            values = parser.parse(stream, os.path.basename(path))
+        # Parse the stream
+        values = parser.parse(stream, os.path.basename(path))
 
         return cls(path, **values)
 
-    def __init__(self, path, target, preamble, tests, mocks, fixtures):
+    def __init__(self, path, target, preamble, tests, mocks, fixtures,
+                 benches=None, fake_io=False):
         """
         Initialize a ``HypoFile`` instance.
 
@@ -815,6 +1282,15 @@ class HypoFile(object):
         :param dict fixtures: A dictionary mapping the names of test
                               fixtures to descriptions of those
                               fixtures (instances of ``Fixture``).
+        :param dict benches: A dictionary (probably a
+                             ``collections.OrderedDict``) mapping
+                             benchmark names to benchmark
+                             descriptions (instances of
+                             ``HypocriteBench``).  Optional.
+        :param list fake_io: The names of the functions whose calls
+                             by the target are served from memory, in
+                             the order of ``FAKE_IO_FUNCS``.
+                             Optional.
         """
 
         self.path = path
@@ -823,37 +1299,201 @@ class HypoFile(object):
         self.tests = tests
         self.mocks = mocks
         self.fixtures = fixtures
+        self.benches = (
+            collections.OrderedDict() if benches is None else benches
+        )
+        self.fake_io = fake_io
+        self._code = None
+        self._mock_helpers = None
+        self._fixture_owners = None
 
-    def render(self, test_fname):
+    @property
+    def fixture_owners(self):
+        """
+        Determine which test owns the fixture setup and teardown
+        functions for each combination of fixtures.  Tests using the
+        same fixtures, in the same order, share the functions of the
+        first such test; this allows the runner to identify tests
+        which may share a single set up of their fixtures.
+
+        :returns: A dictionary mapping tuples of fixture names to the
+                  name of the first test using those fixtures.
+        :rtype: ``dict``
+        """
+
+        if self._fixture_owners is None:
+            owners = {}
+            for test in self.tests.values():
+                owners.setdefault(
+                    tuple(fix for fix, _inject in test.fixtures), test.name
+                )
+
+            self._fixture_owners = owners
+
+        return self._fixture_owners
+
+    @property
+    def code(self):
+        """
+        Collect the code of the preambles, tests, benchmarks, and
+        fixtures, for scanning for references to the helpers.
+
+        :returns: The code, as a single string.
+        :rtype: ``str``
+        """
+
+        if self._code is None:
+            code = []
+            for preamble in self.preamble:
+                code.extend(preamble.code)
+            for test in self.tests.values():
+                code.extend(test.code)
+            for bench in self.benches.values():
+                code.extend(bench.code)
+            for fix in self.fixtures.values():
+                code.extend(fix.code)
+                if fix.teardown:
+                    code.extend(fix.teardown)
+
+            self._code = '\n'.join(code)
+
+        return self._code
+
+    @property
+    def mock_helpers(self):
+        """
+        Determine which optional helpers of each mock are used.  This
+        scans the preambles, tests, benchmarks, and fixtures for
+        references to the helpers, such as
+        ``hypo_mock_addreturn_malloc`` or ``ANYARG_MALLOC_SIZE``.
+
+        :returns: A dictionary mapping the names of the mocks to sets
+                  of the names of the helpers used.
+        :rtype: ``dict``
+        """
+
+        if self._mock_helpers is None:
+            text = self.code
+            helpers = dict((name, set()) for name in self.mocks)
+
+            # Look for direct references to the helpers
+            for helper, name in MOCK_HELPER_RE.findall(text):
+                if name in helpers and helper in HypocriteMock.HELPERS:
+                    helpers[name].add(helper)
+
+            # The "any" flags are part of the expected calls
+            for flag in set(MOCK_ANYARG_RE.findall(text)):
+                for name in helpers:
+                    if flag.startswith(name.upper() + '_'):
+                        helpers[name].add('expectcalls')
+
+            self._mock_helpers = helpers
+
+        return self._mock_helpers
+
+    def render(self, test_fname, profiler=None, ctxt=None,
+               runtime_header=None, all_mock_helpers=False,
+               track_allocs=False):
         """
         Render the ``HypoFile`` instance into an output file.
 
         :param str test_fname: The base name of the test file.
+        :param profiler: A profiler to record the time and memory
+                         spent rendering each kind of element.
+                         Optional.
+        :type profiler: ``hypocrite.metrics.Profiler``
+        :param ctxt: The render context to use.  If not provided, a
+                     new one will be created.  Callers may pass a
+                     context to inspect it after rendering, e.g., to
+                     determine which templates were used.
+        :type ctxt: ``hypocrite.template.RenderContext``
+        :param str runtime_header: The name of the shared runtime
+                                   header to include.  If not
+                                   provided, the runtime is included
+                                   directly in the output.
+        :param bool all_mock_helpers: If ``True``, emit all the
+                                      optional helpers of each mock,
+                                      rather than just those used.
+        :param bool track_allocs: If ``True``, track and report the
+                                  allocations made by the target
+                                  during each test.  Allocations are
+                                  also tracked if the allocation
+                                  assertions are used.
 
         :returns: A list of lines to be emitted to the output file.
         :rtype: ``hypocrite.linelist.LineList``
         """
 
+        profiler = profiler or metrics.NullProfiler()
+
         # First, set up a render context
-        ctxt = template.RenderContext()
+        if ctxt is None:
+            ctxt = template.RenderContext()
 
         # Now render all the elements, starting with the preamble
-        for preamble in self.preamble:
-            preamble.render(self, ctxt)
-        for test in self.tests.values():
-            test.render(self, ctxt)
-        for _name, mock in sorted(self.mocks.items(), key=lambda x: x[0]):
-            mock.render(self, ctxt)
-        for _name, fix in sorted(self.fixtures.items(), key=lambda x: x[0]):
-            fix.render(self, ctxt)
+        with profiler.phase('render:preamble'):
+            for preamble in self.preamble:
+                preamble.render(self, ctxt)
+        with profiler.phase('render:tests'):
+            for test in self.tests.values():
+                test.render(self, ctxt)
+        with profiler.phase('render:benches'):
+            for bench in self.benches.values():
+                bench.render(self, ctxt)
+        with profiler.phase('render:mocks'):
+            for name, mock in sorted(self.mocks.items(),
+                                     key=lambda x: x[0]):
+                mock.render(self, ctxt, None if all_mock_helpers
+                            else self.mock_helpers[name])
+        with profiler.phase('render:fixtures'):
+            for _name, fix in sorted(self.fixtures.items(),
+                                     key=lambda x: x[0]):
+                fix.render(self, ctxt)
+
+        # Record the element counts
+        profiler.count('tests', len(self.tests))
+        profiler.count('mocks', len(self.mocks))
+        profiler.count('fixtures', len(self.fixtures))
+        profiler.count('benches', len(self.benches))
+
+        # Track the allocations if requested or needed
+        kwargs = {}
+        if track_allocs or ALLOC_RE.search(self.code):
+            kwargs['track_allocs'] = True
+
+        # Serve the target's I/O from memory if requested
+        if self.fake_io:
+            kwargs['fake_io'] = self.fake_io
+
+        # Include the runtime, either by reference or inline; an
+        # inline runtime only includes the virtual clock and the
+        # in-memory I/O if they are used, and its implementation
+        # follows the target
+        if runtime_header:
+            kwargs['runtime_header'] = runtime_header
+        else:
+            fakes = ' '.join(mock.fake for mock in self.mocks.values()
+                             if mock.fake)
+            features = {}
+            if CLOCK_RE.search(self.code) or CLOCK_RE.search(fakes):
+                features['clock'] = True
+            if (self.fake_io or FAKE_IO_RE.search(self.code) or
+                    FAKE_IO_RE.search(fakes)):
+                features['fake_io'] = True
+            with profiler.phase('render:runtime'):
+                decls, impl = runtime.render_inline(ctxt, **features)
+            ctxt.sections['runtime'] = decls
+            ctxt.sections['runtime_impl'] = impl
 
         # Grab the master template
         tmpl = template.Template.get_tmpl(self.TEMPLATE)
 
         # Render it and return the code
-        return tmpl.render(
-            ctxt,
-            source=os.path.basename(self.path),
-            target=self.target,
-            test_fname=test_fname,
-        )
+        with profiler.phase('render:master'):
+            return tmpl.render(
+                ctxt,
+                source=os.path.basename(self.path),
+                target=self.target,
+                test_fname=test_fname,
+                **kwargs
+            )
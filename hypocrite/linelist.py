@@ -12,8 +12,6 @@
 # implied. See the License for the specific language governing
 # permissions and limitations under the License.
 
-from __future__ import print_function
-
 import collections
 import os
 
@@ -183,6 +181,22 @@ class LineList(object):
         # Determine the path so we can get the base filename
         if not path:
             path = stream.name
+
+        for text in self.iter_output(path):
+            stream.write(text)
+
+    def iter_output(self, path):
+        """
+        Iterate over the lines that ``output()`` would emit, including
+        the ``#line`` directives needed to map the lines back to the
+        coordinates they originated at.
+
+        :param str path: The path of the file being written.
+
+        :returns: An iterator that yields each output line, including
+                  its trailing newline.
+        """
+
         fname = os.path.basename(path)
 
         # Initialize some state about the current line number and the
@@ -197,18 +211,18 @@ class LineList(object):
                     # Reset line context to current line number in
                     # the file
                     line += 1
-                    print('#line %d "%s"' % (line, fname), file=stream)
+                    yield '#line %d "%s"\n' % (line, fname)
 
                 # Both coord and last are None, so line numbering is
                 # correct without a #line directive
 
-            elif last is None or last + 1 != coord:
+            elif not coord.follows(last):
                 # Shifting coordinates out-of-band, so emit a #line
-                print(coord.line, file=stream)
+                yield coord.line + '\n'
                 line += 1
 
             # Emit the text and increment the line count
-            print(text, file=stream)
+            yield text + '\n'
             line += 1
 
             # Keep track of the last coordinate, so we know when to
@@ -15,11 +15,81 @@
 import six
 
 
-class Coordinate(object):
+def _intern(path):
     """
-    Coordinate within a file.
+    Intern a path string.  A coordinate is created for every line of
+    every file processed, so interning the path ensures that all of
+    those coordinates share a single copy of the string, and allows
+    path comparisons to short-circuit on identity.
+
+    :param str path: The path to intern.
+
+    :returns: The interned path.  Paths which cannot be interned
+              (e.g., ``unicode`` instances on Python 2) are returned
+              unchanged.
+    """
+
+    return six.moves.intern(path) if type(path) is str else path
+
+
+class _Immutable(object):
+    """
+    A mix-in for classes with ``__slots__`` whose instances must not
+    be altered once they have been initialized.  Values should be set
+    by the initializer using ``_init_slots()``.
+    """
+
+    __slots__ = ()
+
+    def _init_slots(self, **kwargs):
+        """
+        Initialize the slots of an immutable instance.
+
+        :param kwargs: The values to set, keyed by the slot name.
+        """
+
+        for name, value in kwargs.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        """
+        Prohibit altering an attribute.
+
+        :param str name: The name of the attribute.
+        :param value: The new value of the attribute.
+
+        :raises AttributeError:
+            The instance is immutable.
+        """
+
+        raise AttributeError(
+            "can't set attribute %r of immutable %s" %
+            (name, self.__class__.__name__)
+        )
+
+    def __delattr__(self, name):
+        """
+        Prohibit deleting an attribute.
+
+        :param str name: The name of the attribute.
+
+        :raises AttributeError:
+            The instance is immutable.
+        """
+
+        raise AttributeError(
+            "can't delete attribute %r of immutable %s" %
+            (name, self.__class__.__name__)
+        )
+
+
+class Coordinate(_Immutable):
+    """
+    Coordinate within a file.  Coordinates are immutable and hashable.
     """
 
+    __slots__ = ('path', 'lno', '_line')
+
     def __init__(self, path, lno):
         """
         Initialize a ``Coordinate`` instance.
@@ -28,8 +98,17 @@ class Coordinate(object):
         :param int lno: The 1-indexed line number within the file.
         """
 
-        self.path = path
-        self.lno = lno
+        self._init_slots(path=_intern(path), lno=lno, _line=None)
+
+    def __reduce__(self):
+        """
+        Support pickling and copying of ``Coordinate`` instances, which
+        cannot be restored by setting attributes.
+
+        :returns: A tuple of the class and the initializer arguments.
+        """
+
+        return (self.__class__, (self.path, self.lno))
 
     def __str__(self):
         """
@@ -74,6 +153,17 @@ class Coordinate(object):
 
         return self.path != other.path or self.lno != other.lno
 
+    def __hash__(self):
+        """
+        Compute a hash for the coordinate.  Coordinates which compare
+        equal have the same hash.
+
+        :returns: The hash value.
+        :rtype: ``int``
+        """
+
+        return hash((self.path, self.lno))
+
     def __add__(self, other):
         """
         Generate a new coordinate offset from this one by a fixed amount.
@@ -125,17 +215,45 @@ class Coordinate(object):
     def line(self):
         """
         Retrieve a C preprocessor-style ``#line`` directive representing
-        the coordinate.
+        the coordinate.  The directive is computed the first time it
+        is requested, then cached.
         """
 
-        return '#line %d "%s"' % (self.lno, self.path)
+        if self._line is None:
+            object.__setattr__(
+                self, '_line', '#line %d "%s"' % (self.lno, self.path)
+            )
 
+        return self._line
 
-class CoordinateRange(object):
+    def follows(self, other):
+        """
+        Determine if this coordinate immediately follows another one,
+        that is, if it is equal to ``other + 1``.  This is equivalent
+        to that comparison, but does not construct an intermediate
+        ``Coordinate`` instance.
+
+        :param other: The other coordinate.
+        :type other: ``Coordinate``
+
+        :returns: A ``True`` value if this coordinate is on the line
+                  after ``other`` in the same file, ``False``
+                  otherwise.
+        """
+
+        return (isinstance(other, Coordinate) and
+                self.lno == other.lno + 1 and
+                (self.path is other.path or self.path == other.path))
+
+
+class CoordinateRange(_Immutable):
     """
-    A range of coordinates within a file.
+    A range of coordinates within a file.  Coordinate ranges are
+    immutable and hashable.
     """
 
+    __slots__ = ('path', 'start', 'end')
+
     def __init__(self, path, start, end):
         """
         Initialize a ``CoordinateRange`` instance.
@@ -147,9 +265,17 @@ class CoordinateRange(object):
                         the range.
         """
 
-        self.path = path
-        self.start = start
-        self.end = end
+        self._init_slots(path=_intern(path), start=start, end=end)
+
+    def __reduce__(self):
+        """
+        Support pickling and copying of ``CoordinateRange`` instances,
+        which cannot be restored by setting attributes.
+
+        :returns: A tuple of the class and the initializer arguments.
+        """
+
+        return (self.__class__, (self.path, self.start, self.end))
 
     def __str__(self):
         """
@@ -200,3 +326,14 @@ class CoordinateRange(object):
 
         return (self.path != other.path or self.start != other.start or
                 self.end != other.end)
+
+    def __hash__(self):
+        """
+        Compute a hash for the coordinate range.  Coordinate ranges
+        which compare equal have the same hash.
+
+        :returns: The hash value.
+        :rtype: ``int``
+        """
+
+        return hash((self.path, self.start, self.end))
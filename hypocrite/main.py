@@ -13,15 +13,26 @@
 # permissions and limitations under the License.
 
 import os
+import sys
 
 import cli_tools
 
+from hypocrite import api
+from hypocrite import benchcmp
+from hypocrite import depfile
+from hypocrite import folded
 from hypocrite import hypofile
+from hypocrite import metrics
+from hypocrite import runtime
+from hypocrite import template
+from hypocrite import worker
 
 
 @cli_tools.argument(
     'infile',
-    help='The input test file.'
+    nargs='?',
+    help='The input test file.  Required unless --persistent-worker or '
+    '--emit-runtime is given.'
 )
 @cli_tools.argument(
     '--output', '-O',
@@ -32,11 +43,146 @@ from hypocrite import hypofile
 )
 @cli_tools.argument(
     '--debug', '-d',
+    action='store_true',
     help='Enable debugging mode.  Note: This only affects hypocrite '
     'itself; no additional debugging code is added to the written '
     'test file.'
 )
-def main(infile, outfile=None):
+@cli_tools.argument(
+    '--runtime-header', '-R',
+    help='Include the specified shared runtime header in the output, '
+    'rather than including the runtime directly.  The runtime source '
+    'written by --emit-runtime must then be compiled and linked into '
+    'the test program.'
+)
+@cli_tools.argument(
+    '--emit-runtime',
+    metavar='DIR',
+    help='Write the shared runtime header and source, "%s" and "%s", to '
+    'the specified directory.  If --runtime-header is given, its base '
+    'name is used for the header.' % (runtime.HEADER, runtime.SOURCE)
+)
+@cli_tools.argument(
+    '--all-mock-helpers',
+    action='store_true',
+    help='Emit all the helpers of each mock, such as '
+    '"hypo_mock_addreturn_NAME()", rather than just those referenced by '
+    'the tests, fixtures, and preambles.'
+)
+@cli_tools.argument(
+    '--track-allocs',
+    action='store_true',
+    help='Track the memory allocations made by the target during each '
+    'test, and report them with the status of the test.  Allocations '
+    'are also tracked if the tests use the allocation assertions, such '
+    'as "hypo_assert_max_allocs()".'
+)
+@cli_tools.argument(
+    '-MD',
+    dest='depfile_auto',
+    action='store_true',
+    help='Write a make-compatible dependency file naming the input file '
+    'and the templates used.  The dependency file is named after the '
+    'output file, with the extension changed to ".d", unless -MF is '
+    'given.'
+)
+@cli_tools.argument(
+    '-MF',
+    dest='depfile_name',
+    help='Write a make-compatible dependency file to the specified file.'
+)
+@cli_tools.argument(
+    '-MT',
+    dest='depfile_target',
+    help='The target of the rule in the dependency file.  Defaults to '
+    'the name of the output file.'
+)
+@cli_tools.argument(
+    '--profile', '-p',
+    action='store_true',
+    help='Report the wall time and peak memory of each generation '
+    'phase, along with counts of the elements generated, to standard '
+    'error.'
+)
+@cli_tools.argument(
+    '--profile-json',
+    help='Write the generation phase metrics to the specified file '
+    'in JSON format.'
+)
+@cli_tools.argument(
+    '--profile-stats',
+    help='Collect a cProfile profile of the generation and write it to '
+    'the specified file, in a format suitable for the "pstats" module.'
+)
+@cli_tools.argument(
+    '--persistent-worker', '--persistent_worker',
+    dest='persistent_worker',
+    action='store_true',
+    help='Run as a persistent worker, reading JSON work requests, one '
+    'per line, from standard input and writing JSON work responses to '
+    'standard output.  The arguments of each work request are the '
+    'input file and, optionally, the --output option.'
+)
+@cli_tools.argument(
+    '--bench-results',
+    metavar='FILE',
+    action='append',
+    help='Compare the benchmark results written by a test program, '
+    'when the HYPO_BENCH_JSON environment variable is set, with the '
+    'baseline given by --bench-baseline, and exit with a non-zero '
+    'status if any benchmark is significantly slower.  May be given '
+    'more than once.'
+)
+@cli_tools.argument(
+    '--bench-baseline',
+    metavar='FILE',
+    help='The benchmark baseline file to compare --bench-results with.'
+)
+@cli_tools.argument(
+    '--bench-save',
+    action='store_true',
+    help='Save the --bench-results to the --bench-baseline file, rather '
+    'than comparing them.  Results of other benchmarks in the baseline '
+    'are retained.'
+)
+@cli_tools.argument(
+    '--bench-alpha',
+    type=float,
+    default=0.05,
+    help='The significance level of the comparison of benchmark '
+    'samples.  Default: %(default)s.'
+)
+@cli_tools.argument(
+    '--bench-threshold',
+    metavar='PERCENT',
+    type=float,
+    default=5.0,
+    help='The smallest change in the median time of a benchmark, in '
+    'percent, considered a slowdown.  Default: %(default)s.'
+)
+@cli_tools.argument(
+    '--fold-profile',
+    metavar='FILE',
+    action='append',
+    help='Symbolize the profile written by a test program, when the '
+    'HYPO_PROFILE environment variable is set, and write it to standard '
+    'output as folded stacks, suitable for rendering as a flame graph.  '
+    'May be given more than once.'
+)
+@cli_tools.argument(
+    '--addr2line',
+    metavar='PROG',
+    default='addr2line',
+    help='The "addr2line" program used by --fold-profile.  Default: '
+    '%(default)s.'
+)
+def main(infile=None, outfile=None, runtime_header=None, emit_runtime=None,
+         all_mock_helpers=False, depfile_auto=False, depfile_name=None,
+         depfile_target=None,
+         profile=False, profile_json=None, profile_stats=None,
+         persistent_worker=False, bench_results=None, bench_baseline=None,
+         bench_save=False, bench_alpha=0.05, bench_threshold=5.0,
+         track_allocs=False, fold_profile=None, addr2line='addr2line'):
     """
     Generate a C test file from the contents of a specially-formatted
     input file.  The input format supports declaration of fixtures and
@@ -47,21 +193,141 @@ def main(infile, outfile=None):
                         the name of the input file is altered by
                         changing the extension to ".c" and the file
                         will be written out to the current directory.
+    :param str runtime_header: The name of the shared runtime header
+                               to include.  If not provided, the
+                               runtime is included directly in the
+                               output file.
+    :param str emit_runtime: The name of a directory to write the
+                             shared runtime header and source to.
+    :param bool all_mock_helpers: If ``True``, emit all the helpers of
+                                  each mock, rather than just those
+                                  referenced.
+    :param bool depfile_auto: If ``True``, write a make-compatible
+                              dependency file.  Unless
+                              ``depfile_name`` is given, its name is
+                              that of the output file with the
+                              extension changed to ".d".
+    :param str depfile_name: The name of a make-compatible dependency
+                             file to write.
+    :param str depfile_target: The target of the rule in the
+                               dependency file.  Defaults to the name
+                               of the output file.
+    :param bool profile: If ``True``, report the metrics of each
+                         generation phase to standard error.
+    :param str profile_json: The name of a file to write the metrics
+                             of each generation phase to, in JSON
+                             format.
+    :param str profile_stats: The name of a file to write a
+                              ``cProfile`` profile of the generation
+                              to.
+    :param bool persistent_worker: If ``True``, process work requests
+                                   from standard input until it is
+                                   closed, rather than generating a
+                                   single test file.
+    :param list bench_results: The names of benchmark results files
+                               to compare with the baseline, rather
+                               than generating a test file.
+    :param str bench_baseline: The name of the benchmark baseline
+                               file.
+    :param bool bench_save: If ``True``, save the benchmark results to
+                            the baseline file rather than comparing
+                            them.
+    :param float bench_alpha: The significance level of the benchmark
+                              comparison.
+    :param float bench_threshold: The smallest change in the median
+                                  time of a benchmark, in percent,
+                                  considered a slowdown.
+    :param bool track_allocs: If ``True``, track and report the
+                              allocations made by the target during
+                              each test.
+    :param list fold_profile: The names of profiles written by test
+                              programs to symbolize and fold, rather
+                              than generating a test file.
+    :param str addr2line: The ``addr2line`` program used to symbolize
+                          the profiles.
     """
 
+    # Run as a persistent worker if requested
+    if persistent_worker:
+        worker.Worker().serve(sys.stdin, sys.stdout)
+        return
+
+    # Compare benchmark results if requested
+    if bench_results:
+        if not bench_baseline:
+            return 'A benchmark baseline file is required'
+
+        try:
+            return benchcmp.run(
+                bench_baseline, bench_results, sys.stdout,
+                save_baseline=bench_save, alpha=bench_alpha,
+                threshold=bench_threshold / 100.0,
+            )
+        except ValueError as exc:
+            return str(exc)
+
+    # Fold profiles if requested
+    if fold_profile:
+        folded.run(fold_profile, sys.stdout, addr2line)
+        return
+
+    # Write out the shared runtime if requested
+    if emit_runtime:
+        runtime.emit(
+            emit_runtime,
+            header=os.path.basename(runtime_header or runtime.HEADER),
+        )
+        if not infile:
+            return
+
+    if not infile:
+        return 'An input test file is required'
+
+    # Set up the profiler
+    if profile or profile_json or profile_stats:
+        profiler = metrics.Profiler(cprofile=bool(profile_stats))
+
+        # Load the templates up front, so their cost is separated
+        with profiler.phase('load'):
+            template.Template.preload()
+    else:
+        profiler = metrics.NullProfiler()
+
     # Read in the hypocrite file
-    hfile = hypofile.HypoFile.parse(infile)
+    with profiler.phase('parse'):
+        hfile = hypofile.HypoFile.parse(infile)
 
     # Pick the correct test basename
-    if not outfile:
-        test_fname = os.path.splitext(os.path.basename(infile))[0]
-        outfile = test_fname + '.c'
-    else:
-        test_fname = os.path.splitext(os.path.basename(outfile))[0]
+    test_fname, outfile = api.output_names(infile, outfile)
 
     # Render the template
-    rendered = hfile.render(test_fname)
+    ctxt = template.RenderContext()
+    rendered = hfile.render(test_fname, profiler, ctxt, runtime_header,
+                            all_mock_helpers, track_allocs)
 
     # Write it to the appropriate output file
-    with open(outfile, 'w') as stream:
-        rendered.output(stream, outfile)
+    with profiler.phase('output'):
+        with open(outfile, 'w') as stream:
+            rendered.output(stream, outfile)
+
+    # Write the dependency file
+    if depfile_auto and not depfile_name:
+        depfile_name = os.path.splitext(outfile)[0] + '.d'
+    if depfile_name:
+        deps = [infile] + [
+            template.Template.filename(name)
+            for name in sorted(ctxt.templates)
+        ]
+        with open(depfile_name, 'w') as stream:
+            depfile.write(stream, depfile_target or outfile, deps)
+
+    # Emit the requested metrics
+    if profiler.enabled:
+        profiler.count('lines', len(rendered))
+
+        if profile:
+            profiler.report(sys.stderr)
+        if profile_json:
+            profiler.dump_json(profile_json)
+        if profile_stats:
+            profiler.dump_stats(profile_stats)
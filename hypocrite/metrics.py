@@ -0,0 +1,273 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+from __future__ import print_function
+
+import collections
+import contextlib
+import json
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    # Not available on Python 2
+    tracemalloc = None
+
+try:
+    import cProfile
+except ImportError:  # pragma: no cover
+    cProfile = None
+
+
+class PhaseMetrics(object):
+    """
+    Accumulate the metrics for a single phase of generation.  A phase
+    may be entered multiple times, e.g., if one profiler is used to
+    generate several files; the calls are counted, the wall times are
+    summed, and the largest peak is kept.
+    """
+
+    def __init__(self, name):
+        """
+        Initialize a ``PhaseMetrics`` instance.
+
+        :param str name: The name of the phase.
+        """
+
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.peak = None
+
+    def add(self, wall, peak):
+        """
+        Add the results of one entry into the phase.
+
+        :param float wall: The wall clock time spent in the phase, in
+                           seconds.
+        :param int peak: The peak memory allocated during the phase,
+                         in bytes.  May be ``None`` if memory is not
+                         being traced.
+        """
+
+        self.calls += 1
+        self.wall += wall
+        if peak is not None:
+            self.peak = peak if self.peak is None else max(self.peak, peak)
+
+    def as_dict(self):
+        """
+        Retrieve the metrics as a dictionary.
+
+        :returns: A dictionary containing the phase metrics.
+        :rtype: ``dict``
+        """
+
+        return {
+            'calls': self.calls,
+            'wall': self.wall,
+            'peak': self.peak,
+        }
+
+
+class NullProfiler(object):
+    """
+    A profiler which does nothing.  This is used when profiling is
+    not enabled, so that callers need not check.
+    """
+
+    enabled = False
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Enter a phase.  This is a context manager.
+
+        :param str name: The name of the phase.
+        """
+
+        yield
+
+    def count(self, name, value):
+        """
+        Record a count.
+
+        :param str name: The name of the count.
+        :param int value: The value of the count.
+        """
+
+        pass
+
+
+class Profiler(NullProfiler):
+    """
+    Collect per-phase wall time and peak memory, along with counts of
+    items processed.  Memory is measured using ``tracemalloc``, where
+    available.  Optionally, a ``cProfile`` profile may be collected
+    for the phases.
+    """
+
+    enabled = True
+
+    def __init__(self, memory=True, cprofile=False):
+        """
+        Initialize a ``Profiler`` instance.
+
+        :param bool memory: If ``True`` (the default), peak memory
+                            usage will be traced for each phase.  This
+                            is ignored if ``tracemalloc`` is not
+                            available.
+        :param bool cprofile: If ``True``, a ``cProfile`` profile will
+                              be collected while any phase is active.
+        """
+
+        self.phases = collections.OrderedDict()
+        self.counts = collections.OrderedDict()
+        self.memory = bool(memory and tracemalloc)
+        self.cprofile = cProfile.Profile() if cprofile and cProfile else None
+        self._depth = 0
+
+        # The highest memory traced by each active phase before its
+        # peak was reset by a nested phase
+        self._peaks = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Enter a phase.  This is a context manager.  Phases may be
+        nested; however, the memory and time of a nested phase will
+        also be attributed to the enclosing phase.  Resetting the
+        traced peak for a nested phase does not lose the peak of the
+        enclosing phase.
+
+        :param str name: The name of the phase.
+        """
+
+        # Set up memory tracing
+        tracing = False
+        base = 0
+        if self.memory:
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            base, current_peak = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, 'reset_peak'):
+                # Remember the enclosing phase's peak before losing it
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], current_peak)
+                tracemalloc.reset_peak()
+            self._peaks.append(0)
+
+        # Start the profiler for the outermost phase
+        if self.cprofile and not self._depth:
+            self.cprofile.enable()
+        self._depth += 1
+
+        start = timeit.default_timer()
+        try:
+            yield
+        finally:
+            wall = timeit.default_timer() - start
+
+            self._depth -= 1
+            if self.cprofile and not self._depth:
+                self.cprofile.disable()
+
+            peak = None
+            if self.memory:
+                # Include the peaks lost to nested phases, and pass
+                # this phase's peak on to the enclosing phase
+                high = max(tracemalloc.get_traced_memory()[1],
+                           self._peaks.pop())
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], high)
+                peak = max(high - base, 0)
+                if tracing:
+                    tracemalloc.stop()
+
+            # Save the metrics
+            if name not in self.phases:
+                self.phases[name] = PhaseMetrics(name)
+            self.phases[name].add(wall, peak)
+
+    def count(self, name, value):
+        """
+        Record a count.  Counts with the same name are summed.
+
+        :param str name: The name of the count.
+        :param int value: The value of the count.
+        """
+
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def as_dict(self):
+        """
+        Retrieve the metrics as a dictionary suitable for serializing
+        to JSON.
+
+        :returns: A dictionary containing the phase metrics and the
+                  counts.
+        :rtype: ``dict``
+        """
+
+        return {
+            'phases': collections.OrderedDict(
+                (name, phase.as_dict()) for name, phase in self.phases.items()
+            ),
+            'counts': dict(self.counts),
+        }
+
+    def report(self, stream):
+        """
+        Emit a human-readable report of the metrics.
+
+        :param stream: The stream to emit the report to.
+        """
+
+        print('%-24s %6s %12s %12s' % ('phase', 'calls', 'wall (ms)',
+                                       'peak (KiB)'), file=stream)
+        for phase in self.phases.values():
+            print('%-24s %6d %12.3f %12s' % (
+                phase.name, phase.calls, phase.wall * 1000.0,
+                '-' if phase.peak is None else '%.1f' % (phase.peak / 1024.0),
+            ), file=stream)
+
+        if self.counts:
+            print('', file=stream)
+            for name, value in self.counts.items():
+                print('%-24s %6d' % (name, value), file=stream)
+
+    def dump_json(self, path):
+        """
+        Write the metrics to a JSON file.
+
+        :param str path: The path of the file to write.
+        """
+
+        with open(path, 'w') as stream:
+            json.dump(self.as_dict(), stream, indent=2)
+            stream.write('\n')
+
+    def dump_stats(self, path):
+        """
+        Write the collected ``cProfile`` data to a file, suitable for
+        loading with ``pstats``.  Does nothing if ``cProfile`` data
+        was not collected.
+
+        :param str path: The path of the file to write.
+        """
+
+        if self.cprofile:
+            self.cprofile.dump_stats(path)
@@ -0,0 +1,122 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import os
+
+from hypocrite import template
+
+# Default names of the shared runtime files
+HEADER = 'hypo_runtime.h'
+SOURCE = 'hypo_runtime.c'
+
+# Names of the runtime templates
+HEADER_TEMPLATE = 'runtime.h.tmpl'
+SOURCE_TEMPLATE = 'runtime.c.tmpl'
+
+
+def render_inline(ctxt, clock=False, fake_io=False):
+    """
+    Render the runtime for inclusion directly in a generated test
+    file.  The runtime functions are given static linkage, and are
+    marked as possibly unused.  The declarations are included before
+    the target, but the implementation is included after it, so that
+    the system headers it needs are not included before the target.
+
+    :param ctxt: The render context of the test file.  The names of
+                 the runtime templates will be added to its set of
+                 templates.
+    :type ctxt: ``hypocrite.template.RenderContext``
+    :param bool clock: If ``True``, include the virtual clock.
+    :param bool fake_io: If ``True``, include the in-memory I/O.
+
+    :returns: A tuple of the lines of the runtime declarations and
+              the lines of the runtime implementation.
+    :rtype: ``tuple`` of ``hypocrite.linelist.LineList``
+    """
+
+    # Sections are rendered if their variables are present at all, so
+    # only pass the features that are wanted
+    kwargs = {'linkage': 'static _HYPO_UNUSED'}
+    if clock:
+        kwargs['clock'] = True
+    if fake_io:
+        kwargs['fake_io'] = True
+
+    # Render each template in its own context, so their sections
+    # cannot collide with each other or with the test file's
+    result = []
+    for name in (HEADER_TEMPLATE, SOURCE_TEMPLATE):
+        sub_ctxt = template.RenderContext()
+        sub_ctxt.templates = ctxt.templates
+        result.append(
+            template.Template.get_tmpl(name).render(sub_ctxt, **kwargs)
+        )
+
+    return tuple(result)
+
+
+def render_header(header=HEADER):
+    """
+    Render the header file of the shared runtime.
+
+    :param str header: The name of the header file.
+
+    :returns: The lines of the header file.
+    :rtype: ``hypocrite.linelist.LineList``
+    """
+
+    tmpl = template.Template.get_tmpl(HEADER_TEMPLATE)
+    return tmpl.render(template.RenderContext(), shared=header,
+                       linkage='extern', clock=True, fake_io=True)
+
+
+def render_source(header=HEADER):
+    """
+    Render the source file of the shared runtime.
+
+    :param str header: The name of the header file, as it should be
+                       included from the source file.
+
+    :returns: The lines of the source file.
+    :rtype: ``hypocrite.linelist.LineList``
+    """
+
+    tmpl = template.Template.get_tmpl(SOURCE_TEMPLATE)
+    return tmpl.render(template.RenderContext(), shared=header,
+                       linkage='extern', clock=True, fake_io=True)
+
+
+def emit(directory='.', header=HEADER, source=SOURCE):
+    """
+    Write the header and source files of the shared runtime.  The
+    source file must be compiled and linked into each test program
+    generated with the runtime header.
+
+    :param str directory: The directory to write the files to.
+    :param str header: The name of the header file.
+    :param str source: The name of the source file.
+
+    :returns: A list of the paths of the files written.
+    :rtype: ``list`` of ``str``
+    """
+
+    result = []
+    for fname, rendered in ((header, render_header(header)),
+                            (source, render_source(header))):
+        path = os.path.join(directory, fname)
+        with open(path, 'w') as stream:
+            rendered.output(stream, path)
+        result.append(path)
+
+    return result
@@ -15,6 +15,7 @@
 import collections
 import io
 import re
+import threading
 
 import jinja2
 import pkg_resources
@@ -23,6 +24,13 @@ import six
 from hypocrite import linelist
 from hypocrite import perfile
 
+try:
+    from types import MappingProxyType
+except ImportError:  # pragma: no cover
+    # Not available on Python 2; the preloaded templates are never
+    # altered anyway
+    MappingProxyType = dict
+
 # Regular expression for section template rendering
 SUBST_RE = re.compile(r'\{\{\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\}\}')
 
@@ -186,6 +194,19 @@ class Section(object):
         self.name = name
         self.requires = requires
         self.contents = contents
+        self.extras = []
+
+    def append(self, section):
+        """
+        Append another section template with the same name.  The
+        section templates are rendered in order, and each is subject
+        to its own requirements.
+
+        :param section: The section template to append.
+        :type section: ``Section``
+        """
+
+        self.extras.append(section)
 
     def render(self, kwargs):
         """
@@ -199,6 +220,33 @@ class Section(object):
                   to add to the designated section.
         """
 
+        result = self._render(kwargs)
+
+        # Render the section templates appended to this one
+        for extra in self.extras:
+            extra_result = extra.render(kwargs)
+            if extra_result is None:
+                continue
+            elif result is None:
+                result = extra_result
+            else:
+                result += extra_result
+
+        return result
+
+    def _render(self, kwargs):
+        """
+        Render just this section template, ignoring any appended
+        section templates.
+
+        :param dict kwargs: The arguments to use while rendering the
+                            section template.
+
+        :returns: Either ``None`` or an instance of
+                  ``hypocrite.linelist.LineList`` containing the lines
+                  to add to the designated section.
+        """
+
         if self.requires - set(kwargs):
             # Missing variables, don't render it
             return None
@@ -429,8 +477,9 @@ class SectionDirective(object):
     be added, and should end with a TOK_CHAR token with the value '{'.
     Additional comma-separated TOK_WORD tokens, surrounded by '(' and
     ')' tokens, indicate variables that must be set for the section to
-    be rendered.  Will be ended by a '%}' directive, which must appear
-    at the beginning of a line.
+    be rendered.  A section may be given more than once; the
+    templates are rendered in order.  Will be ended by a '%}'
+    directive, which must appear at the beginning of a line.
     """
 
     def __init__(self, values, start_coord, toks):
@@ -510,10 +559,15 @@ class SectionDirective(object):
                 'Invalid end of %%section directive at %s' % end_coord
             )
 
-        # Save the section
-        self.values['sections'][self.name] = Section(
+        # Save the section; sections with the same name are rendered
+        # in order
+        section = Section(
             self.start_coord - end_coord, self.name, self.requires, buf
         )
+        if self.name in self.values['sections']:
+            self.values['sections'][self.name].append(section)
+        else:
+            self.values['sections'][self.name] = section
 
         return None
 
@@ -522,7 +576,7 @@ class RenderContext(object):
     """
     A context to use while rendering the templates.  Instances of this
     class accumulate the output, as well as section data to be
-    inserted into the output.
+    inserted into the output and the names of the templates rendered.
     """
 
     def __init__(self):
@@ -532,6 +586,7 @@ class RenderContext(object):
 
         self.output = linelist.LineList()
         self.sections = collections.defaultdict(linelist.LineList)
+        self.templates = set()
 
 
 class Template(object):
@@ -540,8 +595,14 @@ class Template(object):
     """
 
     # Cache of templates, so they don't have to be loaded over and
-    # over
+    # over.  Templates are never altered once loaded, so they may be
+    # shared between threads; the lock serializes access to the
+    # cache.  Once all the templates have been preloaded, they are
+    # published as an immutable mapping, which may be read without
+    # locking.
     _tmpl_cache = {}
+    _tmpl_lock = threading.Lock()
+    _preloaded = None
 
     @classmethod
     def get_tmpl(cls, name):
@@ -555,29 +616,94 @@ class Template(object):
         :rtype: ``Template``
         """
 
-        # Do we need to suck it in?
-        if name not in cls._tmpl_cache:
-            # Grab the resource stream
-            resource_name = TEMPLATES % name
-            raw_stream = pkg_resources.resource_stream(
-                'hypocrite', resource_name
-            )
+        # Fast path: all the templates have been preloaded
+        preloaded = cls._preloaded
+        if preloaded is not None and name in preloaded:
+            return preloaded[name]
+
+        # Otherwise, load the template on first use
+        with cls._tmpl_lock:
+            if name not in cls._tmpl_cache:
+                cls._tmpl_cache[name] = cls._load(name)
+
+            return cls._tmpl_cache[name]
+
+    @classmethod
+    def _load(cls, name):
+        """
+        Load a template with the given name.
 
-            # Paper over a py2/py3 mismatch
-            if six.PY2 and isinstance(raw_stream, file):  # pragma: no cover
-                raw_stream = io.BufferedReader(_ReadableWrapper(raw_stream))
+        :param str name: The name of the template.  Must exist in the
+                         templates directory.
+
+        :returns: A template.
+        :rtype: ``Template``
+        """
+
+        # Grab the resource stream
+        resource_name = TEMPLATES % name
+        raw_stream = pkg_resources.resource_stream(
+            'hypocrite', resource_name
+        )
+
+        # Paper over a py2/py3 mismatch
+        if six.PY2 and isinstance(raw_stream, file):  # pragma: no cover
+            raw_stream = io.BufferedReader(_ReadableWrapper(raw_stream))
 
-            # We need a text stream with universal newlines
-            stream = io.TextIOWrapper(raw_stream)
+        # We need a text stream with universal newlines
+        stream = io.TextIOWrapper(raw_stream)
 
-            # Initialize a parser and parse the stream
-            parser = TemplateParser()
-            values = parser.parse(stream, name)
+        # Initialize a parser and parse the stream
+        parser = TemplateParser()
+        values = parser.parse(stream, name)
 
-            # Create and cache the template
-            cls._tmpl_cache[name] = cls(name, **values)
+        # Create the template
+        return cls(name, **values)
 
-        return cls._tmpl_cache[name]
+    @staticmethod
+    def filename(name):
+        """
+        Retrieve the name of the file containing the template with the
+        given name.  This is suitable for use in dependency lists.
+
+        :param str name: The name of the template.
+
+        :returns: The name of the template file.
+        :rtype: ``str``
+        """
+
+        return pkg_resources.resource_filename('hypocrite', TEMPLATES % name)
+
+    @classmethod
+    def preload(cls):
+        """
+        Load all the templates in the templates directory into the
+        cache, and publish them as an immutable mapping.  This allows
+        the cost of loading the templates to be paid up front, rather
+        than during rendering, and allows them to be retrieved
+        without locking.  Only the first call loads the templates.
+
+        :returns: A list of the names of the templates.
+        :rtype: ``list`` of ``str``
+        """
+
+        with cls._tmpl_lock:
+            if cls._preloaded is None:
+                names = [
+                    name for name in pkg_resources.resource_listdir(
+                        'hypocrite', TEMPLATES % ''
+                    ) if name.endswith('.tmpl')
+                ]
+
+                for name in names:
+                    if name not in cls._tmpl_cache:
+                        cls._tmpl_cache[name] = cls._load(name)
+
+                cls._preloaded = MappingProxyType(
+                    dict((name, cls._tmpl_cache[name]) for name in names)
+                )
+
+        return sorted(cls._preloaded)
 
     def __init__(self, name, structure, defines, sections):
         """
@@ -622,6 +748,9 @@ class Template(object):
                   output from ``ctxt``.  This is for convenience.
         """
 
+        # Remember that this template contributed to the output
+        ctxt.templates.add(self.name)
+
         # First, realize all the defines
         for name, define in self.defines.items():
             kwargs[name] = define.render(kwargs)
@@ -0,0 +1,189 @@
+# Copyright (C) 2017 by Kevin L. Mitchell <klmitch@mit.edu>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import argparse
+import hashlib
+import io
+import json
+import os
+
+from hypocrite import api
+from hypocrite import hypofile
+
+
+class WorkerArgumentError(Exception):
+    """
+    An error occurred while parsing the arguments of a work request.
+    """
+
+    pass
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    """
+    An argument parser which raises an exception on error, rather
+    than exiting the worker.
+    """
+
+    def error(self, message):
+        """
+        Report an argument error.
+
+        :param str message: The error message.
+
+        :raises WorkerArgumentError:
+            Always raised.
+        """
+
+        raise WorkerArgumentError('%s: %s' % (self.prog, message))
+
+
+class Worker(object):
+    """
+    Implement the persistent worker protocol used by build tools such
+    as Bazel.  Each work request is a JSON object on a single line of
+    the input stream, containing an "arguments" list (the
+    ``hypocrite`` command line, less the program name; only the input
+    file and the --output, --runtime-header, --all-mock-helpers, and
+    --track-allocs options are recognized), an optional "inputs" list
+    of objects with "path" and "digest" keys, and a "requestId".  Each
+    work response is a JSON object on a single line of the output
+    stream, containing the "exitCode", the "output" (any error
+    message), and the "requestId" of the request.
+
+    The templates are loaded once, when the worker starts, and the
+    parsed input files are cached, keyed by path and content digest,
+    so that an unchanged input file is not parsed again.
+    """
+
+    def __init__(self):
+        """
+        Initialize a ``Worker`` instance.
+        """
+
+        # Maps input paths to a tuple of the digest and the HypoFile
+        self._cache = {}
+
+        # The parser for work request arguments
+        self._parser = _ArgumentParser(prog='hypocrite')
+        self._parser.add_argument('infile')
+        self._parser.add_argument('--output', '-O', dest='outfile')
+        self._parser.add_argument('--runtime-header', '-R')
+        self._parser.add_argument('--all-mock-helpers', action='store_true')
+        self._parser.add_argument('--track-allocs', action='store_true')
+
+    def serve(self, instream, outstream):
+        """
+        Process work requests until the input stream is closed.
+
+        :param instream: The stream to read work requests from.
+        :param outstream: The stream to write work responses to.
+        """
+
+        # Load all the templates up front
+        api.preload()
+
+        for line in iter(instream.readline, ''):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                request = json.loads(line)
+            except ValueError as exc:
+                response = {
+                    'exitCode': 1,
+                    'output': 'Invalid work request: %s' % exc,
+                }
+            else:
+                response = self.handle(request)
+
+            outstream.write(json.dumps(response, sort_keys=True) + '\n')
+            outstream.flush()
+
+    def handle(self, request):
+        """
+        Process a single work request.
+
+        :param dict request: The work request.
+
+        :returns: The work response.
+        :rtype: ``dict``
+        """
+
+        response = {
+            'exitCode': 0,
+            'output': '',
+            'requestId': request.get('requestId', 0),
+        }
+
+        # Paths in multiplexed sandboxes are relative to the sandbox
+        sandbox = request.get('sandboxDir', '')
+
+        try:
+            args = self._parser.parse_args(request.get('arguments', []))
+            digests = dict(
+                (inp['path'], inp.get('digest'))
+                for inp in request.get('inputs', [])
+            )
+
+            # Generate the test file
+            test_fname, outfile = api.output_names(args.infile, args.outfile)
+            hfile = self.load(
+                os.path.join(sandbox, args.infile),
+                digests.get(args.infile),
+            )
+            rendered = hfile.render(
+                test_fname, runtime_header=args.runtime_header,
+                all_mock_helpers=args.all_mock_helpers,
+                track_allocs=args.track_allocs,
+            )
+            with open(os.path.join(sandbox, outfile), 'w') as stream:
+                rendered.output(stream, outfile)
+        except Exception as exc:
+            response.update(exitCode=1, output=str(exc))
+
+        return response
+
+    def load(self, path, digest=None):
+        """
+        Load a hypocrite input file, using the cached parse result if
+        the file is unchanged.
+
+        :param str path: The path to the hypocrite input file.
+        :param str digest: The digest of the file contents, as
+                           provided by the build tool.  If not
+                           provided, the file is read and its SHA-256
+                           digest computed.
+
+        :returns: The parsed file.
+        :rtype: ``hypocrite.hypofile.HypoFile``
+        """
+
+        # Use the build tool's digest to avoid reading the file
+        cached = self._cache.get(path)
+        if digest and cached and cached[0] == digest:
+            return cached[1]
+
+        with io.open(path, 'rb') as stream:
+            text = stream.read()
+        if not digest:
+            digest = hashlib.sha256(text).hexdigest()
+            if cached and cached[0] == digest:
+                return cached[1]
+
+        hfile = hypofile.HypoFile.parse_text(text, path)
+        self._cache[path] = (digest, hfile)
+
+        return hfile
@@ -0,0 +1,29 @@
+/* A target with a member named after a POSIX I/O function */
+#include <unistd.h>
+
+struct sink {
+  int (*close)(int fd);
+};
+
+static int closed = -1;
+
+static int
+record_close(int fd)
+{
+  closed = fd;
+
+  return 0;
+}
+
+ssize_t
+relay(int in, int out, struct sink *sink)
+{
+  char buf[64];
+  ssize_t len;
+
+  if ((len = read(in, buf, sizeof(buf))) < 0 || write(out, buf, len) != len)
+    return -1;
+  sink->close(in);
+
+  return len;
+}
@@ -0,0 +1,3868 @@
+#line 17 "runtime.c.tmpl"
+/* This file is automatically generated by hypocrite.
+ *
+ * It contains the runtime shared by the test files generated by
+ * hypocrite; to change it, re-run hypocrite with --emit-runtime.
+ */
+
+#include "hypo_runtime.h"
+
+#line 30 "runtime.c.tmpl"
+/* The system interfaces used by the runtime are only included here,
+ * so that they are not declared before the target
+ */
+#ifdef _HYPO_HAVE_FORK
+# include <errno.h>
+# include <sys/types.h>
+# include <sys/wait.h>
+# include <unistd.h>
+#endif
+#ifdef _HYPO_HAVE_TIMEOUT
+# include <setjmp.h>
+# include <signal.h>
+# include <sys/resource.h>
+# include <sys/time.h>
+#endif
+#ifdef _HYPO_HAVE_RUSAGE
+# include <fcntl.h>
+# include <sys/resource.h>
+# include <sys/time.h>
+# include <unistd.h>
+#endif
+#ifdef _HYPO_HAVE_PERF
+# include <linux/perf_event.h>
+# include <sys/ioctl.h>
+# include <sys/syscall.h>
+#endif
+#ifdef _HYPO_HAVE_PROF
+# include <fcntl.h>
+# include <signal.h>
+# include <sys/time.h>
+# include <ucontext.h>
+# include <unistd.h>
+#endif
+#ifdef _HYPO_HAVE_CLOCK
+# include <sys/time.h>
+#endif
+#ifdef _HYPO_HAVE_FAKEIO
+# include <fcntl.h>
+# include <unistd.h>
+#endif
+
+/* Mocks may be called from several threads at once if HYPO_THREADS
+ * is defined; this requires POSIX threads
+ */
+#ifdef HYPO_THREADS
+# include <pthread.h>
+#endif
+
+/* The mocks used by the current test */
+static _hypo_mock_t *_hypo_mock_dirty = 0;
+
+/* Set while benchmarks are being measured; mocks then keep only the
+ * most recent call, and do not save the return values of the
+ * underlying functions
+ */
+static int _hypo_mock_quiet = 0;
+
+/* The minimum number of calls to a mock for a query to use a hash
+ * index; shorter call lists are simply scanned
+ */
+#ifndef HYPO_MOCK_INDEX_MIN
+# define HYPO_MOCK_INDEX_MIN	64
+#endif
+
+/* A hash index over the calls to a mock, keyed by the arguments not
+ * ignored by the flags of a query.  The index covers the first
+ * "indexed" calls, and is extended as needed when it is used.  Each
+ * bucket contains the index of the last call in the bucket, plus 1,
+ * or 0 if the bucket is empty; the chain contains, for each call,
+ * the index of the previous call in the same bucket, plus 1.
+ */
+typedef struct _hypo_mock_index_s {
+  unsigned long any_flags;
+  unsigned int indexed;
+  unsigned int nbuckets;
+  unsigned int *buckets;
+  _hypo_list_t chain;
+  struct _hypo_mock_index_s *next;
+} _hypo_mock_index_t;
+
+/* The calls to a mock which the expected calls with the given flags
+ * may match, when checking the calls without regard to order.  These
+ * are copies of the hash index for the flags, or, if there is none,
+ * of a single bucket containing all the calls.  Calls are removed
+ * from the first copy once they have been matched, and from the
+ * second once the current search has visited them.
+ */
+typedef struct {
+  unsigned long any_flags;
+  int hashed;
+  unsigned int nbuckets;
+  unsigned int *buckets;
+  unsigned int *chain;
+  unsigned int *search_buckets;
+  unsigned int *search_chain;
+} _hypo_mock_view_t;
+
+/* A removal of a call from the search copy of a view, to be undone
+ * when the search is over
+ */
+typedef struct {
+  unsigned int *link;
+  unsigned int value;
+} _hypo_mock_unlink_t;
+
+/* An expected call being visited by a search, along with the link to
+ * the next call it may match, and the call through which the search
+ * continued
+ */
+typedef struct {
+  unsigned int expect;
+  unsigned int call;
+  unsigned int *link;
+  unsigned int *chain;
+} _hypo_mock_frame_t;
+
+/* The state of checking the calls to a mock without regard to order.
+ * For each call, owner contains the index of the expected call
+ * matched with it, plus 1, or 0 if it has not been matched, and seen
+ * contains the number of the last search to visit it.
+ */
+typedef struct {
+  _hypo_mock_t *mock;
+  const _hypo_mock_arg_t *args;
+  const unsigned char *expected;
+  size_t size;
+  unsigned int *owner;
+  unsigned int *seen;
+  unsigned int search;
+  _hypo_list_t views;
+  _hypo_list_t unlinked;
+  _hypo_list_t stack;
+} _hypo_mock_match_t;
+
+/* A deferred teardown of a file-scoped fixture */
+typedef struct {
+  const char *name;
+  void (*teardown)(hypo_context_t *);
+} _hypo_fix_deferred_t;
+
+/* The deferred teardowns, in the order they were deferred */
+static _hypo_list_t _hypo_fix_deferred = _HYPO_LIST_INIT(_hypo_fix_deferred_t);
+
+#ifdef HYPO_THREADS
+/* Serializes the rare operations of the threaded mode: creating the
+ * per-thread buffers, marking mocks as used, saving the return
+ * values of mocks in "spy" mode, and merging the buffers
+ */
+static pthread_mutex_t _hypo_mock_lock = PTHREAD_MUTEX_INITIALIZER;
+
+/* The sequence number of the next call to any mock */
+static unsigned long _hypo_mock_seq = 0;
+
+/* The key of each thread's list of per-thread buffers */
+static pthread_key_t _hypo_mock_key;
+static pthread_once_t _hypo_mock_once = PTHREAD_ONCE_INIT;
+
+/* The calls made to a mock by a single thread, each paired with its
+ * sequence number.  The buffer is on the list of its thread, linked
+ * through the thread_next element, and on the list of its mock,
+ * linked through the next element.  The merged element counts the
+ * calls already moved to the mock's calls list; the orphaned element
+ * is set once the thread has exited.
+ */
+typedef struct _hypo_mock_tbuf_s {
+  _hypo_mock_t *mock;
+  _hypo_list_t seqs;
+  _hypo_list_t calls;
+  unsigned int merged;
+  int orphaned;
+  struct _hypo_mock_tbuf_s *next;
+  struct _hypo_mock_tbuf_s *thread_next;
+} _hypo_mock_tbuf_t;
+
+/* Called when a thread exits; its buffers are released when their
+ * mocks are next reset
+ */
+static void
+_hypo_mock_orphan(void *value)
+{
+  _hypo_mock_tbuf_t *tbuf;
+
+  pthread_mutex_lock(&_hypo_mock_lock);
+  for (tbuf = (_hypo_mock_tbuf_t *)value; tbuf; tbuf = tbuf->thread_next)
+    tbuf->orphaned = 1;
+  pthread_mutex_unlock(&_hypo_mock_lock);
+}
+
+/* Create the key of the lists of per-thread buffers */
+static void
+_hypo_mock_key_init(void)
+{
+  if (pthread_key_create(&_hypo_mock_key, _hypo_mock_orphan))
+    abort(); /* Not much else we can do */
+}
+
+/* Obtain the calling thread's buffer for a mock, creating it on the
+ * first call to the mock from the thread.
+ */
+static _hypo_mock_tbuf_t *
+_hypo_mock_tbuf(_hypo_mock_t *mock)
+{
+  _hypo_mock_tbuf_t *head, *tbuf;
+
+  pthread_once(&_hypo_mock_once, _hypo_mock_key_init);
+
+  /* Look for the thread's buffer */
+  head = (_hypo_mock_tbuf_t *)pthread_getspecific(_hypo_mock_key);
+  for (tbuf = head; tbuf; tbuf = tbuf->thread_next)
+    if (tbuf->mock == mock)
+      return tbuf;
+
+  /* Allocate a new one */
+  if (!(tbuf = (_hypo_mock_tbuf_t *)calloc(1, sizeof(*tbuf))))
+    abort(); /* Not much else we can do */
+  tbuf->mock = mock;
+  tbuf->seqs.size = sizeof(unsigned long);
+  tbuf->calls.size = mock->calls.size;
+
+  /* Add it to the thread's list */
+  tbuf->thread_next = head;
+  if (pthread_setspecific(_hypo_mock_key, tbuf))
+    abort(); /* Not much else we can do */
+
+  /* And to the mock's list */
+  pthread_mutex_lock(&_hypo_mock_lock);
+  tbuf->next = mock->tbufs;
+  mock->tbufs = tbuf;
+  pthread_mutex_unlock(&_hypo_mock_lock);
+
+  return tbuf;
+}
+#endif
+
+/* Mark a mock as used by the current test, adding it to the list of
+ * mocks to reset after the test.
+ */
+static void
+_hypo_mock_touch(_hypo_mock_t *mock)
+{
+#ifdef HYPO_THREADS
+  if (__atomic_load_n(&mock->dirty, __ATOMIC_ACQUIRE))
+    return;
+
+  pthread_mutex_lock(&_hypo_mock_lock);
+  if (!mock->dirty) {
+    mock->next = _hypo_mock_dirty;
+    _hypo_mock_dirty = mock;
+    __atomic_store_n(&mock->dirty, 1, __ATOMIC_RELEASE);
+  }
+  pthread_mutex_unlock(&_hypo_mock_lock);
+#else
+  if (mock->dirty)
+    return;
+
+  mock->dirty = 1;
+  mock->next = _hypo_mock_dirty;
+  _hypo_mock_dirty = mock;
+#endif
+}
+
+/* Allocate an item in the list.  This may increase the capacity of
+ * the list (factor-of-two logic is used).  If the system is out of
+ * memory, this will abort().
+ */
+_HYPO_API void *
+_hypo_list_alloc(_hypo_list_t *list)
+{
+  return _hypo_list_extend(list, 1);
+}
+
+/* Allocate n items at the end of the list, with a single
+ * reservation.  The capacity is doubled until the items fit.  If the
+ * system is out of memory, this will abort().
+ */
+_HYPO_API void *
+_hypo_list_extend(_hypo_list_t *list, unsigned int n)
+{
+  void *item;
+
+  if (list->count + n >= list->capacity) {
+    unsigned char *new;
+    unsigned int new_capacity = list->capacity ? list->capacity << 1 : 4;
+
+    while (list->count + n >= new_capacity)
+      new_capacity <<= 1;
+
+    new = (unsigned char *)realloc(list->storage, list->size * new_capacity);
+    if (!new) /* Not much else we can do */
+      abort();
+
+    /* realloc() can move the storage */
+    list->storage = new;
+    list->capacity = new_capacity;
+  }
+
+  item = _hypo_list_ref(list, list->count);
+  list->count += n;
+
+  return item;
+}
+
+/* The core assertion function.  Called with the location of the
+ * assertion macro and all the interesting data (string form of the
+ * expression, the evaluated expression, and an optional message).
+ * Stores failures in the test context.
+ */
+_HYPO_API int
+_hypo_assert(hypo_context_t *hypo_ctx, unsigned int flags,
+	     const char *file, unsigned int line,
+	     const char *expr, int value, const char *msg)
+{
+  _hypo_failure_t *failure;
+
+  /* If the fatal flag is set, do nothing but bail out */
+  if (hypo_ctx->flags & _HYPO_FLAG_FATAL)
+    return 1;
+
+  /* Successful assert? */
+  if (value)
+    return 0;
+
+  /* Allocate a failure and record it */
+  failure = (_hypo_failure_t *)_hypo_list_alloc(&hypo_ctx->failures);
+  failure->test_fname = hypo_ctx->test_fname;
+  failure->test = hypo_ctx->cur_test;
+  failure->file = file;
+  failure->line = line;
+  failure->expr = expr;
+  failure->value = value;
+  failure->msg = msg;
+
+  /* Flag that this test failed */
+  hypo_ctx->flags |= _HYPO_FLAG_FAIL;
+
+  /* If it was a fatal assertion, remember that */
+  if (flags & _HYPO_FLAG_FATAL)
+    hypo_ctx->flags |= _HYPO_FLAG_FATAL;
+
+  /* Return true if it was fatal, so hypo_assert() can return */
+  return hypo_ctx->flags & _HYPO_FLAG_FATAL;
+}
+
+/* Record a call to a mock.  Allocates a call record and stores the
+ * file and line of the call; the caller stores the arguments.  In
+ * the threaded mode, the record is allocated in the calling thread's
+ * buffer, along with the call's sequence number, without locking.
+ * While benchmarks are measured, the same record is reused.
+ */
+_HYPO_API void *
+_hypo_mock_call(_hypo_mock_t *mock, const char *file, unsigned int line)
+{
+  _hypo_mock_call_t *call;
+#ifdef HYPO_THREADS
+  _hypo_mock_tbuf_t *tbuf;
+#endif
+
+  _hypo_mock_touch(mock);
+
+#ifdef HYPO_THREADS
+  tbuf = _hypo_mock_tbuf(mock);
+  if (_hypo_mock_quiet)
+    tbuf->seqs.count = tbuf->calls.count = 0;
+  *(unsigned long *)_hypo_list_alloc(&tbuf->seqs) =
+    __atomic_fetch_add(&_hypo_mock_seq, 1, __ATOMIC_RELAXED);
+  call = (_hypo_mock_call_t *)_hypo_list_alloc(&tbuf->calls);
+#else
+  if (_hypo_mock_quiet)
+    mock->calls.count = 0;
+  call = (_hypo_mock_call_t *)_hypo_list_alloc(&mock->calls);
+#endif
+  call->_file = file;
+  call->_line = line;
+
+  return call;
+}
+
+/* Obtain the list of calls to a mock.  In the threaded mode, the
+ * calls recorded in the per-thread buffers are first merged into the
+ * list, in order of their sequence numbers; the threads calling the
+ * mock must not be running at the time.
+ */
+_HYPO_API _hypo_list_t *
+_hypo_mock_calls(_hypo_mock_t *mock)
+{
+#ifdef HYPO_THREADS
+  _hypo_mock_tbuf_t *tbuf, *next;
+
+  pthread_mutex_lock(&_hypo_mock_lock);
+
+  /* While benchmarks are measured, only the most recent call is kept */
+  if (_hypo_mock_quiet)
+    for (tbuf = mock->tbufs; tbuf; tbuf = tbuf->next)
+      if (_hypo_list_len(&tbuf->seqs)) {
+	mock->calls.count = 0;
+	break;
+      }
+
+  /* Repeatedly take the earliest call not yet merged */
+  for (;;) {
+    next = 0;
+    for (tbuf = mock->tbufs; tbuf; tbuf = tbuf->next)
+      if (tbuf->merged < _hypo_list_len(&tbuf->seqs) &&
+	  (!next ||
+	   *(unsigned long *)_hypo_list_ref(&tbuf->seqs, tbuf->merged) <
+	   *(unsigned long *)_hypo_list_ref(&next->seqs, next->merged)))
+	next = tbuf;
+
+    if (!next)
+      break;
+
+    memcpy(_hypo_list_alloc(&mock->calls),
+	   _hypo_list_ref(&next->calls, next->merged), mock->calls.size);
+    next->merged++;
+  }
+
+  /* The buffers may now be reused */
+  for (tbuf = mock->tbufs; tbuf; tbuf = tbuf->next) {
+    tbuf->seqs.count = 0;
+    tbuf->calls.count = 0;
+    tbuf->merged = 0;
+  }
+
+  pthread_mutex_unlock(&_hypo_mock_lock);
+#endif
+
+  return &mock->calls;
+}
+
+/* Select the return value of a mock.  In "spy" mode, returns
+ * non-zero so the caller will call the underlying function.
+ * Otherwise, copies the next mocked return value, advancing the
+ * index if there are more; the last return value is repeated, unless
+ * the mock cycles back to the first.
+ */
+_HYPO_API int
+_hypo_mock_return(_hypo_mock_t *mock, void *value)
+{
+#ifdef HYPO_THREADS
+  int ret_idx = __atomic_load_n(&mock->ret_idx, __ATOMIC_RELAXED);
+  int next_idx;
+#else
+  int ret_idx = mock->ret_idx;
+#endif
+
+  /* If in spy mode, tell the caller to call the underlying function */
+  if (ret_idx < 0)
+    return 1;
+
+  /* Void mocks have no return values, and no place to put them */
+  if (!value || !_hypo_list_len(&mock->returns))
+    return 0;
+
+#ifdef HYPO_THREADS
+  /* Atomically advance the index, if appropriate */
+  do {
+    if (ret_idx + 1 < (int)_hypo_list_len(&mock->returns))
+      next_idx = ret_idx + 1;
+    else if (mock->flags & HYPO_MOCK_CYCLE)
+      next_idx = 0;
+    else
+      break;
+  } while (!__atomic_compare_exchange_n(&mock->ret_idx, &ret_idx, next_idx,
+					1, __ATOMIC_RELAXED,
+					__ATOMIC_RELAXED));
+#else
+  /* Advance the index if appropriate */
+  if (ret_idx + 1 < (int)_hypo_list_len(&mock->returns))
+    mock->ret_idx++;
+  else if (mock->flags & HYPO_MOCK_CYCLE)
+    mock->ret_idx = 0;
+#endif
+
+  /* Copy the selected return value */
+  memcpy(value, _hypo_list_ref(&mock->returns, ret_idx), mock->returns.size);
+
+  return 0;
+}
+
+/* Save the value returned by the underlying function in "spy" mode,
+ * so that it may be retrieved by the test.
+ */
+_HYPO_API void
+_hypo_mock_save(_hypo_mock_t *mock, const void *value)
+{
+  if (_hypo_mock_quiet)
+    return;
+
+#ifdef HYPO_THREADS
+  pthread_mutex_lock(&_hypo_mock_lock);
+#endif
+  memcpy(_hypo_list_alloc(&mock->returns), value, mock->returns.size);
+#ifdef HYPO_THREADS
+  pthread_mutex_unlock(&_hypo_mock_lock);
+#endif
+}
+
+/* Add a return value for the mock to return.  The first time this
+ * is called, the mock is forced out of "spy" mode.
+ */
+_HYPO_API void
+_hypo_mock_addreturn(_hypo_mock_t *mock, const void *value)
+{
+  /* Switch to mock mode */
+  _hypo_mock_nospy(mock);
+
+  /* Take a copy of borrowed return values before adding to them */
+  if (mock->flags & HYPO_MOCK_BORROW) {
+    const void *values = mock->returns.storage;
+    unsigned int count = _hypo_list_len(&mock->returns);
+
+    mock->flags &= ~HYPO_MOCK_BORROW;
+    mock->returns.count = 0;
+    mock->returns.capacity = 0;
+    mock->returns.storage = 0;
+    memcpy(_hypo_list_extend(&mock->returns, count), values,
+	   mock->returns.size * count);
+  }
+
+  /* Add a return value */
+  _hypo_mock_save(mock, value);
+}
+
+/* Replace the return values of the mock with an array of n values.
+ * Unless the BORROW flag is given, the values are copied with a
+ * single reservation; otherwise, the array is used in place, and
+ * must remain valid until the end of the test.
+ */
+_HYPO_API void
+_hypo_mock_setreturns(_hypo_mock_t *mock, const void *values, size_t n,
+		      unsigned int flags)
+{
+  /* Switch to mock mode, starting over at the first value */
+  _hypo_mock_nospy(mock);
+  mock->ret_idx = 0;
+
+  /* Discard the previous return values */
+  if (mock->flags & HYPO_MOCK_BORROW)
+    mock->returns.storage = 0;
+  _hypo_list_cleanup(&mock->returns);
+  mock->flags = flags;
+
+  if (flags & HYPO_MOCK_BORROW) {
+    /* Never modified while borrowed */
+    mock->returns.storage = (unsigned char *)values;
+    mock->returns.count = (unsigned int)n;
+    mock->returns.capacity = (unsigned int)n;
+  } else
+    memcpy(_hypo_list_extend(&mock->returns, (unsigned int)n), values,
+	   mock->returns.size * n);
+}
+
+/* Force the mock out of "spy" mode.  For mocks returning a value,
+ * the mock will return 0 until a return value is added.
+ */
+_HYPO_API void
+_hypo_mock_nospy(_hypo_mock_t *mock)
+{
+  _hypo_mock_touch(mock);
+
+  if (mock->ret_idx < 0)
+    mock->ret_idx = 0;
+}
+
+/* Compare an argument of an expected call and an actual call */
+#define _hypo_mock_argeq(arg, expect, actual)				\
+  ((arg)->compare ? (arg)->compare((expect), (actual)) :		\
+   !memcmp((expect) + (arg)->expect_offset,				\
+	   (actual) + (arg)->call_offset, (arg)->size))
+
+/* Check the calls to a mock.  This walks through each of the
+ * expected calls, verifying that it matches the corresponding actual
+ * call to the mock.  Each argument is compared, unless the
+ * corresponding bit of the expected call's flags is set.
+ */
+_HYPO_API void
+_hypo_mock_checkcalls(hypo_context_t *hypo_ctx, _hypo_mock_t *mock,
+		      const _hypo_mock_arg_t *args,
+		      const void *expected, size_t size,
+		      unsigned int count)
+{
+  unsigned int i, j, len;
+  const unsigned char *expect, *actual;
+  unsigned long any_flags;
+
+  /* How many calls were there actually? */
+  len = _hypo_list_len(_hypo_mock_calls(mock));
+
+  /* Verify we were called exactly count times */
+  hypo_assert(count == len);
+
+  /* Check each of the calls */
+  for (i = 0; i < _hypo_min(count, len); i++) {
+    expect = (const unsigned char *)expected + size * i;
+    actual = (const unsigned char *)_hypo_list_ref(&mock->calls, i);
+    any_flags = *(const unsigned long *)expect;
+
+    for (j = 0; args[j].expr; j++)
+      if (!(any_flags & (1UL << j)) &&
+	  _hypo_assert(hypo_ctx, 0, __FILE__, __LINE__, args[j].expr,
+		       _hypo_mock_argeq(&args[j], expect, actual), 0))
+	return;
+  }
+}
+
+/* Determine if an actual call matches an expected call.  Each
+ * argument is compared, unless the corresponding bit of the flags is
+ * set.
+ */
+static int
+_hypo_mock_matches(const _hypo_mock_arg_t *args, unsigned long any_flags,
+		   const unsigned char *expect, const unsigned char *actual)
+{
+  unsigned int j;
+
+  for (j = 0; args[j].expr; j++)
+    if (!(any_flags & (1UL << j)) &&
+	!_hypo_mock_argeq(&args[j], expect, actual))
+      return 0;
+
+  return 1;
+}
+
+/* Compute the hash of the arguments of a call, or of an expected
+ * call, not ignored by the flags.  This is FNV-1a over the bytes of
+ * the arguments; arguments with a compare function, whose equal
+ * values may differ in their bytes, are left out.
+ */
+static unsigned long
+_hypo_mock_hash(const _hypo_mock_arg_t *args, unsigned long any_flags,
+		const unsigned char *record, int is_expect)
+{
+  unsigned long hash = 2166136261UL;
+  const unsigned char *arg;
+  unsigned int j;
+  size_t k;
+
+  for (j = 0; args[j].expr; j++) {
+    if ((any_flags & (1UL << j)) || args[j].compare)
+      continue;
+
+    arg = record + (is_expect ? args[j].expect_offset : args[j].call_offset);
+    for (k = 0; k < args[j].size; k++)
+      hash = (hash ^ arg[k]) * 16777619UL;
+  }
+
+  return hash;
+}
+
+/* Obtain the hash index of a mock for the given flags, building it
+ * or extending it to cover all the calls.  Returns 0 if the calls
+ * should be scanned instead: there are too few of them, or none of
+ * the arguments the flags do not ignore may be hashed.
+ */
+static _hypo_mock_index_t *
+_hypo_mock_index(_hypo_mock_t *mock, const _hypo_mock_arg_t *args,
+		 unsigned long any_flags)
+{
+  _hypo_mock_index_t *index;
+  unsigned int i, j, len, nbuckets, *chain;
+  unsigned long bucket;
+
+  /* Is an index worth it? */
+  len = _hypo_list_len(&mock->calls);
+  for (j = 0; args[j].expr && ((any_flags & (1UL << j)) || args[j].compare);
+       j++)
+    ;
+  if (len < HYPO_MOCK_INDEX_MIN || !args[j].expr)
+    return 0;
+
+  /* Find the index for the flags, or create one */
+  for (index = mock->indices; index; index = index->next)
+    if (index->any_flags == any_flags)
+      break;
+  if (!index) {
+    if (!(index = (_hypo_mock_index_t *)calloc(1, sizeof(*index))))
+      abort(); /* Not much else we can do */
+    index->any_flags = any_flags;
+    index->chain.size = sizeof(unsigned int);
+    index->next = mock->indices;
+    mock->indices = index;
+  }
+
+  /* Keep the buckets at least half empty, rebuilding as needed */
+  if (len > index->nbuckets / 2) {
+    for (nbuckets = index->nbuckets ? index->nbuckets : 64;
+	 len > nbuckets / 2; nbuckets <<= 1)
+      ;
+
+    free(index->buckets);
+    if (!(index->buckets = (unsigned int *)calloc(nbuckets,
+						  sizeof(unsigned int))))
+      abort(); /* Not much else we can do */
+    index->nbuckets = nbuckets;
+    index->indexed = 0;
+    index->chain.count = 0;
+  }
+
+  /* Add the calls made since the index was last used */
+  if (index->indexed < len) {
+    chain = (unsigned int *)_hypo_list_extend(&index->chain,
+					      len - index->indexed);
+    for (i = index->indexed; i < len; i++) {
+      bucket = _hypo_mock_hash(args, any_flags,
+			       (const unsigned char *)_hypo_list_ref(
+				 &mock->calls, i
+			       ), 0) & (index->nbuckets - 1);
+      chain[i - index->indexed] = index->buckets[bucket];
+      index->buckets[bucket] = i + 1;
+    }
+    index->indexed = len;
+  }
+
+  return index;
+}
+
+/* Find the first call to a mock, at or after the start index, that
+ * matches an expected call.  Returns the index of the call, or -1 if
+ * there is none.
+ */
+static int
+_hypo_mock_search(_hypo_mock_t *mock, const _hypo_mock_arg_t *args,
+		  const void *expected, unsigned int start)
+{
+  const unsigned char *expect = (const unsigned char *)expected;
+  unsigned long any_flags = *(const unsigned long *)expect;
+  _hypo_mock_index_t *index;
+  unsigned int i, len;
+  int found = -1;
+
+  /* Scan the calls if there's no index */
+  if (!(index = _hypo_mock_index(mock, args, any_flags))) {
+    len = _hypo_list_len(&mock->calls);
+    for (i = start; i < len; i++)
+      if (_hypo_mock_matches(args, any_flags, expect,
+			     (const unsigned char *)_hypo_list_ref(
+			       &mock->calls, i
+			     )))
+	return (int)i;
+
+    return -1;
+  }
+
+  /* Walk the chain of the bucket, from the last call backwards */
+  for (i = index->buckets[_hypo_mock_hash(args, any_flags, expect, 1) &
+			  (index->nbuckets - 1)];
+       i > start;
+       i = *(unsigned int *)_hypo_list_ref(&index->chain, i - 1))
+    if (_hypo_mock_matches(args, any_flags, expect,
+			   (const unsigned char *)_hypo_list_ref(
+			     &mock->calls, i - 1
+			   )))
+      found = (int)(i - 1);
+
+  return found;
+}
+
+/* Obtain the view of the calls which the expected calls with the
+ * given flags may match, creating it if necessary.
+ */
+static _hypo_mock_view_t *
+_hypo_mock_view(_hypo_mock_match_t *match, unsigned long any_flags)
+{
+  unsigned int i, len = _hypo_list_len(&match->mock->calls);
+  _hypo_mock_index_t *index;
+  _hypo_mock_view_t *view;
+  size_t bsize, csize;
+
+  /* Find the view for the flags */
+  for (i = 0; i < _hypo_list_len(&match->views); i++) {
+    view = (_hypo_mock_view_t *)_hypo_list_ref(&match->views, i);
+    if (view->any_flags == any_flags)
+      return view;
+  }
+
+  /* Copy the index, or put all the calls in a single bucket */
+  view = (_hypo_mock_view_t *)_hypo_list_alloc(&match->views);
+  view->any_flags = any_flags;
+  index = _hypo_mock_index(match->mock, match->args, any_flags);
+  view->hashed = index != 0;
+  view->nbuckets = index ? index->nbuckets : 1;
+  bsize = sizeof(unsigned int) * view->nbuckets;
+  csize = sizeof(unsigned int) * (len ? len : 1);
+  if (!(view->buckets = (unsigned int *)malloc(bsize)) ||
+      !(view->chain = (unsigned int *)malloc(csize)) ||
+      !(view->search_buckets = (unsigned int *)malloc(bsize)) ||
+      !(view->search_chain = (unsigned int *)malloc(csize)))
+    abort(); /* Not much else we can do */
+  if (index) {
+    memcpy(view->buckets, index->buckets, bsize);
+    memcpy(view->chain, index->chain.storage, sizeof(unsigned int) * len);
+  } else {
+    view->buckets[0] = len;
+    for (i = 0; i < len; i++)
+      view->chain[i] = i;
+  }
+  memcpy(view->search_buckets, view->buckets, bsize);
+  memcpy(view->search_chain, view->chain, csize);
+
+  return view;
+}
+
+/* Obtain the bucket of a view containing the calls an expected call
+ * may match
+ */
+static unsigned int
+_hypo_mock_bucket(_hypo_mock_match_t *match, _hypo_mock_view_t *view,
+		  const unsigned char *expect)
+{
+  if (!view->hashed)
+    return 0;
+
+  return _hypo_mock_hash(match->args, view->any_flags, expect, 1) &
+    (view->nbuckets - 1);
+}
+
+/* Find a call which has not been matched and which matches an
+ * expected call.  The matched calls passed over are removed from the
+ * view, so that they are not examined again.  Returns the index of
+ * the call, or -1 if there is none.
+ */
+static int
+_hypo_mock_take(_hypo_mock_match_t *match, const unsigned char *expect)
+{
+  unsigned long any_flags = *(const unsigned long *)expect;
+  _hypo_mock_view_t *view = _hypo_mock_view(match, any_flags);
+  unsigned int i, *link;
+
+  link = view->buckets + _hypo_mock_bucket(match, view, expect);
+  while ((i = *link)) {
+    if (match->owner[i - 1])
+      *link = view->chain[i - 1];
+    else if (_hypo_mock_matches(match->args, any_flags, expect,
+				(const unsigned char *)_hypo_list_ref(
+				  &match->mock->calls, i - 1
+				)))
+      return (int)(i - 1);
+    else
+      link = &view->chain[i - 1];
+  }
+
+  return -1;
+}
+
+/* Begin visiting an expected call in a search */
+static void
+_hypo_mock_visit(_hypo_mock_match_t *match, unsigned int e)
+{
+  const unsigned char *expect = match->expected + match->size * e;
+  _hypo_mock_view_t *view;
+  _hypo_mock_frame_t *frame;
+
+  view = _hypo_mock_view(match, *(const unsigned long *)expect);
+  frame = (_hypo_mock_frame_t *)_hypo_list_alloc(&match->stack);
+  frame->expect = e;
+  frame->call = 0;
+  frame->link = view->search_buckets + _hypo_mock_bucket(match, view, expect);
+  frame->chain = view->search_chain;
+}
+
+/* Search for an augmenting path from an expected call: a call it
+ * matches which has not been matched, or which has been matched with
+ * an expected call for which there is in turn an augmenting path.
+ * This is a depth-first search, in which each call is visited at
+ * most once.  If a path is found, the calls along it are matched
+ * again and non-zero is returned.
+ */
+static int
+_hypo_mock_augment(_hypo_mock_match_t *match, unsigned int e)
+{
+  const unsigned char *expect;
+  _hypo_mock_frame_t *frame;
+  _hypo_mock_unlink_t *unlink;
+  unsigned int i;
+  int found = 0;
+
+  match->search++;
+  _hypo_mock_visit(match, e);
+  while (!found && _hypo_list_len(&match->stack)) {
+    frame = (_hypo_mock_frame_t *)_hypo_list_ref(
+      &match->stack, _hypo_list_len(&match->stack) - 1
+    );
+    expect = match->expected + match->size * frame->expect;
+
+    if (!(i = *frame->link)) {
+      /* No path from this expected call */
+      match->stack.count--;
+    } else if (match->seen[i - 1] == match->search) {
+      /* Skip the calls already visited from now on */
+      unlink = (_hypo_mock_unlink_t *)_hypo_list_alloc(&match->unlinked);
+      unlink->link = frame->link;
+      unlink->value = i;
+      *frame->link = frame->chain[i - 1];
+    } else if (!_hypo_mock_matches(match->args,
+				   *(const unsigned long *)expect, expect,
+				   (const unsigned char *)_hypo_list_ref(
+				     &match->mock->calls, i - 1
+				   ))) {
+      frame->link = &frame->chain[i - 1];
+    } else {
+      /* Continue the search through the call */
+      match->seen[i - 1] = match->search;
+      frame->call = i;
+      if (match->owner[i - 1])
+	_hypo_mock_visit(match, match->owner[i - 1] - 1);
+      else
+	found = 1;
+    }
+  }
+
+  /* Match the expected calls along the path */
+  for (i = _hypo_list_len(&match->stack); i > 0; i--) {
+    frame = (_hypo_mock_frame_t *)_hypo_list_ref(&match->stack, i - 1);
+    match->owner[frame->call - 1] = frame->expect + 1;
+  }
+  match->stack.count = 0;
+
+  /* Restore the calls removed by the search, in reverse order */
+  for (i = _hypo_list_len(&match->unlinked); i > 0; i--) {
+    unlink = (_hypo_mock_unlink_t *)_hypo_list_ref(&match->unlinked, i - 1);
+    *unlink->link = unlink->value;
+  }
+  match->unlinked.count = 0;
+
+  return found;
+}
+
+/* Match an expected call with an actual call.  Returns non-zero if
+ * it could be matched.
+ */
+static int
+_hypo_mock_assign(_hypo_mock_match_t *match, unsigned int e)
+{
+  int found;
+
+  /* Prefer a call which has not been matched */
+  if ((found = _hypo_mock_take(match, match->expected + match->size * e)) >=
+      0) {
+    match->owner[found] = e + 1;
+    return 1;
+  }
+
+  /* Otherwise, see if the matched calls may be rearranged */
+  return _hypo_mock_augment(match, e);
+}
+
+/* Check the calls to a mock, without regard to order.  The expected
+ * calls are matched with the actual calls so that as many as possible
+ * are matched.  The expected calls without "any" flags are matched
+ * first, since the calls they match are identical to each other;
+ * the others may then require the matches already made to be
+ * rearranged.  Failures are attributed to the given file and line.
+ */
+_HYPO_API void
+_hypo_mock_checkunordered(hypo_context_t *hypo_ctx, const char *file,
+			  unsigned int line, _hypo_mock_t *mock,
+			  const _hypo_mock_arg_t *args,
+			  const void *expected, size_t size,
+			  unsigned int count)
+{
+  _hypo_mock_match_t match = {
+    0, 0, 0, 0, 0, 0, 0, _HYPO_LIST_INIT(_hypo_mock_view_t),
+    _HYPO_LIST_INIT(_hypo_mock_unlink_t), _HYPO_LIST_INIT(_hypo_mock_frame_t)
+  };
+  _hypo_mock_view_t *view;
+  unsigned int i, len;
+  int pass, fatal = 0;
+
+  /* How many calls were there actually? */
+  len = _hypo_list_len(_hypo_mock_calls(mock));
+
+  /* Verify we were called exactly count times */
+  if (_hypo_assert(hypo_ctx, 0, file, line, "count == len", count == len,
+		   0))
+    return;
+
+  match.mock = mock;
+  match.args = args;
+  match.expected = (const unsigned char *)expected;
+  match.size = size;
+  if (!(match.owner = (unsigned int *)calloc(len ? len : 1,
+					     sizeof(unsigned int))) ||
+      !(match.seen = (unsigned int *)calloc(len ? len : 1,
+					    sizeof(unsigned int))))
+    abort(); /* Not much else we can do */
+
+  /* Match the expected calls without "any" flags, then the rest */
+  for (pass = 0; pass < 2 && !fatal; pass++)
+    for (i = 0; i < count && !fatal; i++)
+      if ((*(const unsigned long *)(match.expected + size * i) != 0) ==
+	  pass && !_hypo_mock_assign(&match, i))
+	fatal = _hypo_assert(hypo_ctx, 0, file, line,
+			     "expected[i] matches an actual call", 0, 0);
+
+  for (i = 0; i < _hypo_list_len(&match.views); i++) {
+    view = (_hypo_mock_view_t *)_hypo_list_ref(&match.views, i);
+    free(view->buckets);
+    free(view->chain);
+    free(view->search_buckets);
+    free(view->search_chain);
+  }
+  _hypo_list_cleanup(&match.views);
+  _hypo_list_cleanup(&match.unlinked);
+  _hypo_list_cleanup(&match.stack);
+  free(match.owner);
+  free(match.seen);
+}
+
+/* Find the first call to a mock, at or after the start index, that
+ * matches an expected call.  Returns the index of the call, or -1 if
+ * there is none.
+ */
+_HYPO_API int
+_hypo_mock_findcall(_hypo_mock_t *mock, const _hypo_mock_arg_t *args,
+		    const void *expected, unsigned int start)
+{
+  _hypo_mock_calls(mock);
+
+  return _hypo_mock_search(mock, args, expected, start);
+}
+
+/* Count the calls to a mock that match an expected call */
+_HYPO_API unsigned int
+_hypo_mock_countcalls(_hypo_mock_t *mock, const _hypo_mock_arg_t *args,
+		      const void *expected)
+{
+  const unsigned char *expect = (const unsigned char *)expected;
+  unsigned long any_flags = *(const unsigned long *)expect;
+  _hypo_mock_index_t *index;
+  unsigned int i, start, count = 0;
+
+  _hypo_mock_calls(mock);
+
+  /* Without an index, walk all the calls */
+  if (!(index = _hypo_mock_index(mock, args, any_flags))) {
+    for (i = 0; i < _hypo_list_len(&mock->calls); i++)
+      count += _hypo_mock_matches(args, any_flags, expect,
+				  (const unsigned char *)_hypo_list_ref(
+				    &mock->calls, i
+				  ));
+
+    return count;
+  }
+
+  /* Walk the chain of the bucket */
+  start = index->buckets[_hypo_mock_hash(args, any_flags, expect, 1) &
+			 (index->nbuckets - 1)];
+  for (i = start; i; i = *(unsigned int *)_hypo_list_ref(&index->chain, i - 1))
+    count += _hypo_mock_matches(args, any_flags, expect,
+				(const unsigned char *)_hypo_list_ref(
+				  &mock->calls, i - 1
+				));
+
+  return count;
+}
+
+/* Clean up the mocks.  This is called after every test function run
+ * and ensures that each mock used by the test is returned to its
+ * initial state ("spy" mode), not to mention releasing any memory
+ * allocated during the test.  Mocks not used by the test are not
+ * visited.
+ */
+static void
+_hypo_mock_cleanup(void)
+{
+  _hypo_mock_t *mock;
+  _hypo_mock_index_t *index;
+#ifdef HYPO_THREADS
+  _hypo_mock_tbuf_t *tbuf, **tbuf_p;
+#endif
+
+  while ((mock = _hypo_mock_dirty)) {
+    _hypo_mock_dirty = mock->next;
+
+    /* Reset mock to "spy" mode */
+    mock->ret_idx = -1;
+    mock->dirty = 0;
+    mock->next = 0;
+
+    /* Discard the indices over the calls */
+    while ((index = mock->indices)) {
+      mock->indices = index->next;
+      free(index->buckets);
+      _hypo_list_cleanup(&index->chain);
+      free(index);
+    }
+
+    /* Borrowed return values belong to the test */
+    if (mock->flags & HYPO_MOCK_BORROW)
+      mock->returns.storage = 0;
+    mock->flags = 0;
+
+    /* And clean up the lists */
+    _hypo_list_cleanup(&mock->returns);
+    _hypo_list_cleanup(&mock->calls);
+
+#ifdef HYPO_THREADS
+    /* Empty the per-thread buffers, releasing those of exited threads */
+    pthread_mutex_lock(&_hypo_mock_lock);
+    for (tbuf_p = &mock->tbufs; (tbuf = *tbuf_p);) {
+      if (tbuf->orphaned) {
+	*tbuf_p = tbuf->next;
+	_hypo_list_cleanup(&tbuf->seqs);
+	_hypo_list_cleanup(&tbuf->calls);
+	free(tbuf);
+	continue;
+      }
+
+      tbuf->seqs.count = 0;
+      tbuf->calls.count = 0;
+      tbuf->merged = 0;
+      tbuf_p = &tbuf->next;
+    }
+    pthread_mutex_unlock(&_hypo_mock_lock);
+#endif
+  }
+}
+
+/* Defer the teardown of a file-scoped fixture until all the tests
+ * have run.
+ */
+_HYPO_API void
+_hypo_fix_defer(const char *name, void (*teardown)(hypo_context_t *))
+{
+  _hypo_fix_deferred_t *deferred;
+
+  deferred = (_hypo_fix_deferred_t *)_hypo_list_alloc(&_hypo_fix_deferred);
+  deferred->name = name;
+  deferred->teardown = teardown;
+}
+
+/* An allocation made by the target.  The serial number identifies
+ * the test it was made by.
+ */
+typedef struct {
+  void *ptr;
+  size_t size;
+  unsigned long serial;
+  const char *file;
+  int line;
+} _hypo_alloc_t;
+
+/* The allocations made by the target.  These are kept in an open
+ * addressing hash table keyed by the pointer, which is only
+ * allocated once the target allocates memory, so that the runtime's
+ * own use of memory is unaffected.
+ */
+static struct {
+  int enabled;			/* Report the allocations of each test */
+  int pending;			/* Allocations not yet reported */
+  unsigned long serial;		/* Serial number of the current test */
+  _hypo_alloc_t *table;		/* The hash table */
+  size_t size;			/* The size of the table, a power of 2 */
+  size_t count;			/* The number of allocations in it */
+  hypo_alloc_stats_t stats;	/* The allocations of the current test */
+} _hypo_allocs = {0, 0, 1, 0, 0, 0, {0, 0, 0, 0, 0, 0}};
+
+#ifdef HYPO_THREADS
+/* The allocations may be made from several threads */
+static pthread_mutex_t _hypo_alloc_mutex = PTHREAD_MUTEX_INITIALIZER;
+# define _hypo_alloc_lock()	pthread_mutex_lock(&_hypo_alloc_mutex)
+# define _hypo_alloc_unlock()	pthread_mutex_unlock(&_hypo_alloc_mutex)
+#else
+# define _hypo_alloc_lock()
+# define _hypo_alloc_unlock()
+#endif
+
+/* Locate the slot of the hash table for a pointer.  The slot is
+ * either the one holding the pointer or the empty slot where it
+ * would be added.
+ */
+static size_t
+_hypo_alloc_slot(void *ptr)
+{
+  size_t i = (((size_t)ptr >> 4) * 2654435761u) & (_hypo_allocs.size - 1);
+
+  while (_hypo_allocs.table[i].ptr && _hypo_allocs.table[i].ptr != ptr)
+    i = (i + 1) & (_hypo_allocs.size - 1);
+
+  return i;
+}
+
+/* Record an allocation */
+static void
+_hypo_alloc_add(void *ptr, size_t size, const char *file, int line)
+{
+  _hypo_alloc_t *old = _hypo_allocs.table;
+  size_t i, old_size = _hypo_allocs.size;
+
+  /* Keep the table at most half full */
+  if (2 * (_hypo_allocs.count + 1) > _hypo_allocs.size) {
+    _hypo_allocs.size = old_size ? 2 * old_size : 64;
+    if (!(_hypo_allocs.table = (_hypo_alloc_t *)calloc(
+	    _hypo_allocs.size, sizeof(_hypo_alloc_t))))
+      abort(); /* Not much else we can do */
+
+    for (i = 0; i < old_size; i++)
+      if (old[i].ptr)
+	_hypo_allocs.table[_hypo_alloc_slot(old[i].ptr)] = old[i];
+    free(old);
+  }
+
+  i = _hypo_alloc_slot(ptr);
+  _hypo_allocs.table[i].ptr = ptr;
+  _hypo_allocs.table[i].size = size;
+  _hypo_allocs.table[i].serial = _hypo_allocs.serial;
+  _hypo_allocs.table[i].file = file;
+  _hypo_allocs.table[i].line = line;
+  _hypo_allocs.count++;
+
+  /* Account for it */
+  _hypo_allocs.stats.allocs++;
+  _hypo_allocs.stats.bytes += size;
+  _hypo_allocs.stats.live += size;
+  _hypo_allocs.stats.leaks++;
+  if (_hypo_allocs.stats.live > _hypo_allocs.stats.peak)
+    _hypo_allocs.stats.peak = _hypo_allocs.stats.live;
+}
+
+/* Find the slot of the hash table holding a pointer.  Returns -1 if
+ * the pointer was not recorded.
+ */
+static size_t
+_hypo_alloc_find(void *ptr)
+{
+  size_t i;
+
+  if (!ptr || !_hypo_allocs.count ||
+      !_hypo_allocs.table[i = _hypo_alloc_slot(ptr)].ptr)
+    return (size_t)-1;
+
+  return i;
+}
+
+/* Forget the allocation in a slot of the hash table, if any */
+static void
+_hypo_alloc_remove(size_t i)
+{
+  size_t j, k, mask = _hypo_allocs.size - 1;
+
+  if (i == (size_t)-1)
+    return;
+
+  /* Account for it; only the current test's allocations are live */
+  _hypo_allocs.stats.frees++;
+  if (_hypo_allocs.table[i].serial == _hypo_allocs.serial) {
+    _hypo_allocs.stats.live -= _hypo_allocs.table[i].size;
+    _hypo_allocs.stats.leaks--;
+  }
+  _hypo_allocs.count--;
+
+  /* Move later entries of the probe sequence into the hole */
+  for (j = (i + 1) & mask; _hypo_allocs.table[j].ptr; j = (j + 1) & mask) {
+    k = (((size_t)_hypo_allocs.table[j].ptr >> 4) * 2654435761u) & mask;
+    if ((j > i && (k <= i || k > j)) || (j < i && k <= i && k > j)) {
+      _hypo_allocs.table[i] = _hypo_allocs.table[j];
+      i = j;
+    }
+  }
+  _hypo_allocs.table[i].ptr = 0;
+}
+
+_HYPO_API void *
+_hypo_alloc_malloc(const char *file, int line, size_t size)
+{
+  void *ptr = malloc(size);
+
+  if (ptr) {
+    _hypo_alloc_lock();
+    _hypo_alloc_add(ptr, size, file, line);
+    _hypo_alloc_unlock();
+  }
+
+  return ptr;
+}
+
+_HYPO_API void *
+_hypo_alloc_calloc(const char *file, int line, size_t nmemb, size_t size)
+{
+  void *ptr = calloc(nmemb, size);
+
+  if (ptr) {
+    _hypo_alloc_lock();
+    _hypo_alloc_add(ptr, nmemb * size, file, line);
+    _hypo_alloc_unlock();
+  }
+
+  return ptr;
+}
+
+_HYPO_API void *
+_hypo_alloc_realloc(const char *file, int line, void *ptr, size_t size)
+{
+  void *result;
+  size_t i;
+
+  /* The old memory is released unless the reallocation fails */
+  _hypo_alloc_lock();
+  i = _hypo_alloc_find(ptr);
+  if (!(result = realloc(ptr, size)) && size) {
+    _hypo_alloc_unlock();
+    return result;
+  }
+
+  _hypo_alloc_remove(i);
+  if (result)
+    _hypo_alloc_add(result, size, file, line);
+  _hypo_alloc_unlock();
+
+  return result;
+}
+
+_HYPO_API void
+_hypo_alloc_free(const char *file, int line, void *ptr)
+{
+  _hypo_alloc_lock();
+  _hypo_alloc_remove(_hypo_alloc_find(ptr));
+  free(ptr);
+  _hypo_alloc_unlock();
+}
+
+_HYPO_API void
+_hypo_alloc_enable(void)
+{
+  _hypo_allocs.enabled = 1;
+}
+
+_HYPO_API const hypo_alloc_stats_t *
+hypo_alloc_stats(void)
+{
+  return &_hypo_allocs.stats;
+}
+
+/* Begin accounting for the allocations of a test */
+static void
+_hypo_alloc_begin(void)
+{
+  _hypo_alloc_lock();
+  _hypo_allocs.pending = 1;
+  _hypo_allocs.serial++;
+  memset(&_hypo_allocs.stats, 0, sizeof(_hypo_allocs.stats));
+  _hypo_alloc_unlock();
+}
+
+/* Report the allocations made during the current test, if enabled.
+ * For leaks, the location of one of the leaked allocations is given.
+ */
+static void
+_hypo_alloc_report(void)
+{
+  const hypo_alloc_stats_t *stats = &_hypo_allocs.stats;
+  size_t i;
+
+  if (!_hypo_allocs.enabled || !_hypo_allocs.pending)
+    return;
+
+  _hypo_alloc_lock();
+  _hypo_allocs.pending = 0;
+  printf(" [allocs %lu, frees %lu, bytes %lu, peak %lu", stats->allocs,
+	 stats->frees, (unsigned long)stats->bytes,
+	 (unsigned long)stats->peak);
+  if (stats->leaks) {
+    printf(", leaks %lu (%lu bytes", stats->leaks,
+	   (unsigned long)stats->live);
+    for (i = 0; i < _hypo_allocs.size; i++)
+      if (_hypo_allocs.table[i].ptr &&
+	  _hypo_allocs.table[i].serial == _hypo_allocs.serial) {
+	printf(", e.g., %s:%d", _hypo_allocs.table[i].file,
+	       _hypo_allocs.table[i].line);
+	break;
+      }
+    printf(")");
+  }
+  printf("]");
+  _hypo_alloc_unlock();
+}
+
+#line 1410 "runtime.c.tmpl"
+#ifdef _HYPO_HAVE_CLOCK
+/* The wall-clock time the virtual clock starts at, in seconds since
+ * the epoch
+ */
+#ifndef HYPO_CLOCK_EPOCH
+# define HYPO_CLOCK_EPOCH 1000000000
+#endif
+
+/* A timer of the virtual clock */
+typedef struct {
+  unsigned int id;		/* The identifier of the timer */
+  struct timespec due;		/* The time the timer comes due */
+  hypo_clock_callback_t callback; /* The callback to run */
+  void *arg;			/* The argument for the callback */
+} _hypo_clock_timer_t;
+
+/* The virtual clock.  The time is that elapsed since the start of the
+ * test; the wall-clock time is offset from it by the epoch.  The
+ * timers are kept in the order they were created.
+ */
+static struct {
+  struct timespec now;		/* The current time */
+  time_t epoch;			/* The wall-clock offset */
+  unsigned int next_id;		/* The identifier of the next timer */
+  _hypo_list_t timers;		/* The pending timers */
+} _hypo_clock = {
+  {0, 0}, HYPO_CLOCK_EPOCH, 1, _HYPO_LIST_INIT(_hypo_clock_timer_t)
+};
+
+/* Compare two times, returning less than, equal to, or greater than
+ * 0, as for strcmp()
+ */
+static int
+_hypo_clock_cmp(const struct timespec *a, const struct timespec *b)
+{
+  if (a->tv_sec != b->tv_sec)
+    return a->tv_sec < b->tv_sec ? -1 : 1;
+
+  return a->tv_nsec < b->tv_nsec ? -1 : a->tv_nsec > b->tv_nsec;
+}
+
+/* Add an interval to a time */
+static struct timespec
+_hypo_clock_add(struct timespec ts, time_t sec, long nsec)
+{
+  ts.tv_sec += sec + nsec / 1000000000L;
+  ts.tv_nsec += nsec % 1000000000L;
+  if (ts.tv_nsec >= 1000000000L) {
+    ts.tv_sec++;
+    ts.tv_nsec -= 1000000000L;
+  } else if (ts.tv_nsec < 0) {
+    ts.tv_sec--;
+    ts.tv_nsec += 1000000000L;
+  }
+
+  return ts;
+}
+
+/* Find the next timer to come due, no later than the given time if
+ * one is given.  Returns -1 if there is no such timer.
+ */
+static int
+_hypo_clock_due(const struct timespec *limit)
+{
+  _hypo_clock_timer_t *timer, *next = 0;
+  unsigned int i;
+  int found = -1;
+
+  for (i = 0; i < _hypo_list_len(&_hypo_clock.timers); i++) {
+    timer = (_hypo_clock_timer_t *)_hypo_list_ref(&_hypo_clock.timers, i);
+    if ((limit && _hypo_clock_cmp(&timer->due, limit) > 0) ||
+	(next && _hypo_clock_cmp(&timer->due, &next->due) >= 0))
+      continue;
+
+    next = timer;
+    found = (int)i;
+  }
+
+  return found;
+}
+
+/* Remove a timer from the list, returning it */
+static _hypo_clock_timer_t
+_hypo_clock_remove(unsigned int i)
+{
+  _hypo_clock_timer_t timer =
+    *(_hypo_clock_timer_t *)_hypo_list_ref(&_hypo_clock.timers, i);
+
+  memmove(_hypo_list_ref(&_hypo_clock.timers, i),
+	  _hypo_list_ref(&_hypo_clock.timers, i + 1),
+	  _hypo_clock.timers.size * (_hypo_clock.timers.count - i - 1));
+  _hypo_clock.timers.count--;
+
+  return timer;
+}
+
+/* Advance the clock to a timer and run it.  The timer is removed
+ * first, so the callback may create or cancel timers, or advance the
+ * clock itself.
+ */
+static void
+_hypo_clock_fire(unsigned int i)
+{
+  _hypo_clock_timer_t timer = _hypo_clock_remove(i);
+
+  if (_hypo_clock_cmp(&timer.due, &_hypo_clock.now) > 0)
+    _hypo_clock.now = timer.due;
+  timer.callback(timer.arg);
+}
+
+_HYPO_API void
+hypo_clock_advance(time_t sec, long nsec)
+{
+  struct timespec target = _hypo_clock_add(_hypo_clock.now, sec, nsec);
+  int i;
+
+  /* Run the timers in order, then catch up to the target */
+  while ((i = _hypo_clock_due(&target)) >= 0)
+    _hypo_clock_fire((unsigned int)i);
+  if (_hypo_clock_cmp(&target, &_hypo_clock.now) > 0)
+    _hypo_clock.now = target;
+}
+
+_HYPO_API int
+hypo_clock_next(void)
+{
+  int i;
+
+  if ((i = _hypo_clock_due(0)) < 0)
+    return 0;
+
+  _hypo_clock_fire((unsigned int)i);
+  return 1;
+}
+
+_HYPO_API unsigned int
+hypo_clock_timer(time_t sec, long nsec, hypo_clock_callback_t callback,
+		 void *arg)
+{
+  _hypo_clock_timer_t *timer;
+
+  timer = (_hypo_clock_timer_t *)_hypo_list_alloc(&_hypo_clock.timers);
+  timer->id = _hypo_clock.next_id++;
+  timer->due = _hypo_clock_add(_hypo_clock.now, sec, nsec);
+  timer->callback = callback;
+  timer->arg = arg;
+
+  return timer->id;
+}
+
+_HYPO_API int
+hypo_clock_cancel(unsigned int timer)
+{
+  unsigned int i;
+
+  for (i = 0; i < _hypo_list_len(&_hypo_clock.timers); i++)
+    if (((_hypo_clock_timer_t *)_hypo_list_ref(&_hypo_clock.timers,
+					       i))->id == timer) {
+      _hypo_clock_remove(i);
+      return 1;
+    }
+
+  return 0;
+}
+
+_HYPO_API void
+hypo_clock_settime(time_t sec)
+{
+  _hypo_clock.epoch = sec - _hypo_clock.now.tv_sec;
+}
+
+_HYPO_API double
+hypo_clock_elapsed(void)
+{
+  return _hypo_clock.now.tv_sec + _hypo_clock.now.tv_nsec / 1e9;
+}
+
+_HYPO_API unsigned int
+hypo_clock_sleep(unsigned int seconds)
+{
+  hypo_clock_advance((time_t)seconds, 0);
+  return 0;
+}
+
+_HYPO_API int
+hypo_clock_usleep(unsigned long usec)
+{
+  hypo_clock_advance((time_t)(usec / 1000000UL),
+		     (long)(usec % 1000000UL) * 1000L);
+  return 0;
+}
+
+_HYPO_API int
+hypo_clock_nanosleep(const struct timespec *req, struct timespec *rem)
+{
+  if (!req || req->tv_sec < 0 || req->tv_nsec < 0 ||
+      req->tv_nsec >= 1000000000L) {
+    errno = EINVAL;
+    return -1;
+  }
+
+  hypo_clock_advance(req->tv_sec, req->tv_nsec);
+  if (rem)
+    rem->tv_sec = rem->tv_nsec = 0;
+  return 0;
+}
+
+_HYPO_API int
+hypo_clock_gettime(int clock_id, struct timespec *tp)
+{
+  if (!tp) {
+    errno = EFAULT;
+    return -1;
+  }
+
+  /* Only the wall clock is offset by the epoch */
+  *tp = _hypo_clock.now;
+#ifdef CLOCK_REALTIME
+  if (clock_id == CLOCK_REALTIME)
+    tp->tv_sec += _hypo_clock.epoch;
+#else
+  (void)clock_id;
+#endif
+  return 0;
+}
+
+_HYPO_API int
+hypo_clock_gettimeofday(struct timeval *tv, void *tz)
+{
+  (void)tz; /* Obsolete */
+
+  if (tv) {
+    tv->tv_sec = _hypo_clock.epoch + _hypo_clock.now.tv_sec;
+    tv->tv_usec = _hypo_clock.now.tv_nsec / 1000;
+  }
+  return 0;
+}
+
+_HYPO_API time_t
+hypo_clock_time(time_t *tloc)
+{
+  time_t now = _hypo_clock.epoch + _hypo_clock.now.tv_sec;
+
+  if (tloc)
+    *tloc = now;
+  return now;
+}
+
+/* Reset the virtual clock for the next test, discarding any timers */
+static void
+_hypo_clock_reset(void)
+{
+  _hypo_clock.now.tv_sec = 0;
+  _hypo_clock.now.tv_nsec = 0;
+  _hypo_clock.epoch = HYPO_CLOCK_EPOCH;
+  _hypo_list_cleanup(&_hypo_clock.timers);
+}
+#endif /* _HYPO_HAVE_CLOCK */
+
+#line 1672 "runtime.c.tmpl"
+#ifdef _HYPO_HAVE_FAKEIO
+/* An in-memory file.  A capacity of 0 indicates the contents are
+ * borrowed, or there are none.
+ */
+typedef struct {
+  char *path;			/* The name of the file */
+  unsigned char *data;		/* The contents of the file */
+  size_t len;			/* The length of the contents */
+  size_t capacity;		/* The size of the buffer */
+} _hypo_io_file_t;
+
+/* A one-way stream of bytes, for pipes and socket pairs */
+typedef struct {
+  unsigned char *data;		/* The buffer */
+  size_t start;			/* The start of the unread bytes */
+  size_t len;			/* The number of unread bytes */
+  size_t capacity;		/* The size of the buffer */
+  unsigned int readers;		/* Open descriptors reading the stream */
+  unsigned int writers;		/* Open descriptors writing the stream */
+} _hypo_io_stream_t;
+
+/* An in-memory descriptor.  A descriptor refers either to a file, or
+ * to the streams it reads and writes.
+ */
+typedef struct {
+  int open;			/* Whether the descriptor is open */
+  int flags;			/* The flags it was opened with */
+  int file;			/* The file, or -1 */
+  int in;			/* The stream read, or -1 */
+  int out;			/* The stream written, or -1 */
+  size_t offset;		/* The file offset */
+  size_t limit;			/* The most bytes per transfer, or 0 */
+} _hypo_io_fd_t;
+
+/* An error queued for a descriptor */
+typedef struct {
+  int fd;			/* The descriptor, or HYPO_IO_ANY */
+  int err;			/* The error to fail with */
+} _hypo_io_error_t;
+
+/* The in-memory files, streams, and descriptors.  The descriptors
+ * are numbered from HYPO_IO_FD_BASE.
+ */
+static struct {
+  _hypo_list_t files;		/* The files */
+  _hypo_list_t streams;		/* The streams */
+  _hypo_list_t fds;		/* The descriptors */
+  _hypo_list_t errors;		/* The queued errors, in order */
+  size_t limit;			/* The most bytes per transfer, or 0 */
+} _hypo_io = {
+  _HYPO_LIST_INIT(_hypo_io_file_t), _HYPO_LIST_INIT(_hypo_io_stream_t),
+  _HYPO_LIST_INIT(_hypo_io_fd_t), _HYPO_LIST_INIT(_hypo_io_error_t), 0
+};
+
+/* Make room for size bytes in a buffer, the first used bytes of
+ * which are in use.  A borrowed buffer, with a capacity of 0, is
+ * copied rather than released.  If the system is out of memory,
+ * this will abort().
+ */
+static void
+_hypo_io_reserve(unsigned char **data, size_t *capacity, size_t used,
+		 size_t size)
+{
+  unsigned char *buf;
+  size_t new_capacity = *capacity ? *capacity : 64;
+
+  if (size <= *capacity)
+    return;
+
+  while (new_capacity < size)
+    new_capacity <<= 1;
+
+  if (!(buf = (unsigned char *)malloc(new_capacity)))
+    abort(); /* Not much else we can do */
+  if (used)
+    memcpy(buf, *data, used);
+  if (*capacity)
+    free(*data);
+
+  *data = buf;
+  *capacity = new_capacity;
+}
+
+/* Find an in-memory file by name.  Returns -1 if there is no such
+ * file.
+ */
+static int
+_hypo_io_find(const char *path)
+{
+  unsigned int i;
+
+  for (i = 0; i < _hypo_list_len(&_hypo_io.files); i++)
+    if (!strcmp(((_hypo_io_file_t *)_hypo_list_ref(&_hypo_io.files,
+						   i))->path, path))
+      return (int)i;
+
+  return -1;
+}
+
+/* Create an empty in-memory file */
+static int
+_hypo_io_create(const char *path)
+{
+  _hypo_io_file_t *file;
+  size_t len = strlen(path) + 1;
+
+  file = (_hypo_io_file_t *)_hypo_list_alloc(&_hypo_io.files);
+  if (!(file->path = (char *)malloc(len)))
+    abort(); /* Not much else we can do */
+  memcpy(file->path, path, len);
+  file->data = 0;
+  file->len = 0;
+  file->capacity = 0;
+
+  return (int)_hypo_list_len(&_hypo_io.files) - 1;
+}
+
+/* Create a stream, with one reader and one writer */
+static int
+_hypo_io_stream(void)
+{
+  _hypo_io_stream_t *stream;
+
+  stream = (_hypo_io_stream_t *)_hypo_list_alloc(&_hypo_io.streams);
+  memset(stream, 0, sizeof(*stream));
+  stream->readers = 1;
+  stream->writers = 1;
+
+  return (int)_hypo_list_len(&_hypo_io.streams) - 1;
+}
+
+/* Open the lowest free in-memory descriptor */
+static int
+_hypo_io_alloc(int flags, int file, int in, int out)
+{
+  _hypo_io_fd_t *desc = 0;
+  unsigned int i;
+
+  for (i = 0; i < _hypo_list_len(&_hypo_io.fds); i++)
+    if (!(desc = (_hypo_io_fd_t *)_hypo_list_ref(&_hypo_io.fds, i))->open)
+      break;
+  if (i == _hypo_list_len(&_hypo_io.fds))
+    desc = (_hypo_io_fd_t *)_hypo_list_alloc(&_hypo_io.fds);
+
+  desc->open = 1;
+  desc->flags = flags;
+  desc->file = file;
+  desc->in = in;
+  desc->out = out;
+  desc->offset = 0;
+  desc->limit = 0;
+
+  return HYPO_IO_FD_BASE + (int)i;
+}
+
+/* Look up an open in-memory descriptor.  Returns NULL, setting
+ * errno, if the descriptor is not open.
+ */
+static _hypo_io_fd_t *
+_hypo_io_fd(int fd)
+{
+  _hypo_io_fd_t *desc;
+
+  if (fd < HYPO_IO_FD_BASE ||
+      (unsigned int)(fd - HYPO_IO_FD_BASE) >= _hypo_list_len(&_hypo_io.fds) ||
+      !(desc = (_hypo_io_fd_t *)_hypo_list_ref(&_hypo_io.fds,
+					       fd - HYPO_IO_FD_BASE))->open) {
+    errno = EBADF;
+    return 0;
+  }
+
+  return desc;
+}
+
+/* Begin a read or write of a descriptor.  Fails, setting errno, if
+ * an error is queued for the descriptor; otherwise, returns the
+ * number of bytes which may be transferred.
+ */
+static int
+_hypo_io_begin(int fd, _hypo_io_fd_t *desc, size_t *count)
+{
+  _hypo_io_error_t *error;
+  unsigned int i;
+  size_t limit = desc->limit ? desc->limit : _hypo_io.limit;
+
+  for (i = 0; i < _hypo_list_len(&_hypo_io.errors); i++) {
+    error = (_hypo_io_error_t *)_hypo_list_ref(&_hypo_io.errors, i);
+    if (error->fd != fd && error->fd != HYPO_IO_ANY)
+      continue;
+
+    errno = error->err;
+    memmove(error, error + 1, _hypo_io.errors.size *
+	    (_hypo_list_len(&_hypo_io.errors) - i - 1));
+    _hypo_io.errors.count--;
+    return -1;
+  }
+
+  if (limit && *count > limit)
+    *count = limit;
+  return 0;
+}
+
+_HYPO_API void
+hypo_io_file(const char *path, const void *data, size_t len,
+	     unsigned int flags)
+{
+  _hypo_io_file_t *file;
+  int i;
+
+  if ((i = _hypo_io_find(path)) < 0)
+    i = _hypo_io_create(path);
+  file = (_hypo_io_file_t *)_hypo_list_ref(&_hypo_io.files, i);
+
+  /* Release the old contents */
+  if (file->capacity)
+    free(file->data);
+  file->data = 0;
+  file->capacity = 0;
+
+  /* Borrow the contents, or copy them */
+  if (flags & HYPO_MOCK_BORROW)
+    file->data = (unsigned char *)data;
+  else if (len) {
+    _hypo_io_reserve(&file->data, &file->capacity, 0, len);
+    memcpy(file->data, data, len);
+  }
+  file->len = len;
+}
+
+_HYPO_API const void *
+hypo_io_contents(const char *path, size_t *len)
+{
+  _hypo_io_file_t *file;
+  int i;
+
+  if ((i = _hypo_io_find(path)) < 0)
+    return 0;
+
+  file = (_hypo_io_file_t *)_hypo_list_ref(&_hypo_io.files, i);
+  if (len)
+    *len = file->len;
+  return file->data ? (const void *)file->data : (const void *)"";
+}
+
+_HYPO_API void
+hypo_io_limit(int fd, size_t max)
+{
+  _hypo_io_fd_t *desc;
+
+  if (fd == HYPO_IO_ANY)
+    _hypo_io.limit = max;
+  else if ((desc = _hypo_io_fd(fd)))
+    desc->limit = max;
+}
+
+_HYPO_API void
+hypo_io_error(int fd, int err)
+{
+  _hypo_io_error_t *error;
+
+  error = (_hypo_io_error_t *)_hypo_list_alloc(&_hypo_io.errors);
+  error->fd = fd;
+  error->err = err;
+}
+
+_HYPO_API int
+hypo_io_open(const char *path, int flags, ...)
+{
+  _hypo_io_file_t *file;
+  int i;
+
+  /* Find or create the file; the mode is ignored */
+  if ((i = _hypo_io_find(path)) < 0) {
+    if (!(flags & O_CREAT)) {
+      errno = ENOENT;
+      return -1;
+    }
+    i = _hypo_io_create(path);
+  } else if ((flags & O_CREAT) && (flags & O_EXCL)) {
+    errno = EEXIST;
+    return -1;
+  }
+
+  /* Truncate it if requested */
+  file = (_hypo_io_file_t *)_hypo_list_ref(&_hypo_io.files, i);
+  if ((flags & O_TRUNC) && (flags & O_ACCMODE) != O_RDONLY) {
+    if (!file->capacity)
+      file->data = 0;
+    file->len = 0;
+  }
+
+  return _hypo_io_alloc(flags, i, -1, -1);
+}
+
+_HYPO_API int
+hypo_io_close(int fd)
+{
+  _hypo_io_fd_t *desc;
+
+  if (fd < HYPO_IO_FD_BASE)
+    return close(fd);
+  else if (!(desc = _hypo_io_fd(fd)))
+    return -1;
+
+  /* The peer sees the end of the stream once all writers close */
+  if (desc->in >= 0)
+    ((_hypo_io_stream_t *)_hypo_list_ref(&_hypo_io.streams,
+					 desc->in))->readers--;
+  if (desc->out >= 0)
+    ((_hypo_io_stream_t *)_hypo_list_ref(&_hypo_io.streams,
+					 desc->out))->writers--;
+  desc->open = 0;
+
+  return 0;
+}
+
+_HYPO_API ssize_t
+hypo_io_read(int fd, void *buf, size_t count)
+{
+  _hypo_io_fd_t *desc;
+  _hypo_io_file_t *file;
+  _hypo_io_stream_t *stream;
+
+  if (fd < HYPO_IO_FD_BASE)
+    return read(fd, buf, count);
+  else if (!(desc = _hypo_io_fd(fd)))
+    return -1;
+  else if (desc->file >= 0 ? (desc->flags & O_ACCMODE) == O_WRONLY :
+	   desc->in < 0) {
+    errno = EBADF;
+    return -1;
+  } else if (_hypo_io_begin(fd, desc, &count))
+    return -1;
+
+  /* Read from the file at the offset */
+  if (desc->file >= 0) {
+    file = (_hypo_io_file_t *)_hypo_list_ref(&_hypo_io.files, desc->file);
+    count = desc->offset < file->len ?
+      _hypo_min(count, file->len - desc->offset) : 0;
+    if (count)
+      memcpy(buf, file->data + desc->offset, count);
+    desc->offset += count;
+    return (ssize_t)count;
+  }
+
+  /* An empty stream would block, unless all its writers are closed */
+  stream = (_hypo_io_stream_t *)_hypo_list_ref(&_hypo_io.streams, desc->in);
+  if (!stream->len && count) {
+    if (!stream->writers)
+      return 0;
+    errno = EAGAIN;
+    return -1;
+  }
+
+  count = _hypo_min(count, stream->len);
+  memcpy(buf, stream->data + stream->start, count);
+  stream->start += count;
+  if (!(stream->len -= count))
+    stream->start = 0;
+  return (ssize_t)count;
+}
+
+_HYPO_API ssize_t
+hypo_io_write(int fd, const void *buf, size_t count)
+{
+  _hypo_io_fd_t *desc;
+  _hypo_io_file_t *file;
+  _hypo_io_stream_t *stream;
+
+  if (fd < HYPO_IO_FD_BASE)
+    return write(fd, buf, count);
+  else if (!(desc = _hypo_io_fd(fd)))
+    return -1;
+  else if (desc->file >= 0 ? (desc->flags & O_ACCMODE) == O_RDONLY :
+	   desc->out < 0) {
+    errno = EBADF;
+    return -1;
+  } else if (_hypo_io_begin(fd, desc, &count))
+    return -1;
+
+  /* Write to the file at the offset, filling any gap with zeros */
+  if (desc->file >= 0) {
+    file = (_hypo_io_file_t *)_hypo_list_ref(&_hypo_io.files, desc->file);
+    if (desc->flags & O_APPEND)
+      desc->offset = file->len;
+    _hypo_io_reserve(&file->data, &file->capacity, file->len,
+		     desc->offset + count);
+    if (desc->offset > file->len)
+      memset(file->data + file->len, 0, desc->offset - file->len);
+    if (count)
+      memcpy(file->data + desc->offset, buf, count);
+    desc->offset += count;
+    if (desc->offset > file->len)
+      file->len = desc->offset;
+    return (ssize_t)count;
+  }
+
+  /* Writing a stream nobody reads fails; no signal is raised */
+  stream = (_hypo_io_stream_t *)_hypo_list_ref(&_hypo_io.streams,
+					       desc->out);
+  if (!stream->readers) {
+    errno = EPIPE;
+    return -1;
+  }
+
+  /* Move the unread bytes to the front before growing the buffer */
+  if (stream->start + stream->len + count > stream->capacity &&
+      stream->start) {
+    memmove(stream->data, stream->data + stream->start, stream->len);
+    stream->start = 0;
+  }
+  _hypo_io_reserve(&stream->data, &stream->capacity, stream->len,
+		   stream->len + count);
+  if (count)
+    memcpy(stream->data + stream->start + stream->len, buf, count);
+  stream->len += count;
+  return (ssize_t)count;
+}
+
+_HYPO_API off_t
+hypo_io_lseek(int fd, off_t offset, int whence)
+{
+  _hypo_io_fd_t *desc;
+  off_t base;
+
+  if (fd < HYPO_IO_FD_BASE)
+    return lseek(fd, offset, whence);
+  else if (!(desc = _hypo_io_fd(fd)))
+    return -1;
+  else if (desc->file < 0) {
+    errno = ESPIPE;
+    return -1;
+  }
+
+  /* Select the position the offset is relative to */
+  switch (whence) {
+  case SEEK_SET:
+    base = 0;
+    break;
+
+  case SEEK_CUR:
+    base = (off_t)desc->offset;
+    break;
+
+  case SEEK_END:
+    base = (off_t)((_hypo_io_file_t *)_hypo_list_ref(&_hypo_io.files,
+						     desc->file))->len;
+    break;
+
+  default:
+    errno = EINVAL;
+    return -1;
+  }
+
+  if (base + offset < 0) {
+    errno = EINVAL;
+    return -1;
+  }
+
+  desc->offset = (size_t)(base + offset);
+  return base + offset;
+}
+
+_HYPO_API int
+hypo_io_pipe(int fds[2])
+{
+  int stream = _hypo_io_stream();
+
+  fds[0] = _hypo_io_alloc(O_RDONLY, -1, stream, -1);
+  fds[1] = _hypo_io_alloc(O_WRONLY, -1, -1, stream);
+
+  return 0;
+}
+
+_HYPO_API int
+hypo_io_socketpair(int domain, int type, int protocol, int fds[2])
+{
+  int first = _hypo_io_stream(), second = _hypo_io_stream();
+
+  /* The kind of socket is not simulated */
+  (void)domain;
+  (void)type;
+  (void)protocol;
+
+  fds[0] = _hypo_io_alloc(O_RDWR, -1, first, second);
+  fds[1] = _hypo_io_alloc(O_RDWR, -1, second, first);
+
+  return 0;
+}
+
+/* Discard the in-memory files, streams, and descriptors after a
+ * test
+ */
+static void
+_hypo_io_reset(void)
+{
+  _hypo_io_file_t *file;
+  _hypo_io_stream_t *stream;
+  unsigned int i;
+
+  for (i = 0; i < _hypo_list_len(&_hypo_io.files); i++) {
+    file = (_hypo_io_file_t *)_hypo_list_ref(&_hypo_io.files, i);
+    free(file->path);
+    if (file->capacity)
+      free(file->data);
+  }
+  for (i = 0; i < _hypo_list_len(&_hypo_io.streams); i++) {
+    stream = (_hypo_io_stream_t *)_hypo_list_ref(&_hypo_io.streams, i);
+    free(stream->data);
+  }
+
+  _hypo_list_cleanup(&_hypo_io.files);
+  _hypo_list_cleanup(&_hypo_io.streams);
+  _hypo_list_cleanup(&_hypo_io.fds);
+  _hypo_list_cleanup(&_hypo_io.errors);
+  _hypo_io.limit = 0;
+}
+#endif /* _HYPO_HAVE_FAKEIO */
+
+#line 2197 "runtime.c.tmpl"
+/* The virtual clock and the in-memory I/O are only included when
+ * used
+ */
+#ifndef _HYPO_HAVE_CLOCK
+# define _hypo_clock_reset()
+#endif
+#ifndef _HYPO_HAVE_FAKEIO
+# define _hypo_io_reset()
+#endif
+
+#ifdef _HYPO_HAVE_RUSAGE
+/* The performance counters collected around each test and benchmark */
+#define _HYPO_PERF_COUNTERS	6
+
+static const char *const _hypo_perf_names[_HYPO_PERF_COUNTERS] = {
+  "instructions", "cycles", "cache-misses", "task-clock",
+  "context-switches", "page-faults"
+};
+
+#ifdef _HYPO_HAVE_PERF
+/* The perf events for each counter.  The hardware events count only
+ * the user-space code of the test, and are unavailable in most
+ * virtual machines; the software events fall back to getrusage().
+ */
+static const struct {
+  unsigned int type;
+  unsigned long long config;
+} _hypo_perf_events[_HYPO_PERF_COUNTERS] = {
+  {PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS},
+  {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES},
+  {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CACHE_MISSES},
+  {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_TASK_CLOCK},
+  {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_CONTEXT_SWITCHES},
+  {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_PAGE_FAULTS}
+};
+#endif
+
+/* The state of the performance counters.  The counters are opened
+ * by each process which uses them, since a forked test process can't
+ * use the counters of its parent.
+ */
+static struct {
+  int enabled;			/* HYPO_PERF was set */
+  pid_t pid;			/* Process the counters were opened by */
+  int fds[_HYPO_PERF_COUNTERS];	/* Counter descriptors, or -1 */
+  double start[_HYPO_PERF_COUNTERS]; /* Values from getrusage() */
+  double values[_HYPO_PERF_COUNTERS]; /* Last measurement, or -1 */
+  int measured;			/* Measurement not yet reported */
+  int json;			/* HYPO_PERF_JSON descriptor, or -1 */
+} _hypo_perf = {0, 0, {-1, -1, -1, -1, -1, -1}, {0}, {0}, 0, -1};
+
+/* Obtain the values of the counters which getrusage() can provide */
+static void
+_hypo_rusage(double *values)
+{
+  struct rusage usage;
+
+  getrusage(RUSAGE_SELF, &usage);
+  values[0] = values[1] = values[2] = -1;
+  values[3] = (usage.ru_utime.tv_sec + usage.ru_stime.tv_sec) * 1e9 +
+    (usage.ru_utime.tv_usec + usage.ru_stime.tv_usec) * 1e3;
+  values[4] = (double)usage.ru_nvcsw + usage.ru_nivcsw;
+  values[5] = (double)usage.ru_minflt + usage.ru_majflt;
+}
+
+/* Open the performance counters for the current process */
+static void
+_hypo_perf_open(void)
+{
+#ifdef _HYPO_HAVE_PERF
+  struct perf_event_attr attr;
+  int i;
+
+  for (i = 0; i < _HYPO_PERF_COUNTERS; i++) {
+    if (_hypo_perf.fds[i] >= 0)
+      close(_hypo_perf.fds[i]);
+
+    memset(&attr, 0, sizeof(attr));
+    attr.size = sizeof(attr);
+    attr.type = _hypo_perf_events[i].type;
+    attr.config = _hypo_perf_events[i].config;
+    attr.disabled = 1;
+    attr.inherit = 1;
+    attr.exclude_kernel = attr.type == PERF_TYPE_HARDWARE;
+    attr.exclude_hv = 1;
+    attr.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED |
+      PERF_FORMAT_TOTAL_TIME_RUNNING;
+
+    _hypo_perf.fds[i] = (int)syscall(SYS_perf_event_open, &attr, 0, -1, -1,
+				     0);
+  }
+#endif
+
+  _hypo_perf.pid = getpid();
+}
+
+/* Start measuring a test or benchmark */
+static void
+_hypo_perf_start(void)
+{
+#ifdef _HYPO_HAVE_PERF
+  int i;
+#endif
+
+  if (!_hypo_perf.enabled)
+    return;
+  else if (_hypo_perf.pid != getpid())
+    _hypo_perf_open();
+
+  _hypo_rusage(_hypo_perf.start);
+#ifdef _HYPO_HAVE_PERF
+  for (i = 0; i < _HYPO_PERF_COUNTERS; i++)
+    if (_hypo_perf.fds[i] >= 0) {
+      ioctl(_hypo_perf.fds[i], PERF_EVENT_IOC_RESET, 0);
+      ioctl(_hypo_perf.fds[i], PERF_EVENT_IOC_ENABLE, 0);
+    }
+#endif
+}
+
+/* Stop measuring a test or benchmark, saving the values of the
+ * counters.  A counter which is not available has a value of -1.
+ */
+static void
+_hypo_perf_stop(void)
+{
+  double now[_HYPO_PERF_COUNTERS];
+  int i;
+#ifdef _HYPO_HAVE_PERF
+  unsigned long long data[3];
+#endif
+
+  if (!_hypo_perf.enabled)
+    return;
+
+  _hypo_rusage(now);
+  for (i = 0; i < _HYPO_PERF_COUNTERS; i++) {
+    _hypo_perf.values[i] = now[i] < 0 ? -1 : now[i] - _hypo_perf.start[i];
+
+#ifdef _HYPO_HAVE_PERF
+    /* Prefer the perf counter, scaled if it was multiplexed */
+    if (_hypo_perf.fds[i] < 0)
+      continue;
+    ioctl(_hypo_perf.fds[i], PERF_EVENT_IOC_DISABLE, 0);
+    if (read(_hypo_perf.fds[i], data, sizeof(data)) == sizeof(data) &&
+	data[2])
+      _hypo_perf.values[i] = (double)data[0] * data[1] / data[2];
+#endif
+  }
+
+  _hypo_perf.measured = 1;
+}
+
+/* Report the last measurement of the counters, scaled by the given
+ * number of iterations.  The counters are emitted to standard output,
+ * and as a line of JSON to the file named by HYPO_PERF_JSON.
+ */
+static void
+_hypo_perf_report(hypo_context_t *hypo_ctx, const char *kind,
+		  double iterations)
+{
+  char buf[1024];
+  int i, prec = iterations > 1 ? 2 : 0, len, sep = 0;
+
+  if (!_hypo_perf.measured)
+    return;
+  _hypo_perf.measured = 0;
+
+  len = snprintf(buf, sizeof(buf),
+		 "{\"suite\": \"%s\", \"%s\": \"%s\", \"counters\": {",
+		 hypo_ctx->test_fname, kind, hypo_ctx->cur_test);
+  printf(" [");
+  for (i = 0; i < _HYPO_PERF_COUNTERS; i++) {
+    if (_hypo_perf.values[i] < 0)
+      continue;
+
+    printf("%s%s %.*f", sep ? ", " : "", _hypo_perf_names[i], prec,
+	   _hypo_perf.values[i] / iterations);
+    if (len < (int)sizeof(buf))
+      len += snprintf(buf + len, sizeof(buf) - len, "%s\"%s\": %.*f",
+		      sep ? ", " : "", _hypo_perf_names[i], prec,
+		      _hypo_perf.values[i] / iterations);
+    sep = 1;
+  }
+  printf("]");
+
+  /* Each line is written at once, since forked test processes share
+   * the file
+   */
+  if (_hypo_perf.json >= 0 && len < (int)sizeof(buf) - 3) {
+    len += snprintf(buf + len, sizeof(buf) - len, "}}\n");
+    if (write(_hypo_perf.json, buf, len) < 0)
+      perror("Unable to save performance counters");
+  }
+}
+
+/* Enable the performance counters if the HYPO_PERF environment
+ * variable is set to a non-empty value other than "0"
+ */
+static void
+_hypo_perf_init(void)
+{
+  const char *perf = getenv("HYPO_PERF");
+  const char *json_fname = getenv("HYPO_PERF_JSON");
+
+  if (!perf || !*perf || !strcmp(perf, "0"))
+    return;
+
+  _hypo_perf.enabled = 1;
+  _hypo_perf.json = -1;
+  if (json_fname && *json_fname &&
+      (_hypo_perf.json = open(json_fname, O_WRONLY | O_CREAT | O_TRUNC |
+			      O_APPEND, 0666)) < 0)
+    perror(json_fname);
+
+  _hypo_perf_open();
+}
+#else
+# define _hypo_perf_init()
+# define _hypo_perf_start()
+# define _hypo_perf_stop()
+# define _hypo_perf_report(hypo_ctx, kind, iterations)
+#endif /* _HYPO_HAVE_RUSAGE */
+
+#ifdef _HYPO_HAVE_PROF
+/* The rate at which the profiler samples the program counter */
+#ifndef HYPO_PROFILE_HZ
+# define HYPO_PROFILE_HZ	1000
+#endif
+
+/* The number of distinct samples the profiler can record; must be a
+ * power of 2
+ */
+#ifndef HYPO_PROFILE_SLOTS
+# define HYPO_PROFILE_SLOTS	16384
+#endif
+
+/* Extract the program counter from the context of a signal.  The
+ * register indices are REG_RIP and REG_EIP, which are only defined
+ * with _GNU_SOURCE.
+ */
+#if defined(__x86_64__)
+# define _hypo_prof_pc(uc)	((unsigned long)(uc)->uc_mcontext.gregs[16])
+#elif defined(__i386__)
+# define _hypo_prof_pc(uc)	((unsigned long)(uc)->uc_mcontext.gregs[14])
+#else
+# define _hypo_prof_pc(uc)	((unsigned long)(uc)->uc_mcontext.pc)
+#endif
+
+/* A sample of the program counter, counted for a test.  The name of
+ * the test is 0 outside of the tests; the case index is -1 unless
+ * the test is parameterized.
+ */
+typedef struct {
+  const char *name;
+  int index;
+  unsigned long pc;
+  unsigned long count;
+} _hypo_prof_sample_t;
+
+/* The state of the profiler.  The samples are kept in a hash table
+ * which is allocated before the profiler is started, so the signal
+ * handler need not allocate memory.  The fd is -1 if profiling was
+ * not requested.
+ */
+static struct {
+  int fd;
+  const char *suite;
+  const char *volatile name;
+  volatile int index;
+  _hypo_prof_sample_t *table;
+  size_t used;
+  unsigned long dropped;
+} _hypo_prof = {-1, 0, 0, -1, 0, 0, 0};
+
+#ifdef HYPO_THREADS
+/* Set while a thread is recording a sample; a sample taken by
+ * another thread meanwhile is dropped
+ */
+static volatile int _hypo_prof_busy = 0;
+#endif
+
+/* Record a sample of the program counter for the current test */
+static void
+_hypo_prof_sample(int signo, siginfo_t *info, void *context)
+{
+  unsigned long pc = _hypo_prof_pc((ucontext_t *)context);
+  const char *name = _hypo_prof.name;
+  int index = _hypo_prof.index;
+  _hypo_prof_sample_t *sample;
+  size_t i, mask = HYPO_PROFILE_SLOTS - 1;
+
+  (void)signo;
+  (void)info;
+
+#ifdef HYPO_THREADS
+  if (__sync_lock_test_and_set(&_hypo_prof_busy, 1)) {
+    _hypo_prof.dropped++;
+    return;
+  }
+#endif
+
+  /* Find the sample, adding it if the table has room */
+  for (i = (((pc >> 2) ^ (size_t)name ^ (size_t)index) * 2654435761u) & mask;
+       ; i = (i + 1) & mask) {
+    sample = &_hypo_prof.table[i];
+    if (!sample->count) {
+      if (_hypo_prof.used >= HYPO_PROFILE_SLOTS / 4 * 3) {
+	sample = 0;
+	_hypo_prof.dropped++;
+	break;
+      }
+
+      sample->name = name;
+      sample->index = index;
+      sample->pc = pc;
+      _hypo_prof.used++;
+      break;
+    } else if (sample->pc == pc && sample->name == name &&
+	       sample->index == index)
+      break;
+  }
+
+  if (sample)
+    sample->count++;
+
+#ifdef HYPO_THREADS
+  __sync_lock_release(&_hypo_prof_busy);
+#endif
+}
+
+/* Start (or, if run is 0, stop) the profiling timer */
+static void
+_hypo_prof_timer(int run)
+{
+  struct itimerval timer;
+
+  memset(&timer, 0, sizeof(timer));
+  if (run) {
+    timer.it_interval.tv_usec = 1000000 / HYPO_PROFILE_HZ;
+    timer.it_value = timer.it_interval;
+  }
+
+  setitimer(ITIMER_PROF, &timer, 0);
+}
+
+/* Attribute the following samples to a test.  The name of the test,
+ * which must not be freed, is 0 outside of the tests; the case index
+ * is -1 unless the test is parameterized.
+ */
+static void
+_hypo_prof_attribute(const char *name, int index)
+{
+  _hypo_prof.name = 0;
+  _hypo_prof.index = index;
+  _hypo_prof.name = name;
+}
+
+/* Discard the samples inherited by a newly forked process, and start
+ * profiling it; timers are not inherited.
+ */
+static void
+_hypo_prof_fork(void)
+{
+  if (_hypo_prof.fd < 0)
+    return;
+
+  memset(_hypo_prof.table, 0,
+	 HYPO_PROFILE_SLOTS * sizeof(_hypo_prof_sample_t));
+  _hypo_prof.used = 0;
+  _hypo_prof.dropped = 0;
+  _hypo_prof_timer(1);
+}
+
+/* A mapping of an executable file into memory.  The bias is
+ * subtracted from addresses in the mapping to give the addresses
+ * used by the file's symbol table.
+ */
+typedef struct {
+  unsigned long start;
+  unsigned long end;
+  unsigned long bias;
+  char *path;
+} _hypo_prof_map_t;
+
+/* Copy a string, aborting if there is no memory for it */
+static char *
+_hypo_prof_strdup(const char *str)
+{
+  size_t len = strlen(str) + 1;
+  char *copy;
+
+  if (!(copy = (char *)malloc(len)))
+    abort(); /* Not much else we can do */
+
+  return (char *)memcpy(copy, str, len);
+}
+
+/* Read the executable mappings of the current process.  Addresses in
+ * position-independent files are relative to the start of their
+ * first mapping, which holds the ELF header.
+ */
+static _hypo_list_t
+_hypo_prof_maps(void)
+{
+  _hypo_list_t maps = _HYPO_LIST_INIT(_hypo_prof_map_t);
+  _hypo_prof_map_t *map;
+  unsigned long start, end, offset, base = 0;
+  char line[4200], perms[8], *path, *base_path = 0;
+  const unsigned char *ehdr;
+  int pos;
+  FILE *stream;
+
+  if (!(stream = fopen("/proc/self/maps", "r")))
+    return maps;
+
+  while (fgets(line, sizeof(line), stream)) {
+    pos = 0;
+    if (sscanf(line, "%lx-%lx %7s %lx %*s %*s %n",
+	       &start, &end, perms, &offset, &pos) < 4 || !pos)
+      continue;
+    path = line + pos;
+    path[strcspn(path, "\n")] = '\0';
+    if (!*path)
+      continue;
+
+    /* Remember where each file starts */
+    if (!offset && perms[0] == 'r') {
+      base = start;
+      free(base_path);
+      base_path = _hypo_prof_strdup(path);
+    }
+    if (perms[2] != 'x')
+      continue;
+
+    map = (_hypo_prof_map_t *)_hypo_list_alloc(&maps);
+    map->start = start;
+    map->end = end;
+    map->bias = 0;
+    map->path = _hypo_prof_strdup(path);
+
+    /* Position-independent files are of type ET_DYN */
+    ehdr = (const unsigned char *)base;
+    if (base_path && !strcmp(path, base_path) &&
+	!memcmp(ehdr, "\177ELF", 4) &&
+	*(const unsigned short *)(ehdr + 16) == 3)
+      map->bias = base;
+  }
+
+  free(base_path);
+  fclose(stream);
+
+  return maps;
+}
+
+/* Write the samples of the current process to the profile, one line
+ * for each test and address, and stop profiling.  The lines are in
+ * the "folded stack" format, giving the test, the file containing
+ * the address and the address within it, and the count; e.g.,
+ * "test.hypo::check_count;/path/to/test+0x1189 42".
+ */
+static void
+_hypo_prof_dump(void)
+{
+  _hypo_list_t maps;
+  _hypo_prof_map_t *map;
+  _hypo_prof_sample_t *sample;
+  char line[4400], index[3 * sizeof(int) + 3];
+  unsigned int i, j;
+  int len;
+
+  if (_hypo_prof.fd < 0)
+    return;
+
+  _hypo_prof_timer(0);
+  maps = _hypo_prof_maps();
+
+  for (i = 0; i < HYPO_PROFILE_SLOTS; i++) {
+    sample = &_hypo_prof.table[i];
+    if (!sample->count)
+      continue;
+
+    /* Find the file containing the address */
+    for (j = 0; j < _hypo_list_len(&maps); j++) {
+      map = (_hypo_prof_map_t *)_hypo_list_ref(&maps, j);
+      if (sample->pc >= map->start && sample->pc < map->end)
+	break;
+    }
+    if (j >= _hypo_list_len(&maps))
+      map = 0;
+
+    index[0] = '\0';
+    if (sample->index >= 0)
+      snprintf(index, sizeof(index), "[%d]", sample->index);
+    len = snprintf(line, sizeof(line), "%s%s%s%s;%s+0x%lx %lu\n",
+		   _hypo_prof.suite, sample->name ? "::" : "",
+		   sample->name ? sample->name : "", index,
+		   map ? map->path : "[unknown]",
+		   sample->pc - (map ? map->bias : 0), sample->count);
+    if (len >= (int)sizeof(line))
+      continue;
+    if (write(_hypo_prof.fd, line, len) < 0) {
+      perror("Unable to save profile");
+      break;
+    }
+  }
+
+  if (_hypo_prof.dropped)
+    fprintf(stderr, "%s: %lu profile samples dropped\n", _hypo_prof.suite,
+	    _hypo_prof.dropped);
+
+  for (j = 0; j < _hypo_list_len(&maps); j++)
+    free(((_hypo_prof_map_t *)_hypo_list_ref(&maps, j))->path);
+  _hypo_list_cleanup(&maps);
+}
+
+/* Start profiling if the HYPO_PROFILE environment variable names a
+ * file to write the profile to
+ */
+static void
+_hypo_prof_init(const char *test_fname)
+{
+  const char *fname = getenv("HYPO_PROFILE");
+  struct sigaction action;
+
+  if (!fname || !*fname)
+    return;
+
+  if ((_hypo_prof.fd = open(fname, O_WRONLY | O_CREAT | O_TRUNC |
+			    O_APPEND, 0666)) < 0) {
+    perror(fname);
+    return;
+  }
+  if (!(_hypo_prof.table = (_hypo_prof_sample_t *)calloc(
+	  HYPO_PROFILE_SLOTS, sizeof(_hypo_prof_sample_t))))
+    abort(); /* Not much else we can do */
+  _hypo_prof.suite = test_fname;
+
+  /* Restart interrupted system calls, so tests don't notice */
+  memset(&action, 0, sizeof(action));
+  action.sa_sigaction = _hypo_prof_sample;
+  action.sa_flags = SA_SIGINFO | SA_RESTART;
+  sigemptyset(&action.sa_mask);
+  sigaction(SIGPROF, &action, 0);
+
+  _hypo_prof_timer(1);
+}
+#else
+# define _hypo_prof_init(test_fname)
+# define _hypo_prof_attribute(name, index)
+# define _hypo_prof_fork()
+# define _hypo_prof_dump()
+#endif /* _HYPO_HAVE_PROF */
+
+/* Obtain the current time, in nanoseconds, from a monotonic clock */
+static double
+_hypo_now(void)
+{
+#ifdef CLOCK_MONOTONIC
+  struct timespec ts;
+
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return ts.tv_sec * 1e9 + ts.tv_nsec;
+#else
+  return clock() * (1e9 / CLOCKS_PER_SEC);
+#endif
+}
+
+/* The time, in seconds, a test ran before it was stopped for
+ * exceeding its timeout or a resource limit
+ */
+static double _hypo_elapsed = 0.0;
+
+/* Let the user know of the status of a test, along with its
+ * allocations and performance counters, and reset the failure flags
+ * for the next test.
+ */
+static void
+_hypo_status(hypo_context_t *hypo_ctx)
+{
+  if (hypo_ctx->flags & (_HYPO_FLAG_TIMEOUT | _HYPO_FLAG_LIMIT))
+    printf("%s [elapsed %.3f s]",
+	   (hypo_ctx->flags & _HYPO_FLAG_TIMEOUT) ? "TIMEOUT" : "LIMIT",
+	   _hypo_elapsed);
+  else
+    printf((hypo_ctx->flags & _HYPO_FLAG_FAIL) ? "FAIL" : "PASS");
+  _hypo_alloc_report();
+  _hypo_perf_report(hypo_ctx, "test", 1);
+  printf("\n");
+  hypo_ctx->flags &= ~(_HYPO_FLAG_FAIL | _HYPO_FLAG_TIMEOUT |
+		       _HYPO_FLAG_LIMIT);
+}
+
+/* The number of times a test is run: once for each case of a
+ * parameterized test, otherwise once
+ */
+#define _hypo_ncases(test) ((test)->cases ? (test)->cases : 1)
+
+/* Select a case of a test, and set the current test to its name.
+ * The cases of a parameterized test are named "name[i]".
+ */
+static void
+_hypo_case_begin(hypo_context_t *hypo_ctx, const _hypo_test_t *test,
+		 unsigned int i)
+{
+  size_t len;
+  char *name;
+
+  hypo_ctx->case_index = i;
+  hypo_ctx->cur_test = test->name;
+  if (!test->cases)
+    return;
+
+  len = strlen(test->name) + 3 * sizeof(i) + 3;
+  if (!(name = (char *)malloc(len)))
+    abort(); /* Not much else we can do */
+  snprintf(name, len, "%s[%u]", test->name, i);
+  hypo_ctx->cur_test = name;
+}
+
+/* Finish a case of a test.  The name of a case of a parameterized
+ * test is released, unless a failure recorded since count refers to
+ * it.
+ */
+static void
+_hypo_case_end(hypo_context_t *hypo_ctx, const _hypo_test_t *test,
+	       unsigned int count)
+{
+  if (test->cases && _hypo_list_len(&hypo_ctx->failures) == count)
+    free((char *)hypo_ctx->cur_test);
+}
+
+/* Tell the user the fatal error stopped testing */
+static void
+_hypo_halted(hypo_context_t *hypo_ctx)
+{
+  printf("Testing halted due to fatal error in %s::%s\n",
+	 hypo_ctx->test_fname, hypo_ctx->cur_test);
+}
+
+#ifdef _HYPO_HAVE_FORK
+/* Exit codes of a test process which has sent its result */
+#define _HYPO_EXIT_SENT		0x68
+#define _HYPO_EXIT_SENT_FATAL	0x69
+
+/* Write all of a buffer to a file descriptor.  If the write fails,
+ * this will abort().
+ */
+static void
+_hypo_write(int fd, const void *buf, size_t len)
+{
+  const unsigned char *ptr = (const unsigned char *)buf;
+  ssize_t count;
+
+  while (len) {
+    if ((count = write(fd, ptr, len)) < 0) {
+      if (errno == EINTR)
+	continue;
+      abort(); /* Not much else we can do */
+    }
+
+    ptr += count;
+    len -= count;
+  }
+}
+
+/* Read all of a buffer from a file descriptor.  Returns 0 if the
+ * data could not be read, e.g., because the writer exited.
+ */
+static int
+_hypo_read(int fd, void *buf, size_t len)
+{
+  unsigned char *ptr = (unsigned char *)buf;
+  ssize_t count;
+
+  while (len) {
+    if ((count = read(fd, ptr, len)) < 0) {
+      if (errno == EINTR)
+	continue;
+      return 0;
+    } else if (!count)
+      return 0;
+
+    ptr += count;
+    len -= count;
+  }
+
+  return 1;
+}
+
+/* Write a string, which may be 0, to a file descriptor */
+static void
+_hypo_send_str(int fd, const char *str)
+{
+  int len = str ? (int)strlen(str) : -1;
+
+  _hypo_write(fd, &len, sizeof(len));
+  if (len > 0)
+    _hypo_write(fd, str, len);
+}
+
+/* Read a string written by _hypo_send_str().  The string is
+ * allocated with malloc().  Returns 0 if the string could not be
+ * read.
+ */
+static int
+_hypo_recv_str(int fd, char **str)
+{
+  int len;
+
+  *str = 0;
+  if (!_hypo_read(fd, &len, sizeof(len)))
+    return 0;
+  else if (len < 0)
+    return 1;
+
+  if (!(*str = (char *)malloc(len + 1)))
+    abort(); /* Not much else we can do */
+  if (!_hypo_read(fd, *str, len)) {
+    free(*str);
+    *str = 0;
+    return 0;
+  }
+  (*str)[len] = '\0';
+
+  return 1;
+}
+
+/* Send the result of a test to the main process.  This consists of
+ * the name of the test, the flags, and the failures, which are then
+ * discarded.
+ */
+static void
+_hypo_send_result(int fd, hypo_context_t *hypo_ctx)
+{
+  unsigned int i, count = _hypo_list_len(&hypo_ctx->failures);
+  _hypo_failure_t *failure;
+
+  _hypo_send_str(fd, hypo_ctx->cur_test);
+  _hypo_write(fd, &hypo_ctx->flags, sizeof(hypo_ctx->flags));
+  _hypo_write(fd, &count, sizeof(count));
+  for (i = 0; i < count; i++) {
+    failure = (_hypo_failure_t *)_hypo_list_ref(&hypo_ctx->failures, i);
+    _hypo_send_str(fd, failure->file);
+    _hypo_write(fd, &failure->line, sizeof(failure->line));
+    _hypo_send_str(fd, failure->expr);
+    _hypo_write(fd, &failure->value, sizeof(failure->value));
+    _hypo_send_str(fd, failure->msg);
+  }
+
+  _hypo_list_cleanup(&hypo_ctx->failures);
+}
+
+/* Receive the result of a test, adding its failures to the context
+ * and setting the current test.  Returns 0 if there are no more
+ * results.
+ */
+static int
+_hypo_recv_result(int fd, hypo_context_t *hypo_ctx)
+{
+  _hypo_failure_t tmp, *failure;
+  unsigned int flags, i, count;
+  char *name;
+
+  if (!_hypo_recv_str(fd, &name) ||
+      !_hypo_read(fd, &flags, sizeof(flags)) ||
+      !_hypo_read(fd, &count, sizeof(count)))
+    return 0;
+
+  hypo_ctx->cur_test = name;
+  hypo_ctx->flags |= flags & _HYPO_FLAG_FATAL;
+
+  for (i = 0; i < count; i++) {
+    tmp.test_fname = hypo_ctx->test_fname;
+    tmp.test = name;
+    if (!_hypo_recv_str(fd, (char **)&tmp.file) ||
+	!_hypo_read(fd, &tmp.line, sizeof(tmp.line)) ||
+	!_hypo_recv_str(fd, (char **)&tmp.expr) ||
+	!_hypo_read(fd, &tmp.value, sizeof(tmp.value)) ||
+	!_hypo_recv_str(fd, (char **)&tmp.msg))
+      return 0;
+
+    failure = (_hypo_failure_t *)_hypo_list_alloc(&hypo_ctx->failures);
+    *failure = tmp;
+  }
+
+  return 1;
+}
+
+/* Wait for a process to exit, returning its status */
+static int
+_hypo_wait(pid_t pid)
+{
+  int status;
+
+  while (waitpid(pid, &status, 0) < 0)
+    if (errno != EINTR)
+      abort(); /* Not much else we can do */
+
+  return status;
+}
+
+/* Record a failure for a process which exited without sending a
+ * result.
+ */
+static void
+_hypo_abnormal(hypo_context_t *hypo_ctx, int status)
+{
+  static char msg[64];
+
+  if (WIFSIGNALED(status))
+    snprintf(msg, sizeof(msg), "Test process killed by signal %d",
+	     WTERMSIG(status));
+  else
+    snprintf(msg, sizeof(msg), "Test process exited with status %d",
+	     WEXITSTATUS(status));
+
+  _hypo_assert(hypo_ctx, 0, hypo_ctx->test_fname, 0, 0, 0, msg);
+}
+#endif /* _HYPO_HAVE_FORK */
+
+#ifdef _HYPO_HAVE_TIMEOUT
+/* The default timeout of a test, in seconds, from HYPO_TIMEOUT; 0
+ * if tests may run for as long as they like
+ */
+static double _hypo_timeout_default = 0.0;
+
+/* The timeout of a test, in seconds, or 0 if it has none */
+#define _hypo_timeout(test) \
+  ((test)->timeout > 0 ? (test)->timeout : _hypo_timeout_default)
+
+/* Set when the timer of a test expires */
+static volatile sig_atomic_t _hypo_expired = 0;
+
+/* Where to return to if the timer of a test run in the current
+ * process expires, and when the test was started
+ */
+static sigjmp_buf _hypo_timeout_env;
+static double _hypo_timeout_began = 0.0;
+
+/* Start the timer of a test.  If interval is non-zero, the timer
+ * keeps expiring every interval microseconds once the timeout has
+ * passed.  A timeout of 0 stops the timer.
+ */
+static void
+_hypo_timer(double timeout, long interval)
+{
+  struct itimerval timer;
+
+  memset(&timer, 0, sizeof(timer));
+  if (timeout > 0) {
+    timer.it_value.tv_sec = (time_t)timeout;
+    timer.it_value.tv_usec = (long)((timeout - timer.it_value.tv_sec) * 1e6);
+    if (!timer.it_value.tv_sec && !timer.it_value.tv_usec)
+      timer.it_value.tv_usec = 1;
+    timer.it_interval.tv_usec = interval;
+  }
+
+  setitimer(ITIMER_REAL, &timer, 0);
+}
+
+/* Note that the timer of a test in another process expired */
+static void
+_hypo_timer_expired(int signo)
+{
+  (void)signo;
+  _hypo_expired = 1;
+}
+
+/* Abandon a test which timed out in the current process, returning
+ * to _hypo_run_tests()
+ */
+static void
+_hypo_timer_jump(int signo)
+{
+  (void)signo;
+  siglongjmp(_hypo_timeout_env, 1);
+}
+
+/* Install the handler for the expiry of the timer of a test.  It
+ * does not restart system calls, so that waitpid() is interrupted.
+ */
+static void
+_hypo_timer_handler(void (*handler)(int))
+{
+  struct sigaction action;
+
+  memset(&action, 0, sizeof(action));
+  action.sa_handler = handler;
+  sigemptyset(&action.sa_mask);
+  sigaction(SIGALRM, &action, 0);
+}
+
+/* Mark the point to return to if the timer of a test run in the
+ * current process expires.  Evaluates to non-zero on that return.
+ */
+#define _hypo_timeout_jumped()	sigsetjmp(_hypo_timeout_env, 1)
+
+/* Start the timer of a test run in the current process, if it has a
+ * timeout
+ */
+static void
+_hypo_timeout_start(const _hypo_test_t *test)
+{
+  if (_hypo_timeout(test) <= 0)
+    return;
+
+  _hypo_timeout_began = _hypo_now();
+  _hypo_timer_handler(_hypo_timer_jump);
+  _hypo_timer(_hypo_timeout(test), 0);
+}
+
+/* Record the failure of a test which timed out in the current
+ * process, and report it.  The state of the test, and of the
+ * process, is unknown, so testing is halted; the failures are still
+ * reported as usual.
+ */
+static void
+_hypo_timeout_halt(hypo_context_t *hypo_ctx, const _hypo_test_t *test)
+{
+  static char msg[96];
+
+  _hypo_elapsed = (_hypo_now() - _hypo_timeout_began) / 1e9;
+  snprintf(msg, sizeof(msg),
+	   "Test timed out after %.3f seconds (timeout %g seconds)",
+	   _hypo_elapsed, _hypo_timeout(test));
+  _hypo_assert(hypo_ctx, _HYPO_FLAG_FATAL, test->file, test->line, 0, 0,
+	       msg);
+  hypo_ctx->flags |= _HYPO_FLAG_TIMEOUT;
+
+  _hypo_status(hypo_ctx);
+  printf("Testing halted due to timeout in %s::%s\n",
+	 hypo_ctx->test_fname, hypo_ctx->cur_test);
+}
+
+/* Stop the timer of a test run in the current process */
+#define _hypo_timeout_stop(test)		\
+  do {						\
+    if (_hypo_timeout(test) > 0)		\
+      _hypo_timer(0, 0);			\
+  } while (0)
+
+/* Apply the resource limits of a test to the current process.  The
+ * soft limits are lowered; the hard limits are left alone.
+ */
+static void
+_hypo_rlimit(const _hypo_test_t *test)
+{
+  struct rlimit limit;
+
+  if (test->cpu && !getrlimit(RLIMIT_CPU, &limit) &&
+      (limit.rlim_max == RLIM_INFINITY || test->cpu < limit.rlim_max)) {
+    limit.rlim_cur = test->cpu;
+    setrlimit(RLIMIT_CPU, &limit);
+  }
+
+  if (test->memory && !getrlimit(RLIMIT_AS, &limit) &&
+      (limit.rlim_max == RLIM_INFINITY || test->memory < limit.rlim_max)) {
+    limit.rlim_cur = test->memory;
+    setrlimit(RLIMIT_AS, &limit);
+  }
+}
+
+/* Wait for a test process to exit, returning its status.  If the
+ * test has a timeout, the process is killed when it expires, and
+ * timed_out is set.  The timer keeps expiring every 10ms after the
+ * timeout, so an expiry just before waitpid() is not missed.
+ */
+static int
+_hypo_wait_test(pid_t pid, const _hypo_test_t *test, int *timed_out)
+{
+  int status;
+
+  *timed_out = 0;
+  _hypo_expired = 0;
+  _hypo_timer(_hypo_timeout(test), 10000);
+
+  while (waitpid(pid, &status, 0) < 0) {
+    if (errno != EINTR)
+      abort(); /* Not much else we can do */
+    else if (_hypo_expired && !*timed_out) {
+      kill(pid, SIGKILL);
+      *timed_out = 1;
+    }
+  }
+
+  _hypo_timer(0, 0);
+
+  return status;
+}
+
+/* Record a failure for a test process which was stopped for
+ * exceeding its timeout or one of its resource limits.  Returns 0 if
+ * it was not.
+ */
+static int
+_hypo_limited(hypo_context_t *hypo_ctx, const _hypo_test_t *test,
+	      int status, int timed_out, double elapsed)
+{
+  static char msg[160];
+  unsigned int flag;
+
+  if (!WIFSIGNALED(status))
+    return 0;
+
+  /* Work out which limit was exceeded */
+  if (timed_out && WTERMSIG(status) == SIGKILL) {
+    snprintf(msg, sizeof(msg),
+	     "Test timed out after %.3f seconds (timeout %g seconds)",
+	     elapsed, _hypo_timeout(test));
+    flag = _HYPO_FLAG_TIMEOUT;
+  } else if (test->cpu && (WTERMSIG(status) == SIGXCPU ||
+			   WTERMSIG(status) == SIGKILL)) {
+    snprintf(msg, sizeof(msg),
+	     "Test exceeded its CPU limit of %u seconds after %.3f seconds",
+	     test->cpu, elapsed);
+    flag = _HYPO_FLAG_LIMIT;
+  } else if (test->memory) {
+    snprintf(msg, sizeof(msg),
+	     "Test process killed by signal %d after %.3f seconds; it may "
+	     "have exceeded its memory limit of %lu bytes",
+	     WTERMSIG(status), elapsed, test->memory);
+    flag = _HYPO_FLAG_LIMIT;
+  } else
+    return 0;
+
+  _hypo_assert(hypo_ctx, 0, test->file, test->line, 0, 0, msg);
+  hypo_ctx->flags |= flag;
+  _hypo_elapsed = elapsed;
+
+  return 1;
+}
+
+/* Test if a test has its own timeout or resource limits, which can
+ * only be enforced reliably in a forked process
+ */
+#define _hypo_has_limits(test) \
+  ((test)->timeout > 0 || (test)->cpu || (test)->memory)
+#else
+# define _hypo_timeout_jumped() 0
+# define _hypo_timeout_start(test)
+# define _hypo_timeout_halt(hypo_ctx, test)
+# define _hypo_timeout_stop(test)
+# define _hypo_timer_handler(handler)
+# define _hypo_rlimit(test)
+# define _hypo_wait_test(pid, test, timed_out) \
+  (*(timed_out) = 0, _hypo_wait(pid))
+# define _hypo_limited(hypo_ctx, test, status, timed_out, elapsed) \
+  ((void)(elapsed), 0)
+# define _hypo_has_limits(test) 0
+#endif /* _HYPO_HAVE_TIMEOUT */
+
+/* Tear down the file-scoped fixtures, in reverse order */
+static void
+_hypo_fix_teardown_all(hypo_context_t *hypo_ctx)
+{
+  _hypo_fix_deferred_t *deferred;
+  unsigned int i;
+
+  for (i = _hypo_list_len(&_hypo_fix_deferred); i > 0; i--) {
+    deferred = (_hypo_fix_deferred_t *)_hypo_list_ref(
+      &_hypo_fix_deferred, i - 1
+    );
+    hypo_ctx->cur_test = deferred->name;
+
+    printf("%s::%s (teardown)... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+    fflush(stdout);
+
+    deferred->teardown(hypo_ctx);
+    _hypo_mock_cleanup();
+    _hypo_clock_reset();
+    _hypo_io_reset();
+
+    _hypo_status(hypo_ctx);
+  }
+  _hypo_list_cleanup(&_hypo_fix_deferred);
+}
+
+#ifdef _HYPO_HAVE_FORK
+/* The "template" process for a group of tests sharing the same
+ * fixtures.  The fixtures are set up once, then each test is run in
+ * its own copy-on-write child process, so that every test starts
+ * from the same pristine state without paying for the set up again.
+ * If alone is non-zero, only the first test of the group is run.
+ * The file-scoped fixtures have already been set up by the main
+ * process.  The results are sent to the main process through fd.
+ * Does not return.
+ */
+static void
+_hypo_run_group(const char *test_fname, const _hypo_test_t *group,
+		int alone, int fd)
+{
+  hypo_context_t hypo_ctx = {0, 0, 0, _HYPO_LIST_INIT(_hypo_failure_t), 0};
+  const _hypo_test_t *test;
+  unsigned int i;
+  pid_t pid;
+  int status, timed_out, fatal = 0;
+  double start;
+
+  hypo_ctx.test_fname = test_fname;
+  hypo_ctx.cur_test = group->name;
+  _hypo_timer_handler(_hypo_timer_expired);
+
+  /* Set up the fixtures, once */
+  if (group->setup)
+    group->setup(&hypo_ctx);
+
+  /* Run each case of each test of the group in its own process */
+  for (test = group; test->name && !fatal && (!alone || test == group);
+       test++) {
+    if (test->setup != group->setup)
+      continue;
+
+    for (i = 0; i < _hypo_ncases(test) && !fatal; i++) {
+      _hypo_case_begin(&hypo_ctx, test, i);
+
+      fflush(stdout);
+      start = _hypo_now();
+      if ((pid = fork()) < 0)
+	abort(); /* Not much else we can do */
+      else if (!pid) {
+	printf("%s::%s... ", hypo_ctx.test_fname, hypo_ctx.cur_test);
+	fflush(stdout);
+
+	_hypo_rlimit(test);
+	_hypo_prof_fork();
+	_hypo_prof_attribute(test->name, test->cases ? (int)i : -1);
+	_hypo_alloc_begin();
+	_hypo_perf_start();
+	test->run(&hypo_ctx);
+	_hypo_perf_stop();
+	_hypo_prof_attribute(0, -1);
+
+	status = (hypo_ctx.flags & _HYPO_FLAG_FATAL) ?
+	  _HYPO_EXIT_SENT_FATAL : _HYPO_EXIT_SENT;
+	_hypo_status(&hypo_ctx);
+	fflush(stdout);
+	_hypo_send_result(fd, &hypo_ctx);
+	_hypo_prof_dump();
+	_exit(status);
+      }
+
+      /* Make sure the test process sent its result */
+      status = _hypo_wait_test(pid, test, &timed_out);
+      if (WIFEXITED(status) && WEXITSTATUS(status) == _HYPO_EXIT_SENT_FATAL)
+	fatal = 1;
+      else if (!WIFEXITED(status) ||
+	       WEXITSTATUS(status) != _HYPO_EXIT_SENT) {
+	/* The inherited failures have not been reported yet */
+	if (!_hypo_limited(&hypo_ctx, test, status, timed_out,
+			   (_hypo_now() - start) / 1e9))
+	  _hypo_abnormal(&hypo_ctx, status);
+	_hypo_status(&hypo_ctx);
+	_hypo_send_result(fd, &hypo_ctx);
+      }
+
+      /* The result was sent by value */
+      if (test->cases)
+	free((char *)hypo_ctx.cur_test);
+    }
+  }
+
+  /* The failures from the set up were reported with the tests */
+  _hypo_list_cleanup(&hypo_ctx.failures);
+  hypo_ctx.flags &= ~_HYPO_FLAG_FAIL;
+
+  /* Clean up the fixtures, once */
+  if (group->teardown) {
+    hypo_ctx.cur_test = group->name;
+
+    printf("%s::%s (teardown)... ", hypo_ctx.test_fname, hypo_ctx.cur_test);
+    fflush(stdout);
+
+    group->teardown(&hypo_ctx);
+
+    _hypo_status(&hypo_ctx);
+    _hypo_send_result(fd, &hypo_ctx);
+  }
+
+  fflush(stdout);
+  _hypo_prof_dump();
+  _exit(0);
+}
+
+/* Set up the file-scoped fixtures of a group of tests in the main
+ * process, so that they are set up only once, and are torn down only
+ * after all the tests have run.  If alone is non-zero, only the first
+ * test of the group is considered.  Returns non-zero if the set up
+ * encountered a fatal error.
+ */
+static int
+_hypo_file_setup_group(hypo_context_t *hypo_ctx, const _hypo_test_t *group,
+		       int alone)
+{
+  const _hypo_test_t *test;
+
+  for (test = group; test->name && (!alone || test == group); test++) {
+    if (test->setup != group->setup || !test->file_setup)
+      continue;
+
+    /* Set up the fixtures, reporting only failures */
+    hypo_ctx->cur_test = test->name;
+    test->file_setup(hypo_ctx);
+    _hypo_mock_cleanup();
+    _hypo_clock_reset();
+    _hypo_io_reset();
+    if (hypo_ctx->flags & (_HYPO_FLAG_FAIL | _HYPO_FLAG_FATAL)) {
+      printf("%s::%s (setup)... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+      _hypo_status(hypo_ctx);
+    }
+
+    /* Check if we encountered a fatal error */
+    if (hypo_ctx->flags & _HYPO_FLAG_FATAL) {
+      _hypo_halted(hypo_ctx);
+      return 1;
+    }
+  }
+
+  return 0;
+}
+
+/* Run a group of tests, or, if alone is non-zero, only the first
+ * test of the group, in a "template" process.  Returns non-zero if
+ * testing should stop because of a fatal error.
+ */
+static int
+_hypo_run_template(hypo_context_t *hypo_ctx, const _hypo_test_t *group,
+		   int alone)
+{
+  const char *fatal_test = 0;
+  int fds[2], status;
+  pid_t pid;
+
+  /* Set up the file-scoped fixtures first */
+  if (_hypo_file_setup_group(hypo_ctx, group, alone))
+    return 1;
+
+  /* Start the template process */
+  fflush(stdout);
+  if (pipe(fds) || (pid = fork()) < 0)
+    abort(); /* Not much else we can do */
+  else if (!pid) {
+    close(fds[0]);
+    _hypo_prof_fork();
+    _hypo_run_group(hypo_ctx->test_fname, group, alone, fds[1]);
+  }
+  close(fds[1]);
+
+  /* Collect the results */
+  hypo_ctx->cur_test = 0;
+  while (_hypo_recv_result(fds[0], hypo_ctx))
+    if (!fatal_test && (hypo_ctx->flags & _HYPO_FLAG_FATAL))
+      fatal_test = hypo_ctx->cur_test;
+  close(fds[0]);
+
+  /* Did the template process exit abnormally? */
+  status = _hypo_wait(pid);
+  if (!WIFEXITED(status) || WEXITSTATUS(status)) {
+    if (!hypo_ctx->cur_test) {
+      hypo_ctx->cur_test = group->name;
+      printf("%s::%s... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+    }
+    _hypo_abnormal(hypo_ctx, status);
+    _hypo_status(hypo_ctx);
+  }
+
+  /* Check if we encountered a fatal error */
+  if (fatal_test) {
+    hypo_ctx->cur_test = fatal_test;
+    _hypo_halted(hypo_ctx);
+    return 1;
+  }
+
+  return 0;
+}
+
+/* Run the tests, forking a "template" process for each group of
+ * tests sharing the same fixtures.  The groups are run in the order
+ * of their first tests.
+ */
+static void
+_hypo_run_forked(hypo_context_t *hypo_ctx, const _hypo_test_t *tests)
+{
+  const _hypo_test_t *group, *test;
+  unsigned char *done;
+
+  /* Keep track of which tests have been run */
+  for (test = tests; test->name; test++)
+    ;
+  if (!(done = (unsigned char *)calloc(test - tests + 1, 1)))
+    abort(); /* Not much else we can do */
+
+  for (group = tests; group->name; group++) {
+    if (done[group - tests])
+      continue;
+    for (test = group; test->name; test++)
+      if (test->setup == group->setup)
+	done[test - tests] = 1;
+
+    if (_hypo_run_template(hypo_ctx, group, 0))
+      break;
+  }
+
+  free(done);
+}
+#endif /* _HYPO_HAVE_FORK */
+
+/* Run a case of a test in the current process, resetting the mocks
+ * it used.  Returns non-zero if the test timed out.
+ */
+static int
+_hypo_run_case(hypo_context_t *hypo_ctx, const _hypo_test_t *test,
+	       unsigned int i)
+{
+  /* Return here if the test times out */
+  if (_hypo_timeout_jumped())
+    return 1;
+
+  /* Set up the fixtures, run the test, and clean up */
+  _hypo_prof_attribute(test->name, test->cases ? (int)i : -1);
+  _hypo_timeout_start(test);
+  if (test->file_setup)
+    test->file_setup(hypo_ctx);
+  if (test->setup)
+    test->setup(hypo_ctx);
+  _hypo_alloc_begin();
+  _hypo_perf_start();
+  test->run(hypo_ctx);
+  _hypo_perf_stop();
+  if (test->teardown)
+    test->teardown(hypo_ctx);
+  _hypo_timeout_stop(test);
+  _hypo_mock_cleanup();
+  _hypo_clock_reset();
+  _hypo_io_reset();
+  _hypo_prof_attribute(0, -1);
+
+  return 0;
+}
+
+/* Run the tests in the current process, resetting the mocks used by
+ * each.  If fork_limited is non-zero, tests with their own timeout or
+ * resource limits are instead run in their own processes.
+ */
+static void
+_hypo_run_tests(hypo_context_t *hypo_ctx, const _hypo_test_t *tests,
+		int fork_limited)
+{
+  const _hypo_test_t *test;
+  unsigned int i, count;
+
+  for (test = tests; test->name; test++) {
+#ifdef _HYPO_HAVE_FORK
+    /* Enforce the limits of the test in a forked process */
+    if (fork_limited && _hypo_has_limits(test)) {
+      if (_hypo_run_template(hypo_ctx, test, 1))
+	return;
+      continue;
+    }
+#endif
+
+    for (i = 0; i < _hypo_ncases(test); i++) {
+      /* Save the test name */
+      count = _hypo_list_len(&hypo_ctx->failures);
+      _hypo_case_begin(hypo_ctx, test, i);
+
+      /* Let the user know what's being tested */
+      printf("%s::%s... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+      fflush(stdout);
+
+      /* Run the test, giving up on the rest if it times out */
+      if (_hypo_run_case(hypo_ctx, test, i)) {
+	_hypo_timeout_halt(hypo_ctx, test);
+	return;
+      }
+
+      /* Let the user know of the status of the test */
+      _hypo_status(hypo_ctx);
+
+      /* Check if we encountered a fatal error */
+      if (hypo_ctx->flags & _HYPO_FLAG_FATAL) {
+	_hypo_halted(hypo_ctx);
+	return;
+      }
+
+      _hypo_case_end(hypo_ctx, test, count);
+    }
+  }
+}
+
+/* The time each sample of a benchmark should take, in nanoseconds */
+#ifndef HYPO_BENCH_SAMPLE_NS
+# define HYPO_BENCH_SAMPLE_NS	10000000.0
+#endif
+
+/* The most iterations each sample of a benchmark may run.  A
+ * benchmark too fast to time, such as one the compiler optimized
+ * away, is run this many times.
+ */
+#ifndef HYPO_BENCH_MAX_ITERATIONS
+# define HYPO_BENCH_MAX_ITERATIONS	1000000000UL
+#endif
+
+/* The number of samples of each benchmark, if HYPO_BENCH does not
+ * give one
+ */
+#define _HYPO_BENCH_SAMPLES	20
+
+/* Test if a sample is a finite, non-negative time */
+#define _hypo_sample_valid(x)	((x) >= 0 && (x) <= DBL_MAX)
+
+/* Compare two samples, for qsort() */
+static int
+_hypo_sample_cmp(const void *a, const void *b)
+{
+  double x = *(const double *)a, y = *(const double *)b;
+
+  return x < y ? -1 : x > y;
+}
+
+/* Write a string to a JSON file, quoting it */
+static void
+_hypo_json_str(FILE *json, const char *str)
+{
+  fputc('"', json);
+  for (; *str; str++)
+    if (*str == '"' || *str == '\\')
+      fprintf(json, "\\%c", *str);
+    else if ((unsigned char)*str < ' ')
+      fprintf(json, "\\u%04x", *str);
+    else
+      fputc(*str, json);
+  fputc('"', json);
+}
+
+/* Run a benchmark.  The number of iterations is calibrated by
+ * doubling it until a run takes a significant fraction of the sample
+ * time, then scaling it to the sample time, between 1 and
+ * HYPO_BENCH_MAX_ITERATIONS; a warm-up run is made at the final
+ * number of iterations before the samples are taken.  Reports the
+ * minimum, median, and 99th percentile time per iteration, and, if
+ * json is not 0, writes the samples to it.  Samples which are not
+ * finite are reported as invalid, and are not written.
+ */
+static void
+_hypo_bench(hypo_context_t *hypo_ctx, const _hypo_bench_t *bench,
+	    unsigned int nsamples, FILE *json)
+{
+  double start, elapsed, scaled, *samples;
+  unsigned long iterations = 1;
+  unsigned int i, invalid = 0;
+
+  if (!(samples = (double *)malloc(sizeof(double) * nsamples)))
+    abort(); /* Not much else we can do */
+
+  /* Calibrate the number of iterations, bailing out on failure */
+  for (;;) {
+    start = _hypo_now();
+    bench->run(hypo_ctx, iterations);
+    elapsed = _hypo_now() - start;
+
+    if (hypo_ctx->flags & _HYPO_FLAG_FAIL)
+      goto done;
+    else if (elapsed >= HYPO_BENCH_SAMPLE_NS / 10 ||
+	     iterations >= HYPO_BENCH_MAX_ITERATIONS / 2)
+      break;
+
+    iterations <<= 1;
+  }
+
+  /* Scale the iterations to the sample time, clamping the result;
+   * an elapsed time of 0 means the run was too fast to time
+   */
+  if (elapsed < HYPO_BENCH_SAMPLE_NS) {
+    scaled = elapsed > 0 ? iterations * (HYPO_BENCH_SAMPLE_NS / elapsed) :
+      HYPO_BENCH_MAX_ITERATIONS;
+    if (!(scaled < HYPO_BENCH_MAX_ITERATIONS))
+      iterations = HYPO_BENCH_MAX_ITERATIONS;
+    else if (scaled > 1)
+      iterations = (unsigned long)scaled;
+  }
+
+  /* Warm up, then take the samples */
+  bench->run(hypo_ctx, iterations);
+  _hypo_perf_start();
+  for (i = 0; i < nsamples && !(hypo_ctx->flags & _HYPO_FLAG_FAIL); i++) {
+    start = _hypo_now();
+    bench->run(hypo_ctx, iterations);
+    samples[i] = (_hypo_now() - start) / iterations;
+    if (!_hypo_sample_valid(samples[i]))
+      invalid++;
+  }
+
+  /* Report the samples, unless a misbehaving timer spoiled them */
+  if (!(hypo_ctx->flags & _HYPO_FLAG_FAIL) && invalid)
+    printf("invalid: %u of %u samples of %lu iterations were not valid "
+	   "times\n", invalid, nsamples, iterations);
+  else if (!(hypo_ctx->flags & _HYPO_FLAG_FAIL)) {
+    _hypo_perf_stop();
+
+    /* Save the samples, in the order they were taken */
+    if (json) {
+      fprintf(json, "%s\n    ", ftell(json) > 0 ? "," : "{");
+      _hypo_json_str(json, bench->name);
+      fprintf(json, ": {\"iterations\": %lu, \"samples\": [", iterations);
+      for (i = 0; i < nsamples; i++)
+	fprintf(json, "%s%.3f", i ? ", " : "", samples[i]);
+      fprintf(json, "]}");
+    }
+
+    qsort(samples, nsamples, sizeof(double), _hypo_sample_cmp);
+    printf("min %.2f ns, median %.2f ns, p99 %.2f ns "
+	   "(%u samples of %lu iterations)", samples[0],
+	   (samples[(nsamples - 1) / 2] + samples[nsamples / 2]) / 2,
+	   samples[(99 * nsamples + 99) / 100 - 1], nsamples, iterations);
+    _hypo_perf_report(hypo_ctx, "bench", (double)nsamples * iterations);
+    printf("\n");
+  }
+
+ done:
+  if (hypo_ctx->flags & _HYPO_FLAG_FAIL)
+    _hypo_status(hypo_ctx);
+  free(samples);
+}
+
+/* Run the benchmarks in a table.  Each benchmark's fixtures are set
+ * up once, and mocks are quiet while the benchmark runs.  If the
+ * HYPO_BENCH_JSON environment variable names a file, the samples of
+ * each benchmark are written to it, keyed by the test file name and
+ * the benchmark name.
+ */
+static void
+_hypo_run_benches(hypo_context_t *hypo_ctx, const _hypo_bench_t *benches,
+		  unsigned int nsamples)
+{
+  const _hypo_bench_t *bench;
+  const char *json_fname = getenv("HYPO_BENCH_JSON");
+  FILE *json = 0, *body = 0;
+  int c;
+
+  /* The benchmarks are written to a temporary file first, since the
+   * document can't be completed until they have all been run
+   */
+  if (json_fname && *json_fname && !(body = tmpfile()))
+    perror("Unable to save benchmark results");
+
+  for (bench = benches; bench->name; bench++) {
+    hypo_ctx->cur_test = bench->name;
+
+    /* Let the user know what's being measured */
+    printf("%s::%s (bench)... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+    fflush(stdout);
+
+    /* Set up the fixtures, run the benchmark, and clean up */
+    _hypo_prof_attribute(bench->name, -1);
+    if (bench->setup)
+      bench->setup(hypo_ctx);
+    _hypo_mock_quiet = 1;
+    _hypo_bench(hypo_ctx, bench, nsamples, body);
+    _hypo_mock_quiet = 0;
+    if (bench->teardown)
+      bench->teardown(hypo_ctx);
+    _hypo_mock_cleanup();
+    _hypo_clock_reset();
+    _hypo_io_reset();
+    _hypo_prof_attribute(0, -1);
+
+    /* Check if we encountered a fatal error */
+    if (hypo_ctx->flags & _HYPO_FLAG_FATAL) {
+      _hypo_halted(hypo_ctx);
+      break;
+    }
+  }
+
+  /* Write out the results */
+  if (!body)
+    return;
+  else if (!(json = fopen(json_fname, "w"))) {
+    perror(json_fname);
+    fclose(body);
+    return;
+  }
+
+  fprintf(json, "{\"suites\": {\n  ");
+  _hypo_json_str(json, hypo_ctx->test_fname);
+  fprintf(json, ": ");
+  if (ftell(body) > 0) {
+    rewind(body);
+    while ((c = getc(body)) != EOF)
+      putc(c, json);
+    fprintf(json, "\n  }");
+  } else
+    fprintf(json, "{}");
+  fprintf(json, "\n}}\n");
+
+  fclose(body);
+  if (fclose(json))
+    perror(json_fname);
+}
+
+/* Run the tests in a table, then the benchmarks, and report any
+ * failures.  If the HYPO_FORK environment variable is set to a
+ * non-empty value other than "0", each test is run in its own
+ * process, forked from a process which has set up its fixtures;
+ * otherwise, the tests are run in the current process, except that,
+ * if it is not set, tests with their own timeout or resource limits
+ * are run in their own processes.
+ * The HYPO_TIMEOUT environment variable gives the timeout, in
+ * seconds, of tests which do not have their own, and the
+ * HYPO_PROFILE environment variable names a file to write a profile
+ * of the tests to.
+ * The benchmarks are only run if the HYPO_BENCH environment variable
+ * is set to a non-empty value other than "0"; if it is a number, it
+ * gives the number of samples of each benchmark.  Returns the exit
+ * code for the test program.
+ */
+_HYPO_API int
+_hypo_run(const char *test_fname, const _hypo_test_t *tests,
+	  const _hypo_bench_t *benches)
+{
+  hypo_context_t hypo_ctx = {0, 0, 0, _HYPO_LIST_INIT(_hypo_failure_t), 0};
+  _hypo_failure_t *failure;
+  int i, j, len;
+  const char *last_test = 0;
+  char star_buf[513], name_buf[513 - 4];
+  const char *bench = getenv("HYPO_BENCH");
+  int nsamples, fork_limited = 0;
+#ifdef _HYPO_HAVE_FORK
+  const char *mode = getenv("HYPO_FORK");
+#endif
+#ifdef _HYPO_HAVE_TIMEOUT
+  const char *timeout = getenv("HYPO_TIMEOUT");
+#endif
+
+  hypo_ctx.test_fname = test_fname;
+  _hypo_perf_init();
+  _hypo_prof_init(test_fname);
+#ifdef _HYPO_HAVE_TIMEOUT
+  if (timeout && *timeout)
+    _hypo_timeout_default = atof(timeout);
+#endif
+
+  /* Run the tests */
+#ifdef _HYPO_HAVE_FORK
+  fork_limited = !mode || !*mode;
+  if (!fork_limited && strcmp(mode, "0"))
+    _hypo_run_forked(&hypo_ctx, tests);
+  else
+#endif
+    _hypo_run_tests(&hypo_ctx, tests, fork_limited);
+
+  /* Run the benchmarks, if requested */
+  if (bench && *bench && strcmp(bench, "0") &&
+      !(hypo_ctx.flags & _HYPO_FLAG_FATAL)) {
+    nsamples = atoi(bench);
+    _hypo_run_benches(&hypo_ctx, benches,
+		      nsamples > 0 ? nsamples : _HYPO_BENCH_SAMPLES);
+  }
+
+  /* Tear down the file-scoped fixtures */
+  _hypo_fix_teardown_all(&hypo_ctx);
+  _hypo_prof_dump();
+
+  /* Emit the test failure details */
+  for (i = 0; i < _hypo_list_len(&hypo_ctx.failures); i++) {
+    failure = (_hypo_failure_t *)_hypo_list_ref(
+      &hypo_ctx.failures, i
+    );
+
+    /* Emit a detailed information header for test name changes */
+    if (last_test != failure->test) {
+      /* Construct the name string */
+      len = snprintf(name_buf, sizeof(name_buf), "%s::%s",
+		     failure->test_fname, failure->test);
+
+      /* Construct the star buffer */
+      for (j = 0; j < len + 4; j++)
+	star_buf[j] = '*';
+      star_buf[j] = '\0';
+
+      /* Emit the name header */
+      printf("\n%s\n* %s *\n%s\n\n", star_buf, name_buf, star_buf);
+
+      /* Update the last_test so we don't output this ad nauseum */
+      last_test = failure->test;
+    }
+
+    /* Now, report the failure */
+    printf("%s:%d: ", failure->file, failure->line);
+    if (failure->expr)
+      printf("\"%s\" -> %d%s%s\n", failure->expr, failure->value,
+	     failure->msg ? ": " : "", failure->msg ? failure->msg : "");
+    else if (failure->msg)
+      printf("%s\n", failure->msg);
+    else
+      printf("Unknown failure\n");
+  }
+
+  /* Return non-zero if there were any failures */
+  return _hypo_list_len(&hypo_ctx.failures) ? 1 : 0;
+}
@@ -0,0 +1,599 @@
+#line 17 "runtime.h.tmpl"
+/* This file is automatically generated by hypocrite.
+ *
+ * It contains the runtime shared by the test files generated by
+ * hypocrite; to change it, re-run hypocrite with --emit-runtime.
+ */
+
+#ifndef _HYPO_RUNTIME_H
+#define _HYPO_RUNTIME_H
+
+#line 50 "runtime.h.tmpl"
+/* Only the standard C headers are included here, since the runtime
+ * is included before the target; the system interfaces used by the
+ * runtime are included by its implementation
+ */
+#include <float.h>
+#include <stddef.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+/* Some of the system interfaces used by the runtime are hidden when
+ * compiling in strict ISO C mode, e.g., with -std=c99, unless a
+ * feature test macro asks for them
+ */
+#if !defined(_HYPO_HAVE_EXTENSIONS) && \
+  (!defined(__STRICT_ANSI__) || defined(__APPLE__) || \
+   defined(_GNU_SOURCE) || defined(_DEFAULT_SOURCE) || defined(_BSD_SOURCE))
+# define _HYPO_HAVE_EXTENSIONS 1
+#endif
+
+/* Tests may be run in forked processes on POSIX systems, with
+ * timeouts and resource limits if the extensions are available
+ */
+#if !defined(_HYPO_HAVE_FORK) && (defined(__unix__) || defined(__APPLE__))
+# define _HYPO_HAVE_FORK 1
+#endif
+#if !defined(_HYPO_HAVE_TIMEOUT) && defined(_HYPO_HAVE_FORK) && \
+  defined(_HYPO_HAVE_EXTENSIONS)
+# define _HYPO_HAVE_TIMEOUT 1
+#endif
+
+/* Performance counters may be collected on POSIX systems, using
+ * getrusage(), and, on Linux, perf_event_open()
+ */
+#if !defined(_HYPO_HAVE_RUSAGE) && (defined(__unix__) || defined(__APPLE__))
+# define _HYPO_HAVE_RUSAGE 1
+#endif
+#if !defined(_HYPO_HAVE_PERF) && defined(__linux__) && \
+  defined(_HYPO_HAVE_EXTENSIONS)
+# define _HYPO_HAVE_PERF 1
+#endif
+
+/* Tests may be profiled on Linux, where the program counter can be
+ * found in the context of a signal
+ */
+#if !defined(_HYPO_HAVE_PROF) && defined(__linux__) && \
+  defined(_HYPO_HAVE_EXTENSIONS) && \
+  (defined(__x86_64__) || defined(__i386__) || defined(__aarch64__))
+# define _HYPO_HAVE_PROF 1
+#endif
+
+#line 105 "runtime.h.tmpl"
+/* Tests may use a virtual clock where the time structures are
+ * available
+ */
+#if !defined(_HYPO_HAVE_CLOCK) && (defined(__unix__) || defined(__APPLE__)) && \
+  defined(_HYPO_HAVE_EXTENSIONS)
+# define _HYPO_HAVE_CLOCK 1
+#endif
+
+#ifdef _HYPO_HAVE_CLOCK
+# include <errno.h>
+# include <sys/types.h>
+
+struct timespec;
+struct timeval;
+#endif
+
+#line 124 "runtime.h.tmpl"
+/* The target's file descriptor I/O may be served from memory where
+ * the POSIX I/O functions are available
+ */
+#if !defined(_HYPO_HAVE_FAKEIO) && (defined(__unix__) || defined(__APPLE__))
+# define _HYPO_HAVE_FAKEIO 1
+#endif
+
+#ifdef _HYPO_HAVE_FAKEIO
+# include <errno.h>
+# include <sys/types.h>
+#endif
+
+#line 29 "runtime.h.tmpl"
+/* Linkage of the runtime functions.  When the runtime is included
+ * in a test file, the functions the file does not use must not
+ * provoke warnings.
+ */
+#if defined(__GNUC__)
+# define _HYPO_UNUSED __attribute__((unused))
+#else
+# define _HYPO_UNUSED
+#endif
+#define _HYPO_API extern
+
+#line 144 "runtime.h.tmpl"
+/* Structure for manipulating list-like data, such as lists of return
+ * values or of call arguments.
+ */
+typedef struct {
+  size_t size;
+  unsigned int count;
+  unsigned int capacity;
+  unsigned char *storage;  /* unsigned char for convenience */
+} _hypo_list_t;
+
+/* Static initializer for _hypo_list_t */
+#define _HYPO_LIST_INIT(type) {sizeof(type), 0, 0, 0}
+
+/* Obtain the length of a _hypo_list_t */
+#define _hypo_list_len(list) ((list)->count)
+
+/* Obtain the item at the given index */
+#define _hypo_list_ref(list, i)				\
+  ((void *)((list)->storage + (list)->size * (i)))
+
+/* Allocate an item in the list.  This may increase the capacity of
+ * the list (factor-of-two logic is used).  If the system is out of
+ * memory, this will abort().
+ */
+_HYPO_API void *_hypo_list_alloc(_hypo_list_t *list);
+
+/* Allocate n items at the end of the list, with a single
+ * reservation.  Returns the first of the new items.  If the system
+ * is out of memory, this will abort().
+ */
+_HYPO_API void *_hypo_list_extend(_hypo_list_t *list, unsigned int n);
+
+/* Clean up a list, releasing all memory */
+#define _hypo_list_cleanup(list)		\
+  do {						\
+    free((list)->storage);			\
+    (list)->count = 0;				\
+    (list)->capacity = 0;			\
+    (list)->storage = 0;			\
+  } while (0)
+
+/* A description of a test failure.  This will include the file and
+ * line number of the failure, as well as the expression that failed
+ * and what value it returned.  An optional "msg" is also present.
+ */
+typedef struct {
+  const char *test_fname;
+  const char *test;
+  const char *file;
+  unsigned int line;
+  const char *expr;
+  int value;
+  const char *msg;
+} _hypo_failure_t;
+
+/* The test context.  This includes test flags and a list of failures.
+ * Currently, the only defined flag is the FATAL flag, indicating that
+ * an assertion was fatal; this will stop all further testing.  The
+ * case index is the index of the case being run by a parameterized
+ * test.
+ */
+typedef struct {
+  unsigned int flags;
+  const char *test_fname;
+  const char *cur_test;
+  _hypo_list_t failures;
+  unsigned int case_index;
+} hypo_context_t;
+
+#define _HYPO_FLAG_FATAL	0x00000001
+#define _HYPO_FLAG_FAIL		0x00000002
+#define _HYPO_FLAG_TIMEOUT	0x00000004
+#define _HYPO_FLAG_LIMIT	0x00000008
+
+/* The core assertion function.  Stores failures in the test context,
+ * and returns non-zero if a fatal assertion has been triggered.
+ */
+_HYPO_API int _hypo_assert(hypo_context_t *hypo_ctx, unsigned int flags,
+			   const char *file, unsigned int line,
+			   const char *expr, int value, const char *msg);
+
+/* A description of a test.  The file setup function sets up the
+ * file-scoped fixtures of the test, if they have not already been set
+ * up; the setup and teardown functions set up and clean up the rest
+ * of its fixtures.  Any of them may be 0.  The number of cases is 0
+ * unless the test is parameterized, in which case the test is run
+ * once for each case.  The timeout, in seconds, the CPU limit, in
+ * seconds, and the memory limit, in bytes, are 0 if the test does
+ * not have them.  The file and line give the location of the test,
+ * for reporting failures which are not assertions.  A table of tests
+ * is terminated by an entry with a 0 name.
+ */
+typedef struct {
+  const char *name;
+  void (*file_setup)(hypo_context_t *);
+  void (*setup)(hypo_context_t *);
+  void (*run)(hypo_context_t *);
+  void (*teardown)(hypo_context_t *);
+  unsigned int cases;
+  double timeout;
+  unsigned int cpu;
+  unsigned long memory;
+  const char *file;
+  unsigned int line;
+} _hypo_test_t;
+
+/* Defer the teardown of a file-scoped fixture until all the tests
+ * have run.  Deferred teardowns are run in the reverse of the order
+ * in which they were deferred.
+ */
+_HYPO_API void _hypo_fix_defer(const char *name,
+			       void (*teardown)(hypo_context_t *));
+
+/* A description of a benchmark.  The run function runs the body of
+ * the benchmark the given number of times; the setup and teardown
+ * functions may be 0.  A table of benchmarks is terminated by an
+ * entry with a 0 name.
+ */
+typedef struct {
+  const char *name;
+  void (*setup)(hypo_context_t *);
+  void (*run)(hypo_context_t *, unsigned long);
+  void (*teardown)(hypo_context_t *);
+} _hypo_bench_t;
+
+/* Run the tests in a table, resetting the mocks used by each, then
+ * the benchmarks, if requested, and report any failures.  Returns
+ * the exit code for the test program.
+ */
+_HYPO_API int _hypo_run(const char *test_fname, const _hypo_test_t *tests,
+			const _hypo_bench_t *benches);
+
+/* The state of a mock.  The ret_idx element is the index of the
+ * next return value to return, or -1 if the mock is in "spy" mode;
+ * the flags are those passed to hypo_mock_setreturns_XXX(); the
+ * returns list contains the return values (its item size is 0
+ * for void mocks), and the calls list contains the call records.
+ * Each call record begins with the file and line of the call,
+ * followed by the arguments.  A mock used by a test is placed on a
+ * list of dirty mocks, linked through the next element, so that only
+ * those mocks need to be reset after the test.  The indices are the
+ * hash indices built over the calls by queries.  In the threaded
+ * mode, calls are first recorded in per-thread buffers, tbufs, and
+ * moved to the calls list when the calls are examined.
+ */
+typedef struct _hypo_mock_s {
+  int ret_idx;
+  unsigned int flags;
+  _hypo_list_t returns;
+  _hypo_list_t calls;
+  int dirty;
+  struct _hypo_mock_s *next;
+  struct _hypo_mock_index_s *indices;
+  struct _hypo_mock_tbuf_s *tbufs;
+} _hypo_mock_t;
+
+/* Static initializer for _hypo_mock_t; the mock starts in "spy"
+ * mode
+ */
+#define _HYPO_MOCK_INIT(returns, calls) {-1, 0, returns, calls, 0, 0, 0, 0}
+
+/* Flags for hypo_mock_setreturns_XXX().  The CYCLE flag causes the
+ * mock to start over at the first return value after returning the
+ * last one, rather than repeating the last one.  The BORROW flag
+ * causes the mock to use the caller's array of return values in
+ * place, rather than copying it.
+ */
+#define HYPO_MOCK_CYCLE		0x00000001
+#define HYPO_MOCK_BORROW	0x00000002
+
+/* The beginning of every call record */
+typedef struct {
+  const char *_file;
+  unsigned int _line;
+} _hypo_mock_call_t;
+
+/* A description of a mock argument, used for checking calls.  The
+ * expr element is the expression reported if the argument does not
+ * match; the size and offsets locate the argument in the call record
+ * and the expected call record.  Integral and pointer arguments are
+ * compared byte for byte; other arguments, such as floating point
+ * values, have a compare function, which is passed the expected
+ * call record and the call record and returns non-zero if the
+ * arguments are equal.  A table of arguments is terminated by an
+ * entry with a 0 expr.
+ */
+typedef struct {
+  const char *expr;
+  size_t size;
+  size_t call_offset;
+  size_t expect_offset;
+  int (*compare)(const void *expected, const void *actual);
+} _hypo_mock_arg_t;
+
+/* Record a call to a mock.  Returns the new call record, for the
+ * caller to store the arguments in.
+ */
+_HYPO_API void *_hypo_mock_call(_hypo_mock_t *mock, const char *file,
+				unsigned int line);
+
+/* Obtain the list of calls to a mock.  In the threaded mode, this
+ * merges the calls recorded by each thread, in the order they were
+ * made.
+ */
+_HYPO_API _hypo_list_t *_hypo_mock_calls(_hypo_mock_t *mock);
+
+/* Select the return value of a mock.  Returns non-zero if the mock
+ * is in "spy" mode; otherwise, copies the next return value, if
+ * any, into the value.
+ */
+_HYPO_API int _hypo_mock_return(_hypo_mock_t *mock, void *value);
+
+/* Save the value returned by the underlying function in "spy" mode */
+_HYPO_API void _hypo_mock_save(_hypo_mock_t *mock, const void *value);
+
+/* Add a return value for the mock, forcing it out of "spy" mode */
+_HYPO_API void _hypo_mock_addreturn(_hypo_mock_t *mock, const void *value);
+
+/* Replace the return values of the mock with an array of n values,
+ * forcing it out of "spy" mode
+ */
+_HYPO_API void _hypo_mock_setreturns(_hypo_mock_t *mock, const void *values,
+				     size_t n, unsigned int flags);
+
+/* Force the mock out of "spy" mode without adding a return value */
+_HYPO_API void _hypo_mock_nospy(_hypo_mock_t *mock);
+
+/* Check the calls to a mock against an array of expected calls,
+ * each of the given size, whose first element is the flags
+ * indicating which arguments to ignore.
+ */
+_HYPO_API void _hypo_mock_checkcalls(hypo_context_t *hypo_ctx,
+				     _hypo_mock_t *mock,
+				     const _hypo_mock_arg_t *args,
+				     const void *expected, size_t size,
+				     unsigned int count);
+
+/* Check the calls to a mock against an array of expected calls,
+ * without regard to the order in which the calls were made.
+ * Failures are attributed to the given file and line.
+ */
+_HYPO_API void _hypo_mock_checkunordered(hypo_context_t *hypo_ctx,
+					 const char *file, unsigned int line,
+					 _hypo_mock_t *mock,
+					 const _hypo_mock_arg_t *args,
+					 const void *expected, size_t size,
+					 unsigned int count);
+
+/* Find the first call to a mock, at or after the start index, that
+ * matches an expected call.  Returns the index of the call, or -1.
+ */
+_HYPO_API int _hypo_mock_findcall(_hypo_mock_t *mock,
+				  const _hypo_mock_arg_t *args,
+				  const void *expected, unsigned int start);
+
+/* Count the calls to a mock that match an expected call */
+_HYPO_API unsigned int _hypo_mock_countcalls(_hypo_mock_t *mock,
+					     const _hypo_mock_arg_t *args,
+					     const void *expected);
+
+/* The allocations made by the target during the current test, when
+ * allocations are tracked.  The live bytes and leaks are those
+ * allocated during the test and not yet released; the peak is the
+ * highest the live bytes have been.
+ */
+typedef struct {
+  unsigned long allocs;
+  unsigned long frees;
+  size_t bytes;
+  size_t live;
+  size_t peak;
+  unsigned long leaks;
+} hypo_alloc_stats_t;
+
+/* Replacements for the allocation functions, which track the
+ * allocations made by the target.  Memory allocated by these may be
+ * released by the standard functions, and vice versa.
+ */
+_HYPO_API void *_hypo_alloc_malloc(const char *file, int line, size_t size);
+_HYPO_API void *_hypo_alloc_calloc(const char *file, int line, size_t nmemb,
+				   size_t size);
+_HYPO_API void *_hypo_alloc_realloc(const char *file, int line, void *ptr,
+				    size_t size);
+_HYPO_API void _hypo_alloc_free(const char *file, int line, void *ptr);
+
+/* Enable the reporting of the allocations made by each test */
+_HYPO_API void _hypo_alloc_enable(void);
+
+/* Obtain the allocations made during the current test */
+_HYPO_API const hypo_alloc_stats_t *hypo_alloc_stats(void);
+
+/* Assert that the target has made no more than the given number of
+ * allocations, or allocated no more than the given number of bytes,
+ * during the current test
+ */
+#define hypo_assert_max_allocs(n)					\
+  hypo_assert_msg(hypo_alloc_stats()->allocs <= (n),			\
+		  "Too many allocations")
+#define hypo_assert_max_bytes(n)					\
+  hypo_assert_msg(hypo_alloc_stats()->bytes <= (n),			\
+		  "Too many bytes allocated")
+
+/* Assert that the peak live bytes allocated by the target during the
+ * current test have not exceeded the given number
+ */
+#define hypo_assert_max_peak(n)						\
+  hypo_assert_msg(hypo_alloc_stats()->peak <= (n),			\
+		  "Too many bytes live at once")
+
+/* Assert that all the memory allocated by the target during the
+ * current test has been released
+ */
+#define hypo_assert_no_leaks()						\
+  hypo_assert_msg(hypo_alloc_stats()->leaks == 0,			\
+		  "Allocations were not released")
+
+#line 463 "runtime.h.tmpl"
+#ifdef _HYPO_HAVE_CLOCK
+/* A callback to be run by the virtual clock */
+typedef void (*hypo_clock_callback_t)(void *arg);
+
+/* Advance the virtual clock by the given number of seconds and
+ * nanoseconds, running each timer which comes due, in order.
+ */
+_HYPO_API void hypo_clock_advance(time_t sec, long nsec);
+
+/* Advance the virtual clock to the next timer and run it.  Returns 0
+ * if there are no timers.
+ */
+_HYPO_API int hypo_clock_next(void);
+
+/* Arrange for a callback to be run once the virtual clock has
+ * advanced by the given number of seconds and nanoseconds.  Timers
+ * coming due at the same time are run in the order they were
+ * created.  Returns an identifier for the timer.
+ */
+_HYPO_API unsigned int hypo_clock_timer(time_t sec, long nsec,
+					hypo_clock_callback_t callback,
+					void *arg);
+
+/* Cancel a timer.  Returns 0 if the timer has already run or been
+ * cancelled.
+ */
+_HYPO_API int hypo_clock_cancel(unsigned int timer);
+
+/* Set the wall-clock time of the virtual clock, in seconds since the
+ * epoch
+ */
+_HYPO_API void hypo_clock_settime(time_t sec);
+
+/* Obtain the time the virtual clock has advanced during the current
+ * test, in seconds
+ */
+_HYPO_API double hypo_clock_elapsed(void);
+
+/* Fakes for the time functions, which use the virtual clock; these
+ * may be bound to mocks, e.g., "%mock unsigned int sleep(unsigned int
+ * seconds) = hypo_clock_sleep".  Sleeping advances the clock.
+ */
+_HYPO_API unsigned int hypo_clock_sleep(unsigned int seconds);
+_HYPO_API int hypo_clock_usleep(unsigned long usec);
+_HYPO_API int hypo_clock_nanosleep(const struct timespec *req,
+				   struct timespec *rem);
+_HYPO_API int hypo_clock_gettime(int clock_id, struct timespec *tp);
+_HYPO_API int hypo_clock_gettimeofday(struct timeval *tv, void *tz);
+_HYPO_API time_t hypo_clock_time(time_t *tloc);
+#endif
+
+#line 517 "runtime.h.tmpl"
+#ifdef _HYPO_HAVE_FAKEIO
+/* The first in-memory descriptor; lower descriptors are passed to
+ * the real functions
+ */
+#ifndef HYPO_IO_FD_BASE
+# define HYPO_IO_FD_BASE	1000
+#endif
+
+/* Apply a fault to all the in-memory descriptors */
+#define HYPO_IO_ANY	(-1)
+
+/* Create an in-memory file with the given contents, replacing any
+ * existing file of the same name.  The contents are copied, unless
+ * the HYPO_MOCK_BORROW flag is given; a borrowed buffer must remain
+ * valid until the end of the test, and is copied if the file is
+ * written.
+ */
+_HYPO_API void hypo_io_file(const char *path, const void *data, size_t len,
+			    unsigned int flags);
+
+/* Obtain the contents of an in-memory file, without copying them.
+ * Returns NULL if there is no such file.
+ */
+_HYPO_API const void *hypo_io_contents(const char *path, size_t *len);
+
+/* Limit each read or write of an in-memory descriptor, or of all of
+ * them if fd is HYPO_IO_ANY, to at most max bytes.  A max of 0
+ * removes the limit.
+ */
+_HYPO_API void hypo_io_limit(int fd, size_t max);
+
+/* Cause the next read or write of an in-memory descriptor, or of any
+ * of them if fd is HYPO_IO_ANY, to fail with the given error, e.g.,
+ * EINTR.  Several errors may be queued.
+ */
+_HYPO_API void hypo_io_error(int fd, int err);
+
+/* Fakes for the file descriptor functions, which serve in-memory
+ * files, pipes, and socket pairs
+ */
+_HYPO_API int hypo_io_open(const char *path, int flags, ...);
+_HYPO_API int hypo_io_close(int fd);
+_HYPO_API ssize_t hypo_io_read(int fd, void *buf, size_t count);
+_HYPO_API ssize_t hypo_io_write(int fd, const void *buf, size_t count);
+_HYPO_API off_t hypo_io_lseek(int fd, off_t offset, int whence);
+_HYPO_API int hypo_io_pipe(int fds[2]);
+_HYPO_API int hypo_io_socketpair(int domain, int type, int protocol,
+				 int fds[2]);
+#endif
+
+#line 573 "runtime.h.tmpl"
+/* Indicate a failure.  The required message must describe the
+ * failure.
+ */
+#define hypo_fail(msg)					\
+  do {							\
+    if (_hypo_assert(hypo_ctx, 0, __FILE__, __LINE__,	\
+		     0, 0, (msg)))			\
+      return;						\
+  } while (0)
+
+/* Indicate a fatal failure.  The required message must describe
+ * the failure.
+ */
+#define hypo_fail_fatal(msg)						\
+  do {									\
+    if (_hypo_assert(hypo_ctx, _HYPO_FLAG_FATAL, __FILE__, __LINE__,	\
+		     0, 0, (msg)))					\
+      return;								\
+  } while (0)
+
+/* Assert that an expression is true.  This is similar in concept to
+ * the standard C assert() macro, except that it does not call
+ * abort().
+ */
+#define hypo_assert(expr)				\
+  do {							\
+    if (_hypo_assert(hypo_ctx, 0, __FILE__, __LINE__,	\
+		     #expr, (expr), 0))			\
+      return;						\
+  } while (0)
+
+/* Assert that an expression is true.  This is similar in concept to
+ * the standard C assert() macro, except that it does not call
+ * abort().  This variant allows the specification of an explanatory
+ * message.
+ */
+#define hypo_assert_msg(expr, msg)			\
+  do {							\
+    if (_hypo_assert(hypo_ctx, 0, __FILE__, __LINE__,	\
+		     #expr, (expr), (msg)))		\
+      return;						\
+  } while (0)
+
+/* Assert that an expression is true.  This is similar in concept to
+ * the standard C assert() macro, except that it does not call
+ * abort().  This variant indicates a fatal assertion that will stop
+ * all remaining testing.
+ */
+#define hypo_assert_fatal(expr)						\
+  do {									\
+    if (_hypo_assert(hypo_ctx, _HYPO_FLAG_FATAL, __FILE__, __LINE__,	\
+		     #expr, (expr), 0))					\
+      return;								\
+  } while (0)
+
+/* Assert that an expression is true.  This is similar in concept to
+ * the standard C assert() macro, except that it does not call
+ * abort().  This variant indicates a fatal assertion that will stop
+ * all remaining testing, as well as allowing the specification of an
+ * explanatory message.
+ */
+#define hypo_assert_fatal_msg(expr, msg)				\
+  do {									\
+    if (_hypo_assert(hypo_ctx, _HYPO_FLAG_FATAL, __FILE__, __LINE__,	\
+		     #expr, (expr), (msg)))				\
+      return;								\
+  } while (0)
+
+/* Helper macro for picking the minimum of two values. */
+#define _hypo_min(a, b) ((a) < (b) ? (a) : (b))
+#line 43 "runtime.h.tmpl"
+
+#endif /* _HYPO_RUNTIME_H */
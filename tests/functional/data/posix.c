@@ -0,0 +1,6 @@
+/* A target defining a function named after a POSIX function */
+long
+dup(long value)
+{
+  return value * 2;
+}
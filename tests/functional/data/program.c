@@ -0,0 +1,36 @@
+/* A target for the tests which compile and run generated programs */
+#include <math.h>
+#include <stdlib.h>
+
+int
+add(int a, int b)
+{
+  return a + b;
+}
+
+double
+scale(double x, int exp)
+{
+  return ldexp(x, exp);
+}
+
+char *
+make_buf(size_t size)
+{
+  return (char *)malloc(size);
+}
+
+void
+release(char *buf)
+{
+  free(buf);
+}
+
+void
+spin(void)
+{
+  volatile unsigned long count = 0;
+
+  for (;;)
+    count++;
+}
@@ -0,0 +1,687 @@
+#line 17 "master.c.tmpl"
+/* This file is automatically generated from test.hypo.
+ *
+ * To change this file, edit the source file and re-run hypocrite.
+ */
+
+#line 27 "master.c.tmpl"
+#include "hypo_runtime.h"
+
+#line 35 "master.c.tmpl"
+/* Allow testing of targets containing main() functions. */
+#define main _hypo_main
+
+#line 6 "test.hypo"
+#include <stdlib.h>
+
+typedef struct test_struct {
+  unsigned int ts_value;
+} test_struct;
+
+static const size_t alloc_sizes[] = {1, sizeof(struct test_struct), 4096};
+#line 23 "shared.c"
+#define ANYARG_FREE_PTR 0x00000001
+#line 81 "mock-void.c.tmpl"
+
+/* Represent calls that we expect to be made; the _any_flags element
+ * can be used to indicate that we don't care about the value of a
+ * specific argument.
+ */
+typedef struct {
+  unsigned long _any_flags;
+#line 33 "shared.c"
+void * ptr;
+#line 89 "mock-void.c.tmpl"
+} hypo_mock_expectcalls_free;
+
+#line 94 "mock-void.c.tmpl"
+/* Represent actual calls to the mock.  The file and line from which
+ * the call was made are recorded in the _file and _line elements.
+ */
+typedef struct {
+  const char *_file;
+  unsigned int _line;
+#line 45 "shared.c"
+void * ptr;
+#line 101 "mock-void.c.tmpl"
+} hypo_mock_actualcalls_free;
+
+/* Represent the state of the mock.  Keeps track of what the mock
+ * should return, and what arguments it's been called with.
+ */
+static _hypo_mock_t _hypo_mock_descriptor_free = _HYPO_MOCK_INIT(
+  _HYPO_LIST_INIT(char), /* no return values are stored */
+  _HYPO_LIST_INIT(hypo_mock_actualcalls_free)
+);
+
+/* Implementation of the mock itself.  This is called by the mock
+ * macro, and either calls the underlying function or returns the
+ * configured return values.  Stores the call location and the
+ * arguments the mock was called with; the rest of the work is done
+ * by the runtime.
+ */
+static _HYPO_UNUSED void
+_hypo_mock_free(const char *_file, unsigned int _line, void * ptr)
+{
+  hypo_mock_actualcalls_free *_call_storage;
+
+  /* Store the call details */
+  _call_storage = (hypo_mock_actualcalls_free *)_hypo_mock_call(
+    &_hypo_mock_descriptor_free, _file, _line
+  );
+#line 73 "shared.c"
+_call_storage->ptr = ptr;
+#line 127 "mock-void.c.tmpl"
+
+  /* If in spy mode, call the underlying function or its fake */
+  if (_hypo_mock_return(&_hypo_mock_descriptor_free, 0))
+    free(ptr);
+}
+
+#line 136 "mock-void.c.tmpl"
+/* Turn off spy mode for the mock. */
+static _HYPO_UNUSED void
+hypo_mock_nospy_free(void)
+{
+  _hypo_mock_nospy(&_hypo_mock_descriptor_free);
+}
+
+#line 90 "shared.c"
+
+#line 147 "mock-void.c.tmpl"
+/* Describe the arguments of the mock, for checking calls */
+static const _hypo_mock_arg_t _hypo_mock_args_free[] = {
+#line 95 "shared.c"
+{"expected[i].ptr == actual->ptr",
+   sizeof(((hypo_mock_actualcalls_free *)0)->ptr),
+   offsetof(hypo_mock_actualcalls_free, ptr),
+   offsetof(hypo_mock_expectcalls_free, ptr),
+   0},
+#line 150 "mock-void.c.tmpl"
+  {0, 0, 0, 0, 0}
+};
+
+#line 156 "mock-void.c.tmpl"
+/* Check the calls to the mock.  This walks through each of the
+ * expected calls, verifying that it matches the corresponding actual
+ * call to the mock.
+ */
+static _HYPO_UNUSED void
+_hypo_mock_checkcalls_free(
+    hypo_context_t *hypo_ctx,
+    hypo_mock_expectcalls_free *expected,
+    unsigned int count
+)
+{
+  _hypo_mock_checkcalls(hypo_ctx, &_hypo_mock_descriptor_free,
+			_hypo_mock_args_free, expected,
+			sizeof(*expected), count);
+}
+
+/* The macro.  This is used to ensure that the hypocrite context is
+ * passed to the _hypo_mock_checkcalls_free function.
+ */
+#define hypo_mock_checkcalls_free(expected, count)			\
+  _hypo_mock_checkcalls_free(hypo_ctx, (expected), (count))
+
+#line 181 "mock-void.c.tmpl"
+/* Check the calls to the mock, without regard to the order in which
+ * they were made.  The expected calls are matched with the actual
+ * calls so that as many as possible are matched.
+ */
+static _HYPO_UNUSED void
+_hypo_mock_checkunordered_free(
+    hypo_context_t *hypo_ctx,
+    const char *file,
+    unsigned int line,
+    hypo_mock_expectcalls_free *expected,
+    unsigned int count
+)
+{
+  _hypo_mock_checkunordered(hypo_ctx, file, line,
+			    &_hypo_mock_descriptor_free,
+			    _hypo_mock_args_free, expected,
+			    sizeof(*expected), count);
+}
+
+/* The macro.  This is used to ensure that the hypocrite context and
+ * the location of the check are passed to the
+ * _hypo_mock_checkunordered_free function.
+ */
+#define hypo_mock_checkunordered_free(expected, count)		\
+  _hypo_mock_checkunordered_free(hypo_ctx, __FILE__, __LINE__,	\
+				     (expected), (count))
+
+#line 211 "mock-void.c.tmpl"
+/* Find the first call to the mock, at or after the start index, that
+ * matches the expected call.  Returns the index of the call, or -1
+ * if there is none.
+ */
+static _HYPO_UNUSED int
+hypo_mock_findcall_free(
+    const hypo_mock_expectcalls_free *expected,
+    unsigned int start
+)
+{
+  return _hypo_mock_findcall(&_hypo_mock_descriptor_free,
+			     _hypo_mock_args_free, expected, start);
+}
+
+#line 228 "mock-void.c.tmpl"
+/* Count the calls to the mock that match the expected call */
+static _HYPO_UNUSED unsigned int
+hypo_mock_countcalls_free(const hypo_mock_expectcalls_free *expected)
+{
+  return _hypo_mock_countcalls(&_hypo_mock_descriptor_free,
+			       _hypo_mock_args_free, expected);
+}
+
+#line 180 "shared.c"
+#define ANYARG_MALLOC_SIZE 0x00000001
+#line 81 "mock.c.tmpl"
+
+/* Represent calls that we expect to be made; the _any_flags element
+ * can be used to indicate that we don't care about the value of a
+ * specific argument.
+ */
+typedef struct {
+  unsigned long _any_flags;
+#line 190 "shared.c"
+size_t size;
+#line 89 "mock.c.tmpl"
+} hypo_mock_expectcalls_malloc;
+
+#line 94 "mock.c.tmpl"
+/* Represent actual calls to the mock.  The file and line from which
+ * the call was made are recorded in the _file and _line elements.
+ */
+typedef struct {
+  const char *_file;
+  unsigned int _line;
+#line 202 "shared.c"
+size_t size;
+#line 101 "mock.c.tmpl"
+} hypo_mock_actualcalls_malloc;
+
+/* Represent the state of the mock.  Keeps track of what the mock
+ * should return, and what arguments it's been called with.
+ */
+static _hypo_mock_t _hypo_mock_descriptor_malloc = _HYPO_MOCK_INIT(
+  _HYPO_LIST_INIT(void *),
+  _HYPO_LIST_INIT(hypo_mock_actualcalls_malloc)
+);
+
+/* Implementation of the mock itself.  This is called by the mock
+ * macro, and either calls the underlying function or returns the
+ * configured return values.  Stores the call location and the
+ * arguments the mock was called with; the rest of the work is done
+ * by the runtime.
+ */
+static _HYPO_UNUSED void *
+_hypo_mock_malloc(const char *_file, unsigned int _line, size_t size)
+{
+  void * _return_value;
+  hypo_mock_actualcalls_malloc *_call_storage;
+
+  /* There may be no return value configured */
+  memset(&_return_value, 0, sizeof(_return_value));
+
+  /* Store the call details */
+  _call_storage = (hypo_mock_actualcalls_malloc *)_hypo_mock_call(
+    &_hypo_mock_descriptor_malloc, _file, _line
+  );
+#line 234 "shared.c"
+_call_storage->size = size;
+#line 131 "mock.c.tmpl"
+
+  /* If in spy mode, call the underlying function or its fake */
+  if (_hypo_mock_return(&_hypo_mock_descriptor_malloc, &_return_value)) {
+    _return_value = malloc(size);
+    _hypo_mock_save(&_hypo_mock_descriptor_malloc, &_return_value);
+  }
+
+  return _return_value;
+}
+
+#line 144 "mock.c.tmpl"
+/* Add a return value for the mock to return.  The first time this is
+ * called, the mock is forced out of "spy" mode.
+ */
+static _HYPO_UNUSED void
+hypo_mock_addreturn_malloc(void * return_value)
+{
+  _hypo_mock_addreturn(&_hypo_mock_descriptor_malloc, &return_value);
+}
+
+#line 156 "mock.c.tmpl"
+/* Replace the return values of the mock with an array of n values.
+ * The flags may include HYPO_MOCK_CYCLE, to start over at the first
+ * value after returning the last, and HYPO_MOCK_BORROW, to use the
+ * array in place rather than copying it.  The mock is forced out of
+ * "spy" mode.
+ */
+static _HYPO_UNUSED void
+hypo_mock_setreturns_malloc(
+    void * const *values,
+    size_t n,
+    unsigned int flags
+)
+{
+  _hypo_mock_setreturns(&_hypo_mock_descriptor_malloc, values, n, flags);
+}
+
+#line 274 "shared.c"
+
+#line 176 "mock.c.tmpl"
+/* Describe the arguments of the mock, for checking calls */
+static const _hypo_mock_arg_t _hypo_mock_args_malloc[] = {
+#line 279 "shared.c"
+{"expected[i].size == actual->size",
+   sizeof(((hypo_mock_actualcalls_malloc *)0)->size),
+   offsetof(hypo_mock_actualcalls_malloc, size),
+   offsetof(hypo_mock_expectcalls_malloc, size),
+   0},
+#line 179 "mock.c.tmpl"
+  {0, 0, 0, 0, 0}
+};
+
+#line 185 "mock.c.tmpl"
+/* Check the calls to the mock.  This walks through each of the
+ * expected calls, verifying that it matches the corresponding actual
+ * call to the mock.
+ */
+static _HYPO_UNUSED void
+_hypo_mock_checkcalls_malloc(
+    hypo_context_t *hypo_ctx,
+    hypo_mock_expectcalls_malloc *expected,
+    unsigned int count
+)
+{
+  _hypo_mock_checkcalls(hypo_ctx, &_hypo_mock_descriptor_malloc,
+			_hypo_mock_args_malloc, expected,
+			sizeof(*expected), count);
+}
+
+/* The macro.  This is used to ensure that the hypocrite context is
+ * passed to the _hypo_mock_checkcalls_malloc function.
+ */
+#define hypo_mock_checkcalls_malloc(expected, count)			\
+  _hypo_mock_checkcalls_malloc(hypo_ctx, (expected), (count))
+
+#line 268 "mock.c.tmpl"
+/* Retrieve the number of calls that have been made to the mock. */
+#define hypo_mock_callcount_malloc()				\
+  _hypo_list_len(_hypo_mock_calls(&_hypo_mock_descriptor_malloc))
+
+#line 283 "mock-void.c.tmpl"
+#undef free
+#define free(ptr)				\
+  _hypo_mock_free(__FILE__, __LINE__, (ptr))
+#line 321 "mock.c.tmpl"
+#undef malloc
+#define malloc(size)				\
+  _hypo_mock_malloc(__FILE__, __LINE__, (size))
+#line 41 "master.c.tmpl"
+#include "to_test.c"
+#line 289 "mock-void.c.tmpl"
+#undef free
+#line 327 "mock.c.tmpl"
+#undef malloc
+#line 21 "fixture.c.tmpl"
+/* The value of the allocate fixture for the running test */
+static test_struct * _hypo_fix_value_allocate;
+
+#line 27 "fixture.c.tmpl"
+static test_struct *
+hypo_fix_setup_allocate(hypo_context_t *hypo_ctx)
+{
+#line 19 "test.hypo"
+  return (test_struct *)malloc(sizeof(struct test_struct));
+#line 31 "fixture.c.tmpl"
+}
+#line 21 "fixture.c.tmpl"
+/* The value of the counter fixture for the running test */
+static unsigned int * _hypo_fix_value_counter;
+
+#line 27 "fixture.c.tmpl"
+static unsigned int *
+hypo_fix_setup_counter(hypo_context_t *hypo_ctx)
+{
+#line 102 "test.hypo"
+  static unsigned int count = 0;
+
+  return &count;
+#line 31 "fixture.c.tmpl"
+}
+#line 39 "fixture.c.tmpl"
+static void
+hypo_fix_teardown_allocate(hypo_context_t *hypo_ctx, test_struct * allocate)
+{
+#line 21 "test.hypo"
+  free(allocate);
+#line 43 "fixture.c.tmpl"
+}
+#line 39 "fixture.c.tmpl"
+static void
+hypo_fix_teardown_counter(hypo_context_t *hypo_ctx, unsigned int * counter)
+{
+#line 106 "test.hypo"
+  *counter = 0;
+#line 43 "fixture.c.tmpl"
+}
+#line 56 "fixture.c.tmpl"
+
+/* Tear down the counter fixture once all the tests have run */
+static void
+_hypo_fix_cleanup_counter(hypo_context_t *hypo_ctx)
+{
+  hypo_fix_teardown_counter(hypo_ctx, _hypo_fix_value_counter);
+}
+#line 66 "fixture.c.tmpl"
+
+/* Whether the counter fixture has been set up */
+static int _hypo_fix_active_counter = 0;
+
+/* Set up the counter fixture the first time a test uses it */
+static void
+_hypo_fix_use_counter(hypo_context_t *hypo_ctx)
+{
+  if (_hypo_fix_active_counter)
+    return;
+
+  _hypo_fix_active_counter = 1;
+  _hypo_fix_value_counter = hypo_fix_setup_counter(hypo_ctx);
+#line 82 "fixture.c.tmpl"
+  _hypo_fix_defer("counter", _hypo_fix_cleanup_counter);
+#line 86 "fixture.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_allocate(hypo_context_t *hypo_ctx)
+{
+#line 25 "test.hypo"
+  hypo_mock_expectcalls_malloc expected[] = {
+    {0, sizeof(test_struct)}
+  };
+  struct test_struct test_data;
+  struct test_struct *result;
+
+  hypo_mock_addreturn_malloc(&test_data);
+
+  result = alloc();
+
+  hypo_assert(result == &test_data);
+  hypo_mock_checkcalls_malloc(expected, 1);
+#line 32 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_allocate_cycle(hypo_context_t *hypo_ctx)
+{
+#line 40 "test.hypo"
+  struct test_struct test_data[2];
+  struct test_struct *returns[] = {&test_data[0], &test_data[1]};
+
+  hypo_mock_setreturns_malloc((void **)returns, 2,
+                              HYPO_MOCK_CYCLE | HYPO_MOCK_BORROW);
+
+  hypo_assert(alloc() == &test_data[0]);
+  hypo_assert(alloc() == &test_data[1]);
+  hypo_assert(alloc() == &test_data[0]);
+  hypo_assert(hypo_mock_callcount_malloc() == 3);
+#line 32 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_allocate_failure(hypo_context_t *hypo_ctx)
+{
+#line 53 "test.hypo"
+  hypo_mock_expectcalls_malloc expected[] = {
+    {0, sizeof(test_struct)}
+  };
+  struct test_struct *result;
+
+  hypo_mock_addreturn_malloc(0);
+
+  result = alloc();
+
+  hypo_assert(result == 0);
+  hypo_mock_checkcalls_malloc(expected, 1);
+#line 32 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_deallocate(hypo_context_t *hypo_ctx, test_struct * allocate)
+{
+#line 67 "test.hypo"
+  hypo_mock_expectcalls_free expected[] = {
+    {0, allocate}
+  };
+
+  hypo_mock_nospy_free();
+
+  dealloc(allocate);
+
+  hypo_mock_checkcalls_free(expected, 1);
+#line 32 "test.c.tmpl"
+}
+#line 69 "test.c.tmpl"
+
+/* Set up the fixtures for deallocate, and for any later tests using the
+ * same fixtures
+ */
+static void
+_hypo_setup_deallocate(hypo_context_t *hypo_ctx)
+{
+#line 477 "shared.c"
+  _hypo_fix_value_allocate = hypo_fix_setup_allocate(hypo_ctx);
+#line 77 "test.c.tmpl"
+}
+#line 87 "test.c.tmpl"
+
+/* Run deallocate, injecting its fixtures */
+static void
+_hypo_run_deallocate(hypo_context_t *hypo_ctx)
+{
+  hypo_test_deallocate(hypo_ctx, _hypo_fix_value_allocate);
+}
+#line 105 "test.c.tmpl"
+
+/* Clean up the fixtures for deallocate, and for any later tests using
+ * the same fixtures
+ */
+static void
+_hypo_teardown_deallocate(hypo_context_t *hypo_ctx)
+{
+#line 497 "shared.c"
+  hypo_fix_teardown_allocate(hypo_ctx, _hypo_fix_value_allocate);
+#line 113 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_deallocate_many(hypo_context_t *hypo_ctx)
+{
+#line 79 "test.hypo"
+  struct test_struct test_data[3];
+  hypo_mock_expectcalls_free expected[] = {
+    {0, &test_data[2]},
+    {0, &test_data[1]},
+    {0, &test_data[0]},
+    {0, &test_data[1]}
+  };
+  hypo_mock_expectcalls_free query = {0, &test_data[1]};
+
+  hypo_mock_nospy_free();
+
+  dealloc(&test_data[0]);
+  dealloc(&test_data[1]);
+  dealloc(&test_data[2]);
+  dealloc(&test_data[1]);
+
+  hypo_assert(hypo_mock_findcall_free(&query, 0) == 1);
+  hypo_assert(hypo_mock_findcall_free(&query, 2) == 3);
+  hypo_assert(hypo_mock_countcalls_free(&query) == 2);
+  hypo_mock_checkunordered_free(expected, 4);
+#line 32 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_count_first(hypo_context_t *hypo_ctx, unsigned int * counter)
+{
+#line 110 "test.hypo"
+  hypo_assert((*counter)++ == 0);
+#line 32 "test.c.tmpl"
+}
+#line 48 "test.c.tmpl"
+
+/* Set up the file-scoped fixtures for count_first, and for any later
+ * tests using the same fixtures
+ */
+static void
+_hypo_file_setup_count_first(hypo_context_t *hypo_ctx)
+{
+#line 544 "shared.c"
+  _hypo_fix_use_counter(hypo_ctx);
+#line 56 "test.c.tmpl"
+}
+#line 87 "test.c.tmpl"
+
+/* Run count_first, injecting its fixtures */
+static void
+_hypo_run_count_first(hypo_context_t *hypo_ctx)
+{
+  hypo_test_count_first(hypo_ctx, _hypo_fix_value_counter);
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_count_second(hypo_context_t *hypo_ctx, unsigned int * counter)
+{
+#line 114 "test.hypo"
+  hypo_assert((*counter)++ == 1);
+#line 32 "test.c.tmpl"
+}
+#line 87 "test.c.tmpl"
+
+/* Run count_second, injecting its fixtures */
+static void
+_hypo_run_count_second(hypo_context_t *hypo_ctx)
+{
+  hypo_test_count_second(hypo_ctx, _hypo_fix_value_counter);
+}
+#line 23 "test.c.tmpl"
+#define hypo_case (alloc_sizes[hypo_ctx->case_index])
+#define hypo_case_index (hypo_ctx->case_index)
+#line 28 "test.c.tmpl"
+static void
+hypo_test_allocate_size(hypo_context_t *hypo_ctx, unsigned int * counter)
+{
+#line 118 "test.hypo"
+  hypo_mock_expectcalls_malloc expected[] = {
+    {0, hypo_case}
+  };
+
+  (*counter)++;
+  hypo_mock_addreturn_malloc(0);
+
+  hypo_assert(alloc_size(hypo_case) == 0);
+  hypo_mock_checkcalls_malloc(expected, 1);
+#line 32 "test.c.tmpl"
+}
+#line 36 "test.c.tmpl"
+#undef hypo_case
+#undef hypo_case_index
+#line 87 "test.c.tmpl"
+
+/* Run allocate_size, injecting its fixtures */
+static void
+_hypo_run_allocate_size(hypo_context_t *hypo_ctx)
+{
+  hypo_test_allocate_size(hypo_ctx, _hypo_fix_value_counter);
+}
+#line 23 "bench.c.tmpl"
+static void
+hypo_bench_allocate_loop(hypo_context_t *hypo_ctx, unsigned long hypo_iterations, test_struct * allocate)
+{
+  unsigned long hypo_iteration;
+
+  for (hypo_iteration = 0; hypo_iteration < hypo_iterations;
+       hypo_iteration++) {
+#line 130 "test.hypo"
+  hypo_mock_setreturns_malloc((void **)&allocate, 1,
+                              HYPO_MOCK_CYCLE | HYPO_MOCK_BORROW);
+
+  hypo_assert(alloc() == allocate);
+#line 31 "bench.c.tmpl"
+  }
+}
+#line 46 "bench.c.tmpl"
+
+/* Set up the fixtures for allocate_loop */
+static void
+_hypo_bench_setup_allocate_loop(hypo_context_t *hypo_ctx)
+{
+#line 624 "shared.c"
+  _hypo_fix_value_allocate = hypo_fix_setup_allocate(hypo_ctx);
+#line 52 "bench.c.tmpl"
+}
+#line 62 "bench.c.tmpl"
+
+/* Run allocate_loop for the given number of iterations, injecting its
+ * fixtures
+ */
+static void
+_hypo_bench_run_allocate_loop(hypo_context_t *hypo_ctx, unsigned long iterations)
+{
+  hypo_bench_allocate_loop(hypo_ctx, iterations, _hypo_fix_value_allocate);
+}
+#line 82 "bench.c.tmpl"
+
+/* Clean up the fixtures for allocate_loop */
+static void
+_hypo_bench_teardown_allocate_loop(hypo_context_t *hypo_ctx)
+{
+#line 644 "shared.c"
+  hypo_fix_teardown_allocate(hypo_ctx, _hypo_fix_value_allocate);
+#line 88 "bench.c.tmpl"
+}
+#line 127 "master.c.tmpl"
+/* The tests to run, in order */
+static const _hypo_test_t _hypo_tests[] = {
+#line 145 "test.c.tmpl"
+  {"allocate", 0, 0, hypo_test_allocate, 0, 0, 0, 0, 0UL, "test.hypo", 24},
+#line 145 "test.c.tmpl"
+  {"allocate_cycle", 0, 0, hypo_test_allocate_cycle, 0, 0, 0, 0, 0UL, "test.hypo", 39},
+#line 145 "test.c.tmpl"
+  {"allocate_failure", 0, 0, hypo_test_allocate_failure, 0, 0, 0, 0, 0UL, "test.hypo", 52},
+#line 145 "test.c.tmpl"
+  {"deallocate", 0, _hypo_setup_deallocate, _hypo_run_deallocate, _hypo_teardown_deallocate, 0, 0, 0, 0UL, "test.hypo", 66},
+#line 145 "test.c.tmpl"
+  {"deallocate_many", 0, 0, hypo_test_deallocate_many, 0, 0, 5.0, 0, 0UL, "test.hypo", 78},
+#line 145 "test.c.tmpl"
+  {"count_first", _hypo_file_setup_count_first, 0, _hypo_run_count_first, 0, 0, 0, 0, 0UL, "test.hypo", 109},
+#line 145 "test.c.tmpl"
+  {"count_second", _hypo_file_setup_count_first, 0, _hypo_run_count_second, 0, 0, 0, 0, 0UL, "test.hypo", 113},
+#line 145 "test.c.tmpl"
+  {"allocate_size", _hypo_file_setup_count_first, 0, _hypo_run_allocate_size, 0, sizeof(alloc_sizes) / sizeof(alloc_sizes[0]), 0, 0, 0UL, "test.hypo", 117},
+#line 134 "master.c.tmpl"
+  {0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0}
+};
+
+/* The benchmarks to run, in order */
+static const _hypo_bench_t _hypo_benches[] = {
+#line 100 "bench.c.tmpl"
+  {"allocate_loop", _hypo_bench_setup_allocate_loop, _hypo_bench_run_allocate_loop, _hypo_bench_teardown_allocate_loop},
+#line 144 "master.c.tmpl"
+  {0, 0, 0, 0}
+};
+
+/* The target's main() has been renamed; define the real one */
+#undef main
+
+#line 153 "master.c.tmpl"
+int
+(main)(int argc, char **argv)
+{
+#line 163 "master.c.tmpl"
+  return _hypo_run("shared", _hypo_tests, _hypo_benches);
+}
@@ -4,11 +4,72 @@
  * To change this file, edit the source file and re-run hypocrite.
  */
 
-#line 27 "master.c.tmpl"
+#line 50 "runtime.h.tmpl"
+/* Only the standard C headers are included here, since the runtime
+ * is included before the target; the system interfaces used by the
+ * runtime are included by its implementation
+ */
+#include <float.h>
+#include <stddef.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <time.h>
+
+/* Some of the system interfaces used by the runtime are hidden when
+ * compiling in strict ISO C mode, e.g., with -std=c99, unless a
+ * feature test macro asks for them
+ */
+#if !defined(_HYPO_HAVE_EXTENSIONS) && \
+  (!defined(__STRICT_ANSI__) || defined(__APPLE__) || \
+   defined(_GNU_SOURCE) || defined(_DEFAULT_SOURCE) || defined(_BSD_SOURCE))
+# define _HYPO_HAVE_EXTENSIONS 1
+#endif
+
+/* Tests may be run in forked processes on POSIX systems, with
+ * timeouts and resource limits if the extensions are available
+ */
+#if !defined(_HYPO_HAVE_FORK) && (defined(__unix__) || defined(__APPLE__))
+# define _HYPO_HAVE_FORK 1
+#endif
+#if !defined(_HYPO_HAVE_TIMEOUT) && defined(_HYPO_HAVE_FORK) && \
+  defined(_HYPO_HAVE_EXTENSIONS)
+# define _HYPO_HAVE_TIMEOUT 1
+#endif
+
+/* Performance counters may be collected on POSIX systems, using
+ * getrusage(), and, on Linux, perf_event_open()
+ */
+#if !defined(_HYPO_HAVE_RUSAGE) && (defined(__unix__) || defined(__APPLE__))
+# define _HYPO_HAVE_RUSAGE 1
+#endif
+#if !defined(_HYPO_HAVE_PERF) && defined(__linux__) && \
+  defined(_HYPO_HAVE_EXTENSIONS)
+# define _HYPO_HAVE_PERF 1
+#endif
+
+/* Tests may be profiled on Linux, where the program counter can be
+ * found in the context of a signal
+ */
+#if !defined(_HYPO_HAVE_PROF) && defined(__linux__) && \
+  defined(_HYPO_HAVE_EXTENSIONS) && \
+  (defined(__x86_64__) || defined(__i386__) || defined(__aarch64__))
+# define _HYPO_HAVE_PROF 1
+#endif
+
+#line 29 "runtime.h.tmpl"
+/* Linkage of the runtime functions.  When the runtime is included
+ * in a test file, the functions the file does not use must not
+ * provoke warnings.
+ */
+#if defined(__GNUC__)
+# define _HYPO_UNUSED __attribute__((unused))
+#else
+# define _HYPO_UNUSED
+#endif
+#define _HYPO_API static _HYPO_UNUSED
 
+#line 144 "runtime.h.tmpl"
 /* Structure for manipulating list-like data, such as lists of return
  * values or of call arguments.
  */
@@ -33,24 +94,13 @@ typedef struct {
  * the list (factor-of-two logic is used).  If the system is out of
  * memory, this will abort().
  */
-static void *
-_hypo_list_alloc(_hypo_list_t *list)
-{
-  if (list->count + 1 >= list->capacity) {
-    unsigned char *new;
-    unsigned int new_capacity = list->capacity << 1;
-
-    new = (unsigned char *)realloc(list->storage, list->size * new_capacity);
-    if (!new) /* Not much else we can do */
-      abort();
-
-    /* realloc() can move the storage */
-    list->storage = new;
-    list->capacity = new_capacity;
-  }
+_HYPO_API void *_hypo_list_alloc(_hypo_list_t *list);
 
-  return _hypo_list_ref(list, list->count++);
-}
+/* Allocate n items at the end of the list, with a single
+ * reservation.  Returns the first of the new items.  If the system
+ * is out of memory, this will abort().
+ */
+_HYPO_API void *_hypo_list_extend(_hypo_list_t *list, unsigned int n);
 
 /* Clean up a list, releasing all memory */
 #define _hypo_list_cleanup(list)		\
@@ -77,59 +127,266 @@ typedef struct {
 
 /* The test context.  This includes test flags and a list of failures.
  * Currently, the only defined flag is the FATAL flag, indicating that
- * an assertion was fatal; this will stop all further testing.
+ * an assertion was fatal; this will stop all further testing.  The
+ * case index is the index of the case being run by a parameterized
+ * test.
  */
 typedef struct {
   unsigned int flags;
   const char *test_fname;
   const char *cur_test;
   _hypo_list_t failures;
+  unsigned int case_index;
 } hypo_context_t;
 
 #define _HYPO_FLAG_FATAL	0x00000001
 #define _HYPO_FLAG_FAIL		0x00000002
+#define _HYPO_FLAG_TIMEOUT	0x00000004
+#define _HYPO_FLAG_LIMIT	0x00000008
 
-/* The core assertion function.  Called with the location of the
- * assertion macro and all the interesting data (string form of the
- * expression, the evaluated expression, and an optional message).
- * Stores failures in the test context.
+/* The core assertion function.  Stores failures in the test context,
+ * and returns non-zero if a fatal assertion has been triggered.
  */
-static int
-_hypo_assert(hypo_context_t *hypo_ctx, unsigned int flags,
-	     const char *file, unsigned int line,
-	     const char *expr, int value, const char *msg)
-{
-  _hypo_failure_t *failure;
+_HYPO_API int _hypo_assert(hypo_context_t *hypo_ctx, unsigned int flags,
+			   const char *file, unsigned int line,
+			   const char *expr, int value, const char *msg);
 
-  /* If the fatal flag is set, do nothing but bail out */
-  if (hypo_ctx->flags & _HYPO_FLAG_FATAL)
-    return 1;
+/* A description of a test.  The file setup function sets up the
+ * file-scoped fixtures of the test, if they have not already been set
+ * up; the setup and teardown functions set up and clean up the rest
+ * of its fixtures.  Any of them may be 0.  The number of cases is 0
+ * unless the test is parameterized, in which case the test is run
+ * once for each case.  The timeout, in seconds, the CPU limit, in
+ * seconds, and the memory limit, in bytes, are 0 if the test does
+ * not have them.  The file and line give the location of the test,
+ * for reporting failures which are not assertions.  A table of tests
+ * is terminated by an entry with a 0 name.
+ */
+typedef struct {
+  const char *name;
+  void (*file_setup)(hypo_context_t *);
+  void (*setup)(hypo_context_t *);
+  void (*run)(hypo_context_t *);
+  void (*teardown)(hypo_context_t *);
+  unsigned int cases;
+  double timeout;
+  unsigned int cpu;
+  unsigned long memory;
+  const char *file;
+  unsigned int line;
+} _hypo_test_t;
 
-  /* Successful assert? */
-  if (value)
-    return 0;
+/* Defer the teardown of a file-scoped fixture until all the tests
+ * have run.  Deferred teardowns are run in the reverse of the order
+ * in which they were deferred.
+ */
+_HYPO_API void _hypo_fix_defer(const char *name,
+			       void (*teardown)(hypo_context_t *));
 
-  /* Allocate a failure and record it */
-  failure = (_hypo_failure_t *)_hypo_list_alloc(&hypo_ctx->failures);
-  failure->test_fname = hypo_ctx->test_fname;
-  failure->test = hypo_ctx->cur_test;
-  failure->file = file;
-  failure->line = line;
-  failure->expr = expr;
-  failure->value = value;
-  failure->msg = msg;
+/* A description of a benchmark.  The run function runs the body of
+ * the benchmark the given number of times; the setup and teardown
+ * functions may be 0.  A table of benchmarks is terminated by an
+ * entry with a 0 name.
+ */
+typedef struct {
+  const char *name;
+  void (*setup)(hypo_context_t *);
+  void (*run)(hypo_context_t *, unsigned long);
+  void (*teardown)(hypo_context_t *);
+} _hypo_bench_t;
 
-  /* Flag that this test failed */
-  hypo_ctx->flags |= _HYPO_FLAG_FAIL;
+/* Run the tests in a table, resetting the mocks used by each, then
+ * the benchmarks, if requested, and report any failures.  Returns
+ * the exit code for the test program.
+ */
+_HYPO_API int _hypo_run(const char *test_fname, const _hypo_test_t *tests,
+			const _hypo_bench_t *benches);
 
-  /* If it was a fatal assertion, remember that */
-  if (flags & _HYPO_FLAG_FATAL)
-    hypo_ctx->flags |= _HYPO_FLAG_FATAL;
+/* The state of a mock.  The ret_idx element is the index of the
+ * next return value to return, or -1 if the mock is in "spy" mode;
+ * the flags are those passed to hypo_mock_setreturns_XXX(); the
+ * returns list contains the return values (its item size is 0
+ * for void mocks), and the calls list contains the call records.
+ * Each call record begins with the file and line of the call,
+ * followed by the arguments.  A mock used by a test is placed on a
+ * list of dirty mocks, linked through the next element, so that only
+ * those mocks need to be reset after the test.  The indices are the
+ * hash indices built over the calls by queries.  In the threaded
+ * mode, calls are first recorded in per-thread buffers, tbufs, and
+ * moved to the calls list when the calls are examined.
+ */
+typedef struct _hypo_mock_s {
+  int ret_idx;
+  unsigned int flags;
+  _hypo_list_t returns;
+  _hypo_list_t calls;
+  int dirty;
+  struct _hypo_mock_s *next;
+  struct _hypo_mock_index_s *indices;
+  struct _hypo_mock_tbuf_s *tbufs;
+} _hypo_mock_t;
 
-  /* Return true if it was fatal, so hypo_assert() can return */
-  return hypo_ctx->flags & _HYPO_FLAG_FATAL;
-}
+/* Static initializer for _hypo_mock_t; the mock starts in "spy"
+ * mode
+ */
+#define _HYPO_MOCK_INIT(returns, calls) {-1, 0, returns, calls, 0, 0, 0, 0}
+
+/* Flags for hypo_mock_setreturns_XXX().  The CYCLE flag causes the
+ * mock to start over at the first return value after returning the
+ * last one, rather than repeating the last one.  The BORROW flag
+ * causes the mock to use the caller's array of return values in
+ * place, rather than copying it.
+ */
+#define HYPO_MOCK_CYCLE		0x00000001
+#define HYPO_MOCK_BORROW	0x00000002
+
+/* The beginning of every call record */
+typedef struct {
+  const char *_file;
+  unsigned int _line;
+} _hypo_mock_call_t;
+
+/* A description of a mock argument, used for checking calls.  The
+ * expr element is the expression reported if the argument does not
+ * match; the size and offsets locate the argument in the call record
+ * and the expected call record.  Integral and pointer arguments are
+ * compared byte for byte; other arguments, such as floating point
+ * values, have a compare function, which is passed the expected
+ * call record and the call record and returns non-zero if the
+ * arguments are equal.  A table of arguments is terminated by an
+ * entry with a 0 expr.
+ */
+typedef struct {
+  const char *expr;
+  size_t size;
+  size_t call_offset;
+  size_t expect_offset;
+  int (*compare)(const void *expected, const void *actual);
+} _hypo_mock_arg_t;
+
+/* Record a call to a mock.  Returns the new call record, for the
+ * caller to store the arguments in.
+ */
+_HYPO_API void *_hypo_mock_call(_hypo_mock_t *mock, const char *file,
+				unsigned int line);
+
+/* Obtain the list of calls to a mock.  In the threaded mode, this
+ * merges the calls recorded by each thread, in the order they were
+ * made.
+ */
+_HYPO_API _hypo_list_t *_hypo_mock_calls(_hypo_mock_t *mock);
+
+/* Select the return value of a mock.  Returns non-zero if the mock
+ * is in "spy" mode; otherwise, copies the next return value, if
+ * any, into the value.
+ */
+_HYPO_API int _hypo_mock_return(_hypo_mock_t *mock, void *value);
+
+/* Save the value returned by the underlying function in "spy" mode */
+_HYPO_API void _hypo_mock_save(_hypo_mock_t *mock, const void *value);
+
+/* Add a return value for the mock, forcing it out of "spy" mode */
+_HYPO_API void _hypo_mock_addreturn(_hypo_mock_t *mock, const void *value);
+
+/* Replace the return values of the mock with an array of n values,
+ * forcing it out of "spy" mode
+ */
+_HYPO_API void _hypo_mock_setreturns(_hypo_mock_t *mock, const void *values,
+				     size_t n, unsigned int flags);
+
+/* Force the mock out of "spy" mode without adding a return value */
+_HYPO_API void _hypo_mock_nospy(_hypo_mock_t *mock);
+
+/* Check the calls to a mock against an array of expected calls,
+ * each of the given size, whose first element is the flags
+ * indicating which arguments to ignore.
+ */
+_HYPO_API void _hypo_mock_checkcalls(hypo_context_t *hypo_ctx,
+				     _hypo_mock_t *mock,
+				     const _hypo_mock_arg_t *args,
+				     const void *expected, size_t size,
+				     unsigned int count);
+
+/* Check the calls to a mock against an array of expected calls,
+ * without regard to the order in which the calls were made.
+ * Failures are attributed to the given file and line.
+ */
+_HYPO_API void _hypo_mock_checkunordered(hypo_context_t *hypo_ctx,
+					 const char *file, unsigned int line,
+					 _hypo_mock_t *mock,
+					 const _hypo_mock_arg_t *args,
+					 const void *expected, size_t size,
+					 unsigned int count);
+
+/* Find the first call to a mock, at or after the start index, that
+ * matches an expected call.  Returns the index of the call, or -1.
+ */
+_HYPO_API int _hypo_mock_findcall(_hypo_mock_t *mock,
+				  const _hypo_mock_arg_t *args,
+				  const void *expected, unsigned int start);
+
+/* Count the calls to a mock that match an expected call */
+_HYPO_API unsigned int _hypo_mock_countcalls(_hypo_mock_t *mock,
+					     const _hypo_mock_arg_t *args,
+					     const void *expected);
+
+/* The allocations made by the target during the current test, when
+ * allocations are tracked.  The live bytes and leaks are those
+ * allocated during the test and not yet released; the peak is the
+ * highest the live bytes have been.
+ */
+typedef struct {
+  unsigned long allocs;
+  unsigned long frees;
+  size_t bytes;
+  size_t live;
+  size_t peak;
+  unsigned long leaks;
+} hypo_alloc_stats_t;
+
+/* Replacements for the allocation functions, which track the
+ * allocations made by the target.  Memory allocated by these may be
+ * released by the standard functions, and vice versa.
+ */
+_HYPO_API void *_hypo_alloc_malloc(const char *file, int line, size_t size);
+_HYPO_API void *_hypo_alloc_calloc(const char *file, int line, size_t nmemb,
+				   size_t size);
+_HYPO_API void *_hypo_alloc_realloc(const char *file, int line, void *ptr,
+				    size_t size);
+_HYPO_API void _hypo_alloc_free(const char *file, int line, void *ptr);
+
+/* Enable the reporting of the allocations made by each test */
+_HYPO_API void _hypo_alloc_enable(void);
+
+/* Obtain the allocations made during the current test */
+_HYPO_API const hypo_alloc_stats_t *hypo_alloc_stats(void);
+
+/* Assert that the target has made no more than the given number of
+ * allocations, or allocated no more than the given number of bytes,
+ * during the current test
+ */
+#define hypo_assert_max_allocs(n)					\
+  hypo_assert_msg(hypo_alloc_stats()->allocs <= (n),			\
+		  "Too many allocations")
+#define hypo_assert_max_bytes(n)					\
+  hypo_assert_msg(hypo_alloc_stats()->bytes <= (n),			\
+		  "Too many bytes allocated")
+
+/* Assert that the peak live bytes allocated by the target during the
+ * current test have not exceeded the given number
+ */
+#define hypo_assert_max_peak(n)						\
+  hypo_assert_msg(hypo_alloc_stats()->peak <= (n),			\
+		  "Too many bytes live at once")
+
+/* Assert that all the memory allocated by the target during the
+ * current test has been released
+ */
+#define hypo_assert_no_leaks()						\
+  hypo_assert_msg(hypo_alloc_stats()->leaks == 0,			\
+		  "Allocations were not released")
 
+#line 573 "runtime.h.tmpl"
 /* Indicate a failure.  The required message must describe the
  * failure.
  */
@@ -200,19 +457,21 @@ _hypo_assert(hypo_context_t *hypo_ctx, unsigned int flags,
 
 /* Helper macro for picking the minimum of two values. */
 #define _hypo_min(a, b) ((a) < (b) ? (a) : (b))
-
+#line 35 "master.c.tmpl"
 /* Allow testing of targets containing main() functions. */
 #define main _hypo_main
 
 #line 6 "test.hypo"
 #include <stdlib.h>
 
-struct test_struct {
+typedef struct test_struct {
   unsigned int ts_value;
-};
-#line 214 "test.c"
+} test_struct;
+
+static const size_t alloc_sizes[] = {1, sizeof(struct test_struct), 4096};
+#line 473 "test.c"
 #define ANYARG_FREE_PTR 0x00000001
-#line 61 "mock-void.c.tmpl"
+#line 81 "mock-void.c.tmpl"
 
 /* Represent calls that we expect to be made; the _any_flags element
  * can be used to indicate that we don't care about the value of a
@@ -220,100 +479,93 @@ struct test_struct {
  */
 typedef struct {
   unsigned long _any_flags;
-#line 224 "test.c"
+#line 483 "test.c"
 void * ptr;
-#line 69 "mock-void.c.tmpl"
+#line 89 "mock-void.c.tmpl"
 } hypo_mock_expectcalls_free;
 
+#line 94 "mock-void.c.tmpl"
 /* Represent actual calls to the mock.  The file and line from which
  * the call was made are recorded in the _file and _line elements.
  */
 typedef struct {
   const char *_file;
   unsigned int _line;
-#line 235 "test.c"
+#line 495 "test.c"
 void * ptr;
-#line 78 "mock-void.c.tmpl"
+#line 101 "mock-void.c.tmpl"
 } hypo_mock_actualcalls_free;
 
 /* Represent the state of the mock.  Keeps track of what the mock
  * should return, and what arguments it's been called with.
  */
-static struct {
-  int spy;
-  _hypo_list_t calls;
-} _hypo_mock_descriptor_free = {
-  1, /* indicates "spy" mode */
+static _hypo_mock_t _hypo_mock_descriptor_free = _HYPO_MOCK_INIT(
+  _HYPO_LIST_INIT(char), /* no return values are stored */
   _HYPO_LIST_INIT(hypo_mock_actualcalls_free)
-};
+);
 
 /* Implementation of the mock itself.  This is called by the mock
  * macro, and either calls the underlying function or returns the
  * configured return values.  Stores the call location and the
- * arguments the mock was called with.  This is the core of the mock
- * system.
+ * arguments the mock was called with; the rest of the work is done
+ * by the runtime.
  */
-static void
+static _HYPO_UNUSED void
 _hypo_mock_free(const char *_file, unsigned int _line, void * ptr)
 {
   hypo_mock_actualcalls_free *_call_storage;
 
   /* Store the call details */
-  _call_storage = (hypo_mock_actualcalls_free*)_hypo_list_alloc(
-    &_hypo_mock_descriptor_free.calls
+  _call_storage = (hypo_mock_actualcalls_free *)_hypo_mock_call(
+    &_hypo_mock_descriptor_free, _file, _line
   );
-  _call_storage->_file = _file;
-  _call_storage->_line = _line;
-#line 268 "test.c"
+#line 523 "test.c"
 _call_storage->ptr = ptr;
-#line 109 "mock-void.c.tmpl"
+#line 127 "mock-void.c.tmpl"
 
-  /* If in spy mode, call the underlying function */
-  if (_hypo_mock_descriptor_free.spy)
+  /* If in spy mode, call the underlying function or its fake */
+  if (_hypo_mock_return(&_hypo_mock_descriptor_free, 0))
     free(ptr);
-
-  return;
 }
 
+#line 136 "mock-void.c.tmpl"
 /* Turn off spy mode for the mock. */
-static void
+static _HYPO_UNUSED void
 hypo_mock_nospy_free(void)
 {
-  /* Switch to mock mode */
-  _hypo_mock_descriptor_free.spy = 0;
+  _hypo_mock_nospy(&_hypo_mock_descriptor_free);
 }
 
+#line 540 "test.c"
+
+#line 147 "mock-void.c.tmpl"
+/* Describe the arguments of the mock, for checking calls */
+static const _hypo_mock_arg_t _hypo_mock_args_free[] = {
+#line 545 "test.c"
+{"expected[i].ptr == actual->ptr",
+   sizeof(((hypo_mock_actualcalls_free *)0)->ptr),
+   offsetof(hypo_mock_actualcalls_free, ptr),
+   offsetof(hypo_mock_expectcalls_free, ptr),
+   0},
+#line 150 "mock-void.c.tmpl"
+  {0, 0, 0, 0, 0}
+};
+
+#line 156 "mock-void.c.tmpl"
 /* Check the calls to the mock.  This walks through each of the
  * expected calls, verifying that it matches the corresponding actual
  * call to the mock.
  */
-static void
+static _HYPO_UNUSED void
 _hypo_mock_checkcalls_free(
     hypo_context_t *hypo_ctx,
     hypo_mock_expectcalls_free *expected,
     unsigned int count
 )
 {
-  unsigned int i, len;
-  hypo_mock_actualcalls_free *actual;
-
-  /* How many calls were there actually? */
-  len = _hypo_list_len(&_hypo_mock_descriptor_free.calls);
-
-  /* Verify we were called exactly count times */
-  hypo_assert(count == len);
-
-  /* Check each of the calls */
-  for (i = 0; i < _hypo_min(count, len); i++) {
-    actual = (hypo_mock_actualcalls_free *)_hypo_list_ref(
-      &_hypo_mock_descriptor_free.calls, i
-    );
-
-#line 313 "test.c"
-if (!(expected[i]._any_flags & ANYARG_FREE_PTR))
-      hypo_assert(expected[i].ptr == actual->ptr);
-#line 152 "mock-void.c.tmpl"
-  }
+  _hypo_mock_checkcalls(hypo_ctx, &_hypo_mock_descriptor_free,
+			_hypo_mock_args_free, expected,
+			sizeof(*expected), count);
 }
 
 /* The macro.  This is used to ensure that the hypocrite context is
@@ -322,53 +574,61 @@ if (!(expected[i]._any_flags & ANYARG_FREE_PTR))
 #define hypo_mock_checkcalls_free(expected, count)			\
   _hypo_mock_checkcalls_free(hypo_ctx, (expected), (count))
 
-/* Retrieve the number of calls that have been made to the mock. */
-#define hypo_mock_callcount_free()			\
-  _hypo_list_len(&_hypo_mock_descriptor_free.calls)
-
-/* Retrieve the Nth call description; this is an internal convenience
- * macro for building the macros for accessing the call arguments.
- */
-#define _hypo_mock_getcall_free(i)			\
-  ((hypo_mock_actualcalls_free *)_hypo_list_ref(	\
-     &_hypo_mock_descriptor_free.calls, (i)		\
-  ))
-
-/* Get the file name from which the Nth call to the mock was made.
- * This will be "const char *".
- */
-#define hypo_mock_getfile_free(i) (_hypo_mock_getcall_free(i)->_file)
-
-/* Get the line number from which the Nth call to the mock was made.
- * This will be "int".
+#line 181 "mock-void.c.tmpl"
+/* Check the calls to the mock, without regard to the order in which
+ * they were made.  The expected calls are matched with the actual
+ * calls so that as many as possible are matched.
  */
-#define hypo_mock_getline_free(i) (_hypo_mock_getcall_free(i)->_line)
+static _HYPO_UNUSED void
+_hypo_mock_checkunordered_free(
+    hypo_context_t *hypo_ctx,
+    const char *file,
+    unsigned int line,
+    hypo_mock_expectcalls_free *expected,
+    unsigned int count
+)
+{
+  _hypo_mock_checkunordered(hypo_ctx, file, line,
+			    &_hypo_mock_descriptor_free,
+			    _hypo_mock_args_free, expected,
+			    sizeof(*expected), count);
+}
 
-/* Get the named argument for the Nth call to the mock.  This will be
- * whatever type was defined for that argument.  The argument name
- * must be a bare word specifying the argument name given when
- * declaring the mock.
+/* The macro.  This is used to ensure that the hypocrite context and
+ * the location of the check are passed to the
+ * _hypo_mock_checkunordered_free function.
  */
-#define hypo_mock_getarg_free(i, arg)	\
-  (_hypo_mock_getcall_free(i)->arg)
+#define hypo_mock_checkunordered_free(expected, count)		\
+  _hypo_mock_checkunordered_free(hypo_ctx, __FILE__, __LINE__,	\
+				     (expected), (count))
 
-/* Clean up the mock.  This is called after every test function run
- * and ensures that the mock is returned to its initial state ("spy"
- * mode), not to mention releasing any memory allocated during the
- * test.
+#line 211 "mock-void.c.tmpl"
+/* Find the first call to the mock, at or after the start index, that
+ * matches the expected call.  Returns the index of the call, or -1
+ * if there is none.
  */
-static void
-_hypo_mock_cleanup_free(void)
+static _HYPO_UNUSED int
+hypo_mock_findcall_free(
+    const hypo_mock_expectcalls_free *expected,
+    unsigned int start
+)
 {
-  /* Reset mock to "spy" mode */
-  _hypo_mock_descriptor_free.spy = 1;
+  return _hypo_mock_findcall(&_hypo_mock_descriptor_free,
+			     _hypo_mock_args_free, expected, start);
+}
 
-  /* And clean up the lists */
-  _hypo_list_cleanup(&_hypo_mock_descriptor_free.calls);
+#line 228 "mock-void.c.tmpl"
+/* Count the calls to the mock that match the expected call */
+static _HYPO_UNUSED unsigned int
+hypo_mock_countcalls_free(const hypo_mock_expectcalls_free *expected)
+{
+  return _hypo_mock_countcalls(&_hypo_mock_descriptor_free,
+			       _hypo_mock_args_free, expected);
 }
-#line 370 "test.c"
+
+#line 630 "test.c"
 #define ANYARG_MALLOC_SIZE 0x00000001
-#line 61 "mock.c.tmpl"
+#line 81 "mock.c.tmpl"
 
 /* Represent calls that we expect to be made; the _any_flags element
  * can be used to indicate that we don't care about the value of a
@@ -376,133 +636,120 @@ _hypo_mock_cleanup_free(void)
  */
 typedef struct {
   unsigned long _any_flags;
-#line 380 "test.c"
+#line 640 "test.c"
 size_t size;
-#line 69 "mock.c.tmpl"
+#line 89 "mock.c.tmpl"
 } hypo_mock_expectcalls_malloc;
 
+#line 94 "mock.c.tmpl"
 /* Represent actual calls to the mock.  The file and line from which
  * the call was made are recorded in the _file and _line elements.
  */
 typedef struct {
   const char *_file;
   unsigned int _line;
-#line 391 "test.c"
+#line 652 "test.c"
 size_t size;
-#line 78 "mock.c.tmpl"
+#line 101 "mock.c.tmpl"
 } hypo_mock_actualcalls_malloc;
 
 /* Represent the state of the mock.  Keeps track of what the mock
  * should return, and what arguments it's been called with.
  */
-static struct {
-  int ret_idx;
-  _hypo_list_t returns;
-  _hypo_list_t calls;
-} _hypo_mock_descriptor_malloc = {
-  -1, /* indicates "spy" mode */
+static _hypo_mock_t _hypo_mock_descriptor_malloc = _HYPO_MOCK_INIT(
   _HYPO_LIST_INIT(void *),
   _HYPO_LIST_INIT(hypo_mock_actualcalls_malloc)
-};
+);
 
 /* Implementation of the mock itself.  This is called by the mock
  * macro, and either calls the underlying function or returns the
  * configured return values.  Stores the call location and the
- * arguments the mock was called with.  This is the core of the mock
- * system.
+ * arguments the mock was called with; the rest of the work is done
+ * by the runtime.
  */
-static void *
+static _HYPO_UNUSED void *
 _hypo_mock_malloc(const char *_file, unsigned int _line, size_t size)
 {
   void * _return_value;
-  void * *_return_storage;
   hypo_mock_actualcalls_malloc *_call_storage;
 
+  /* There may be no return value configured */
+  memset(&_return_value, 0, sizeof(_return_value));
+
   /* Store the call details */
-  _call_storage = (hypo_mock_actualcalls_malloc*)_hypo_list_alloc(
-    &_hypo_mock_descriptor_malloc.calls
+  _call_storage = (hypo_mock_actualcalls_malloc *)_hypo_mock_call(
+    &_hypo_mock_descriptor_malloc, _file, _line
   );
-  _call_storage->_file = _file;
-  _call_storage->_line = _line;
-#line 428 "test.c"
+#line 684 "test.c"
 _call_storage->size = size;
-#line 113 "mock.c.tmpl"
+#line 131 "mock.c.tmpl"
 
-  /* If in spy mode, call the underlying function */
-  if (_hypo_mock_descriptor_malloc.ret_idx < 0) {
+  /* If in spy mode, call the underlying function or its fake */
+  if (_hypo_mock_return(&_hypo_mock_descriptor_malloc, &_return_value)) {
     _return_value = malloc(size);
-    _return_storage = (void * *)_hypo_list_alloc(
-      &_hypo_mock_descriptor_malloc.returns
-    );
-    *_return_storage = _return_value;
-    return _return_value;
+    _hypo_mock_save(&_hypo_mock_descriptor_malloc, &_return_value);
   }
 
-  /* OK, not spy mode, pick the next mocked return value */
-  _return_value = *((void * *)_hypo_list_ref(
-    &_hypo_mock_descriptor_malloc.returns,
-    &_hypo_mock_descriptor_malloc.ret_idx
-  ));
-
-  /* Advance the index if appropriate */
-  if (_hypo_mock_descriptor_malloc.ret_idx + 1 <
-      _hypo_list_len(&_hypo_mock_descriptor_malloc.returns))
-    _hypo_mock_descriptor_malloc.ret_idx++;
-
-  /* Return the mocked return value */
   return _return_value;
 }
 
+#line 144 "mock.c.tmpl"
 /* Add a return value for the mock to return.  The first time this is
  * called, the mock is forced out of "spy" mode.
  */
-static void
+static _HYPO_UNUSED void
 hypo_mock_addreturn_malloc(void * return_value)
 {
-  void * *return_storage;
-
-  /* Switch to mock mode */
-  if (_hypo_mock_descriptor_malloc.ret_idx < 0)
-    _hypo_mock_descriptor_malloc.ret_idx = 0;
+  _hypo_mock_addreturn(&_hypo_mock_descriptor_malloc, &return_value);
+}
 
-  /* Add a return value */
-  return_storage = (void * *)_hypo_list_alloc(
-    &_hypo_mock_descriptor_malloc.returns
-  );
-  *return_storage = return_value;
+#line 156 "mock.c.tmpl"
+/* Replace the return values of the mock with an array of n values.
+ * The flags may include HYPO_MOCK_CYCLE, to start over at the first
+ * value after returning the last, and HYPO_MOCK_BORROW, to use the
+ * array in place rather than copying it.  The mock is forced out of
+ * "spy" mode.
+ */
+static _HYPO_UNUSED void
+hypo_mock_setreturns_malloc(
+    void * const *values,
+    size_t n,
+    unsigned int flags
+)
+{
+  _hypo_mock_setreturns(&_hypo_mock_descriptor_malloc, values, n, flags);
 }
 
+#line 724 "test.c"
+
+#line 176 "mock.c.tmpl"
+/* Describe the arguments of the mock, for checking calls */
+static const _hypo_mock_arg_t _hypo_mock_args_malloc[] = {
+#line 729 "test.c"
+{"expected[i].size == actual->size",
+   sizeof(((hypo_mock_actualcalls_malloc *)0)->size),
+   offsetof(hypo_mock_actualcalls_malloc, size),
+   offsetof(hypo_mock_expectcalls_malloc, size),
+   0},
+#line 179 "mock.c.tmpl"
+  {0, 0, 0, 0, 0}
+};
+
+#line 185 "mock.c.tmpl"
 /* Check the calls to the mock.  This walks through each of the
  * expected calls, verifying that it matches the corresponding actual
  * call to the mock.
  */
-static void
+static _HYPO_UNUSED void
 _hypo_mock_checkcalls_malloc(
     hypo_context_t *hypo_ctx,
     hypo_mock_expectcalls_malloc *expected,
     unsigned int count
 )
 {
-  unsigned int i, len;
-  hypo_mock_actualcalls_malloc *actual;
-
-  /* How many calls were there actually? */
-  len = _hypo_list_len(&_hypo_mock_descriptor_malloc.calls);
-
-  /* Verify we were called exactly count times */
-  hypo_assert(count == len);
-
-  /* Check each of the calls */
-  for (i = 0; i < _hypo_min(count, len); i++) {
-    actual = (hypo_mock_actualcalls_malloc *)_hypo_list_ref(
-      &_hypo_mock_descriptor_malloc.calls, i
-    );
-
-#line 502 "test.c"
-if (!(expected[i]._any_flags & ANYARG_MALLOC_SIZE))
-      hypo_assert(expected[i].size == actual->size);
-#line 185 "mock.c.tmpl"
-  }
+  _hypo_mock_checkcalls(hypo_ctx, &_hypo_mock_descriptor_malloc,
+			_hypo_mock_args_malloc, expected,
+			sizeof(*expected), count);
 }
 
 /* The macro.  This is used to ensure that the hypocrite context is
@@ -511,274 +758,3065 @@ if (!(expected[i]._any_flags & ANYARG_MALLOC_SIZE))
 #define hypo_mock_checkcalls_malloc(expected, count)			\
   _hypo_mock_checkcalls_malloc(hypo_ctx, (expected), (count))
 
+#line 268 "mock.c.tmpl"
 /* Retrieve the number of calls that have been made to the mock. */
-#define hypo_mock_callcount_malloc()			\
-  _hypo_list_len(&_hypo_mock_descriptor_malloc.calls)
+#define hypo_mock_callcount_malloc()				\
+  _hypo_list_len(_hypo_mock_calls(&_hypo_mock_descriptor_malloc))
 
-/* Retrieve the Nth return value of the mock. */
-#define hypo_mock_getreturn_malloc(i)			\
-  (*((void * *)_hypo_list_ref(			\
-       &_hypo_mock_descriptor_malloc.returns, (i)	\
-  )))
+#line 283 "mock-void.c.tmpl"
+#undef free
+#define free(ptr)				\
+  _hypo_mock_free(__FILE__, __LINE__, (ptr))
+#line 321 "mock.c.tmpl"
+#undef malloc
+#define malloc(size)				\
+  _hypo_mock_malloc(__FILE__, __LINE__, (size))
+#line 41 "master.c.tmpl"
+#include "to_test.c"
+#line 289 "mock-void.c.tmpl"
+#undef free
+#line 327 "mock.c.tmpl"
+#undef malloc
+#line 30 "runtime.c.tmpl"
+/* The system interfaces used by the runtime are only included here,
+ * so that they are not declared before the target
+ */
+#ifdef _HYPO_HAVE_FORK
+# include <errno.h>
+# include <sys/types.h>
+# include <sys/wait.h>
+# include <unistd.h>
+#endif
+#ifdef _HYPO_HAVE_TIMEOUT
+# include <setjmp.h>
+# include <signal.h>
+# include <sys/resource.h>
+# include <sys/time.h>
+#endif
+#ifdef _HYPO_HAVE_RUSAGE
+# include <fcntl.h>
+# include <sys/resource.h>
+# include <sys/time.h>
+# include <unistd.h>
+#endif
+#ifdef _HYPO_HAVE_PERF
+# include <linux/perf_event.h>
+# include <sys/ioctl.h>
+# include <sys/syscall.h>
+#endif
+#ifdef _HYPO_HAVE_PROF
+# include <fcntl.h>
+# include <signal.h>
+# include <sys/time.h>
+# include <ucontext.h>
+# include <unistd.h>
+#endif
+#ifdef _HYPO_HAVE_CLOCK
+# include <sys/time.h>
+#endif
+#ifdef _HYPO_HAVE_FAKEIO
+# include <fcntl.h>
+# include <unistd.h>
+#endif
 
-/* Retrieve the Nth call description; this is an internal convenience
- * macro for building the macros for accessing the call arguments.
+/* Mocks may be called from several threads at once if HYPO_THREADS
+ * is defined; this requires POSIX threads
  */
-#define _hypo_mock_getcall_malloc(i)			\
-  ((hypo_mock_actualcalls_malloc *)_hypo_list_ref(	\
-     &_hypo_mock_descriptor_malloc.calls, (i)		\
-  ))
+#ifdef HYPO_THREADS
+# include <pthread.h>
+#endif
+
+/* The mocks used by the current test */
+static _hypo_mock_t *_hypo_mock_dirty = 0;
 
-/* Get the file name from which the Nth call to the mock was made.
- * This will be "const char *".
+/* Set while benchmarks are being measured; mocks then keep only the
+ * most recent call, and do not save the return values of the
+ * underlying functions
  */
-#define hypo_mock_getfile_malloc(i) (_hypo_mock_getcall_malloc(i)->_file)
+static int _hypo_mock_quiet = 0;
 
-/* Get the line number from which the Nth call to the mock was made.
- * This will be "int".
+/* The minimum number of calls to a mock for a query to use a hash
+ * index; shorter call lists are simply scanned
  */
-#define hypo_mock_getline_malloc(i) (_hypo_mock_getcall_malloc(i)->_line)
+#ifndef HYPO_MOCK_INDEX_MIN
+# define HYPO_MOCK_INDEX_MIN	64
+#endif
 
-/* Get the named argument for the Nth call to the mock.  This will be
- * whatever type was defined for that argument.  The argument name
- * must be a bare word specifying the argument name given when
- * declaring the mock.
+/* A hash index over the calls to a mock, keyed by the arguments not
+ * ignored by the flags of a query.  The index covers the first
+ * "indexed" calls, and is extended as needed when it is used.  Each
+ * bucket contains the index of the last call in the bucket, plus 1,
+ * or 0 if the bucket is empty; the chain contains, for each call,
+ * the index of the previous call in the same bucket, plus 1.
  */
-#define hypo_mock_getarg_malloc(i, arg)	\
-  (_hypo_mock_getcall_malloc(i)->arg)
+typedef struct _hypo_mock_index_s {
+  unsigned long any_flags;
+  unsigned int indexed;
+  unsigned int nbuckets;
+  unsigned int *buckets;
+  _hypo_list_t chain;
+  struct _hypo_mock_index_s *next;
+} _hypo_mock_index_t;
 
-/* Clean up the mock.  This is called after every test function run
- * and ensures that the mock is returned to its initial state ("spy"
- * mode), not to mention releasing any memory allocated during the
- * test.
+/* The calls to a mock which the expected calls with the given flags
+ * may match, when checking the calls without regard to order.  These
+ * are copies of the hash index for the flags, or, if there is none,
+ * of a single bucket containing all the calls.  Calls are removed
+ * from the first copy once they have been matched, and from the
+ * second once the current search has visited them.
+ */
+typedef struct {
+  unsigned long any_flags;
+  int hashed;
+  unsigned int nbuckets;
+  unsigned int *buckets;
+  unsigned int *chain;
+  unsigned int *search_buckets;
+  unsigned int *search_chain;
+} _hypo_mock_view_t;
+
+/* A removal of a call from the search copy of a view, to be undone
+ * when the search is over
+ */
+typedef struct {
+  unsigned int *link;
+  unsigned int value;
+} _hypo_mock_unlink_t;
+
+/* An expected call being visited by a search, along with the link to
+ * the next call it may match, and the call through which the search
+ * continued
+ */
+typedef struct {
+  unsigned int expect;
+  unsigned int call;
+  unsigned int *link;
+  unsigned int *chain;
+} _hypo_mock_frame_t;
+
+/* The state of checking the calls to a mock without regard to order.
+ * For each call, owner contains the index of the expected call
+ * matched with it, plus 1, or 0 if it has not been matched, and seen
+ * contains the number of the last search to visit it.
+ */
+typedef struct {
+  _hypo_mock_t *mock;
+  const _hypo_mock_arg_t *args;
+  const unsigned char *expected;
+  size_t size;
+  unsigned int *owner;
+  unsigned int *seen;
+  unsigned int search;
+  _hypo_list_t views;
+  _hypo_list_t unlinked;
+  _hypo_list_t stack;
+} _hypo_mock_match_t;
+
+/* A deferred teardown of a file-scoped fixture */
+typedef struct {
+  const char *name;
+  void (*teardown)(hypo_context_t *);
+} _hypo_fix_deferred_t;
+
+/* The deferred teardowns, in the order they were deferred */
+static _hypo_list_t _hypo_fix_deferred = _HYPO_LIST_INIT(_hypo_fix_deferred_t);
+
+#ifdef HYPO_THREADS
+/* Serializes the rare operations of the threaded mode: creating the
+ * per-thread buffers, marking mocks as used, saving the return
+ * values of mocks in "spy" mode, and merging the buffers
+ */
+static pthread_mutex_t _hypo_mock_lock = PTHREAD_MUTEX_INITIALIZER;
+
+/* The sequence number of the next call to any mock */
+static unsigned long _hypo_mock_seq = 0;
+
+/* The key of each thread's list of per-thread buffers */
+static pthread_key_t _hypo_mock_key;
+static pthread_once_t _hypo_mock_once = PTHREAD_ONCE_INIT;
+
+/* The calls made to a mock by a single thread, each paired with its
+ * sequence number.  The buffer is on the list of its thread, linked
+ * through the thread_next element, and on the list of its mock,
+ * linked through the next element.  The merged element counts the
+ * calls already moved to the mock's calls list; the orphaned element
+ * is set once the thread has exited.
+ */
+typedef struct _hypo_mock_tbuf_s {
+  _hypo_mock_t *mock;
+  _hypo_list_t seqs;
+  _hypo_list_t calls;
+  unsigned int merged;
+  int orphaned;
+  struct _hypo_mock_tbuf_s *next;
+  struct _hypo_mock_tbuf_s *thread_next;
+} _hypo_mock_tbuf_t;
+
+/* Called when a thread exits; its buffers are released when their
+ * mocks are next reset
  */
 static void
-_hypo_mock_cleanup_malloc(void)
+_hypo_mock_orphan(void *value)
 {
-  /* Reset mock to "spy" mode */
-  _hypo_mock_descriptor_malloc.ret_idx = -1;
+  _hypo_mock_tbuf_t *tbuf;
 
-  /* And clean up the lists */
-  _hypo_list_cleanup(&_hypo_mock_descriptor_malloc.returns);
-  _hypo_list_cleanup(&_hypo_mock_descriptor_malloc.calls);
-}
-#line 208 "mock-void.c.tmpl"
-#undef free
-#define free(ptr)				\
-  _hypo_mock_free(__FILE__, __LINE__(ptr))
-#line 248 "mock.c.tmpl"
-#undef malloc
-#define malloc(size)				\
-  _hypo_mock_malloc(__FILE__, __LINE__(size))
-#line 229 "master.c.tmpl"
-#include "to_test.c"
-#line 214 "mock-void.c.tmpl"
-#undef free
-#line 254 "mock.c.tmpl"
-#undef malloc
-#line 21 "fixture.c.tmpl"
-static test_struct *
-hypo_fix_setup_allocate(hypo_context_t *hypo_ctx)
-{
-#line 17 "test.hypo"
-  return (test_struct *)malloc(sizeof(struct test_struct));
-#line 25 "fixture.c.tmpl"
+  pthread_mutex_lock(&_hypo_mock_lock);
+  for (tbuf = (_hypo_mock_tbuf_t *)value; tbuf; tbuf = tbuf->thread_next)
+    tbuf->orphaned = 1;
+  pthread_mutex_unlock(&_hypo_mock_lock);
 }
-#line 33 "fixture.c.tmpl"
+
+/* Create the key of the lists of per-thread buffers */
 static void
-hypo_fix_teardown_allocate(hypo_context_t *hypo_ctx, test_struct * allocate)
+_hypo_mock_key_init(void)
 {
-#line 19 "test.hypo"
-  free(allocate);
-#line 37 "fixture.c.tmpl"
+  if (pthread_key_create(&_hypo_mock_key, _hypo_mock_orphan))
+    abort(); /* Not much else we can do */
 }
-#line 23 "test.c.tmpl"
-static void
-hypo_test_allocate(hypo_context_t *hypo_ctx)
-{
-#line 23 "test.hypo"
-  hypo_mock_expectcalls_malloc expected[] = {
-    {0, sizeof(test_struct)}
-  };
-  struct test_struct test_data;
-  struct test_struct *result;
 
-  hypo_mock_addreturn_malloc(&test_data);
+/* Obtain the calling thread's buffer for a mock, creating it on the
+ * first call to the mock from the thread.
+ */
+static _hypo_mock_tbuf_t *
+_hypo_mock_tbuf(_hypo_mock_t *mock)
+{
+  _hypo_mock_tbuf_t *head, *tbuf;
+
+  pthread_once(&_hypo_mock_once, _hypo_mock_key_init);
+
+  /* Look for the thread's buffer */
+  head = (_hypo_mock_tbuf_t *)pthread_getspecific(_hypo_mock_key);
+  for (tbuf = head; tbuf; tbuf = tbuf->thread_next)
+    if (tbuf->mock == mock)
+      return tbuf;
+
+  /* Allocate a new one */
+  if (!(tbuf = (_hypo_mock_tbuf_t *)calloc(1, sizeof(*tbuf))))
+    abort(); /* Not much else we can do */
+  tbuf->mock = mock;
+  tbuf->seqs.size = sizeof(unsigned long);
+  tbuf->calls.size = mock->calls.size;
+
+  /* Add it to the thread's list */
+  tbuf->thread_next = head;
+  if (pthread_setspecific(_hypo_mock_key, tbuf))
+    abort(); /* Not much else we can do */
+
+  /* And to the mock's list */
+  pthread_mutex_lock(&_hypo_mock_lock);
+  tbuf->next = mock->tbufs;
+  mock->tbufs = tbuf;
+  pthread_mutex_unlock(&_hypo_mock_lock);
+
+  return tbuf;
+}
+#endif
+
+/* Mark a mock as used by the current test, adding it to the list of
+ * mocks to reset after the test.
+ */
+static void
+_hypo_mock_touch(_hypo_mock_t *mock)
+{
+#ifdef HYPO_THREADS
+  if (__atomic_load_n(&mock->dirty, __ATOMIC_ACQUIRE))
+    return;
+
+  pthread_mutex_lock(&_hypo_mock_lock);
+  if (!mock->dirty) {
+    mock->next = _hypo_mock_dirty;
+    _hypo_mock_dirty = mock;
+    __atomic_store_n(&mock->dirty, 1, __ATOMIC_RELEASE);
+  }
+  pthread_mutex_unlock(&_hypo_mock_lock);
+#else
+  if (mock->dirty)
+    return;
+
+  mock->dirty = 1;
+  mock->next = _hypo_mock_dirty;
+  _hypo_mock_dirty = mock;
+#endif
+}
+
+/* Allocate an item in the list.  This may increase the capacity of
+ * the list (factor-of-two logic is used).  If the system is out of
+ * memory, this will abort().
+ */
+_HYPO_API void *
+_hypo_list_alloc(_hypo_list_t *list)
+{
+  return _hypo_list_extend(list, 1);
+}
+
+/* Allocate n items at the end of the list, with a single
+ * reservation.  The capacity is doubled until the items fit.  If the
+ * system is out of memory, this will abort().
+ */
+_HYPO_API void *
+_hypo_list_extend(_hypo_list_t *list, unsigned int n)
+{
+  void *item;
+
+  if (list->count + n >= list->capacity) {
+    unsigned char *new;
+    unsigned int new_capacity = list->capacity ? list->capacity << 1 : 4;
+
+    while (list->count + n >= new_capacity)
+      new_capacity <<= 1;
+
+    new = (unsigned char *)realloc(list->storage, list->size * new_capacity);
+    if (!new) /* Not much else we can do */
+      abort();
+
+    /* realloc() can move the storage */
+    list->storage = new;
+    list->capacity = new_capacity;
+  }
+
+  item = _hypo_list_ref(list, list->count);
+  list->count += n;
+
+  return item;
+}
+
+/* The core assertion function.  Called with the location of the
+ * assertion macro and all the interesting data (string form of the
+ * expression, the evaluated expression, and an optional message).
+ * Stores failures in the test context.
+ */
+_HYPO_API int
+_hypo_assert(hypo_context_t *hypo_ctx, unsigned int flags,
+	     const char *file, unsigned int line,
+	     const char *expr, int value, const char *msg)
+{
+  _hypo_failure_t *failure;
+
+  /* If the fatal flag is set, do nothing but bail out */
+  if (hypo_ctx->flags & _HYPO_FLAG_FATAL)
+    return 1;
+
+  /* Successful assert? */
+  if (value)
+    return 0;
+
+  /* Allocate a failure and record it */
+  failure = (_hypo_failure_t *)_hypo_list_alloc(&hypo_ctx->failures);
+  failure->test_fname = hypo_ctx->test_fname;
+  failure->test = hypo_ctx->cur_test;
+  failure->file = file;
+  failure->line = line;
+  failure->expr = expr;
+  failure->value = value;
+  failure->msg = msg;
+
+  /* Flag that this test failed */
+  hypo_ctx->flags |= _HYPO_FLAG_FAIL;
+
+  /* If it was a fatal assertion, remember that */
+  if (flags & _HYPO_FLAG_FATAL)
+    hypo_ctx->flags |= _HYPO_FLAG_FATAL;
+
+  /* Return true if it was fatal, so hypo_assert() can return */
+  return hypo_ctx->flags & _HYPO_FLAG_FATAL;
+}
+
+/* Record a call to a mock.  Allocates a call record and stores the
+ * file and line of the call; the caller stores the arguments.  In
+ * the threaded mode, the record is allocated in the calling thread's
+ * buffer, along with the call's sequence number, without locking.
+ * While benchmarks are measured, the same record is reused.
+ */
+_HYPO_API void *
+_hypo_mock_call(_hypo_mock_t *mock, const char *file, unsigned int line)
+{
+  _hypo_mock_call_t *call;
+#ifdef HYPO_THREADS
+  _hypo_mock_tbuf_t *tbuf;
+#endif
+
+  _hypo_mock_touch(mock);
+
+#ifdef HYPO_THREADS
+  tbuf = _hypo_mock_tbuf(mock);
+  if (_hypo_mock_quiet)
+    tbuf->seqs.count = tbuf->calls.count = 0;
+  *(unsigned long *)_hypo_list_alloc(&tbuf->seqs) =
+    __atomic_fetch_add(&_hypo_mock_seq, 1, __ATOMIC_RELAXED);
+  call = (_hypo_mock_call_t *)_hypo_list_alloc(&tbuf->calls);
+#else
+  if (_hypo_mock_quiet)
+    mock->calls.count = 0;
+  call = (_hypo_mock_call_t *)_hypo_list_alloc(&mock->calls);
+#endif
+  call->_file = file;
+  call->_line = line;
+
+  return call;
+}
+
+/* Obtain the list of calls to a mock.  In the threaded mode, the
+ * calls recorded in the per-thread buffers are first merged into the
+ * list, in order of their sequence numbers; the threads calling the
+ * mock must not be running at the time.
+ */
+_HYPO_API _hypo_list_t *
+_hypo_mock_calls(_hypo_mock_t *mock)
+{
+#ifdef HYPO_THREADS
+  _hypo_mock_tbuf_t *tbuf, *next;
+
+  pthread_mutex_lock(&_hypo_mock_lock);
+
+  /* While benchmarks are measured, only the most recent call is kept */
+  if (_hypo_mock_quiet)
+    for (tbuf = mock->tbufs; tbuf; tbuf = tbuf->next)
+      if (_hypo_list_len(&tbuf->seqs)) {
+	mock->calls.count = 0;
+	break;
+      }
+
+  /* Repeatedly take the earliest call not yet merged */
+  for (;;) {
+    next = 0;
+    for (tbuf = mock->tbufs; tbuf; tbuf = tbuf->next)
+      if (tbuf->merged < _hypo_list_len(&tbuf->seqs) &&
+	  (!next ||
+	   *(unsigned long *)_hypo_list_ref(&tbuf->seqs, tbuf->merged) <
+	   *(unsigned long *)_hypo_list_ref(&next->seqs, next->merged)))
+	next = tbuf;
+
+    if (!next)
+      break;
+
+    memcpy(_hypo_list_alloc(&mock->calls),
+	   _hypo_list_ref(&next->calls, next->merged), mock->calls.size);
+    next->merged++;
+  }
+
+  /* The buffers may now be reused */
+  for (tbuf = mock->tbufs; tbuf; tbuf = tbuf->next) {
+    tbuf->seqs.count = 0;
+    tbuf->calls.count = 0;
+    tbuf->merged = 0;
+  }
+
+  pthread_mutex_unlock(&_hypo_mock_lock);
+#endif
+
+  return &mock->calls;
+}
+
+/* Select the return value of a mock.  In "spy" mode, returns
+ * non-zero so the caller will call the underlying function.
+ * Otherwise, copies the next mocked return value, advancing the
+ * index if there are more; the last return value is repeated, unless
+ * the mock cycles back to the first.
+ */
+_HYPO_API int
+_hypo_mock_return(_hypo_mock_t *mock, void *value)
+{
+#ifdef HYPO_THREADS
+  int ret_idx = __atomic_load_n(&mock->ret_idx, __ATOMIC_RELAXED);
+  int next_idx;
+#else
+  int ret_idx = mock->ret_idx;
+#endif
+
+  /* If in spy mode, tell the caller to call the underlying function */
+  if (ret_idx < 0)
+    return 1;
+
+  /* Void mocks have no return values, and no place to put them */
+  if (!value || !_hypo_list_len(&mock->returns))
+    return 0;
+
+#ifdef HYPO_THREADS
+  /* Atomically advance the index, if appropriate */
+  do {
+    if (ret_idx + 1 < (int)_hypo_list_len(&mock->returns))
+      next_idx = ret_idx + 1;
+    else if (mock->flags & HYPO_MOCK_CYCLE)
+      next_idx = 0;
+    else
+      break;
+  } while (!__atomic_compare_exchange_n(&mock->ret_idx, &ret_idx, next_idx,
+					1, __ATOMIC_RELAXED,
+					__ATOMIC_RELAXED));
+#else
+  /* Advance the index if appropriate */
+  if (ret_idx + 1 < (int)_hypo_list_len(&mock->returns))
+    mock->ret_idx++;
+  else if (mock->flags & HYPO_MOCK_CYCLE)
+    mock->ret_idx = 0;
+#endif
+
+  /* Copy the selected return value */
+  memcpy(value, _hypo_list_ref(&mock->returns, ret_idx), mock->returns.size);
+
+  return 0;
+}
+
+/* Save the value returned by the underlying function in "spy" mode,
+ * so that it may be retrieved by the test.
+ */
+_HYPO_API void
+_hypo_mock_save(_hypo_mock_t *mock, const void *value)
+{
+  if (_hypo_mock_quiet)
+    return;
+
+#ifdef HYPO_THREADS
+  pthread_mutex_lock(&_hypo_mock_lock);
+#endif
+  memcpy(_hypo_list_alloc(&mock->returns), value, mock->returns.size);
+#ifdef HYPO_THREADS
+  pthread_mutex_unlock(&_hypo_mock_lock);
+#endif
+}
+
+/* Add a return value for the mock to return.  The first time this
+ * is called, the mock is forced out of "spy" mode.
+ */
+_HYPO_API void
+_hypo_mock_addreturn(_hypo_mock_t *mock, const void *value)
+{
+  /* Switch to mock mode */
+  _hypo_mock_nospy(mock);
+
+  /* Take a copy of borrowed return values before adding to them */
+  if (mock->flags & HYPO_MOCK_BORROW) {
+    const void *values = mock->returns.storage;
+    unsigned int count = _hypo_list_len(&mock->returns);
+
+    mock->flags &= ~HYPO_MOCK_BORROW;
+    mock->returns.count = 0;
+    mock->returns.capacity = 0;
+    mock->returns.storage = 0;
+    memcpy(_hypo_list_extend(&mock->returns, count), values,
+	   mock->returns.size * count);
+  }
+
+  /* Add a return value */
+  _hypo_mock_save(mock, value);
+}
+
+/* Replace the return values of the mock with an array of n values.
+ * Unless the BORROW flag is given, the values are copied with a
+ * single reservation; otherwise, the array is used in place, and
+ * must remain valid until the end of the test.
+ */
+_HYPO_API void
+_hypo_mock_setreturns(_hypo_mock_t *mock, const void *values, size_t n,
+		      unsigned int flags)
+{
+  /* Switch to mock mode, starting over at the first value */
+  _hypo_mock_nospy(mock);
+  mock->ret_idx = 0;
+
+  /* Discard the previous return values */
+  if (mock->flags & HYPO_MOCK_BORROW)
+    mock->returns.storage = 0;
+  _hypo_list_cleanup(&mock->returns);
+  mock->flags = flags;
+
+  if (flags & HYPO_MOCK_BORROW) {
+    /* Never modified while borrowed */
+    mock->returns.storage = (unsigned char *)values;
+    mock->returns.count = (unsigned int)n;
+    mock->returns.capacity = (unsigned int)n;
+  } else
+    memcpy(_hypo_list_extend(&mock->returns, (unsigned int)n), values,
+	   mock->returns.size * n);
+}
+
+/* Force the mock out of "spy" mode.  For mocks returning a value,
+ * the mock will return 0 until a return value is added.
+ */
+_HYPO_API void
+_hypo_mock_nospy(_hypo_mock_t *mock)
+{
+  _hypo_mock_touch(mock);
+
+  if (mock->ret_idx < 0)
+    mock->ret_idx = 0;
+}
+
+/* Compare an argument of an expected call and an actual call */
+#define _hypo_mock_argeq(arg, expect, actual)				\
+  ((arg)->compare ? (arg)->compare((expect), (actual)) :		\
+   !memcmp((expect) + (arg)->expect_offset,				\
+	   (actual) + (arg)->call_offset, (arg)->size))
+
+/* Check the calls to a mock.  This walks through each of the
+ * expected calls, verifying that it matches the corresponding actual
+ * call to the mock.  Each argument is compared, unless the
+ * corresponding bit of the expected call's flags is set.
+ */
+_HYPO_API void
+_hypo_mock_checkcalls(hypo_context_t *hypo_ctx, _hypo_mock_t *mock,
+		      const _hypo_mock_arg_t *args,
+		      const void *expected, size_t size,
+		      unsigned int count)
+{
+  unsigned int i, j, len;
+  const unsigned char *expect, *actual;
+  unsigned long any_flags;
+
+  /* How many calls were there actually? */
+  len = _hypo_list_len(_hypo_mock_calls(mock));
+
+  /* Verify we were called exactly count times */
+  hypo_assert(count == len);
+
+  /* Check each of the calls */
+  for (i = 0; i < _hypo_min(count, len); i++) {
+    expect = (const unsigned char *)expected + size * i;
+    actual = (const unsigned char *)_hypo_list_ref(&mock->calls, i);
+    any_flags = *(const unsigned long *)expect;
+
+    for (j = 0; args[j].expr; j++)
+      if (!(any_flags & (1UL << j)) &&
+	  _hypo_assert(hypo_ctx, 0, __FILE__, __LINE__, args[j].expr,
+		       _hypo_mock_argeq(&args[j], expect, actual), 0))
+	return;
+  }
+}
+
+/* Determine if an actual call matches an expected call.  Each
+ * argument is compared, unless the corresponding bit of the flags is
+ * set.
+ */
+static int
+_hypo_mock_matches(const _hypo_mock_arg_t *args, unsigned long any_flags,
+		   const unsigned char *expect, const unsigned char *actual)
+{
+  unsigned int j;
+
+  for (j = 0; args[j].expr; j++)
+    if (!(any_flags & (1UL << j)) &&
+	!_hypo_mock_argeq(&args[j], expect, actual))
+      return 0;
+
+  return 1;
+}
+
+/* Compute the hash of the arguments of a call, or of an expected
+ * call, not ignored by the flags.  This is FNV-1a over the bytes of
+ * the arguments; arguments with a compare function, whose equal
+ * values may differ in their bytes, are left out.
+ */
+static unsigned long
+_hypo_mock_hash(const _hypo_mock_arg_t *args, unsigned long any_flags,
+		const unsigned char *record, int is_expect)
+{
+  unsigned long hash = 2166136261UL;
+  const unsigned char *arg;
+  unsigned int j;
+  size_t k;
+
+  for (j = 0; args[j].expr; j++) {
+    if ((any_flags & (1UL << j)) || args[j].compare)
+      continue;
+
+    arg = record + (is_expect ? args[j].expect_offset : args[j].call_offset);
+    for (k = 0; k < args[j].size; k++)
+      hash = (hash ^ arg[k]) * 16777619UL;
+  }
+
+  return hash;
+}
+
+/* Obtain the hash index of a mock for the given flags, building it
+ * or extending it to cover all the calls.  Returns 0 if the calls
+ * should be scanned instead: there are too few of them, or none of
+ * the arguments the flags do not ignore may be hashed.
+ */
+static _hypo_mock_index_t *
+_hypo_mock_index(_hypo_mock_t *mock, const _hypo_mock_arg_t *args,
+		 unsigned long any_flags)
+{
+  _hypo_mock_index_t *index;
+  unsigned int i, j, len, nbuckets, *chain;
+  unsigned long bucket;
+
+  /* Is an index worth it? */
+  len = _hypo_list_len(&mock->calls);
+  for (j = 0; args[j].expr && ((any_flags & (1UL << j)) || args[j].compare);
+       j++)
+    ;
+  if (len < HYPO_MOCK_INDEX_MIN || !args[j].expr)
+    return 0;
+
+  /* Find the index for the flags, or create one */
+  for (index = mock->indices; index; index = index->next)
+    if (index->any_flags == any_flags)
+      break;
+  if (!index) {
+    if (!(index = (_hypo_mock_index_t *)calloc(1, sizeof(*index))))
+      abort(); /* Not much else we can do */
+    index->any_flags = any_flags;
+    index->chain.size = sizeof(unsigned int);
+    index->next = mock->indices;
+    mock->indices = index;
+  }
+
+  /* Keep the buckets at least half empty, rebuilding as needed */
+  if (len > index->nbuckets / 2) {
+    for (nbuckets = index->nbuckets ? index->nbuckets : 64;
+	 len > nbuckets / 2; nbuckets <<= 1)
+      ;
+
+    free(index->buckets);
+    if (!(index->buckets = (unsigned int *)calloc(nbuckets,
+						  sizeof(unsigned int))))
+      abort(); /* Not much else we can do */
+    index->nbuckets = nbuckets;
+    index->indexed = 0;
+    index->chain.count = 0;
+  }
+
+  /* Add the calls made since the index was last used */
+  if (index->indexed < len) {
+    chain = (unsigned int *)_hypo_list_extend(&index->chain,
+					      len - index->indexed);
+    for (i = index->indexed; i < len; i++) {
+      bucket = _hypo_mock_hash(args, any_flags,
+			       (const unsigned char *)_hypo_list_ref(
+				 &mock->calls, i
+			       ), 0) & (index->nbuckets - 1);
+      chain[i - index->indexed] = index->buckets[bucket];
+      index->buckets[bucket] = i + 1;
+    }
+    index->indexed = len;
+  }
+
+  return index;
+}
+
+/* Find the first call to a mock, at or after the start index, that
+ * matches an expected call.  Returns the index of the call, or -1 if
+ * there is none.
+ */
+static int
+_hypo_mock_search(_hypo_mock_t *mock, const _hypo_mock_arg_t *args,
+		  const void *expected, unsigned int start)
+{
+  const unsigned char *expect = (const unsigned char *)expected;
+  unsigned long any_flags = *(const unsigned long *)expect;
+  _hypo_mock_index_t *index;
+  unsigned int i, len;
+  int found = -1;
+
+  /* Scan the calls if there's no index */
+  if (!(index = _hypo_mock_index(mock, args, any_flags))) {
+    len = _hypo_list_len(&mock->calls);
+    for (i = start; i < len; i++)
+      if (_hypo_mock_matches(args, any_flags, expect,
+			     (const unsigned char *)_hypo_list_ref(
+			       &mock->calls, i
+			     )))
+	return (int)i;
+
+    return -1;
+  }
+
+  /* Walk the chain of the bucket, from the last call backwards */
+  for (i = index->buckets[_hypo_mock_hash(args, any_flags, expect, 1) &
+			  (index->nbuckets - 1)];
+       i > start;
+       i = *(unsigned int *)_hypo_list_ref(&index->chain, i - 1))
+    if (_hypo_mock_matches(args, any_flags, expect,
+			   (const unsigned char *)_hypo_list_ref(
+			     &mock->calls, i - 1
+			   )))
+      found = (int)(i - 1);
+
+  return found;
+}
+
+/* Obtain the view of the calls which the expected calls with the
+ * given flags may match, creating it if necessary.
+ */
+static _hypo_mock_view_t *
+_hypo_mock_view(_hypo_mock_match_t *match, unsigned long any_flags)
+{
+  unsigned int i, len = _hypo_list_len(&match->mock->calls);
+  _hypo_mock_index_t *index;
+  _hypo_mock_view_t *view;
+  size_t bsize, csize;
+
+  /* Find the view for the flags */
+  for (i = 0; i < _hypo_list_len(&match->views); i++) {
+    view = (_hypo_mock_view_t *)_hypo_list_ref(&match->views, i);
+    if (view->any_flags == any_flags)
+      return view;
+  }
+
+  /* Copy the index, or put all the calls in a single bucket */
+  view = (_hypo_mock_view_t *)_hypo_list_alloc(&match->views);
+  view->any_flags = any_flags;
+  index = _hypo_mock_index(match->mock, match->args, any_flags);
+  view->hashed = index != 0;
+  view->nbuckets = index ? index->nbuckets : 1;
+  bsize = sizeof(unsigned int) * view->nbuckets;
+  csize = sizeof(unsigned int) * (len ? len : 1);
+  if (!(view->buckets = (unsigned int *)malloc(bsize)) ||
+      !(view->chain = (unsigned int *)malloc(csize)) ||
+      !(view->search_buckets = (unsigned int *)malloc(bsize)) ||
+      !(view->search_chain = (unsigned int *)malloc(csize)))
+    abort(); /* Not much else we can do */
+  if (index) {
+    memcpy(view->buckets, index->buckets, bsize);
+    memcpy(view->chain, index->chain.storage, sizeof(unsigned int) * len);
+  } else {
+    view->buckets[0] = len;
+    for (i = 0; i < len; i++)
+      view->chain[i] = i;
+  }
+  memcpy(view->search_buckets, view->buckets, bsize);
+  memcpy(view->search_chain, view->chain, csize);
+
+  return view;
+}
+
+/* Obtain the bucket of a view containing the calls an expected call
+ * may match
+ */
+static unsigned int
+_hypo_mock_bucket(_hypo_mock_match_t *match, _hypo_mock_view_t *view,
+		  const unsigned char *expect)
+{
+  if (!view->hashed)
+    return 0;
+
+  return _hypo_mock_hash(match->args, view->any_flags, expect, 1) &
+    (view->nbuckets - 1);
+}
+
+/* Find a call which has not been matched and which matches an
+ * expected call.  The matched calls passed over are removed from the
+ * view, so that they are not examined again.  Returns the index of
+ * the call, or -1 if there is none.
+ */
+static int
+_hypo_mock_take(_hypo_mock_match_t *match, const unsigned char *expect)
+{
+  unsigned long any_flags = *(const unsigned long *)expect;
+  _hypo_mock_view_t *view = _hypo_mock_view(match, any_flags);
+  unsigned int i, *link;
+
+  link = view->buckets + _hypo_mock_bucket(match, view, expect);
+  while ((i = *link)) {
+    if (match->owner[i - 1])
+      *link = view->chain[i - 1];
+    else if (_hypo_mock_matches(match->args, any_flags, expect,
+				(const unsigned char *)_hypo_list_ref(
+				  &match->mock->calls, i - 1
+				)))
+      return (int)(i - 1);
+    else
+      link = &view->chain[i - 1];
+  }
+
+  return -1;
+}
+
+/* Begin visiting an expected call in a search */
+static void
+_hypo_mock_visit(_hypo_mock_match_t *match, unsigned int e)
+{
+  const unsigned char *expect = match->expected + match->size * e;
+  _hypo_mock_view_t *view;
+  _hypo_mock_frame_t *frame;
+
+  view = _hypo_mock_view(match, *(const unsigned long *)expect);
+  frame = (_hypo_mock_frame_t *)_hypo_list_alloc(&match->stack);
+  frame->expect = e;
+  frame->call = 0;
+  frame->link = view->search_buckets + _hypo_mock_bucket(match, view, expect);
+  frame->chain = view->search_chain;
+}
+
+/* Search for an augmenting path from an expected call: a call it
+ * matches which has not been matched, or which has been matched with
+ * an expected call for which there is in turn an augmenting path.
+ * This is a depth-first search, in which each call is visited at
+ * most once.  If a path is found, the calls along it are matched
+ * again and non-zero is returned.
+ */
+static int
+_hypo_mock_augment(_hypo_mock_match_t *match, unsigned int e)
+{
+  const unsigned char *expect;
+  _hypo_mock_frame_t *frame;
+  _hypo_mock_unlink_t *unlink;
+  unsigned int i;
+  int found = 0;
+
+  match->search++;
+  _hypo_mock_visit(match, e);
+  while (!found && _hypo_list_len(&match->stack)) {
+    frame = (_hypo_mock_frame_t *)_hypo_list_ref(
+      &match->stack, _hypo_list_len(&match->stack) - 1
+    );
+    expect = match->expected + match->size * frame->expect;
+
+    if (!(i = *frame->link)) {
+      /* No path from this expected call */
+      match->stack.count--;
+    } else if (match->seen[i - 1] == match->search) {
+      /* Skip the calls already visited from now on */
+      unlink = (_hypo_mock_unlink_t *)_hypo_list_alloc(&match->unlinked);
+      unlink->link = frame->link;
+      unlink->value = i;
+      *frame->link = frame->chain[i - 1];
+    } else if (!_hypo_mock_matches(match->args,
+				   *(const unsigned long *)expect, expect,
+				   (const unsigned char *)_hypo_list_ref(
+				     &match->mock->calls, i - 1
+				   ))) {
+      frame->link = &frame->chain[i - 1];
+    } else {
+      /* Continue the search through the call */
+      match->seen[i - 1] = match->search;
+      frame->call = i;
+      if (match->owner[i - 1])
+	_hypo_mock_visit(match, match->owner[i - 1] - 1);
+      else
+	found = 1;
+    }
+  }
+
+  /* Match the expected calls along the path */
+  for (i = _hypo_list_len(&match->stack); i > 0; i--) {
+    frame = (_hypo_mock_frame_t *)_hypo_list_ref(&match->stack, i - 1);
+    match->owner[frame->call - 1] = frame->expect + 1;
+  }
+  match->stack.count = 0;
+
+  /* Restore the calls removed by the search, in reverse order */
+  for (i = _hypo_list_len(&match->unlinked); i > 0; i--) {
+    unlink = (_hypo_mock_unlink_t *)_hypo_list_ref(&match->unlinked, i - 1);
+    *unlink->link = unlink->value;
+  }
+  match->unlinked.count = 0;
+
+  return found;
+}
+
+/* Match an expected call with an actual call.  Returns non-zero if
+ * it could be matched.
+ */
+static int
+_hypo_mock_assign(_hypo_mock_match_t *match, unsigned int e)
+{
+  int found;
+
+  /* Prefer a call which has not been matched */
+  if ((found = _hypo_mock_take(match, match->expected + match->size * e)) >=
+      0) {
+    match->owner[found] = e + 1;
+    return 1;
+  }
+
+  /* Otherwise, see if the matched calls may be rearranged */
+  return _hypo_mock_augment(match, e);
+}
+
+/* Check the calls to a mock, without regard to order.  The expected
+ * calls are matched with the actual calls so that as many as possible
+ * are matched.  The expected calls without "any" flags are matched
+ * first, since the calls they match are identical to each other;
+ * the others may then require the matches already made to be
+ * rearranged.  Failures are attributed to the given file and line.
+ */
+_HYPO_API void
+_hypo_mock_checkunordered(hypo_context_t *hypo_ctx, const char *file,
+			  unsigned int line, _hypo_mock_t *mock,
+			  const _hypo_mock_arg_t *args,
+			  const void *expected, size_t size,
+			  unsigned int count)
+{
+  _hypo_mock_match_t match = {
+    0, 0, 0, 0, 0, 0, 0, _HYPO_LIST_INIT(_hypo_mock_view_t),
+    _HYPO_LIST_INIT(_hypo_mock_unlink_t), _HYPO_LIST_INIT(_hypo_mock_frame_t)
+  };
+  _hypo_mock_view_t *view;
+  unsigned int i, len;
+  int pass, fatal = 0;
+
+  /* How many calls were there actually? */
+  len = _hypo_list_len(_hypo_mock_calls(mock));
+
+  /* Verify we were called exactly count times */
+  if (_hypo_assert(hypo_ctx, 0, file, line, "count == len", count == len,
+		   0))
+    return;
+
+  match.mock = mock;
+  match.args = args;
+  match.expected = (const unsigned char *)expected;
+  match.size = size;
+  if (!(match.owner = (unsigned int *)calloc(len ? len : 1,
+					     sizeof(unsigned int))) ||
+      !(match.seen = (unsigned int *)calloc(len ? len : 1,
+					    sizeof(unsigned int))))
+    abort(); /* Not much else we can do */
+
+  /* Match the expected calls without "any" flags, then the rest */
+  for (pass = 0; pass < 2 && !fatal; pass++)
+    for (i = 0; i < count && !fatal; i++)
+      if ((*(const unsigned long *)(match.expected + size * i) != 0) ==
+	  pass && !_hypo_mock_assign(&match, i))
+	fatal = _hypo_assert(hypo_ctx, 0, file, line,
+			     "expected[i] matches an actual call", 0, 0);
+
+  for (i = 0; i < _hypo_list_len(&match.views); i++) {
+    view = (_hypo_mock_view_t *)_hypo_list_ref(&match.views, i);
+    free(view->buckets);
+    free(view->chain);
+    free(view->search_buckets);
+    free(view->search_chain);
+  }
+  _hypo_list_cleanup(&match.views);
+  _hypo_list_cleanup(&match.unlinked);
+  _hypo_list_cleanup(&match.stack);
+  free(match.owner);
+  free(match.seen);
+}
+
+/* Find the first call to a mock, at or after the start index, that
+ * matches an expected call.  Returns the index of the call, or -1 if
+ * there is none.
+ */
+_HYPO_API int
+_hypo_mock_findcall(_hypo_mock_t *mock, const _hypo_mock_arg_t *args,
+		    const void *expected, unsigned int start)
+{
+  _hypo_mock_calls(mock);
+
+  return _hypo_mock_search(mock, args, expected, start);
+}
+
+/* Count the calls to a mock that match an expected call */
+_HYPO_API unsigned int
+_hypo_mock_countcalls(_hypo_mock_t *mock, const _hypo_mock_arg_t *args,
+		      const void *expected)
+{
+  const unsigned char *expect = (const unsigned char *)expected;
+  unsigned long any_flags = *(const unsigned long *)expect;
+  _hypo_mock_index_t *index;
+  unsigned int i, start, count = 0;
+
+  _hypo_mock_calls(mock);
+
+  /* Without an index, walk all the calls */
+  if (!(index = _hypo_mock_index(mock, args, any_flags))) {
+    for (i = 0; i < _hypo_list_len(&mock->calls); i++)
+      count += _hypo_mock_matches(args, any_flags, expect,
+				  (const unsigned char *)_hypo_list_ref(
+				    &mock->calls, i
+				  ));
+
+    return count;
+  }
+
+  /* Walk the chain of the bucket */
+  start = index->buckets[_hypo_mock_hash(args, any_flags, expect, 1) &
+			 (index->nbuckets - 1)];
+  for (i = start; i; i = *(unsigned int *)_hypo_list_ref(&index->chain, i - 1))
+    count += _hypo_mock_matches(args, any_flags, expect,
+				(const unsigned char *)_hypo_list_ref(
+				  &mock->calls, i - 1
+				));
+
+  return count;
+}
+
+/* Clean up the mocks.  This is called after every test function run
+ * and ensures that each mock used by the test is returned to its
+ * initial state ("spy" mode), not to mention releasing any memory
+ * allocated during the test.  Mocks not used by the test are not
+ * visited.
+ */
+static void
+_hypo_mock_cleanup(void)
+{
+  _hypo_mock_t *mock;
+  _hypo_mock_index_t *index;
+#ifdef HYPO_THREADS
+  _hypo_mock_tbuf_t *tbuf, **tbuf_p;
+#endif
+
+  while ((mock = _hypo_mock_dirty)) {
+    _hypo_mock_dirty = mock->next;
+
+    /* Reset mock to "spy" mode */
+    mock->ret_idx = -1;
+    mock->dirty = 0;
+    mock->next = 0;
+
+    /* Discard the indices over the calls */
+    while ((index = mock->indices)) {
+      mock->indices = index->next;
+      free(index->buckets);
+      _hypo_list_cleanup(&index->chain);
+      free(index);
+    }
+
+    /* Borrowed return values belong to the test */
+    if (mock->flags & HYPO_MOCK_BORROW)
+      mock->returns.storage = 0;
+    mock->flags = 0;
+
+    /* And clean up the lists */
+    _hypo_list_cleanup(&mock->returns);
+    _hypo_list_cleanup(&mock->calls);
+
+#ifdef HYPO_THREADS
+    /* Empty the per-thread buffers, releasing those of exited threads */
+    pthread_mutex_lock(&_hypo_mock_lock);
+    for (tbuf_p = &mock->tbufs; (tbuf = *tbuf_p);) {
+      if (tbuf->orphaned) {
+	*tbuf_p = tbuf->next;
+	_hypo_list_cleanup(&tbuf->seqs);
+	_hypo_list_cleanup(&tbuf->calls);
+	free(tbuf);
+	continue;
+      }
+
+      tbuf->seqs.count = 0;
+      tbuf->calls.count = 0;
+      tbuf->merged = 0;
+      tbuf_p = &tbuf->next;
+    }
+    pthread_mutex_unlock(&_hypo_mock_lock);
+#endif
+  }
+}
+
+/* Defer the teardown of a file-scoped fixture until all the tests
+ * have run.
+ */
+_HYPO_API void
+_hypo_fix_defer(const char *name, void (*teardown)(hypo_context_t *))
+{
+  _hypo_fix_deferred_t *deferred;
+
+  deferred = (_hypo_fix_deferred_t *)_hypo_list_alloc(&_hypo_fix_deferred);
+  deferred->name = name;
+  deferred->teardown = teardown;
+}
+
+/* An allocation made by the target.  The serial number identifies
+ * the test it was made by.
+ */
+typedef struct {
+  void *ptr;
+  size_t size;
+  unsigned long serial;
+  const char *file;
+  int line;
+} _hypo_alloc_t;
+
+/* The allocations made by the target.  These are kept in an open
+ * addressing hash table keyed by the pointer, which is only
+ * allocated once the target allocates memory, so that the runtime's
+ * own use of memory is unaffected.
+ */
+static struct {
+  int enabled;			/* Report the allocations of each test */
+  int pending;			/* Allocations not yet reported */
+  unsigned long serial;		/* Serial number of the current test */
+  _hypo_alloc_t *table;		/* The hash table */
+  size_t size;			/* The size of the table, a power of 2 */
+  size_t count;			/* The number of allocations in it */
+  hypo_alloc_stats_t stats;	/* The allocations of the current test */
+} _hypo_allocs = {0, 0, 1, 0, 0, 0, {0, 0, 0, 0, 0, 0}};
+
+#ifdef HYPO_THREADS
+/* The allocations may be made from several threads */
+static pthread_mutex_t _hypo_alloc_mutex = PTHREAD_MUTEX_INITIALIZER;
+# define _hypo_alloc_lock()	pthread_mutex_lock(&_hypo_alloc_mutex)
+# define _hypo_alloc_unlock()	pthread_mutex_unlock(&_hypo_alloc_mutex)
+#else
+# define _hypo_alloc_lock()
+# define _hypo_alloc_unlock()
+#endif
+
+/* Locate the slot of the hash table for a pointer.  The slot is
+ * either the one holding the pointer or the empty slot where it
+ * would be added.
+ */
+static size_t
+_hypo_alloc_slot(void *ptr)
+{
+  size_t i = (((size_t)ptr >> 4) * 2654435761u) & (_hypo_allocs.size - 1);
+
+  while (_hypo_allocs.table[i].ptr && _hypo_allocs.table[i].ptr != ptr)
+    i = (i + 1) & (_hypo_allocs.size - 1);
+
+  return i;
+}
+
+/* Record an allocation */
+static void
+_hypo_alloc_add(void *ptr, size_t size, const char *file, int line)
+{
+  _hypo_alloc_t *old = _hypo_allocs.table;
+  size_t i, old_size = _hypo_allocs.size;
+
+  /* Keep the table at most half full */
+  if (2 * (_hypo_allocs.count + 1) > _hypo_allocs.size) {
+    _hypo_allocs.size = old_size ? 2 * old_size : 64;
+    if (!(_hypo_allocs.table = (_hypo_alloc_t *)calloc(
+	    _hypo_allocs.size, sizeof(_hypo_alloc_t))))
+      abort(); /* Not much else we can do */
+
+    for (i = 0; i < old_size; i++)
+      if (old[i].ptr)
+	_hypo_allocs.table[_hypo_alloc_slot(old[i].ptr)] = old[i];
+    free(old);
+  }
+
+  i = _hypo_alloc_slot(ptr);
+  _hypo_allocs.table[i].ptr = ptr;
+  _hypo_allocs.table[i].size = size;
+  _hypo_allocs.table[i].serial = _hypo_allocs.serial;
+  _hypo_allocs.table[i].file = file;
+  _hypo_allocs.table[i].line = line;
+  _hypo_allocs.count++;
+
+  /* Account for it */
+  _hypo_allocs.stats.allocs++;
+  _hypo_allocs.stats.bytes += size;
+  _hypo_allocs.stats.live += size;
+  _hypo_allocs.stats.leaks++;
+  if (_hypo_allocs.stats.live > _hypo_allocs.stats.peak)
+    _hypo_allocs.stats.peak = _hypo_allocs.stats.live;
+}
+
+/* Find the slot of the hash table holding a pointer.  Returns -1 if
+ * the pointer was not recorded.
+ */
+static size_t
+_hypo_alloc_find(void *ptr)
+{
+  size_t i;
+
+  if (!ptr || !_hypo_allocs.count ||
+      !_hypo_allocs.table[i = _hypo_alloc_slot(ptr)].ptr)
+    return (size_t)-1;
+
+  return i;
+}
+
+/* Forget the allocation in a slot of the hash table, if any */
+static void
+_hypo_alloc_remove(size_t i)
+{
+  size_t j, k, mask = _hypo_allocs.size - 1;
+
+  if (i == (size_t)-1)
+    return;
+
+  /* Account for it; only the current test's allocations are live */
+  _hypo_allocs.stats.frees++;
+  if (_hypo_allocs.table[i].serial == _hypo_allocs.serial) {
+    _hypo_allocs.stats.live -= _hypo_allocs.table[i].size;
+    _hypo_allocs.stats.leaks--;
+  }
+  _hypo_allocs.count--;
+
+  /* Move later entries of the probe sequence into the hole */
+  for (j = (i + 1) & mask; _hypo_allocs.table[j].ptr; j = (j + 1) & mask) {
+    k = (((size_t)_hypo_allocs.table[j].ptr >> 4) * 2654435761u) & mask;
+    if ((j > i && (k <= i || k > j)) || (j < i && k <= i && k > j)) {
+      _hypo_allocs.table[i] = _hypo_allocs.table[j];
+      i = j;
+    }
+  }
+  _hypo_allocs.table[i].ptr = 0;
+}
+
+_HYPO_API void *
+_hypo_alloc_malloc(const char *file, int line, size_t size)
+{
+  void *ptr = malloc(size);
+
+  if (ptr) {
+    _hypo_alloc_lock();
+    _hypo_alloc_add(ptr, size, file, line);
+    _hypo_alloc_unlock();
+  }
+
+  return ptr;
+}
+
+_HYPO_API void *
+_hypo_alloc_calloc(const char *file, int line, size_t nmemb, size_t size)
+{
+  void *ptr = calloc(nmemb, size);
+
+  if (ptr) {
+    _hypo_alloc_lock();
+    _hypo_alloc_add(ptr, nmemb * size, file, line);
+    _hypo_alloc_unlock();
+  }
+
+  return ptr;
+}
+
+_HYPO_API void *
+_hypo_alloc_realloc(const char *file, int line, void *ptr, size_t size)
+{
+  void *result;
+  size_t i;
+
+  /* The old memory is released unless the reallocation fails */
+  _hypo_alloc_lock();
+  i = _hypo_alloc_find(ptr);
+  if (!(result = realloc(ptr, size)) && size) {
+    _hypo_alloc_unlock();
+    return result;
+  }
+
+  _hypo_alloc_remove(i);
+  if (result)
+    _hypo_alloc_add(result, size, file, line);
+  _hypo_alloc_unlock();
+
+  return result;
+}
+
+_HYPO_API void
+_hypo_alloc_free(const char *file, int line, void *ptr)
+{
+  _hypo_alloc_lock();
+  _hypo_alloc_remove(_hypo_alloc_find(ptr));
+  free(ptr);
+  _hypo_alloc_unlock();
+}
+
+_HYPO_API void
+_hypo_alloc_enable(void)
+{
+  _hypo_allocs.enabled = 1;
+}
+
+_HYPO_API const hypo_alloc_stats_t *
+hypo_alloc_stats(void)
+{
+  return &_hypo_allocs.stats;
+}
+
+/* Begin accounting for the allocations of a test */
+static void
+_hypo_alloc_begin(void)
+{
+  _hypo_alloc_lock();
+  _hypo_allocs.pending = 1;
+  _hypo_allocs.serial++;
+  memset(&_hypo_allocs.stats, 0, sizeof(_hypo_allocs.stats));
+  _hypo_alloc_unlock();
+}
+
+/* Report the allocations made during the current test, if enabled.
+ * For leaks, the location of one of the leaked allocations is given.
+ */
+static void
+_hypo_alloc_report(void)
+{
+  const hypo_alloc_stats_t *stats = &_hypo_allocs.stats;
+  size_t i;
+
+  if (!_hypo_allocs.enabled || !_hypo_allocs.pending)
+    return;
+
+  _hypo_alloc_lock();
+  _hypo_allocs.pending = 0;
+  printf(" [allocs %lu, frees %lu, bytes %lu, peak %lu", stats->allocs,
+	 stats->frees, (unsigned long)stats->bytes,
+	 (unsigned long)stats->peak);
+  if (stats->leaks) {
+    printf(", leaks %lu (%lu bytes", stats->leaks,
+	   (unsigned long)stats->live);
+    for (i = 0; i < _hypo_allocs.size; i++)
+      if (_hypo_allocs.table[i].ptr &&
+	  _hypo_allocs.table[i].serial == _hypo_allocs.serial) {
+	printf(", e.g., %s:%d", _hypo_allocs.table[i].file,
+	       _hypo_allocs.table[i].line);
+	break;
+      }
+    printf(")");
+  }
+  printf("]");
+  _hypo_alloc_unlock();
+}
+
+#line 2197 "runtime.c.tmpl"
+/* The virtual clock and the in-memory I/O are only included when
+ * used
+ */
+#ifndef _HYPO_HAVE_CLOCK
+# define _hypo_clock_reset()
+#endif
+#ifndef _HYPO_HAVE_FAKEIO
+# define _hypo_io_reset()
+#endif
+
+#ifdef _HYPO_HAVE_RUSAGE
+/* The performance counters collected around each test and benchmark */
+#define _HYPO_PERF_COUNTERS	6
+
+static const char *const _hypo_perf_names[_HYPO_PERF_COUNTERS] = {
+  "instructions", "cycles", "cache-misses", "task-clock",
+  "context-switches", "page-faults"
+};
+
+#ifdef _HYPO_HAVE_PERF
+/* The perf events for each counter.  The hardware events count only
+ * the user-space code of the test, and are unavailable in most
+ * virtual machines; the software events fall back to getrusage().
+ */
+static const struct {
+  unsigned int type;
+  unsigned long long config;
+} _hypo_perf_events[_HYPO_PERF_COUNTERS] = {
+  {PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS},
+  {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES},
+  {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CACHE_MISSES},
+  {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_TASK_CLOCK},
+  {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_CONTEXT_SWITCHES},
+  {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_PAGE_FAULTS}
+};
+#endif
+
+/* The state of the performance counters.  The counters are opened
+ * by each process which uses them, since a forked test process can't
+ * use the counters of its parent.
+ */
+static struct {
+  int enabled;			/* HYPO_PERF was set */
+  pid_t pid;			/* Process the counters were opened by */
+  int fds[_HYPO_PERF_COUNTERS];	/* Counter descriptors, or -1 */
+  double start[_HYPO_PERF_COUNTERS]; /* Values from getrusage() */
+  double values[_HYPO_PERF_COUNTERS]; /* Last measurement, or -1 */
+  int measured;			/* Measurement not yet reported */
+  int json;			/* HYPO_PERF_JSON descriptor, or -1 */
+} _hypo_perf = {0, 0, {-1, -1, -1, -1, -1, -1}, {0}, {0}, 0, -1};
+
+/* Obtain the values of the counters which getrusage() can provide */
+static void
+_hypo_rusage(double *values)
+{
+  struct rusage usage;
+
+  getrusage(RUSAGE_SELF, &usage);
+  values[0] = values[1] = values[2] = -1;
+  values[3] = (usage.ru_utime.tv_sec + usage.ru_stime.tv_sec) * 1e9 +
+    (usage.ru_utime.tv_usec + usage.ru_stime.tv_usec) * 1e3;
+  values[4] = (double)usage.ru_nvcsw + usage.ru_nivcsw;
+  values[5] = (double)usage.ru_minflt + usage.ru_majflt;
+}
+
+/* Open the performance counters for the current process */
+static void
+_hypo_perf_open(void)
+{
+#ifdef _HYPO_HAVE_PERF
+  struct perf_event_attr attr;
+  int i;
+
+  for (i = 0; i < _HYPO_PERF_COUNTERS; i++) {
+    if (_hypo_perf.fds[i] >= 0)
+      close(_hypo_perf.fds[i]);
+
+    memset(&attr, 0, sizeof(attr));
+    attr.size = sizeof(attr);
+    attr.type = _hypo_perf_events[i].type;
+    attr.config = _hypo_perf_events[i].config;
+    attr.disabled = 1;
+    attr.inherit = 1;
+    attr.exclude_kernel = attr.type == PERF_TYPE_HARDWARE;
+    attr.exclude_hv = 1;
+    attr.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED |
+      PERF_FORMAT_TOTAL_TIME_RUNNING;
+
+    _hypo_perf.fds[i] = (int)syscall(SYS_perf_event_open, &attr, 0, -1, -1,
+				     0);
+  }
+#endif
+
+  _hypo_perf.pid = getpid();
+}
+
+/* Start measuring a test or benchmark */
+static void
+_hypo_perf_start(void)
+{
+#ifdef _HYPO_HAVE_PERF
+  int i;
+#endif
+
+  if (!_hypo_perf.enabled)
+    return;
+  else if (_hypo_perf.pid != getpid())
+    _hypo_perf_open();
+
+  _hypo_rusage(_hypo_perf.start);
+#ifdef _HYPO_HAVE_PERF
+  for (i = 0; i < _HYPO_PERF_COUNTERS; i++)
+    if (_hypo_perf.fds[i] >= 0) {
+      ioctl(_hypo_perf.fds[i], PERF_EVENT_IOC_RESET, 0);
+      ioctl(_hypo_perf.fds[i], PERF_EVENT_IOC_ENABLE, 0);
+    }
+#endif
+}
+
+/* Stop measuring a test or benchmark, saving the values of the
+ * counters.  A counter which is not available has a value of -1.
+ */
+static void
+_hypo_perf_stop(void)
+{
+  double now[_HYPO_PERF_COUNTERS];
+  int i;
+#ifdef _HYPO_HAVE_PERF
+  unsigned long long data[3];
+#endif
+
+  if (!_hypo_perf.enabled)
+    return;
+
+  _hypo_rusage(now);
+  for (i = 0; i < _HYPO_PERF_COUNTERS; i++) {
+    _hypo_perf.values[i] = now[i] < 0 ? -1 : now[i] - _hypo_perf.start[i];
+
+#ifdef _HYPO_HAVE_PERF
+    /* Prefer the perf counter, scaled if it was multiplexed */
+    if (_hypo_perf.fds[i] < 0)
+      continue;
+    ioctl(_hypo_perf.fds[i], PERF_EVENT_IOC_DISABLE, 0);
+    if (read(_hypo_perf.fds[i], data, sizeof(data)) == sizeof(data) &&
+	data[2])
+      _hypo_perf.values[i] = (double)data[0] * data[1] / data[2];
+#endif
+  }
+
+  _hypo_perf.measured = 1;
+}
+
+/* Report the last measurement of the counters, scaled by the given
+ * number of iterations.  The counters are emitted to standard output,
+ * and as a line of JSON to the file named by HYPO_PERF_JSON.
+ */
+static void
+_hypo_perf_report(hypo_context_t *hypo_ctx, const char *kind,
+		  double iterations)
+{
+  char buf[1024];
+  int i, prec = iterations > 1 ? 2 : 0, len, sep = 0;
+
+  if (!_hypo_perf.measured)
+    return;
+  _hypo_perf.measured = 0;
+
+  len = snprintf(buf, sizeof(buf),
+		 "{\"suite\": \"%s\", \"%s\": \"%s\", \"counters\": {",
+		 hypo_ctx->test_fname, kind, hypo_ctx->cur_test);
+  printf(" [");
+  for (i = 0; i < _HYPO_PERF_COUNTERS; i++) {
+    if (_hypo_perf.values[i] < 0)
+      continue;
+
+    printf("%s%s %.*f", sep ? ", " : "", _hypo_perf_names[i], prec,
+	   _hypo_perf.values[i] / iterations);
+    if (len < (int)sizeof(buf))
+      len += snprintf(buf + len, sizeof(buf) - len, "%s\"%s\": %.*f",
+		      sep ? ", " : "", _hypo_perf_names[i], prec,
+		      _hypo_perf.values[i] / iterations);
+    sep = 1;
+  }
+  printf("]");
+
+  /* Each line is written at once, since forked test processes share
+   * the file
+   */
+  if (_hypo_perf.json >= 0 && len < (int)sizeof(buf) - 3) {
+    len += snprintf(buf + len, sizeof(buf) - len, "}}\n");
+    if (write(_hypo_perf.json, buf, len) < 0)
+      perror("Unable to save performance counters");
+  }
+}
+
+/* Enable the performance counters if the HYPO_PERF environment
+ * variable is set to a non-empty value other than "0"
+ */
+static void
+_hypo_perf_init(void)
+{
+  const char *perf = getenv("HYPO_PERF");
+  const char *json_fname = getenv("HYPO_PERF_JSON");
+
+  if (!perf || !*perf || !strcmp(perf, "0"))
+    return;
+
+  _hypo_perf.enabled = 1;
+  _hypo_perf.json = -1;
+  if (json_fname && *json_fname &&
+      (_hypo_perf.json = open(json_fname, O_WRONLY | O_CREAT | O_TRUNC |
+			      O_APPEND, 0666)) < 0)
+    perror(json_fname);
+
+  _hypo_perf_open();
+}
+#else
+# define _hypo_perf_init()
+# define _hypo_perf_start()
+# define _hypo_perf_stop()
+# define _hypo_perf_report(hypo_ctx, kind, iterations)
+#endif /* _HYPO_HAVE_RUSAGE */
+
+#ifdef _HYPO_HAVE_PROF
+/* The rate at which the profiler samples the program counter */
+#ifndef HYPO_PROFILE_HZ
+# define HYPO_PROFILE_HZ	1000
+#endif
+
+/* The number of distinct samples the profiler can record; must be a
+ * power of 2
+ */
+#ifndef HYPO_PROFILE_SLOTS
+# define HYPO_PROFILE_SLOTS	16384
+#endif
+
+/* Extract the program counter from the context of a signal.  The
+ * register indices are REG_RIP and REG_EIP, which are only defined
+ * with _GNU_SOURCE.
+ */
+#if defined(__x86_64__)
+# define _hypo_prof_pc(uc)	((unsigned long)(uc)->uc_mcontext.gregs[16])
+#elif defined(__i386__)
+# define _hypo_prof_pc(uc)	((unsigned long)(uc)->uc_mcontext.gregs[14])
+#else
+# define _hypo_prof_pc(uc)	((unsigned long)(uc)->uc_mcontext.pc)
+#endif
+
+/* A sample of the program counter, counted for a test.  The name of
+ * the test is 0 outside of the tests; the case index is -1 unless
+ * the test is parameterized.
+ */
+typedef struct {
+  const char *name;
+  int index;
+  unsigned long pc;
+  unsigned long count;
+} _hypo_prof_sample_t;
+
+/* The state of the profiler.  The samples are kept in a hash table
+ * which is allocated before the profiler is started, so the signal
+ * handler need not allocate memory.  The fd is -1 if profiling was
+ * not requested.
+ */
+static struct {
+  int fd;
+  const char *suite;
+  const char *volatile name;
+  volatile int index;
+  _hypo_prof_sample_t *table;
+  size_t used;
+  unsigned long dropped;
+} _hypo_prof = {-1, 0, 0, -1, 0, 0, 0};
+
+#ifdef HYPO_THREADS
+/* Set while a thread is recording a sample; a sample taken by
+ * another thread meanwhile is dropped
+ */
+static volatile int _hypo_prof_busy = 0;
+#endif
+
+/* Record a sample of the program counter for the current test */
+static void
+_hypo_prof_sample(int signo, siginfo_t *info, void *context)
+{
+  unsigned long pc = _hypo_prof_pc((ucontext_t *)context);
+  const char *name = _hypo_prof.name;
+  int index = _hypo_prof.index;
+  _hypo_prof_sample_t *sample;
+  size_t i, mask = HYPO_PROFILE_SLOTS - 1;
+
+  (void)signo;
+  (void)info;
+
+#ifdef HYPO_THREADS
+  if (__sync_lock_test_and_set(&_hypo_prof_busy, 1)) {
+    _hypo_prof.dropped++;
+    return;
+  }
+#endif
+
+  /* Find the sample, adding it if the table has room */
+  for (i = (((pc >> 2) ^ (size_t)name ^ (size_t)index) * 2654435761u) & mask;
+       ; i = (i + 1) & mask) {
+    sample = &_hypo_prof.table[i];
+    if (!sample->count) {
+      if (_hypo_prof.used >= HYPO_PROFILE_SLOTS / 4 * 3) {
+	sample = 0;
+	_hypo_prof.dropped++;
+	break;
+      }
+
+      sample->name = name;
+      sample->index = index;
+      sample->pc = pc;
+      _hypo_prof.used++;
+      break;
+    } else if (sample->pc == pc && sample->name == name &&
+	       sample->index == index)
+      break;
+  }
+
+  if (sample)
+    sample->count++;
+
+#ifdef HYPO_THREADS
+  __sync_lock_release(&_hypo_prof_busy);
+#endif
+}
+
+/* Start (or, if run is 0, stop) the profiling timer */
+static void
+_hypo_prof_timer(int run)
+{
+  struct itimerval timer;
+
+  memset(&timer, 0, sizeof(timer));
+  if (run) {
+    timer.it_interval.tv_usec = 1000000 / HYPO_PROFILE_HZ;
+    timer.it_value = timer.it_interval;
+  }
+
+  setitimer(ITIMER_PROF, &timer, 0);
+}
+
+/* Attribute the following samples to a test.  The name of the test,
+ * which must not be freed, is 0 outside of the tests; the case index
+ * is -1 unless the test is parameterized.
+ */
+static void
+_hypo_prof_attribute(const char *name, int index)
+{
+  _hypo_prof.name = 0;
+  _hypo_prof.index = index;
+  _hypo_prof.name = name;
+}
+
+/* Discard the samples inherited by a newly forked process, and start
+ * profiling it; timers are not inherited.
+ */
+static void
+_hypo_prof_fork(void)
+{
+  if (_hypo_prof.fd < 0)
+    return;
+
+  memset(_hypo_prof.table, 0,
+	 HYPO_PROFILE_SLOTS * sizeof(_hypo_prof_sample_t));
+  _hypo_prof.used = 0;
+  _hypo_prof.dropped = 0;
+  _hypo_prof_timer(1);
+}
+
+/* A mapping of an executable file into memory.  The bias is
+ * subtracted from addresses in the mapping to give the addresses
+ * used by the file's symbol table.
+ */
+typedef struct {
+  unsigned long start;
+  unsigned long end;
+  unsigned long bias;
+  char *path;
+} _hypo_prof_map_t;
+
+/* Copy a string, aborting if there is no memory for it */
+static char *
+_hypo_prof_strdup(const char *str)
+{
+  size_t len = strlen(str) + 1;
+  char *copy;
+
+  if (!(copy = (char *)malloc(len)))
+    abort(); /* Not much else we can do */
+
+  return (char *)memcpy(copy, str, len);
+}
+
+/* Read the executable mappings of the current process.  Addresses in
+ * position-independent files are relative to the start of their
+ * first mapping, which holds the ELF header.
+ */
+static _hypo_list_t
+_hypo_prof_maps(void)
+{
+  _hypo_list_t maps = _HYPO_LIST_INIT(_hypo_prof_map_t);
+  _hypo_prof_map_t *map;
+  unsigned long start, end, offset, base = 0;
+  char line[4200], perms[8], *path, *base_path = 0;
+  const unsigned char *ehdr;
+  int pos;
+  FILE *stream;
+
+  if (!(stream = fopen("/proc/self/maps", "r")))
+    return maps;
+
+  while (fgets(line, sizeof(line), stream)) {
+    pos = 0;
+    if (sscanf(line, "%lx-%lx %7s %lx %*s %*s %n",
+	       &start, &end, perms, &offset, &pos) < 4 || !pos)
+      continue;
+    path = line + pos;
+    path[strcspn(path, "\n")] = '\0';
+    if (!*path)
+      continue;
+
+    /* Remember where each file starts */
+    if (!offset && perms[0] == 'r') {
+      base = start;
+      free(base_path);
+      base_path = _hypo_prof_strdup(path);
+    }
+    if (perms[2] != 'x')
+      continue;
+
+    map = (_hypo_prof_map_t *)_hypo_list_alloc(&maps);
+    map->start = start;
+    map->end = end;
+    map->bias = 0;
+    map->path = _hypo_prof_strdup(path);
+
+    /* Position-independent files are of type ET_DYN */
+    ehdr = (const unsigned char *)base;
+    if (base_path && !strcmp(path, base_path) &&
+	!memcmp(ehdr, "\177ELF", 4) &&
+	*(const unsigned short *)(ehdr + 16) == 3)
+      map->bias = base;
+  }
+
+  free(base_path);
+  fclose(stream);
+
+  return maps;
+}
+
+/* Write the samples of the current process to the profile, one line
+ * for each test and address, and stop profiling.  The lines are in
+ * the "folded stack" format, giving the test, the file containing
+ * the address and the address within it, and the count; e.g.,
+ * "test.hypo::check_count;/path/to/test+0x1189 42".
+ */
+static void
+_hypo_prof_dump(void)
+{
+  _hypo_list_t maps;
+  _hypo_prof_map_t *map;
+  _hypo_prof_sample_t *sample;
+  char line[4400], index[3 * sizeof(int) + 3];
+  unsigned int i, j;
+  int len;
+
+  if (_hypo_prof.fd < 0)
+    return;
+
+  _hypo_prof_timer(0);
+  maps = _hypo_prof_maps();
+
+  for (i = 0; i < HYPO_PROFILE_SLOTS; i++) {
+    sample = &_hypo_prof.table[i];
+    if (!sample->count)
+      continue;
+
+    /* Find the file containing the address */
+    for (j = 0; j < _hypo_list_len(&maps); j++) {
+      map = (_hypo_prof_map_t *)_hypo_list_ref(&maps, j);
+      if (sample->pc >= map->start && sample->pc < map->end)
+	break;
+    }
+    if (j >= _hypo_list_len(&maps))
+      map = 0;
+
+    index[0] = '\0';
+    if (sample->index >= 0)
+      snprintf(index, sizeof(index), "[%d]", sample->index);
+    len = snprintf(line, sizeof(line), "%s%s%s%s;%s+0x%lx %lu\n",
+		   _hypo_prof.suite, sample->name ? "::" : "",
+		   sample->name ? sample->name : "", index,
+		   map ? map->path : "[unknown]",
+		   sample->pc - (map ? map->bias : 0), sample->count);
+    if (len >= (int)sizeof(line))
+      continue;
+    if (write(_hypo_prof.fd, line, len) < 0) {
+      perror("Unable to save profile");
+      break;
+    }
+  }
+
+  if (_hypo_prof.dropped)
+    fprintf(stderr, "%s: %lu profile samples dropped\n", _hypo_prof.suite,
+	    _hypo_prof.dropped);
 
-  result = alloc();
+  for (j = 0; j < _hypo_list_len(&maps); j++)
+    free(((_hypo_prof_map_t *)_hypo_list_ref(&maps, j))->path);
+  _hypo_list_cleanup(&maps);
+}
+
+/* Start profiling if the HYPO_PROFILE environment variable names a
+ * file to write the profile to
+ */
+static void
+_hypo_prof_init(const char *test_fname)
+{
+  const char *fname = getenv("HYPO_PROFILE");
+  struct sigaction action;
+
+  if (!fname || !*fname)
+    return;
+
+  if ((_hypo_prof.fd = open(fname, O_WRONLY | O_CREAT | O_TRUNC |
+			    O_APPEND, 0666)) < 0) {
+    perror(fname);
+    return;
+  }
+  if (!(_hypo_prof.table = (_hypo_prof_sample_t *)calloc(
+	  HYPO_PROFILE_SLOTS, sizeof(_hypo_prof_sample_t))))
+    abort(); /* Not much else we can do */
+  _hypo_prof.suite = test_fname;
+
+  /* Restart interrupted system calls, so tests don't notice */
+  memset(&action, 0, sizeof(action));
+  action.sa_sigaction = _hypo_prof_sample;
+  action.sa_flags = SA_SIGINFO | SA_RESTART;
+  sigemptyset(&action.sa_mask);
+  sigaction(SIGPROF, &action, 0);
+
+  _hypo_prof_timer(1);
+}
+#else
+# define _hypo_prof_init(test_fname)
+# define _hypo_prof_attribute(name, index)
+# define _hypo_prof_fork()
+# define _hypo_prof_dump()
+#endif /* _HYPO_HAVE_PROF */
+
+/* Obtain the current time, in nanoseconds, from a monotonic clock */
+static double
+_hypo_now(void)
+{
+#ifdef CLOCK_MONOTONIC
+  struct timespec ts;
+
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return ts.tv_sec * 1e9 + ts.tv_nsec;
+#else
+  return clock() * (1e9 / CLOCKS_PER_SEC);
+#endif
+}
+
+/* The time, in seconds, a test ran before it was stopped for
+ * exceeding its timeout or a resource limit
+ */
+static double _hypo_elapsed = 0.0;
+
+/* Let the user know of the status of a test, along with its
+ * allocations and performance counters, and reset the failure flags
+ * for the next test.
+ */
+static void
+_hypo_status(hypo_context_t *hypo_ctx)
+{
+  if (hypo_ctx->flags & (_HYPO_FLAG_TIMEOUT | _HYPO_FLAG_LIMIT))
+    printf("%s [elapsed %.3f s]",
+	   (hypo_ctx->flags & _HYPO_FLAG_TIMEOUT) ? "TIMEOUT" : "LIMIT",
+	   _hypo_elapsed);
+  else
+    printf((hypo_ctx->flags & _HYPO_FLAG_FAIL) ? "FAIL" : "PASS");
+  _hypo_alloc_report();
+  _hypo_perf_report(hypo_ctx, "test", 1);
+  printf("\n");
+  hypo_ctx->flags &= ~(_HYPO_FLAG_FAIL | _HYPO_FLAG_TIMEOUT |
+		       _HYPO_FLAG_LIMIT);
+}
+
+/* The number of times a test is run: once for each case of a
+ * parameterized test, otherwise once
+ */
+#define _hypo_ncases(test) ((test)->cases ? (test)->cases : 1)
+
+/* Select a case of a test, and set the current test to its name.
+ * The cases of a parameterized test are named "name[i]".
+ */
+static void
+_hypo_case_begin(hypo_context_t *hypo_ctx, const _hypo_test_t *test,
+		 unsigned int i)
+{
+  size_t len;
+  char *name;
+
+  hypo_ctx->case_index = i;
+  hypo_ctx->cur_test = test->name;
+  if (!test->cases)
+    return;
+
+  len = strlen(test->name) + 3 * sizeof(i) + 3;
+  if (!(name = (char *)malloc(len)))
+    abort(); /* Not much else we can do */
+  snprintf(name, len, "%s[%u]", test->name, i);
+  hypo_ctx->cur_test = name;
+}
+
+/* Finish a case of a test.  The name of a case of a parameterized
+ * test is released, unless a failure recorded since count refers to
+ * it.
+ */
+static void
+_hypo_case_end(hypo_context_t *hypo_ctx, const _hypo_test_t *test,
+	       unsigned int count)
+{
+  if (test->cases && _hypo_list_len(&hypo_ctx->failures) == count)
+    free((char *)hypo_ctx->cur_test);
+}
+
+/* Tell the user the fatal error stopped testing */
+static void
+_hypo_halted(hypo_context_t *hypo_ctx)
+{
+  printf("Testing halted due to fatal error in %s::%s\n",
+	 hypo_ctx->test_fname, hypo_ctx->cur_test);
+}
+
+#ifdef _HYPO_HAVE_FORK
+/* Exit codes of a test process which has sent its result */
+#define _HYPO_EXIT_SENT		0x68
+#define _HYPO_EXIT_SENT_FATAL	0x69
+
+/* Write all of a buffer to a file descriptor.  If the write fails,
+ * this will abort().
+ */
+static void
+_hypo_write(int fd, const void *buf, size_t len)
+{
+  const unsigned char *ptr = (const unsigned char *)buf;
+  ssize_t count;
+
+  while (len) {
+    if ((count = write(fd, ptr, len)) < 0) {
+      if (errno == EINTR)
+	continue;
+      abort(); /* Not much else we can do */
+    }
+
+    ptr += count;
+    len -= count;
+  }
+}
+
+/* Read all of a buffer from a file descriptor.  Returns 0 if the
+ * data could not be read, e.g., because the writer exited.
+ */
+static int
+_hypo_read(int fd, void *buf, size_t len)
+{
+  unsigned char *ptr = (unsigned char *)buf;
+  ssize_t count;
+
+  while (len) {
+    if ((count = read(fd, ptr, len)) < 0) {
+      if (errno == EINTR)
+	continue;
+      return 0;
+    } else if (!count)
+      return 0;
+
+    ptr += count;
+    len -= count;
+  }
+
+  return 1;
+}
+
+/* Write a string, which may be 0, to a file descriptor */
+static void
+_hypo_send_str(int fd, const char *str)
+{
+  int len = str ? (int)strlen(str) : -1;
+
+  _hypo_write(fd, &len, sizeof(len));
+  if (len > 0)
+    _hypo_write(fd, str, len);
+}
+
+/* Read a string written by _hypo_send_str().  The string is
+ * allocated with malloc().  Returns 0 if the string could not be
+ * read.
+ */
+static int
+_hypo_recv_str(int fd, char **str)
+{
+  int len;
+
+  *str = 0;
+  if (!_hypo_read(fd, &len, sizeof(len)))
+    return 0;
+  else if (len < 0)
+    return 1;
+
+  if (!(*str = (char *)malloc(len + 1)))
+    abort(); /* Not much else we can do */
+  if (!_hypo_read(fd, *str, len)) {
+    free(*str);
+    *str = 0;
+    return 0;
+  }
+  (*str)[len] = '\0';
+
+  return 1;
+}
+
+/* Send the result of a test to the main process.  This consists of
+ * the name of the test, the flags, and the failures, which are then
+ * discarded.
+ */
+static void
+_hypo_send_result(int fd, hypo_context_t *hypo_ctx)
+{
+  unsigned int i, count = _hypo_list_len(&hypo_ctx->failures);
+  _hypo_failure_t *failure;
+
+  _hypo_send_str(fd, hypo_ctx->cur_test);
+  _hypo_write(fd, &hypo_ctx->flags, sizeof(hypo_ctx->flags));
+  _hypo_write(fd, &count, sizeof(count));
+  for (i = 0; i < count; i++) {
+    failure = (_hypo_failure_t *)_hypo_list_ref(&hypo_ctx->failures, i);
+    _hypo_send_str(fd, failure->file);
+    _hypo_write(fd, &failure->line, sizeof(failure->line));
+    _hypo_send_str(fd, failure->expr);
+    _hypo_write(fd, &failure->value, sizeof(failure->value));
+    _hypo_send_str(fd, failure->msg);
+  }
+
+  _hypo_list_cleanup(&hypo_ctx->failures);
+}
+
+/* Receive the result of a test, adding its failures to the context
+ * and setting the current test.  Returns 0 if there are no more
+ * results.
+ */
+static int
+_hypo_recv_result(int fd, hypo_context_t *hypo_ctx)
+{
+  _hypo_failure_t tmp, *failure;
+  unsigned int flags, i, count;
+  char *name;
+
+  if (!_hypo_recv_str(fd, &name) ||
+      !_hypo_read(fd, &flags, sizeof(flags)) ||
+      !_hypo_read(fd, &count, sizeof(count)))
+    return 0;
+
+  hypo_ctx->cur_test = name;
+  hypo_ctx->flags |= flags & _HYPO_FLAG_FATAL;
+
+  for (i = 0; i < count; i++) {
+    tmp.test_fname = hypo_ctx->test_fname;
+    tmp.test = name;
+    if (!_hypo_recv_str(fd, (char **)&tmp.file) ||
+	!_hypo_read(fd, &tmp.line, sizeof(tmp.line)) ||
+	!_hypo_recv_str(fd, (char **)&tmp.expr) ||
+	!_hypo_read(fd, &tmp.value, sizeof(tmp.value)) ||
+	!_hypo_recv_str(fd, (char **)&tmp.msg))
+      return 0;
+
+    failure = (_hypo_failure_t *)_hypo_list_alloc(&hypo_ctx->failures);
+    *failure = tmp;
+  }
+
+  return 1;
+}
+
+/* Wait for a process to exit, returning its status */
+static int
+_hypo_wait(pid_t pid)
+{
+  int status;
+
+  while (waitpid(pid, &status, 0) < 0)
+    if (errno != EINTR)
+      abort(); /* Not much else we can do */
+
+  return status;
+}
+
+/* Record a failure for a process which exited without sending a
+ * result.
+ */
+static void
+_hypo_abnormal(hypo_context_t *hypo_ctx, int status)
+{
+  static char msg[64];
+
+  if (WIFSIGNALED(status))
+    snprintf(msg, sizeof(msg), "Test process killed by signal %d",
+	     WTERMSIG(status));
+  else
+    snprintf(msg, sizeof(msg), "Test process exited with status %d",
+	     WEXITSTATUS(status));
+
+  _hypo_assert(hypo_ctx, 0, hypo_ctx->test_fname, 0, 0, 0, msg);
+}
+#endif /* _HYPO_HAVE_FORK */
+
+#ifdef _HYPO_HAVE_TIMEOUT
+/* The default timeout of a test, in seconds, from HYPO_TIMEOUT; 0
+ * if tests may run for as long as they like
+ */
+static double _hypo_timeout_default = 0.0;
+
+/* The timeout of a test, in seconds, or 0 if it has none */
+#define _hypo_timeout(test) \
+  ((test)->timeout > 0 ? (test)->timeout : _hypo_timeout_default)
+
+/* Set when the timer of a test expires */
+static volatile sig_atomic_t _hypo_expired = 0;
+
+/* Where to return to if the timer of a test run in the current
+ * process expires, and when the test was started
+ */
+static sigjmp_buf _hypo_timeout_env;
+static double _hypo_timeout_began = 0.0;
+
+/* Start the timer of a test.  If interval is non-zero, the timer
+ * keeps expiring every interval microseconds once the timeout has
+ * passed.  A timeout of 0 stops the timer.
+ */
+static void
+_hypo_timer(double timeout, long interval)
+{
+  struct itimerval timer;
+
+  memset(&timer, 0, sizeof(timer));
+  if (timeout > 0) {
+    timer.it_value.tv_sec = (time_t)timeout;
+    timer.it_value.tv_usec = (long)((timeout - timer.it_value.tv_sec) * 1e6);
+    if (!timer.it_value.tv_sec && !timer.it_value.tv_usec)
+      timer.it_value.tv_usec = 1;
+    timer.it_interval.tv_usec = interval;
+  }
+
+  setitimer(ITIMER_REAL, &timer, 0);
+}
+
+/* Note that the timer of a test in another process expired */
+static void
+_hypo_timer_expired(int signo)
+{
+  (void)signo;
+  _hypo_expired = 1;
+}
+
+/* Abandon a test which timed out in the current process, returning
+ * to _hypo_run_tests()
+ */
+static void
+_hypo_timer_jump(int signo)
+{
+  (void)signo;
+  siglongjmp(_hypo_timeout_env, 1);
+}
+
+/* Install the handler for the expiry of the timer of a test.  It
+ * does not restart system calls, so that waitpid() is interrupted.
+ */
+static void
+_hypo_timer_handler(void (*handler)(int))
+{
+  struct sigaction action;
+
+  memset(&action, 0, sizeof(action));
+  action.sa_handler = handler;
+  sigemptyset(&action.sa_mask);
+  sigaction(SIGALRM, &action, 0);
+}
+
+/* Mark the point to return to if the timer of a test run in the
+ * current process expires.  Evaluates to non-zero on that return.
+ */
+#define _hypo_timeout_jumped()	sigsetjmp(_hypo_timeout_env, 1)
+
+/* Start the timer of a test run in the current process, if it has a
+ * timeout
+ */
+static void
+_hypo_timeout_start(const _hypo_test_t *test)
+{
+  if (_hypo_timeout(test) <= 0)
+    return;
+
+  _hypo_timeout_began = _hypo_now();
+  _hypo_timer_handler(_hypo_timer_jump);
+  _hypo_timer(_hypo_timeout(test), 0);
+}
+
+/* Record the failure of a test which timed out in the current
+ * process, and report it.  The state of the test, and of the
+ * process, is unknown, so testing is halted; the failures are still
+ * reported as usual.
+ */
+static void
+_hypo_timeout_halt(hypo_context_t *hypo_ctx, const _hypo_test_t *test)
+{
+  static char msg[96];
+
+  _hypo_elapsed = (_hypo_now() - _hypo_timeout_began) / 1e9;
+  snprintf(msg, sizeof(msg),
+	   "Test timed out after %.3f seconds (timeout %g seconds)",
+	   _hypo_elapsed, _hypo_timeout(test));
+  _hypo_assert(hypo_ctx, _HYPO_FLAG_FATAL, test->file, test->line, 0, 0,
+	       msg);
+  hypo_ctx->flags |= _HYPO_FLAG_TIMEOUT;
+
+  _hypo_status(hypo_ctx);
+  printf("Testing halted due to timeout in %s::%s\n",
+	 hypo_ctx->test_fname, hypo_ctx->cur_test);
+}
+
+/* Stop the timer of a test run in the current process */
+#define _hypo_timeout_stop(test)		\
+  do {						\
+    if (_hypo_timeout(test) > 0)		\
+      _hypo_timer(0, 0);			\
+  } while (0)
+
+/* Apply the resource limits of a test to the current process.  The
+ * soft limits are lowered; the hard limits are left alone.
+ */
+static void
+_hypo_rlimit(const _hypo_test_t *test)
+{
+  struct rlimit limit;
+
+  if (test->cpu && !getrlimit(RLIMIT_CPU, &limit) &&
+      (limit.rlim_max == RLIM_INFINITY || test->cpu < limit.rlim_max)) {
+    limit.rlim_cur = test->cpu;
+    setrlimit(RLIMIT_CPU, &limit);
+  }
+
+  if (test->memory && !getrlimit(RLIMIT_AS, &limit) &&
+      (limit.rlim_max == RLIM_INFINITY || test->memory < limit.rlim_max)) {
+    limit.rlim_cur = test->memory;
+    setrlimit(RLIMIT_AS, &limit);
+  }
+}
+
+/* Wait for a test process to exit, returning its status.  If the
+ * test has a timeout, the process is killed when it expires, and
+ * timed_out is set.  The timer keeps expiring every 10ms after the
+ * timeout, so an expiry just before waitpid() is not missed.
+ */
+static int
+_hypo_wait_test(pid_t pid, const _hypo_test_t *test, int *timed_out)
+{
+  int status;
+
+  *timed_out = 0;
+  _hypo_expired = 0;
+  _hypo_timer(_hypo_timeout(test), 10000);
+
+  while (waitpid(pid, &status, 0) < 0) {
+    if (errno != EINTR)
+      abort(); /* Not much else we can do */
+    else if (_hypo_expired && !*timed_out) {
+      kill(pid, SIGKILL);
+      *timed_out = 1;
+    }
+  }
+
+  _hypo_timer(0, 0);
+
+  return status;
+}
+
+/* Record a failure for a test process which was stopped for
+ * exceeding its timeout or one of its resource limits.  Returns 0 if
+ * it was not.
+ */
+static int
+_hypo_limited(hypo_context_t *hypo_ctx, const _hypo_test_t *test,
+	      int status, int timed_out, double elapsed)
+{
+  static char msg[160];
+  unsigned int flag;
+
+  if (!WIFSIGNALED(status))
+    return 0;
+
+  /* Work out which limit was exceeded */
+  if (timed_out && WTERMSIG(status) == SIGKILL) {
+    snprintf(msg, sizeof(msg),
+	     "Test timed out after %.3f seconds (timeout %g seconds)",
+	     elapsed, _hypo_timeout(test));
+    flag = _HYPO_FLAG_TIMEOUT;
+  } else if (test->cpu && (WTERMSIG(status) == SIGXCPU ||
+			   WTERMSIG(status) == SIGKILL)) {
+    snprintf(msg, sizeof(msg),
+	     "Test exceeded its CPU limit of %u seconds after %.3f seconds",
+	     test->cpu, elapsed);
+    flag = _HYPO_FLAG_LIMIT;
+  } else if (test->memory) {
+    snprintf(msg, sizeof(msg),
+	     "Test process killed by signal %d after %.3f seconds; it may "
+	     "have exceeded its memory limit of %lu bytes",
+	     WTERMSIG(status), elapsed, test->memory);
+    flag = _HYPO_FLAG_LIMIT;
+  } else
+    return 0;
+
+  _hypo_assert(hypo_ctx, 0, test->file, test->line, 0, 0, msg);
+  hypo_ctx->flags |= flag;
+  _hypo_elapsed = elapsed;
+
+  return 1;
+}
+
+/* Test if a test has its own timeout or resource limits, which can
+ * only be enforced reliably in a forked process
+ */
+#define _hypo_has_limits(test) \
+  ((test)->timeout > 0 || (test)->cpu || (test)->memory)
+#else
+# define _hypo_timeout_jumped() 0
+# define _hypo_timeout_start(test)
+# define _hypo_timeout_halt(hypo_ctx, test)
+# define _hypo_timeout_stop(test)
+# define _hypo_timer_handler(handler)
+# define _hypo_rlimit(test)
+# define _hypo_wait_test(pid, test, timed_out) \
+  (*(timed_out) = 0, _hypo_wait(pid))
+# define _hypo_limited(hypo_ctx, test, status, timed_out, elapsed) \
+  ((void)(elapsed), 0)
+# define _hypo_has_limits(test) 0
+#endif /* _HYPO_HAVE_TIMEOUT */
+
+/* Tear down the file-scoped fixtures, in reverse order */
+static void
+_hypo_fix_teardown_all(hypo_context_t *hypo_ctx)
+{
+  _hypo_fix_deferred_t *deferred;
+  unsigned int i;
+
+  for (i = _hypo_list_len(&_hypo_fix_deferred); i > 0; i--) {
+    deferred = (_hypo_fix_deferred_t *)_hypo_list_ref(
+      &_hypo_fix_deferred, i - 1
+    );
+    hypo_ctx->cur_test = deferred->name;
+
+    printf("%s::%s (teardown)... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+    fflush(stdout);
+
+    deferred->teardown(hypo_ctx);
+    _hypo_mock_cleanup();
+    _hypo_clock_reset();
+    _hypo_io_reset();
+
+    _hypo_status(hypo_ctx);
+  }
+  _hypo_list_cleanup(&_hypo_fix_deferred);
+}
+
+#ifdef _HYPO_HAVE_FORK
+/* The "template" process for a group of tests sharing the same
+ * fixtures.  The fixtures are set up once, then each test is run in
+ * its own copy-on-write child process, so that every test starts
+ * from the same pristine state without paying for the set up again.
+ * If alone is non-zero, only the first test of the group is run.
+ * The file-scoped fixtures have already been set up by the main
+ * process.  The results are sent to the main process through fd.
+ * Does not return.
+ */
+static void
+_hypo_run_group(const char *test_fname, const _hypo_test_t *group,
+		int alone, int fd)
+{
+  hypo_context_t hypo_ctx = {0, 0, 0, _HYPO_LIST_INIT(_hypo_failure_t), 0};
+  const _hypo_test_t *test;
+  unsigned int i;
+  pid_t pid;
+  int status, timed_out, fatal = 0;
+  double start;
+
+  hypo_ctx.test_fname = test_fname;
+  hypo_ctx.cur_test = group->name;
+  _hypo_timer_handler(_hypo_timer_expired);
+
+  /* Set up the fixtures, once */
+  if (group->setup)
+    group->setup(&hypo_ctx);
+
+  /* Run each case of each test of the group in its own process */
+  for (test = group; test->name && !fatal && (!alone || test == group);
+       test++) {
+    if (test->setup != group->setup)
+      continue;
+
+    for (i = 0; i < _hypo_ncases(test) && !fatal; i++) {
+      _hypo_case_begin(&hypo_ctx, test, i);
+
+      fflush(stdout);
+      start = _hypo_now();
+      if ((pid = fork()) < 0)
+	abort(); /* Not much else we can do */
+      else if (!pid) {
+	printf("%s::%s... ", hypo_ctx.test_fname, hypo_ctx.cur_test);
+	fflush(stdout);
+
+	_hypo_rlimit(test);
+	_hypo_prof_fork();
+	_hypo_prof_attribute(test->name, test->cases ? (int)i : -1);
+	_hypo_alloc_begin();
+	_hypo_perf_start();
+	test->run(&hypo_ctx);
+	_hypo_perf_stop();
+	_hypo_prof_attribute(0, -1);
+
+	status = (hypo_ctx.flags & _HYPO_FLAG_FATAL) ?
+	  _HYPO_EXIT_SENT_FATAL : _HYPO_EXIT_SENT;
+	_hypo_status(&hypo_ctx);
+	fflush(stdout);
+	_hypo_send_result(fd, &hypo_ctx);
+	_hypo_prof_dump();
+	_exit(status);
+      }
+
+      /* Make sure the test process sent its result */
+      status = _hypo_wait_test(pid, test, &timed_out);
+      if (WIFEXITED(status) && WEXITSTATUS(status) == _HYPO_EXIT_SENT_FATAL)
+	fatal = 1;
+      else if (!WIFEXITED(status) ||
+	       WEXITSTATUS(status) != _HYPO_EXIT_SENT) {
+	/* The inherited failures have not been reported yet */
+	if (!_hypo_limited(&hypo_ctx, test, status, timed_out,
+			   (_hypo_now() - start) / 1e9))
+	  _hypo_abnormal(&hypo_ctx, status);
+	_hypo_status(&hypo_ctx);
+	_hypo_send_result(fd, &hypo_ctx);
+      }
+
+      /* The result was sent by value */
+      if (test->cases)
+	free((char *)hypo_ctx.cur_test);
+    }
+  }
+
+  /* The failures from the set up were reported with the tests */
+  _hypo_list_cleanup(&hypo_ctx.failures);
+  hypo_ctx.flags &= ~_HYPO_FLAG_FAIL;
+
+  /* Clean up the fixtures, once */
+  if (group->teardown) {
+    hypo_ctx.cur_test = group->name;
+
+    printf("%s::%s (teardown)... ", hypo_ctx.test_fname, hypo_ctx.cur_test);
+    fflush(stdout);
+
+    group->teardown(&hypo_ctx);
+
+    _hypo_status(&hypo_ctx);
+    _hypo_send_result(fd, &hypo_ctx);
+  }
+
+  fflush(stdout);
+  _hypo_prof_dump();
+  _exit(0);
+}
+
+/* Set up the file-scoped fixtures of a group of tests in the main
+ * process, so that they are set up only once, and are torn down only
+ * after all the tests have run.  If alone is non-zero, only the first
+ * test of the group is considered.  Returns non-zero if the set up
+ * encountered a fatal error.
+ */
+static int
+_hypo_file_setup_group(hypo_context_t *hypo_ctx, const _hypo_test_t *group,
+		       int alone)
+{
+  const _hypo_test_t *test;
+
+  for (test = group; test->name && (!alone || test == group); test++) {
+    if (test->setup != group->setup || !test->file_setup)
+      continue;
+
+    /* Set up the fixtures, reporting only failures */
+    hypo_ctx->cur_test = test->name;
+    test->file_setup(hypo_ctx);
+    _hypo_mock_cleanup();
+    _hypo_clock_reset();
+    _hypo_io_reset();
+    if (hypo_ctx->flags & (_HYPO_FLAG_FAIL | _HYPO_FLAG_FATAL)) {
+      printf("%s::%s (setup)... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+      _hypo_status(hypo_ctx);
+    }
+
+    /* Check if we encountered a fatal error */
+    if (hypo_ctx->flags & _HYPO_FLAG_FATAL) {
+      _hypo_halted(hypo_ctx);
+      return 1;
+    }
+  }
+
+  return 0;
+}
+
+/* Run a group of tests, or, if alone is non-zero, only the first
+ * test of the group, in a "template" process.  Returns non-zero if
+ * testing should stop because of a fatal error.
+ */
+static int
+_hypo_run_template(hypo_context_t *hypo_ctx, const _hypo_test_t *group,
+		   int alone)
+{
+  const char *fatal_test = 0;
+  int fds[2], status;
+  pid_t pid;
+
+  /* Set up the file-scoped fixtures first */
+  if (_hypo_file_setup_group(hypo_ctx, group, alone))
+    return 1;
+
+  /* Start the template process */
+  fflush(stdout);
+  if (pipe(fds) || (pid = fork()) < 0)
+    abort(); /* Not much else we can do */
+  else if (!pid) {
+    close(fds[0]);
+    _hypo_prof_fork();
+    _hypo_run_group(hypo_ctx->test_fname, group, alone, fds[1]);
+  }
+  close(fds[1]);
+
+  /* Collect the results */
+  hypo_ctx->cur_test = 0;
+  while (_hypo_recv_result(fds[0], hypo_ctx))
+    if (!fatal_test && (hypo_ctx->flags & _HYPO_FLAG_FATAL))
+      fatal_test = hypo_ctx->cur_test;
+  close(fds[0]);
+
+  /* Did the template process exit abnormally? */
+  status = _hypo_wait(pid);
+  if (!WIFEXITED(status) || WEXITSTATUS(status)) {
+    if (!hypo_ctx->cur_test) {
+      hypo_ctx->cur_test = group->name;
+      printf("%s::%s... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+    }
+    _hypo_abnormal(hypo_ctx, status);
+    _hypo_status(hypo_ctx);
+  }
+
+  /* Check if we encountered a fatal error */
+  if (fatal_test) {
+    hypo_ctx->cur_test = fatal_test;
+    _hypo_halted(hypo_ctx);
+    return 1;
+  }
 
-  hypo_assert(result == &test_data);
-  hypo_mock_checkcalls_malloc(expected, 1);
-#line 27 "test.c.tmpl"
+  return 0;
 }
-#line 23 "test.c.tmpl"
+
+/* Run the tests, forking a "template" process for each group of
+ * tests sharing the same fixtures.  The groups are run in the order
+ * of their first tests.
+ */
 static void
-hypo_test_allocate_failure(hypo_context_t *hypo_ctx)
+_hypo_run_forked(hypo_context_t *hypo_ctx, const _hypo_test_t *tests)
 {
-#line 38 "test.hypo"
-  hypo_mock_expectcalls_malloc expected[] = {
-    {0, sizeof(test_struct)}
-  };
-  struct test_struct *result;
+  const _hypo_test_t *group, *test;
+  unsigned char *done;
 
-  hypo_mock_addreturn_malloc(0);
+  /* Keep track of which tests have been run */
+  for (test = tests; test->name; test++)
+    ;
+  if (!(done = (unsigned char *)calloc(test - tests + 1, 1)))
+    abort(); /* Not much else we can do */
 
-  result = alloc();
+  for (group = tests; group->name; group++) {
+    if (done[group - tests])
+      continue;
+    for (test = group; test->name; test++)
+      if (test->setup == group->setup)
+	done[test - tests] = 1;
 
-  hypo_assert(result == 0);
-  hypo_mock_checkcalls_malloc(expected, 1);
-#line 27 "test.c.tmpl"
+    if (_hypo_run_template(hypo_ctx, group, 0))
+      break;
+  }
+
+  free(done);
 }
-#line 23 "test.c.tmpl"
-static void
-hypo_test_deallocate(hypo_context_t *hypo_ctx, test_struct * allocate)
-{
-#line 52 "test.hypo"
-  hypo_mock_expectcalls_free expected[] = {
-    {0, allocate}
-  };
+#endif /* _HYPO_HAVE_FORK */
 
-  hypo_mock_nospy_free();
+/* Run a case of a test in the current process, resetting the mocks
+ * it used.  Returns non-zero if the test timed out.
+ */
+static int
+_hypo_run_case(hypo_context_t *hypo_ctx, const _hypo_test_t *test,
+	       unsigned int i)
+{
+  /* Return here if the test times out */
+  if (_hypo_timeout_jumped())
+    return 1;
 
-  dealloc(allocate);
+  /* Set up the fixtures, run the test, and clean up */
+  _hypo_prof_attribute(test->name, test->cases ? (int)i : -1);
+  _hypo_timeout_start(test);
+  if (test->file_setup)
+    test->file_setup(hypo_ctx);
+  if (test->setup)
+    test->setup(hypo_ctx);
+  _hypo_alloc_begin();
+  _hypo_perf_start();
+  test->run(hypo_ctx);
+  _hypo_perf_stop();
+  if (test->teardown)
+    test->teardown(hypo_ctx);
+  _hypo_timeout_stop(test);
+  _hypo_mock_cleanup();
+  _hypo_clock_reset();
+  _hypo_io_reset();
+  _hypo_prof_attribute(0, -1);
 
-  hypo_mock_checkcalls_free(expected, 1);
-#line 27 "test.c.tmpl"
+  return 0;
 }
-#line 242 "master.c.tmpl"
+
+/* Run the tests in the current process, resetting the mocks used by
+ * each.  If fork_limited is non-zero, tests with their own timeout or
+ * resource limits are instead run in their own processes.
+ */
 static void
-_hypo_mock_cleanup(void)
+_hypo_run_tests(hypo_context_t *hypo_ctx, const _hypo_test_t *tests,
+		int fork_limited)
 {
-#line 218 "mock-void.c.tmpl"
-  _hypo_mock_cleanup_free();
-#line 258 "mock.c.tmpl"
-  _hypo_mock_cleanup_malloc();
-#line 250 "master.c.tmpl"
-}
+  const _hypo_test_t *test;
+  unsigned int i, count;
 
-int
-_hypo_run_tests(hypo_context_t *ctx)
-{
-#line 258 "master.c.tmpl"
-  ctx->test_fname = "test";
-#line 41 "fixture.c.tmpl"
-  test_struct * allocate;
-#line 52 "test.c.tmpl"
-  /* Save the test name */
-  hypo_ctx->cur_test = "allocate";
-
-  /* Let the user know what's being tested */
-  printf("%s::%s... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
-  fflush(stdout);
+  for (test = tests; test->name; test++) {
+#ifdef _HYPO_HAVE_FORK
+    /* Enforce the limits of the test in a forked process */
+    if (fork_limited && _hypo_has_limits(test)) {
+      if (_hypo_run_template(hypo_ctx, test, 1))
+	return;
+      continue;
+    }
+#endif
 
-  /* Initialize fixtures for allocate */
-#line 676 "test.c"
+    for (i = 0; i < _hypo_ncases(test); i++) {
+      /* Save the test name */
+      count = _hypo_list_len(&hypo_ctx->failures);
+      _hypo_case_begin(hypo_ctx, test, i);
 
-#line 61 "test.c.tmpl"
+      /* Let the user know what's being tested */
+      printf("%s::%s... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+      fflush(stdout);
 
-  /* Run the test */
-  hypo_test_allocate(hypo_ctx);
+      /* Run the test, giving up on the rest if it times out */
+      if (_hypo_run_case(hypo_ctx, test, i)) {
+	_hypo_timeout_halt(hypo_ctx, test);
+	return;
+      }
 
-  /* Clean up the fixtures for allocate */
-#line 684 "test.c"
+      /* Let the user know of the status of the test */
+      _hypo_status(hypo_ctx);
 
-#line 67 "test.c.tmpl"
+      /* Check if we encountered a fatal error */
+      if (hypo_ctx->flags & _HYPO_FLAG_FATAL) {
+	_hypo_halted(hypo_ctx);
+	return;
+      }
 
-  /* Finally, clean up the mocks for allocate */
-  _hypo_mock_cleanup();
+      _hypo_case_end(hypo_ctx, test, count);
+    }
+  }
+}
 
-  /* Let the user know of the status of the test */
-  printf((hypo_ctx->flags & _HYPO_FLAG_FAIL) ? "FAIL\n" : "PASS\n");
-  hypo_ctx->flags &= ~_HYPO_FLAG_FAIL;
+/* The time each sample of a benchmark should take, in nanoseconds */
+#ifndef HYPO_BENCH_SAMPLE_NS
+# define HYPO_BENCH_SAMPLE_NS	10000000.0
+#endif
 
-  /* Check if we encountered a fatal error while running allocate */
-  if (hypo_ctx->flags & _HYPO_FLAG_FATAL)
-    return 0;
+/* The most iterations each sample of a benchmark may run.  A
+ * benchmark too fast to time, such as one the compiler optimized
+ * away, is run this many times.
+ */
+#ifndef HYPO_BENCH_MAX_ITERATIONS
+# define HYPO_BENCH_MAX_ITERATIONS	1000000000UL
+#endif
 
-#line 52 "test.c.tmpl"
-  /* Save the test name */
-  hypo_ctx->cur_test = "allocate_failure";
+/* The number of samples of each benchmark, if HYPO_BENCH does not
+ * give one
+ */
+#define _HYPO_BENCH_SAMPLES	20
 
-  /* Let the user know what's being tested */
-  printf("%s::%s... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
-  fflush(stdout);
+/* Test if a sample is a finite, non-negative time */
+#define _hypo_sample_valid(x)	((x) >= 0 && (x) <= DBL_MAX)
 
-  /* Initialize fixtures for allocate_failure */
-#line 708 "test.c"
+/* Compare two samples, for qsort() */
+static int
+_hypo_sample_cmp(const void *a, const void *b)
+{
+  double x = *(const double *)a, y = *(const double *)b;
 
-#line 61 "test.c.tmpl"
+  return x < y ? -1 : x > y;
+}
 
-  /* Run the test */
-  hypo_test_allocate_failure(hypo_ctx);
+/* Write a string to a JSON file, quoting it */
+static void
+_hypo_json_str(FILE *json, const char *str)
+{
+  fputc('"', json);
+  for (; *str; str++)
+    if (*str == '"' || *str == '\\')
+      fprintf(json, "\\%c", *str);
+    else if ((unsigned char)*str < ' ')
+      fprintf(json, "\\u%04x", *str);
+    else
+      fputc(*str, json);
+  fputc('"', json);
+}
 
-  /* Clean up the fixtures for allocate_failure */
-#line 716 "test.c"
+/* Run a benchmark.  The number of iterations is calibrated by
+ * doubling it until a run takes a significant fraction of the sample
+ * time, then scaling it to the sample time, between 1 and
+ * HYPO_BENCH_MAX_ITERATIONS; a warm-up run is made at the final
+ * number of iterations before the samples are taken.  Reports the
+ * minimum, median, and 99th percentile time per iteration, and, if
+ * json is not 0, writes the samples to it.  Samples which are not
+ * finite are reported as invalid, and are not written.
+ */
+static void
+_hypo_bench(hypo_context_t *hypo_ctx, const _hypo_bench_t *bench,
+	    unsigned int nsamples, FILE *json)
+{
+  double start, elapsed, scaled, *samples;
+  unsigned long iterations = 1;
+  unsigned int i, invalid = 0;
 
-#line 67 "test.c.tmpl"
+  if (!(samples = (double *)malloc(sizeof(double) * nsamples)))
+    abort(); /* Not much else we can do */
 
-  /* Finally, clean up the mocks for allocate_failure */
-  _hypo_mock_cleanup();
+  /* Calibrate the number of iterations, bailing out on failure */
+  for (;;) {
+    start = _hypo_now();
+    bench->run(hypo_ctx, iterations);
+    elapsed = _hypo_now() - start;
 
-  /* Let the user know of the status of the test */
-  printf((hypo_ctx->flags & _HYPO_FLAG_FAIL) ? "FAIL\n" : "PASS\n");
-  hypo_ctx->flags &= ~_HYPO_FLAG_FAIL;
+    if (hypo_ctx->flags & _HYPO_FLAG_FAIL)
+      goto done;
+    else if (elapsed >= HYPO_BENCH_SAMPLE_NS / 10 ||
+	     iterations >= HYPO_BENCH_MAX_ITERATIONS / 2)
+      break;
 
-  /* Check if we encountered a fatal error while running allocate_failure */
-  if (hypo_ctx->flags & _HYPO_FLAG_FATAL)
-    return 0;
+    iterations <<= 1;
+  }
 
-#line 52 "test.c.tmpl"
-  /* Save the test name */
-  hypo_ctx->cur_test = "deallocate";
+  /* Scale the iterations to the sample time, clamping the result;
+   * an elapsed time of 0 means the run was too fast to time
+   */
+  if (elapsed < HYPO_BENCH_SAMPLE_NS) {
+    scaled = elapsed > 0 ? iterations * (HYPO_BENCH_SAMPLE_NS / elapsed) :
+      HYPO_BENCH_MAX_ITERATIONS;
+    if (!(scaled < HYPO_BENCH_MAX_ITERATIONS))
+      iterations = HYPO_BENCH_MAX_ITERATIONS;
+    else if (scaled > 1)
+      iterations = (unsigned long)scaled;
+  }
 
-  /* Let the user know what's being tested */
-  printf("%s::%s... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
-  fflush(stdout);
+  /* Warm up, then take the samples */
+  bench->run(hypo_ctx, iterations);
+  _hypo_perf_start();
+  for (i = 0; i < nsamples && !(hypo_ctx->flags & _HYPO_FLAG_FAIL); i++) {
+    start = _hypo_now();
+    bench->run(hypo_ctx, iterations);
+    samples[i] = (_hypo_now() - start) / iterations;
+    if (!_hypo_sample_valid(samples[i]))
+      invalid++;
+  }
 
-  /* Initialize fixtures for deallocate */
-#line 740 "test.c"
-  allocate = hypo_fix_setup_allocate(hypo_ctx);
-#line 61 "test.c.tmpl"
+  /* Report the samples, unless a misbehaving timer spoiled them */
+  if (!(hypo_ctx->flags & _HYPO_FLAG_FAIL) && invalid)
+    printf("invalid: %u of %u samples of %lu iterations were not valid "
+	   "times\n", invalid, nsamples, iterations);
+  else if (!(hypo_ctx->flags & _HYPO_FLAG_FAIL)) {
+    _hypo_perf_stop();
 
-  /* Run the test */
-  hypo_test_deallocate(hypo_ctx, allocate);
+    /* Save the samples, in the order they were taken */
+    if (json) {
+      fprintf(json, "%s\n    ", ftell(json) > 0 ? "," : "{");
+      _hypo_json_str(json, bench->name);
+      fprintf(json, ": {\"iterations\": %lu, \"samples\": [", iterations);
+      for (i = 0; i < nsamples; i++)
+	fprintf(json, "%s%.3f", i ? ", " : "", samples[i]);
+      fprintf(json, "]}");
+    }
 
-  /* Clean up the fixtures for deallocate */
-#line 748 "test.c"
+    qsort(samples, nsamples, sizeof(double), _hypo_sample_cmp);
+    printf("min %.2f ns, median %.2f ns, p99 %.2f ns "
+	   "(%u samples of %lu iterations)", samples[0],
+	   (samples[(nsamples - 1) / 2] + samples[nsamples / 2]) / 2,
+	   samples[(99 * nsamples + 99) / 100 - 1], nsamples, iterations);
+    _hypo_perf_report(hypo_ctx, "bench", (double)nsamples * iterations);
+    printf("\n");
+  }
 
-#line 67 "test.c.tmpl"
+ done:
+  if (hypo_ctx->flags & _HYPO_FLAG_FAIL)
+    _hypo_status(hypo_ctx);
+  free(samples);
+}
 
-  /* Finally, clean up the mocks for deallocate */
-  _hypo_mock_cleanup();
+/* Run the benchmarks in a table.  Each benchmark's fixtures are set
+ * up once, and mocks are quiet while the benchmark runs.  If the
+ * HYPO_BENCH_JSON environment variable names a file, the samples of
+ * each benchmark are written to it, keyed by the test file name and
+ * the benchmark name.
+ */
+static void
+_hypo_run_benches(hypo_context_t *hypo_ctx, const _hypo_bench_t *benches,
+		  unsigned int nsamples)
+{
+  const _hypo_bench_t *bench;
+  const char *json_fname = getenv("HYPO_BENCH_JSON");
+  FILE *json = 0, *body = 0;
+  int c;
 
-  /* Let the user know of the status of the test */
-  printf((hypo_ctx->flags & _HYPO_FLAG_FAIL) ? "FAIL\n" : "PASS\n");
-  hypo_ctx->flags &= ~_HYPO_FLAG_FAIL;
+  /* The benchmarks are written to a temporary file first, since the
+   * document can't be completed until they have all been run
+   */
+  if (json_fname && *json_fname && !(body = tmpfile()))
+    perror("Unable to save benchmark results");
 
-  /* Check if we encountered a fatal error while running deallocate */
-  if (hypo_ctx->flags & _HYPO_FLAG_FATAL)
-    return 0;
+  for (bench = benches; bench->name; bench++) {
+    hypo_ctx->cur_test = bench->name;
 
-#line 266 "master.c.tmpl"
-  /* Clear the test name */
-  hypo_ctx->cur_test = 0;
+    /* Let the user know what's being measured */
+    printf("%s::%s (bench)... ", hypo_ctx->test_fname, hypo_ctx->cur_test);
+    fflush(stdout);
 
-  return 1;
+    /* Set up the fixtures, run the benchmark, and clean up */
+    _hypo_prof_attribute(bench->name, -1);
+    if (bench->setup)
+      bench->setup(hypo_ctx);
+    _hypo_mock_quiet = 1;
+    _hypo_bench(hypo_ctx, bench, nsamples, body);
+    _hypo_mock_quiet = 0;
+    if (bench->teardown)
+      bench->teardown(hypo_ctx);
+    _hypo_mock_cleanup();
+    _hypo_clock_reset();
+    _hypo_io_reset();
+    _hypo_prof_attribute(0, -1);
+
+    /* Check if we encountered a fatal error */
+    if (hypo_ctx->flags & _HYPO_FLAG_FATAL) {
+      _hypo_halted(hypo_ctx);
+      break;
+    }
+  }
+
+  /* Write out the results */
+  if (!body)
+    return;
+  else if (!(json = fopen(json_fname, "w"))) {
+    perror(json_fname);
+    fclose(body);
+    return;
+  }
+
+  fprintf(json, "{\"suites\": {\n  ");
+  _hypo_json_str(json, hypo_ctx->test_fname);
+  fprintf(json, ": ");
+  if (ftell(body) > 0) {
+    rewind(body);
+    while ((c = getc(body)) != EOF)
+      putc(c, json);
+    fprintf(json, "\n  }");
+  } else
+    fprintf(json, "{}");
+  fprintf(json, "\n}}\n");
+
+  fclose(body);
+  if (fclose(json))
+    perror(json_fname);
 }
 
-int
-(main)(int argc, char **argv)
+/* Run the tests in a table, then the benchmarks, and report any
+ * failures.  If the HYPO_FORK environment variable is set to a
+ * non-empty value other than "0", each test is run in its own
+ * process, forked from a process which has set up its fixtures;
+ * otherwise, the tests are run in the current process, except that,
+ * if it is not set, tests with their own timeout or resource limits
+ * are run in their own processes.
+ * The HYPO_TIMEOUT environment variable gives the timeout, in
+ * seconds, of tests which do not have their own, and the
+ * HYPO_PROFILE environment variable names a file to write a profile
+ * of the tests to.
+ * The benchmarks are only run if the HYPO_BENCH environment variable
+ * is set to a non-empty value other than "0"; if it is a number, it
+ * gives the number of samples of each benchmark.  Returns the exit
+ * code for the test program.
+ */
+_HYPO_API int
+_hypo_run(const char *test_fname, const _hypo_test_t *tests,
+	  const _hypo_bench_t *benches)
 {
-  hypo_context_t hypo_ctx = {0, 0, 0, _HYPO_LIST_INIT(_hypo_failure_t)};
+  hypo_context_t hypo_ctx = {0, 0, 0, _HYPO_LIST_INIT(_hypo_failure_t), 0};
   _hypo_failure_t *failure;
   int i, j, len;
   const char *last_test = 0;
   char star_buf[513], name_buf[513 - 4];
+  const char *bench = getenv("HYPO_BENCH");
+  int nsamples, fork_limited = 0;
+#ifdef _HYPO_HAVE_FORK
+  const char *mode = getenv("HYPO_FORK");
+#endif
+#ifdef _HYPO_HAVE_TIMEOUT
+  const char *timeout = getenv("HYPO_TIMEOUT");
+#endif
+
+  hypo_ctx.test_fname = test_fname;
+  _hypo_perf_init();
+  _hypo_prof_init(test_fname);
+#ifdef _HYPO_HAVE_TIMEOUT
+  if (timeout && *timeout)
+    _hypo_timeout_default = atof(timeout);
+#endif
 
   /* Run the tests */
-  if (!_hypo_run_tests(&hypo_ctx))
-    printf("Testing halted due to fatal error in %s::%s\n",
-	   hypo_ctx.test_fname, hypo_ctx.cur_test);
+#ifdef _HYPO_HAVE_FORK
+  fork_limited = !mode || !*mode;
+  if (!fork_limited && strcmp(mode, "0"))
+    _hypo_run_forked(&hypo_ctx, tests);
+  else
+#endif
+    _hypo_run_tests(&hypo_ctx, tests, fork_limited);
+
+  /* Run the benchmarks, if requested */
+  if (bench && *bench && strcmp(bench, "0") &&
+      !(hypo_ctx.flags & _HYPO_FLAG_FATAL)) {
+    nsamples = atoi(bench);
+    _hypo_run_benches(&hypo_ctx, benches,
+		      nsamples > 0 ? nsamples : _HYPO_BENCH_SAMPLES);
+  }
+
+  /* Tear down the file-scoped fixtures */
+  _hypo_fix_teardown_all(&hypo_ctx);
+  _hypo_prof_dump();
 
   /* Emit the test failure details */
   for (i = 0; i < _hypo_list_len(&hypo_ctx.failures); i++) {
@@ -818,3 +3856,361 @@ int
   /* Return non-zero if there were any failures */
   return _hypo_list_len(&hypo_ctx.failures) ? 1 : 0;
 }
+#line 21 "fixture.c.tmpl"
+/* The value of the allocate fixture for the running test */
+static test_struct * _hypo_fix_value_allocate;
+
+#line 27 "fixture.c.tmpl"
+static test_struct *
+hypo_fix_setup_allocate(hypo_context_t *hypo_ctx)
+{
+#line 19 "test.hypo"
+  return (test_struct *)malloc(sizeof(struct test_struct));
+#line 31 "fixture.c.tmpl"
+}
+#line 21 "fixture.c.tmpl"
+/* The value of the counter fixture for the running test */
+static unsigned int * _hypo_fix_value_counter;
+
+#line 27 "fixture.c.tmpl"
+static unsigned int *
+hypo_fix_setup_counter(hypo_context_t *hypo_ctx)
+{
+#line 102 "test.hypo"
+  static unsigned int count = 0;
+
+  return &count;
+#line 31 "fixture.c.tmpl"
+}
+#line 39 "fixture.c.tmpl"
+static void
+hypo_fix_teardown_allocate(hypo_context_t *hypo_ctx, test_struct * allocate)
+{
+#line 21 "test.hypo"
+  free(allocate);
+#line 43 "fixture.c.tmpl"
+}
+#line 39 "fixture.c.tmpl"
+static void
+hypo_fix_teardown_counter(hypo_context_t *hypo_ctx, unsigned int * counter)
+{
+#line 106 "test.hypo"
+  *counter = 0;
+#line 43 "fixture.c.tmpl"
+}
+#line 56 "fixture.c.tmpl"
+
+/* Tear down the counter fixture once all the tests have run */
+static void
+_hypo_fix_cleanup_counter(hypo_context_t *hypo_ctx)
+{
+  hypo_fix_teardown_counter(hypo_ctx, _hypo_fix_value_counter);
+}
+#line 66 "fixture.c.tmpl"
+
+/* Whether the counter fixture has been set up */
+static int _hypo_fix_active_counter = 0;
+
+/* Set up the counter fixture the first time a test uses it */
+static void
+_hypo_fix_use_counter(hypo_context_t *hypo_ctx)
+{
+  if (_hypo_fix_active_counter)
+    return;
+
+  _hypo_fix_active_counter = 1;
+  _hypo_fix_value_counter = hypo_fix_setup_counter(hypo_ctx);
+#line 82 "fixture.c.tmpl"
+  _hypo_fix_defer("counter", _hypo_fix_cleanup_counter);
+#line 86 "fixture.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_allocate(hypo_context_t *hypo_ctx)
+{
+#line 25 "test.hypo"
+  hypo_mock_expectcalls_malloc expected[] = {
+    {0, sizeof(test_struct)}
+  };
+  struct test_struct test_data;
+  struct test_struct *result;
+
+  hypo_mock_addreturn_malloc(&test_data);
+
+  result = alloc();
+
+  hypo_assert(result == &test_data);
+  hypo_mock_checkcalls_malloc(expected, 1);
+#line 32 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_allocate_cycle(hypo_context_t *hypo_ctx)
+{
+#line 40 "test.hypo"
+  struct test_struct test_data[2];
+  struct test_struct *returns[] = {&test_data[0], &test_data[1]};
+
+  hypo_mock_setreturns_malloc((void **)returns, 2,
+                              HYPO_MOCK_CYCLE | HYPO_MOCK_BORROW);
+
+  hypo_assert(alloc() == &test_data[0]);
+  hypo_assert(alloc() == &test_data[1]);
+  hypo_assert(alloc() == &test_data[0]);
+  hypo_assert(hypo_mock_callcount_malloc() == 3);
+#line 32 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_allocate_failure(hypo_context_t *hypo_ctx)
+{
+#line 53 "test.hypo"
+  hypo_mock_expectcalls_malloc expected[] = {
+    {0, sizeof(test_struct)}
+  };
+  struct test_struct *result;
+
+  hypo_mock_addreturn_malloc(0);
+
+  result = alloc();
+
+  hypo_assert(result == 0);
+  hypo_mock_checkcalls_malloc(expected, 1);
+#line 32 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_deallocate(hypo_context_t *hypo_ctx, test_struct * allocate)
+{
+#line 67 "test.hypo"
+  hypo_mock_expectcalls_free expected[] = {
+    {0, allocate}
+  };
+
+  hypo_mock_nospy_free();
+
+  dealloc(allocate);
+
+  hypo_mock_checkcalls_free(expected, 1);
+#line 32 "test.c.tmpl"
+}
+#line 69 "test.c.tmpl"
+
+/* Set up the fixtures for deallocate, and for any later tests using the
+ * same fixtures
+ */
+static void
+_hypo_setup_deallocate(hypo_context_t *hypo_ctx)
+{
+#line 4006 "test.c"
+  _hypo_fix_value_allocate = hypo_fix_setup_allocate(hypo_ctx);
+#line 77 "test.c.tmpl"
+}
+#line 87 "test.c.tmpl"
+
+/* Run deallocate, injecting its fixtures */
+static void
+_hypo_run_deallocate(hypo_context_t *hypo_ctx)
+{
+  hypo_test_deallocate(hypo_ctx, _hypo_fix_value_allocate);
+}
+#line 105 "test.c.tmpl"
+
+/* Clean up the fixtures for deallocate, and for any later tests using
+ * the same fixtures
+ */
+static void
+_hypo_teardown_deallocate(hypo_context_t *hypo_ctx)
+{
+#line 4026 "test.c"
+  hypo_fix_teardown_allocate(hypo_ctx, _hypo_fix_value_allocate);
+#line 113 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_deallocate_many(hypo_context_t *hypo_ctx)
+{
+#line 79 "test.hypo"
+  struct test_struct test_data[3];
+  hypo_mock_expectcalls_free expected[] = {
+    {0, &test_data[2]},
+    {0, &test_data[1]},
+    {0, &test_data[0]},
+    {0, &test_data[1]}
+  };
+  hypo_mock_expectcalls_free query = {0, &test_data[1]};
+
+  hypo_mock_nospy_free();
+
+  dealloc(&test_data[0]);
+  dealloc(&test_data[1]);
+  dealloc(&test_data[2]);
+  dealloc(&test_data[1]);
+
+  hypo_assert(hypo_mock_findcall_free(&query, 0) == 1);
+  hypo_assert(hypo_mock_findcall_free(&query, 2) == 3);
+  hypo_assert(hypo_mock_countcalls_free(&query) == 2);
+  hypo_mock_checkunordered_free(expected, 4);
+#line 32 "test.c.tmpl"
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_count_first(hypo_context_t *hypo_ctx, unsigned int * counter)
+{
+#line 110 "test.hypo"
+  hypo_assert((*counter)++ == 0);
+#line 32 "test.c.tmpl"
+}
+#line 48 "test.c.tmpl"
+
+/* Set up the file-scoped fixtures for count_first, and for any later
+ * tests using the same fixtures
+ */
+static void
+_hypo_file_setup_count_first(hypo_context_t *hypo_ctx)
+{
+#line 4073 "test.c"
+  _hypo_fix_use_counter(hypo_ctx);
+#line 56 "test.c.tmpl"
+}
+#line 87 "test.c.tmpl"
+
+/* Run count_first, injecting its fixtures */
+static void
+_hypo_run_count_first(hypo_context_t *hypo_ctx)
+{
+  hypo_test_count_first(hypo_ctx, _hypo_fix_value_counter);
+}
+#line 28 "test.c.tmpl"
+static void
+hypo_test_count_second(hypo_context_t *hypo_ctx, unsigned int * counter)
+{
+#line 114 "test.hypo"
+  hypo_assert((*counter)++ == 1);
+#line 32 "test.c.tmpl"
+}
+#line 87 "test.c.tmpl"
+
+/* Run count_second, injecting its fixtures */
+static void
+_hypo_run_count_second(hypo_context_t *hypo_ctx)
+{
+  hypo_test_count_second(hypo_ctx, _hypo_fix_value_counter);
+}
+#line 23 "test.c.tmpl"
+#define hypo_case (alloc_sizes[hypo_ctx->case_index])
+#define hypo_case_index (hypo_ctx->case_index)
+#line 28 "test.c.tmpl"
+static void
+hypo_test_allocate_size(hypo_context_t *hypo_ctx, unsigned int * counter)
+{
+#line 118 "test.hypo"
+  hypo_mock_expectcalls_malloc expected[] = {
+    {0, hypo_case}
+  };
+
+  (*counter)++;
+  hypo_mock_addreturn_malloc(0);
+
+  hypo_assert(alloc_size(hypo_case) == 0);
+  hypo_mock_checkcalls_malloc(expected, 1);
+#line 32 "test.c.tmpl"
+}
+#line 36 "test.c.tmpl"
+#undef hypo_case
+#undef hypo_case_index
+#line 87 "test.c.tmpl"
+
+/* Run allocate_size, injecting its fixtures */
+static void
+_hypo_run_allocate_size(hypo_context_t *hypo_ctx)
+{
+  hypo_test_allocate_size(hypo_ctx, _hypo_fix_value_counter);
+}
+#line 23 "bench.c.tmpl"
+static void
+hypo_bench_allocate_loop(hypo_context_t *hypo_ctx, unsigned long hypo_iterations, test_struct * allocate)
+{
+  unsigned long hypo_iteration;
+
+  for (hypo_iteration = 0; hypo_iteration < hypo_iterations;
+       hypo_iteration++) {
+#line 130 "test.hypo"
+  hypo_mock_setreturns_malloc((void **)&allocate, 1,
+                              HYPO_MOCK_CYCLE | HYPO_MOCK_BORROW);
+
+  hypo_assert(alloc() == allocate);
+#line 31 "bench.c.tmpl"
+  }
+}
+#line 46 "bench.c.tmpl"
+
+/* Set up the fixtures for allocate_loop */
+static void
+_hypo_bench_setup_allocate_loop(hypo_context_t *hypo_ctx)
+{
+#line 4153 "test.c"
+  _hypo_fix_value_allocate = hypo_fix_setup_allocate(hypo_ctx);
+#line 52 "bench.c.tmpl"
+}
+#line 62 "bench.c.tmpl"
+
+/* Run allocate_loop for the given number of iterations, injecting its
+ * fixtures
+ */
+static void
+_hypo_bench_run_allocate_loop(hypo_context_t *hypo_ctx, unsigned long iterations)
+{
+  hypo_bench_allocate_loop(hypo_ctx, iterations, _hypo_fix_value_allocate);
+}
+#line 82 "bench.c.tmpl"
+
+/* Clean up the fixtures for allocate_loop */
+static void
+_hypo_bench_teardown_allocate_loop(hypo_context_t *hypo_ctx)
+{
+#line 4173 "test.c"
+  hypo_fix_teardown_allocate(hypo_ctx, _hypo_fix_value_allocate);
+#line 88 "bench.c.tmpl"
+}
+#line 127 "master.c.tmpl"
+/* The tests to run, in order */
+static const _hypo_test_t _hypo_tests[] = {
+#line 145 "test.c.tmpl"
+  {"allocate", 0, 0, hypo_test_allocate, 0, 0, 0, 0, 0UL, "test.hypo", 24},
+#line 145 "test.c.tmpl"
+  {"allocate_cycle", 0, 0, hypo_test_allocate_cycle, 0, 0, 0, 0, 0UL, "test.hypo", 39},
+#line 145 "test.c.tmpl"
+  {"allocate_failure", 0, 0, hypo_test_allocate_failure, 0, 0, 0, 0, 0UL, "test.hypo", 52},
+#line 145 "test.c.tmpl"
+  {"deallocate", 0, _hypo_setup_deallocate, _hypo_run_deallocate, _hypo_teardown_deallocate, 0, 0, 0, 0UL, "test.hypo", 66},
+#line 145 "test.c.tmpl"
+  {"deallocate_many", 0, 0, hypo_test_deallocate_many, 0, 0, 5.0, 0, 0UL, "test.hypo", 78},
+#line 145 "test.c.tmpl"
+  {"count_first", _hypo_file_setup_count_first, 0, _hypo_run_count_first, 0, 0, 0, 0, 0UL, "test.hypo", 109},
+#line 145 "test.c.tmpl"
+  {"count_second", _hypo_file_setup_count_first, 0, _hypo_run_count_second, 0, 0, 0, 0, 0UL, "test.hypo", 113},
+#line 145 "test.c.tmpl"
+  {"allocate_size", _hypo_file_setup_count_first, 0, _hypo_run_allocate_size, 0, sizeof(alloc_sizes) / sizeof(alloc_sizes[0]), 0, 0, 0UL, "test.hypo", 117},
+#line 134 "master.c.tmpl"
+  {0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0}
+};
+
+/* The benchmarks to run, in order */
+static const _hypo_bench_t _hypo_benches[] = {
+#line 100 "bench.c.tmpl"
+  {"allocate_loop", _hypo_bench_setup_allocate_loop, _hypo_bench_run_allocate_loop, _hypo_bench_teardown_allocate_loop},
+#line 144 "master.c.tmpl"
+  {0, 0, 0, 0}
+};
+
+/* The target's main() has been renamed; define the real one */
+#undef main
+
+#line 153 "master.c.tmpl"
+int
+(main)(int argc, char **argv)
+{
+#line 163 "master.c.tmpl"
+  return _hypo_run("test", _hypo_tests, _hypo_benches);
+}
@@ -0,0 +1,19 @@
+/* The target for the example tests; the preamble supplies the headers */
+
+test_struct *
+alloc(void)
+{
+  return (test_struct *)malloc(sizeof(test_struct));
+}
+
+test_struct *
+alloc_size(size_t size)
+{
+  return (test_struct *)malloc(size);
+}
+
+void
+dealloc(test_struct *ptr)
+{
+  free(ptr);
+}
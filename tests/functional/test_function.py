@@ -1,10 +1,58 @@
+import json
 import os
+import subprocess
 
+import pytest
+
+import hypocrite
 from hypocrite import main
 
+try:
+    from shutil import which
+except ImportError:  # pragma: no cover
+    from distutils.spawn import find_executable as which
+
 TEST_INPUT = 'test.hypo'
 TEST_OUTPUT = 'test.c'
 ALTERNATE_OUTPUT = 'alternate.c'
+SHARED_OUTPUT = 'shared.c'
+RUNTIME_HEADER = 'hypo_runtime.h'
+RUNTIME_SOURCE = 'hypo_runtime.c'
+PROGRAM_TARGET = 'program.c'
+TEST_TARGET = 'to_test.c'
+WARNINGS_INPUT = 'warnings.hypo'
+BENCH_INPUT = 'bench.hypo'
+LIMITS_INPUT = 'limits.hypo'
+COMPARE_INPUT = 'compare.hypo'
+UNORDERED_INPUT = 'unordered.hypo'
+FIXTURES_INPUT = 'fixtures.hypo'
+POSIX_INPUT = 'posix.hypo'
+POSIX_TARGET = 'posix.c'
+FAKEIO_INPUT = 'fakeio.hypo'
+FAKEIO_TARGET = 'fakeio.c'
+
+# The compiler used to build generated test programs
+CC = os.environ.get('CC', 'cc')
+needs_cc = pytest.mark.skipif(not which(CC), reason='no C compiler')
+
+
+def _build(datadir, tmpdir, infile, cflags=(), target=PROGRAM_TARGET,
+           **kwargs):
+    """
+    Generate a test program from an input file in the data directory
+    and compile it.  Returns the path of the program.
+    """
+
+    # The target is included relative to the generated file
+    with open(os.path.join(datadir, target)) as f:
+        tmpdir.join(target).write(f.read())
+    with tmpdir.as_cwd():
+        main.main(os.path.join(datadir, infile), 'program_test.c', **kwargs)
+        subprocess.check_call(
+            [CC] + list(cflags) + ['-o', 'program_test', 'program_test.c']
+        )
+
+    return str(tmpdir.join('program_test'))
 
 
 def test_base(datadir, tmpdir):
@@ -39,3 +87,238 @@ def test_explicit_output(datadir, tmpdir):
     with open(os.path.join(datadir, ALTERNATE_OUTPUT)) as f:
         out_expected = f.read()
     assert out_text == out_expected
+
+
+def test_generate(datadir):
+    with open(os.path.join(datadir, TEST_INPUT)) as f:
+        text = f.read()
+
+    # Generate the output in memory
+    result = hypocrite.generate(
+        text, os.path.join(datadir, TEST_INPUT), 'alternate'
+    )
+
+    with open(os.path.join(datadir, ALTERNATE_OUTPUT)) as f:
+        out_expected = f.read()
+    assert result == out_expected
+
+
+def test_shared_runtime(datadir, tmpdir):
+    # Change directories to the tmpdir
+    with tmpdir.as_cwd():
+        # Run hypocrite on an example file, emitting the runtime
+        main.main(os.path.join(datadir, TEST_INPUT), SHARED_OUTPUT,
+                  runtime_header=RUNTIME_HEADER, emit_runtime='.')
+
+    # Test that the expected output was generated
+    for fname in (SHARED_OUTPUT, RUNTIME_HEADER, RUNTIME_SOURCE):
+        outfile = tmpdir.join(fname)
+        assert outfile.check(file=1)
+
+        out_text = outfile.read()
+        with open(os.path.join(datadir, fname)) as f:
+            out_expected = f.read()
+        assert out_text == out_expected
+
+
+@needs_cc
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'all_mock_helpers': True, 'track_allocs': True},
+])
+def test_compile_warnings(datadir, tmpdir, kwargs):
+    program = _build(
+        datadir, tmpdir, WARNINGS_INPUT, ['-Wall', '-Werror'], **kwargs
+    )
+
+    # The program must also pass its tests
+    subprocess.check_call([program], stdout=subprocess.PIPE)
+
+
+@needs_cc
+def test_compile_warnings_shared(datadir, tmpdir):
+    with tmpdir.as_cwd():
+        main.main(os.path.join(datadir, TEST_INPUT), SHARED_OUTPUT,
+                  runtime_header=RUNTIME_HEADER, emit_runtime='.')
+        subprocess.check_call(
+            [CC, '-Wall', '-Werror', '-c', '-o', 'runtime.o', RUNTIME_SOURCE]
+        )
+
+
+@needs_cc
+def test_shared_runtime_posix_names(datadir, tmpdir):
+    # The runtime header does not declare the POSIX functions, so the
+    # target may define functions with their names
+    with open(os.path.join(datadir, POSIX_TARGET)) as f:
+        tmpdir.join(POSIX_TARGET).write(f.read())
+    with tmpdir.as_cwd():
+        main.main(os.path.join(datadir, POSIX_INPUT), SHARED_OUTPUT,
+                  runtime_header=RUNTIME_HEADER, emit_runtime='.')
+        subprocess.check_call(
+            [CC, '-Wall', '-Werror', '-o', 'posix_test', SHARED_OUTPUT,
+             RUNTIME_SOURCE]
+        )
+
+    subprocess.check_call(
+        [str(tmpdir.join('posix_test'))], stdout=subprocess.PIPE
+    )
+
+
+def _run(program, **env):
+    """
+    Run a test program with additional environment variables.
+    Returns its exit code and its output.
+    """
+
+    proc = subprocess.Popen(
+        [program], env=dict(os.environ, **env), stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    output = proc.communicate()[0]
+
+    return proc.returncode, output
+
+
+@needs_cc
+def test_timeout(datadir, tmpdir):
+    program = _build(datadir, tmpdir, LIMITS_INPUT)
+
+    # Tests with timeouts are run in their own processes
+    status, output = _run(program)
+
+    assert status == 1
+    assert 'program_test::fails... FAIL\n' in output
+    assert 'program_test::spins... TIMEOUT [elapsed ' in output
+    assert 'program_test::passes... PASS\n' in output
+    assert '%s:6: "add(1, 1) == 3" -> 0' % LIMITS_INPUT in output
+    assert '%s:9: Test timed out after ' % LIMITS_INPUT in output
+
+
+@needs_cc
+def test_timeout_in_process(datadir, tmpdir):
+    program = _build(datadir, tmpdir, LIMITS_INPUT)
+
+    # Testing halts, but the failures are still reported
+    status, output = _run(program, HYPO_FORK='0')
+
+    assert status == 1
+    assert 'program_test::spins... TIMEOUT [elapsed ' in output
+    assert 'Testing halted due to timeout in program_test::spins' in output
+    assert 'program_test::passes' not in output
+    assert '%s:6: "add(1, 1) == 3" -> 0' % LIMITS_INPUT in output
+    assert '%s:9: Test timed out after ' % LIMITS_INPUT in output
+
+
+@needs_cc
+def test_example(datadir, tmpdir):
+    program = _build(
+        datadir, tmpdir, TEST_INPUT, ['-Wall', '-Werror'], target=TEST_TARGET,
+    )
+
+    # Only the test with a timeout is forked, so the changes to the
+    # file-scoped counter are seen by the later tests
+    status, output = _run(program)
+
+    assert status == 0
+    assert 'program_test::deallocate_many... PASS\n' in output
+    assert 'program_test::count_second... PASS\n' in output
+    assert 'FAIL' not in output
+
+
+@needs_cc
+def test_example_forked(datadir, tmpdir):
+    program = _build(
+        datadir, tmpdir, TEST_INPUT, ['-Wall', '-Werror'], target=TEST_TARGET,
+    )
+
+    # When every test is forked, the counter is reset for each test
+    status, output = _run(program, HYPO_FORK='1')
+
+    assert status == 1
+    assert 'program_test::count_first... PASS\n' in output
+    assert 'program_test::count_second... FAIL\n' in output
+    assert output.count('FAIL') == 1
+
+
+@needs_cc
+@pytest.mark.parametrize('fork', ['0', '1'])
+def test_file_fixtures(datadir, tmpdir, fork):
+    program = _build(datadir, tmpdir, FIXTURES_INPUT, ['-Wall', '-Werror'])
+
+    # File-scoped fixtures are set up and torn down only once
+    status, output = _run(program, HYPO_FORK=fork)
+
+    assert status == 0
+    assert output.count('(teardown)') == 1
+    assert output.endswith('program_test::total (teardown)... PASS\n')
+
+
+@needs_cc
+def test_compare_typed(datadir, tmpdir):
+    program = _build(datadir, tmpdir, COMPARE_INPUT, ['-Wall', '-Werror'])
+
+    # Floating point arguments are compared as with ==
+    status, output = _run(program)
+
+    assert status == 1
+    assert 'program_test::signed_zero... PASS\n' in output
+    assert 'program_test::not_a_number... FAIL\n' in output
+
+
+@needs_cc
+def test_checkunordered(datadir, tmpdir):
+    program = _build(datadir, tmpdir, UNORDERED_INPUT, ['-Wall', '-Werror'])
+
+    # Expected calls are matched so that as many as possible match
+    status, output = _run(program)
+
+    assert status == 1
+    assert 'program_test::specific_later... PASS\n' in output
+    assert 'program_test::crossed... PASS\n' in output
+    assert 'program_test::duplicates... PASS\n' in output
+    assert 'program_test::unmatched... FAIL\n' in output
+    assert '%s:66: "expected[i] matches an actual call"' % (
+        UNORDERED_INPUT,
+    ) in output
+
+
+@needs_cc
+def test_fakeio_functions(datadir, tmpdir):
+    # Only the listed functions are redirected, so the target's call
+    # through its close member is left alone
+    program = _build(
+        datadir, tmpdir, FAKEIO_INPUT, ['-Wall', '-Werror'],
+        target=FAKEIO_TARGET,
+    )
+
+    status, output = _run(program)
+
+    assert status == 0
+    assert 'program_test::relay... PASS\n' in output
+
+
+@needs_cc
+def test_bench_empty(datadir, tmpdir):
+    # The empty benchmark is optimized away, so it takes no time
+    program = _build(
+        datadir, tmpdir, BENCH_INPUT,
+        ['-O2', '-DHYPO_BENCH_SAMPLE_NS=1000000.0'],
+    )
+    results = str(tmpdir.join('bench.json'))
+    env = dict(os.environ, HYPO_BENCH='3', HYPO_BENCH_JSON=results)
+
+    output = subprocess.check_output(
+        [program], env=env, universal_newlines=True,
+    )
+
+    assert 'inf' not in output
+    assert 'nan' not in output
+    with open(results) as f:
+        suites = json.load(f)['suites']
+    for suite in suites.values():
+        assert sorted(suite) == ['adding', 'empty']
+        for bench in suite.values():
+            assert 1 <= bench['iterations'] <= 1000000000
+            assert len(bench['samples']) == 3
+            assert all(0 <= sample < float('inf')
+                       for sample in bench['samples'])
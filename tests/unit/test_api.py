@@ -0,0 +1,82 @@
+import hypocrite
+from hypocrite import api
+
+
+class TestPreload(object):
+    def test_base(self, mocker):
+        mock_preload = mocker.patch.object(api.template.Template, 'preload')
+
+        result = api.preload()
+
+        assert result == mock_preload.return_value
+        mock_preload.assert_called_once_with()
+
+
+class TestOutputNames(object):
+    def test_base(self):
+        result = api.output_names('some/dir/infile.hypo')
+
+        assert result == ('infile', 'infile.c')
+
+    def test_outfile(self):
+        result = api.output_names('some/dir/infile.hypo', 'out/outfile.x')
+
+        assert result == ('outfile', 'out/outfile.x')
+
+
+class TestGenerateIter(object):
+    def test_base(self, mocker):
+        mock_preload = mocker.patch.object(api.template.Template, 'preload')
+        mock_parse_text = mocker.patch.object(
+            api.hypofile.HypoFile, 'parse_text'
+        )
+        hfile = mock_parse_text.return_value
+        rendered = hfile.render.return_value
+
+        result = api.generate_iter('text', 'src.hypo', 'test_src')
+
+        assert result == rendered.iter_output.return_value
+        mock_preload.assert_called_once_with()
+        mock_parse_text.assert_called_once_with('text', 'src.hypo')
+        hfile.render.assert_called_once_with('test_src')
+        rendered.iter_output.assert_called_once_with('test_src.c')
+
+    def test_output_name(self, mocker):
+        mocker.patch.object(api.template.Template, 'preload')
+        mock_parse_text = mocker.patch.object(
+            api.hypofile.HypoFile, 'parse_text'
+        )
+        rendered = mock_parse_text.return_value.render.return_value
+
+        api.generate_iter('text', 'src.hypo', 'test_src', 'out/file.c')
+
+        rendered.iter_output.assert_called_once_with('out/file.c')
+
+
+class TestGenerate(object):
+    def test_base(self, mocker):
+        mock_generate_iter = mocker.patch.object(
+            api, 'generate_iter', return_value=iter(['l1\n', 'l2\n'])
+        )
+
+        result = api.generate('text', 'src.hypo', 'test_src')
+
+        assert result == 'l1\nl2\n'
+        mock_generate_iter.assert_called_once_with(
+            'text', 'src.hypo', 'test_src', None
+        )
+
+    def test_encoding(self, mocker):
+        mocker.patch.object(
+            api, 'generate_iter', return_value=iter(['l1\n', 'l2\n'])
+        )
+
+        result = api.generate('text', 'src.hypo', 'test_src', 'out.c',
+                              encoding='utf-8')
+
+        assert result == b'l1\nl2\n'
+
+    def test_exported(self):
+        assert hypocrite.generate is api.generate
+        assert hypocrite.generate_iter is api.generate_iter
+        assert hypocrite.preload is api.preload
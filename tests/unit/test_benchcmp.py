@@ -0,0 +1,264 @@
+import json
+
+import pytest
+import six
+
+from hypocrite import benchcmp
+
+
+def bench(*samples):
+    return {'iterations': 1000, 'samples': list(samples)}
+
+
+class TestLoad(object):
+    def test_base(self, tmpdir):
+        path = tmpdir.join('results.json')
+        path.write(json.dumps({'suites': {'s1': {'b1': bench(1.0)}}}))
+
+        result = benchcmp.load(str(path))
+
+        assert result == {'s1': {'b1': bench(1.0)}}
+
+    def test_invalid(self, tmpdir):
+        path = tmpdir.join('results.json')
+        path.write(json.dumps({'s1': {'b1': bench(1.0)}}))
+
+        with pytest.raises(ValueError):
+            benchcmp.load(str(path))
+
+    def test_missing(self, tmpdir):
+        path = tmpdir.join('results.json')
+
+        with pytest.raises(ValueError) as exc_info:
+            benchcmp.load(str(path))
+
+        assert str(exc_info.value).startswith(
+            '%s: not a benchmark results file' % path
+        )
+
+    def test_not_json(self, tmpdir):
+        path = tmpdir.join('results.json')
+        path.write('{"suites": {"s1": {"b1": {"samples": [inf]}}}}')
+
+        with pytest.raises(ValueError) as exc_info:
+            benchcmp.load(str(path))
+
+        assert str(exc_info.value).startswith(
+            '%s: not a benchmark results file' % path
+        )
+
+    def test_invalid_suite(self, tmpdir):
+        path = tmpdir.join('results.json')
+        path.write(json.dumps({'suites': {'s1': [bench(1.0)]}}))
+
+        with pytest.raises(ValueError) as exc_info:
+            benchcmp.load(str(path))
+
+        assert str(exc_info.value) == (
+            '%s: not a benchmark results file' % path
+        )
+
+    @pytest.mark.parametrize('result', [
+        bench(),
+        bench(1.0, float('inf')),
+        bench(float('nan')),
+        bench(1.0, 'fast'),
+        bench(True),
+        {'iterations': 1000},
+        {'iterations': 1000, 'samples': 1.0},
+        [1.0],
+    ])
+    def test_invalid_samples(self, tmpdir, result):
+        path = tmpdir.join('results.json')
+        path.write(json.dumps({'suites': {'s1': {'b1': result}}}))
+
+        with pytest.raises(ValueError) as exc_info:
+            benchcmp.load(str(path))
+
+        assert str(exc_info.value) == (
+            '%s: benchmark s1::b1 has no valid samples' % path
+        )
+
+
+class TestMerge(object):
+    def test_base(self):
+        suites = {
+            's1': {'b1': bench(1.0), 'b2': bench(2.0)},
+        }
+        results = {
+            's1': {'b2': bench(3.0)},
+            's2': {'b1': bench(4.0)},
+        }
+
+        result = benchcmp.merge(suites, results)
+
+        assert result is suites
+        assert suites == {
+            's1': {'b1': bench(1.0), 'b2': bench(3.0)},
+            's2': {'b1': bench(4.0)},
+        }
+
+
+class TestSave(object):
+    def test_base(self, tmpdir):
+        path = tmpdir.join('base.json')
+
+        benchcmp.save(str(path), {'s1': {'b1': bench(1.0)}})
+
+        assert json.loads(path.read()) == {
+            'suites': {'s1': {'b1': bench(1.0)}},
+        }
+
+
+class TestMedian(object):
+    def test_odd(self):
+        assert benchcmp.median([3, 1, 2]) == 2.0
+
+    def test_even(self):
+        assert benchcmp.median([4, 1, 3, 2]) == 2.5
+
+
+class TestMannWhitney(object):
+    def test_larger(self):
+        result = benchcmp.mann_whitney([1, 2, 3], [4, 5, 6])
+
+        assert result == pytest.approx(0.0404, abs=1e-4)
+
+    def test_smaller(self):
+        result = benchcmp.mann_whitney([4, 5, 6], [1, 2, 3])
+
+        assert result == pytest.approx(0.9855, abs=1e-4)
+
+    def test_ties(self):
+        result = benchcmp.mann_whitney([1, 2, 2, 3], [2, 3, 4, 4])
+
+        assert result == pytest.approx(0.0671, abs=1e-4)
+
+    def test_identical(self):
+        assert benchcmp.mann_whitney([1, 1, 1], [1, 1, 1]) == 1.0
+
+    def test_empty(self):
+        assert benchcmp.mann_whitney([], [1, 2, 3]) == 1.0
+
+
+class TestCompare(object):
+    def test_base(self):
+        baseline = {
+            's1': {
+                'same': bench(10, 11, 12, 10, 11, 12),
+                'slower': bench(10, 11, 12, 10, 11, 12),
+                'faster': bench(10, 11, 12, 10, 11, 12),
+                'small': bench(10, 11, 12, 10, 11, 12),
+            },
+        }
+        results = {
+            's1': {
+                'same': bench(12, 11, 10, 11, 10, 12),
+                'slower': bench(20, 21, 22, 20, 21, 22),
+                'faster': bench(5, 6, 7, 5, 6, 7),
+                'small': bench(12, 13, 14, 12, 13, 14),
+            },
+            's2': {
+                'new': bench(1, 2, 3),
+            },
+        }
+
+        result = benchcmp.compare(baseline, results, threshold=0.2)
+
+        assert [(comp.suite, comp.name, comp.status)
+                for comp in result] == [
+            ('s1', 'faster', benchcmp.FASTER),
+            ('s1', 'same', benchcmp.SAME),
+            ('s1', 'slower', benchcmp.SLOWER),
+            ('s1', 'small', benchcmp.SAME),
+            ('s2', 'new', benchcmp.NEW),
+        ]
+        assert result[2].baseline == 11.0
+        assert result[2].current == 21.0
+        assert result[2].delta == pytest.approx(10.0 / 11.0)
+        assert result[2].pvalue < 0.05
+        assert result[4] == benchcmp.Comparison(
+            's2', 'new', None, 2.0, None, None, benchcmp.NEW,
+        )
+
+
+class TestReport(object):
+    def test_base(self):
+        stream = six.StringIO()
+        comparisons = [
+            benchcmp.Comparison('s1', 'b1', 10.0, 12.5, 0.25, 0.0012,
+                                benchcmp.SLOWER),
+            benchcmp.Comparison('s1', 'long_name', None, 2.0, None, None,
+                                benchcmp.NEW),
+        ]
+
+        benchcmp.report(stream, comparisons)
+
+        assert stream.getvalue() == (
+            'benchmark     baseline  current  delta     p status\n'
+            's1::b1        10.00 ns 12.50 ns +25.0% 0.001 slower\n'
+            's1::long_name        -  2.00 ns      -     - new\n'
+        )
+
+
+class TestRun(object):
+    def write(self, tmpdir, name, suites):
+        path = tmpdir.join(name)
+        path.write(json.dumps({'suites': suites}))
+        return str(path)
+
+    def test_compare(self, tmpdir):
+        stream = six.StringIO()
+        base = self.write(tmpdir, 'base.json', {
+            's1': {'b1': bench(10, 11, 12, 10, 11, 12)},
+        })
+        r1 = self.write(tmpdir, 'r1.json', {
+            's1': {'b1': bench(20, 21, 22, 20, 21, 22)},
+        })
+
+        result = benchcmp.run(base, [r1], stream)
+
+        assert result == 1
+        assert 's1::b1' in stream.getvalue()
+        assert 'slower' in stream.getvalue()
+
+    def test_compare_same(self, tmpdir):
+        stream = six.StringIO()
+        base = self.write(tmpdir, 'base.json', {
+            's1': {'b1': bench(10, 11, 12, 10, 11, 12)},
+        })
+        r1 = self.write(tmpdir, 'r1.json', {
+            's1': {'b1': bench(10, 11, 12, 10, 11, 12)},
+            's2': {'b1': bench(1.0)},
+        })
+
+        result = benchcmp.run(base, [r1], stream)
+
+        assert result == 0
+
+    def test_save(self, tmpdir):
+        stream = six.StringIO()
+        base = self.write(tmpdir, 'base.json', {
+            's1': {'b1': bench(1.0), 'b2': bench(2.0)},
+        })
+        r1 = self.write(tmpdir, 'r1.json', {'s1': {'b1': bench(3.0)}})
+        r2 = self.write(tmpdir, 'r2.json', {'s2': {'b1': bench(4.0)}})
+
+        result = benchcmp.run(base, [r1, r2], stream, save_baseline=True)
+
+        assert result == 0
+        assert stream.getvalue() == ''
+        assert benchcmp.load(base) == {
+            's1': {'b1': bench(3.0), 'b2': bench(2.0)},
+            's2': {'b1': bench(4.0)},
+        }
+
+    def test_save_new(self, tmpdir):
+        stream = six.StringIO()
+        base = str(tmpdir.join('base.json'))
+        r1 = self.write(tmpdir, 'r1.json', {'s1': {'b1': bench(3.0)}})
+
+        result = benchcmp.run(base, [r1], stream, save_baseline=True)
+
+        assert result == 0
+        assert benchcmp.load(base) == {'s1': {'b1': bench(3.0)}}
@@ -0,0 +1,33 @@
+import six
+
+from hypocrite import depfile
+
+
+class TestEscape(object):
+    def test_plain(self):
+        assert depfile.escape('some/path.c') == 'some/path.c'
+
+    def test_special(self):
+        result = depfile.escape('a dir/#file$\\x')
+
+        assert result == 'a\\ dir/\\#file$$\\\\x'
+
+
+class TestWrite(object):
+    def test_base(self):
+        stream = six.StringIO()
+
+        depfile.write(stream, 'out file.c', ['in.hypo', 'a.tmpl', 'in.hypo'])
+
+        assert stream.getvalue() == (
+            'out\\ file.c: \\\n'
+            '  in.hypo \\\n'
+            '  a.tmpl\n'
+        )
+
+    def test_no_deps(self):
+        stream = six.StringIO()
+
+        depfile.write(stream, 'out.c', [])
+
+        assert stream.getvalue() == 'out.c:\n'
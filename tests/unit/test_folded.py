@@ -0,0 +1,146 @@
+import collections
+import subprocess
+
+import pytest
+import six
+
+from hypocrite import folded
+
+
+class TestLoad(object):
+    def test_base(self, tmpdir):
+        path = tmpdir.join('profile.txt')
+        path.write(
+            's::t1;/bin/test+0x1189 3\n'
+            '\n'
+            's::t2[1];/bin/test+0x11a0 2\n'
+            's;[unknown]+0x7f00 1\n'
+            's::t1;/bin/test+0x1189 4\n'
+        )
+
+        result = folded.load(str(path))
+
+        assert result == {
+            ('s::t1', '/bin/test', 0x1189): 7,
+            ('s::t2[1]', '/bin/test', 0x11a0): 2,
+            ('s', '[unknown]', 0x7f00): 1,
+        }
+
+    def test_samples(self, tmpdir):
+        path = tmpdir.join('profile.txt')
+        path.write('s::t1;/bin/test+0x1189 3\n')
+        samples = collections.Counter({('s::t1', '/bin/test', 0x1189): 1})
+
+        result = folded.load(str(path), samples)
+
+        assert result is samples
+        assert result == {('s::t1', '/bin/test', 0x1189): 4}
+
+    def test_invalid(self, tmpdir):
+        path = tmpdir.join('profile.txt')
+        path.write('s::t1;/bin/test+0x1189\n')
+
+        with pytest.raises(ValueError) as exc_info:
+            folded.load(str(path))
+
+        assert ':1: invalid profile line' in str(exc_info.value)
+
+
+class TestSymbolize(object):
+    def test_base(self, mocker):
+        mocker.patch.object(folded.os.path, 'isfile',
+                            side_effect=lambda x: x == '/bin/test')
+        mock_Popen = mocker.patch.object(folded.subprocess, 'Popen')
+        proc = mock_Popen.return_value
+        proc.returncode = 0
+        proc.communicate.return_value = (
+            '0x0000000000001189\n'
+            'inner\n'
+            'test.c:12\n'
+            'outer\n'
+            'test.c:30\n'
+            '0x00000000000011a0\n'
+            '??\n'
+            '??:0\n',
+            None,
+        )
+
+        result = folded.symbolize({
+            '/bin/test': {0x11a0, 0x1189},
+            '[vdso]': {0x10},
+        }, 'my-addr2line')
+
+        assert result == {('/bin/test', 0x1189): ['outer', 'inner']}
+        mock_Popen.assert_called_once_with(
+            ['my-addr2line', '-a', '-f', '-C', '-i', '-e', '/bin/test'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        proc.communicate.assert_called_once_with('0x1189\n0x11a0\n')
+
+    def test_failed(self, mocker):
+        mocker.patch.object(folded.os.path, 'isfile', return_value=True)
+        mock_Popen = mocker.patch.object(folded.subprocess, 'Popen')
+        proc = mock_Popen.return_value
+        proc.returncode = 1
+        proc.communicate.return_value = ('0x1189\nfunc\ntest.c:1\n', None)
+
+        result = folded.symbolize({'/bin/test': {0x1189}})
+
+        assert result == {}
+
+    def test_missing(self, mocker):
+        mocker.patch.object(folded.os.path, 'isfile', return_value=True)
+        mocker.patch.object(folded.subprocess, 'Popen', side_effect=OSError)
+
+        result = folded.symbolize({'/bin/test': {0x1189}})
+
+        assert result == {}
+
+
+class TestFold(object):
+    def test_base(self):
+        samples = collections.Counter({
+            ('s::t1', '/bin/test', 0x1189): 3,
+            ('s::t1', '/bin/test', 0x1190): 2,
+            ('s::t2', '/bin/test', 0x11a0): 1,
+            ('s', None, 0x7f00): 4,
+        })
+        symbols = {
+            ('/bin/test', 0x1189): ['outer', 'inner'],
+            ('/bin/test', 0x1190): ['outer', 'inner'],
+        }
+
+        result = folded.fold(samples, symbols)
+
+        assert result == {
+            's::t1;outer;inner': 5,
+            's::t2;test+0x11a0': 1,
+            's;[unknown]+0x7f00': 4,
+        }
+
+
+class TestRun(object):
+    def test_base(self, tmpdir, mocker):
+        mock_symbolize = mocker.patch.object(
+            folded, 'symbolize', return_value={
+                ('/bin/test', 0x1189): ['func'],
+            },
+        )
+        p1 = tmpdir.join('p1.txt')
+        p1.write('s::t1;/bin/test+0x1189 3\ns::t2;/bin/test+0x11a0 1\n')
+        p2 = tmpdir.join('p2.txt')
+        p2.write('s::t1;/bin/test+0x1189 2\ns;[unknown]+0x7f00 1\n')
+        stream = six.StringIO()
+
+        folded.run([str(p1), str(p2)], stream, 'my-addr2line')
+
+        assert stream.getvalue() == (
+            's::t1;func 5\n'
+            's::t2;test+0x11a0 1\n'
+            's;[unknown]+0x7f00 1\n'
+        )
+        mock_symbolize.assert_called_once_with(
+            {'/bin/test': {0x1189, 0x11a0}, '[unknown]': {0x7f00}},
+            'my-addr2line',
+        )
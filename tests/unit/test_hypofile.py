@@ -1,12 +1,18 @@
 import collections
 
 import pytest
-from six.moves import builtins
 
 from hypocrite import hypofile
 from hypocrite import location
 from hypocrite import perfile
 
+# The location of an element, for rendering
+RANGE = location.CoordinateRange('test.hypo', 3, 5)
+
+# The arguments of a mock, one of which must be compared by the C
+# compiler
+ARGS = [hypofile.HypoMockArg('int', 'a'), hypofile.HypoMockArg('double', 'b')]
+
 
 class TestExtractType(object):
     def test_base(self):
@@ -113,6 +119,43 @@ class TestMakeType(object):
             hypofile._make_type(toks, 'spam', 'coord')
 
 
+class TestBytewise(object):
+    def test_pointer(self):
+        assert hypofile._bytewise('const double *')
+        assert hypofile._bytewise('struct spam **')
+
+    def test_integral(self):
+        assert hypofile._bytewise('int')
+        assert hypofile._bytewise('const unsigned long long')
+        assert hypofile._bytewise('unsigned')
+        assert hypofile._bytewise('enum color')
+
+    def test_typedef(self):
+        assert hypofile._bytewise('size_t')
+        assert hypofile._bytewise('const uint32_t')
+        assert hypofile._bytewise('intptr_t')
+
+    def test_other(self):
+        assert not hypofile._bytewise('double')
+        assert not hypofile._bytewise('long double')
+        assert not hypofile._bytewise('struct spam')
+        assert not hypofile._bytewise('spam_t')
+
+
+class TestMemory(object):
+    def test_bytes(self):
+        assert hypofile._memory('4096') == 4096
+
+    def test_units(self):
+        assert hypofile._memory('2K') == 2048
+        assert hypofile._memory('3m') == 3 * 1024 * 1024
+        assert hypofile._memory('1G') == 1024 * 1024 * 1024
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            hypofile._memory('M')
+
+
 class TestPreamble(object):
     def test_init(self):
         result = hypofile.Preamble('range', 'code')
@@ -137,17 +180,43 @@ class TestHypocriteTest(object):
         assert result.name == 'name'
         assert result.code == 'code'
         assert result.fixtures == 'fixtures'
+        assert result.cases is None
+        assert result.limits == {}
+
+    def test_init_cases(self):
+        result = hypofile.HypocriteTest('range', 'name', 'code', 'fixtures',
+                                        'cases')
+
+        assert result.coord_range == 'range'
+        assert result.name == 'name'
+        assert result.code == 'code'
+        assert result.fixtures == 'fixtures'
+        assert result.cases == 'cases'
+        assert result.limits == {}
+
+    def test_init_limits(self):
+        result = hypofile.HypocriteTest('range', 'name', 'code', 'fixtures',
+                                        None, {'timeout': 2.5})
+
+        assert result.cases is None
+        assert result.limits == {'timeout': 2.5}
 
     def test_render(self, mocker):
-        hfile = mocker.Mock(fixtures={
-            'fix1': 'fixture1',
-            'fix2': 'fixture2',
-            'fix3': 'fixture3',
+        fixtures = {
+            'fix1': mocker.Mock(return_type=None, teardown=None,
+                                scope='test'),
+            'fix2': mocker.Mock(return_type='int', teardown=['code'],
+                                scope='test'),
+            'fix3': mocker.Mock(return_type='int', teardown=None,
+                                scope='test'),
+        }
+        hfile = mocker.Mock(fixtures=fixtures, fixture_owners={
+            ('fix1', 'fix2', 'fix3'): 'name',
         })
         mock_get_tmpl = mocker.patch.object(
             hypofile.template.Template, 'get_tmpl'
         )
-        obj = hypofile.HypocriteTest('range', 'name', 'code', [
+        obj = hypofile.HypocriteTest(RANGE, 'name', 'code', [
             ('fix1', True),
             ('fix2', False),
             ('fix3', True),
@@ -161,10 +230,293 @@ class TestHypocriteTest(object):
             name='name',
             code='code',
             fixtures=[
-                ('fixture1', True),
-                ('fixture2', False),
-                ('fixture3', True),
+                (fixtures['fix1'], True),
+                (fixtures['fix2'], False),
+                (fixtures['fix3'], True),
+            ],
+            limits={},
+            path='test.hypo',
+            line=3,
+            setup='name',
+            setup_owner=True,
+            run=True,
+            teardown='name',
+            teardown_owner=True,
+        )
+
+    def test_render_cases(self, mocker):
+        hfile = mocker.Mock(fixtures={}, fixture_owners={(): 'other'})
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteTest(RANGE, 'name', 'code', [], 'cases')
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.assert_called_once_with(hypofile.HypocriteTest.TEMPLATE)
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[],
+            limits={},
+            path='test.hypo',
+            line=3,
+            cases='cases',
+        )
+
+    def test_render_shared(self, mocker):
+        fixtures = {
+            'fix1': mocker.Mock(return_type=None, teardown=None,
+                                scope='test'),
+            'fix2': mocker.Mock(return_type='int', teardown=['code'],
+                                scope='test'),
+        }
+        hfile = mocker.Mock(fixtures=fixtures, fixture_owners={
+            ('fix1', 'fix2'): 'other',
+        })
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteTest(RANGE, 'name', 'code', [
+            ('fix1', True),
+            ('fix2', True),
+        ])
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[
+                (fixtures['fix1'], True),
+                (fixtures['fix2'], True),
+            ],
+            limits={},
+            path='test.hypo',
+            line=3,
+            setup='other',
+            run=True,
+            teardown='other',
+        )
+
+    def test_render_file_scope(self, mocker):
+        fixtures = {
+            'fix1': mocker.Mock(return_type='int', teardown=['code'],
+                                scope='file'),
+        }
+        hfile = mocker.Mock(fixtures=fixtures, fixture_owners={
+            ('fix1',): 'name',
+        })
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteTest(RANGE, 'name', 'code', [
+            ('fix1', True),
+        ])
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[
+                (fixtures['fix1'], True),
             ],
+            limits={},
+            path='test.hypo',
+            line=3,
+            file_setup='name',
+            file_setup_owner=True,
+            run=True,
+        )
+
+    def test_render_mixed_scope(self, mocker):
+        fixtures = {
+            'fix1': mocker.Mock(return_type='int', teardown=['code'],
+                                scope='file'),
+            'fix2': mocker.Mock(return_type=None, teardown=['code'],
+                                scope='test'),
+        }
+        hfile = mocker.Mock(fixtures=fixtures, fixture_owners={
+            ('fix1', 'fix2'): 'other',
+        })
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteTest(RANGE, 'name', 'code', [
+            ('fix1', False),
+            ('fix2', True),
+        ])
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[
+                (fixtures['fix1'], False),
+                (fixtures['fix2'], True),
+            ],
+            limits={},
+            path='test.hypo',
+            line=3,
+            file_setup='other',
+            setup='other',
+            teardown='other',
+        )
+
+    def test_render_no_injection(self, mocker):
+        fixtures = {
+            'fix1': mocker.Mock(return_type=None, teardown=None,
+                                scope='test'),
+            'fix2': mocker.Mock(return_type='int', teardown=None,
+                                scope='test'),
+        }
+        hfile = mocker.Mock(fixtures=fixtures, fixture_owners={
+            ('fix1', 'fix2'): 'name',
+        })
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteTest(RANGE, 'name', 'code', [
+            ('fix1', True),
+            ('fix2', False),
+        ])
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[
+                (fixtures['fix1'], True),
+                (fixtures['fix2'], False),
+            ],
+            limits={},
+            path='test.hypo',
+            line=3,
+            setup='name',
+            setup_owner=True,
+        )
+
+    def test_render_no_fixtures(self, mocker):
+        hfile = mocker.Mock(fixtures={}, fixture_owners={(): 'name'})
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteTest(RANGE, 'name', 'code', [])
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[],
+            limits={},
+            path='test.hypo',
+            line=3,
+        )
+
+    def test_render_limits(self, mocker):
+        hfile = mocker.Mock(fixtures={}, fixture_owners={(): 'name'})
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteTest(RANGE, 'name', 'code', [], None,
+                                     {'timeout': 2.5})
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[],
+            limits={'timeout': 2.5},
+            path='test.hypo',
+            line=3,
+        )
+
+
+class TestHypocriteBench(object):
+    def test_render(self, mocker):
+        fixtures = {
+            'fix1': mocker.Mock(return_type=None, teardown=None,
+                                scope='test'),
+            'fix2': mocker.Mock(return_type='int', teardown=['code'],
+                                scope='test'),
+        }
+        hfile = mocker.Mock(fixtures=fixtures)
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteBench('range', 'name', 'code', [
+            ('fix1', True),
+            ('fix2', False),
+        ])
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.assert_called_once_with(
+            hypofile.HypocriteBench.TEMPLATE
+        )
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[
+                (fixtures['fix1'], True),
+                (fixtures['fix2'], False),
+            ],
+            setup=True,
+            teardown=True,
+        )
+
+    def test_render_file_scope(self, mocker):
+        fixtures = {
+            'fix1': mocker.Mock(return_type='int', teardown=['code'],
+                                scope='file'),
+        }
+        hfile = mocker.Mock(fixtures=fixtures)
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteBench('range', 'name', 'code', [
+            ('fix1', True),
+        ])
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[
+                (fixtures['fix1'], True),
+            ],
+            setup=True,
+        )
+
+    def test_render_no_fixtures(self, mocker):
+        hfile = mocker.Mock(fixtures={})
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteBench('range', 'name', 'code', [])
+
+        obj.render(hfile, 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+            fixtures=[],
         )
 
 
@@ -176,12 +528,20 @@ class TestHypocriteMock(object):
         assert result.name == 'name'
         assert result.return_type == 'return_type'
         assert result.args == 'args'
+        assert result.fake is None
+
+    def test_init_fake(self):
+        result = hypofile.HypocriteMock(
+            'range', 'name', 'return_type', 'args', 'fake',
+        )
+
+        assert result.fake == 'fake'
 
     def test_render_void(self, mocker):
         mock_get_tmpl = mocker.patch.object(
             hypofile.template.Template, 'get_tmpl'
         )
-        obj = hypofile.HypocriteMock('range', 'name', 'void', 'args')
+        obj = hypofile.HypocriteMock('range', 'name', 'void', ARGS)
 
         obj.render('hfile', 'ctxt')
 
@@ -192,23 +552,96 @@ class TestHypocriteMock(object):
             'ctxt',
             name='name',
             return_type='void',
-            args='args',
+            args=ARGS,
+            fake=None,
+            use_addreturn=True,
+            use_setreturns=True,
+            use_nospy=True,
+            use_expectcalls=True,
+            use_argtable=True,
+            typed={'b'},
+            use_checkcalls=True,
+            use_checkunordered=True,
+            use_findcall=True,
+            use_countcalls=True,
+            use_callcount=True,
+            use_getreturn=True,
+            use_getcall=True,
+            use_getfile=True,
+            use_getline=True,
+            use_getarg=True,
         )
 
     def test_render_nonvoid(self, mocker):
         mock_get_tmpl = mocker.patch.object(
             hypofile.template.Template, 'get_tmpl'
         )
-        obj = hypofile.HypocriteMock('range', 'name', 'int', 'args')
+        obj = hypofile.HypocriteMock('range', 'name', 'int', ARGS)
 
         obj.render('hfile', 'ctxt')
 
         mock_get_tmpl.assert_called_once_with(hypofile.HypocriteMock.TEMPLATE)
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            return_type='int',
+            args=ARGS,
+            fake=None,
+            use_addreturn=True,
+            use_setreturns=True,
+            use_nospy=True,
+            use_expectcalls=True,
+            use_argtable=True,
+            typed={'b'},
+            use_checkcalls=True,
+            use_checkunordered=True,
+            use_findcall=True,
+            use_countcalls=True,
+            use_callcount=True,
+            use_getreturn=True,
+            use_getcall=True,
+            use_getfile=True,
+            use_getline=True,
+            use_getarg=True,
+        )
+
+    def test_render_helpers(self, mocker):
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteMock('range', 'name', 'int', ARGS)
+
+        obj.render('hfile', 'ctxt', {'addreturn', 'checkcalls', 'getarg'})
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            return_type='int',
+            args=ARGS,
+            fake=None,
+            use_addreturn=True,
+            use_expectcalls=True,
+            use_argtable=True,
+            typed={'b'},
+            use_checkcalls=True,
+            use_getcall=True,
+            use_getarg=True,
+        )
+
+    def test_render_no_helpers(self, mocker):
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.HypocriteMock('range', 'name', 'int', 'args')
+
+        obj.render('hfile', 'ctxt', set())
+
         mock_get_tmpl.return_value.render.assert_called_once_with(
             'ctxt',
             name='name',
             return_type='int',
             args='args',
+            fake=None,
         )
 
 
@@ -221,6 +654,7 @@ class TestFixture(object):
         assert result.return_type == 'return_type'
         assert result.code == 'code'
         assert result.teardown is None
+        assert result.scope == 'test'
 
     def test_init_teardown(self):
         result = hypofile.Fixture(
@@ -232,6 +666,19 @@ class TestFixture(object):
         assert result.return_type == 'return_type'
         assert result.code == 'code'
         assert result.teardown == 'teardown'
+        assert result.scope == 'test'
+
+    def test_init_scope(self):
+        result = hypofile.Fixture(
+            'range', 'name', 'return_type', 'code', scope='file'
+        )
+
+        assert result.coord_range == 'range'
+        assert result.name == 'name'
+        assert result.return_type == 'return_type'
+        assert result.code == 'code'
+        assert result.teardown is None
+        assert result.scope == 'file'
 
     def test_render_base(self, mocker):
         mock_get_tmpl = mocker.patch.object(
@@ -268,6 +715,38 @@ class TestFixture(object):
             teardown='teardown',
         )
 
+    def test_render_file_scope(self, mocker):
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.Fixture(
+            'range', 'name', 'return_type', 'code', scope='file'
+        )
+
+        obj.render('hfile', 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            return_type='return_type',
+            code='code',
+            file_scope=True,
+        )
+
+    def test_render_no_return(self, mocker):
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        obj = hypofile.Fixture('range', 'name', None, 'code')
+
+        obj.render('hfile', 'ctxt')
+
+        mock_get_tmpl.return_value.render.assert_called_once_with(
+            'ctxt',
+            name='name',
+            code='code',
+        )
+
 
 class TestTargetDirective(object):
     def test_base(self):
@@ -314,6 +793,64 @@ class TestTargetDirective(object):
         assert values == {'target': None}
 
 
+class TestFakeioDirective(object):
+    def test_initial(self):
+        result = hypofile.HypoParser.DIRECTIVES['fakeio'].initial()
+
+        assert result is False
+
+    def test_base(self):
+        values = {'fake_io': False}
+        coord = location.Coordinate('path', 23)
+
+        result = hypofile.fakeio_directive(values, coord, [])
+
+        assert result is None
+        assert values == {
+            'fake_io': [
+                'open', 'close', 'read', 'write', 'lseek', 'pipe',
+                'socketpair',
+            ],
+        }
+
+    def test_functions(self):
+        values = {'fake_io': False}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'write'),
+            perfile.Token(perfile.TOK_WORD, 'read'),
+            perfile.Token(perfile.TOK_WORD, 'write'),
+        ]
+
+        result = hypofile.fakeio_directive(values, coord, toks)
+
+        assert result is None
+        assert values == {'fake_io': ['read', 'write']}
+
+    def test_unknown_function(self):
+        values = {'fake_io': False}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'read'),
+            perfile.Token(perfile.TOK_WORD, 'fread'),
+        ]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.fakeio_directive(values, coord, toks)
+
+        assert values == {'fake_io': False}
+
+    def test_bad_token(self):
+        values = {'fake_io': False}
+        coord = location.Coordinate('path', 23)
+        toks = [perfile.Token(perfile.TOK_STR, 'read')]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.fakeio_directive(values, coord, toks)
+
+        assert values == {'fake_io': False}
+
+
 class TestPreambleDirective(object):
     def test_initial(self):
         result = hypofile.HypoParser.DIRECTIVES['preamble'].init()
@@ -436,6 +973,7 @@ class TestMockDirective(object):
             'func_name',
             'struct st_name *',
             [],
+            None,
         )
 
     def test_void(self, mocker):
@@ -464,26 +1002,60 @@ class TestMockDirective(object):
             location.CoordinateRange('path', 23, 23),
             'func_name',
             'struct st_name *',
-            [],
+            [],
+            None,
+        )
+
+    def test_with_args(self, mocker):
+        mock_HypocriteMock = mocker.patch.object(hypofile, 'HypocriteMock')
+        values = {'mocks': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'struct'),
+            perfile.Token(perfile.TOK_WORD, 'st_name'),
+            perfile.Token(perfile.TOK_CHAR, '*'),
+            perfile.Token(perfile.TOK_WORD, 'func_name'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'void'),
+            perfile.Token(perfile.TOK_CHAR, '*'),
+            perfile.Token(perfile.TOK_WORD, 'arg1'),
+            perfile.Token(perfile.TOK_CHAR, ','),
+            perfile.Token(perfile.TOK_WORD, 'int'),
+            perfile.Token(perfile.TOK_WORD, 'arg2'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+        ]
+
+        result = hypofile.mock(values, coord, toks)
+
+        assert result is None
+        assert values == {
+            'mocks': {
+                'func_name': mock_HypocriteMock.return_value,
+            },
+        }
+        mock_HypocriteMock.assert_called_once_with(
+            location.CoordinateRange('path', 23, 23),
+            'func_name',
+            'struct st_name *',
+            [('void *', 'arg1'), ('int', 'arg2')],
+            None,
         )
 
-    def test_with_args(self, mocker):
+    def test_fake(self, mocker):
         mock_HypocriteMock = mocker.patch.object(hypofile, 'HypocriteMock')
         values = {'mocks': {}}
         coord = location.Coordinate('path', 23)
         toks = [
-            perfile.Token(perfile.TOK_WORD, 'struct'),
-            perfile.Token(perfile.TOK_WORD, 'st_name'),
-            perfile.Token(perfile.TOK_CHAR, '*'),
-            perfile.Token(perfile.TOK_WORD, 'func_name'),
+            perfile.Token(perfile.TOK_WORD, 'unsigned'),
+            perfile.Token(perfile.TOK_WORD, 'int'),
+            perfile.Token(perfile.TOK_WORD, 'sleep'),
             perfile.Token(perfile.TOK_CHAR, '('),
-            perfile.Token(perfile.TOK_WORD, 'void'),
-            perfile.Token(perfile.TOK_CHAR, '*'),
-            perfile.Token(perfile.TOK_WORD, 'arg1'),
-            perfile.Token(perfile.TOK_CHAR, ','),
+            perfile.Token(perfile.TOK_WORD, 'unsigned'),
             perfile.Token(perfile.TOK_WORD, 'int'),
-            perfile.Token(perfile.TOK_WORD, 'arg2'),
+            perfile.Token(perfile.TOK_WORD, 'seconds'),
             perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '='),
+            perfile.Token(perfile.TOK_WORD, 'hypo_clock_sleep'),
         ]
 
         result = hypofile.mock(values, coord, toks)
@@ -491,16 +1063,36 @@ class TestMockDirective(object):
         assert result is None
         assert values == {
             'mocks': {
-                'func_name': mock_HypocriteMock.return_value,
+                'sleep': mock_HypocriteMock.return_value,
             },
         }
         mock_HypocriteMock.assert_called_once_with(
             location.CoordinateRange('path', 23, 23),
-            'func_name',
-            'struct st_name *',
-            [('void *', 'arg1'), ('int', 'arg2')],
+            'sleep',
+            'unsigned int',
+            [('unsigned int', 'seconds')],
+            'hypo_clock_sleep',
         )
 
+    def test_bad_fake(self, mocker):
+        mock_HypocriteMock = mocker.patch.object(hypofile, 'HypocriteMock')
+        values = {'mocks': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'void'),
+            perfile.Token(perfile.TOK_WORD, 'func_name'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '='),
+            perfile.Token(perfile.TOK_CHAR, '*'),
+        ]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.mock(values, coord, toks)
+
+        assert values == {'mocks': {}}
+        assert not mock_HypocriteMock.called
+
     def test_missing_prefix(self, mocker):
         mock_HypocriteMock = mocker.patch.object(hypofile, 'HypocriteMock')
         values = {'mocks': {}}
@@ -784,11 +1376,83 @@ class TestTestDirective(object):
         result = hypofile.TestDirective(values, coord, toks)
 
         assert result.name == 'test_name'
+        assert result.cases is None
         assert result.fixtures == []
+        assert result.limits == {}
         assert result.values is values
         assert result.start_coord == coord
         assert values == {'tests': {}}
 
+    def test_init_with_cases(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_CHAR, '['),
+            perfile.Token(perfile.TOK_WORD, 'cases'),
+            perfile.Token(perfile.TOK_CHAR, ']'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        result = hypofile.TestDirective(values, coord, toks)
+
+        assert result.name == 'test_name'
+        assert result.cases == 'cases'
+        assert result.fixtures == []
+        assert values == {'tests': {}}
+
+    def test_init_with_cases_and_fixtures(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_CHAR, '['),
+            perfile.Token(perfile.TOK_WORD, 'cases'),
+            perfile.Token(perfile.TOK_CHAR, ']'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'fix1'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        result = hypofile.TestDirective(values, coord, toks)
+
+        assert result.name == 'test_name'
+        assert result.cases == 'cases'
+        assert result.fixtures == [('fix1', True)]
+        assert values == {'tests': {}}
+
+    def test_init_bad_cases_name(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_CHAR, '['),
+            perfile.Token(perfile.TOK_STR, 'cases'),
+            perfile.Token(perfile.TOK_CHAR, ']'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.TestDirective(values, coord, toks)
+
+        assert values == {'tests': {}}
+
+    def test_init_bad_cases_close_bracket(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_CHAR, '['),
+            perfile.Token(perfile.TOK_WORD, 'cases'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.TestDirective(values, coord, toks)
+
+        assert values == {'tests': {}}
+
     def test_init_with_fixtures(self):
         values = {'tests': {}}
         coord = location.Coordinate('path', 23)
@@ -829,6 +1493,133 @@ class TestTestDirective(object):
 
         assert values == {'tests': {}}
 
+    def test_init_with_limits(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'fix1'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_WORD, 'timeout'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '2'),
+            perfile.Token(perfile.TOK_CHAR, '.'),
+            perfile.Token(perfile.TOK_CHAR, '5'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_WORD, 'cpu'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '3'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_WORD, 'memory'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '6'),
+            perfile.Token(perfile.TOK_CHAR, '4'),
+            perfile.Token(perfile.TOK_WORD, 'M'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        result = hypofile.TestDirective(values, coord, toks)
+
+        assert result.name == 'test_name'
+        assert result.fixtures == [('fix1', True)]
+        assert result.limits == {
+            'timeout': 2.5,
+            'cpu': 3,
+            'memory': 64 * 1024 * 1024,
+        }
+        assert values == {'tests': {}}
+
+    def test_init_limits_no_fixtures(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_WORD, 'timeout'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '1'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        result = hypofile.TestDirective(values, coord, toks)
+
+        assert result.fixtures == []
+        assert result.limits == {'timeout': 1.0}
+        assert values == {'tests': {}}
+
+    def test_init_bad_limit_name(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_WORD, 'deadline'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '1'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException) as exc_info:
+            hypofile.TestDirective(values, coord, toks)
+
+        assert 'Invalid %test directive' in str(exc_info.value)
+        assert values == {'tests': {}}
+
+    def test_init_bad_limit_close_paren(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_WORD, 'timeout'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '1'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.TestDirective(values, coord, toks)
+
+        assert values == {'tests': {}}
+
+    def test_init_bad_limit_value(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_WORD, 'cpu'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '1'),
+            perfile.Token(perfile.TOK_CHAR, '.'),
+            perfile.Token(perfile.TOK_CHAR, '5'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException) as exc_info:
+            hypofile.TestDirective(values, coord, toks)
+
+        assert 'Invalid cpu limit "1.5"' in str(exc_info.value)
+        assert values == {'tests': {}}
+
+    def test_init_zero_limit(self):
+        values = {'tests': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_WORD, 'timeout'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '0'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.TestDirective(values, coord, toks)
+
+        assert values == {'tests': {}}
+
     def test_init_too_few_tokens(self):
         values = {'tests': {}}
         coord = location.Coordinate('path', 23)
@@ -1042,55 +1833,168 @@ class TestTestDirective(object):
             'test_name',
             'buf',
             [('fix1', True), ('fix2', False)],
+            None,
+            {},
         )
 
-    def test_call_unclosed(self, mocker):
+    def test_call_unclosed(self, mocker):
+        mock_HypocriteTest = mocker.patch.object(hypofile, 'HypocriteTest')
+        values = {'tests': {}}
+        start_coord = location.Coordinate('path', 23)
+        end_coord = location.Coordinate('path', 42)
+        start_toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'fix1'),
+            perfile.Token(perfile.TOK_CHAR, ','),
+            perfile.Token(perfile.TOK_CHAR, '!'),
+            perfile.Token(perfile.TOK_WORD, 'fix2'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+        end_toks = None
+        obj = hypofile.TestDirective(values, start_coord, start_toks)
+
+        with pytest.raises(perfile.ParseException):
+            obj(end_coord, 'buf', end_toks)
+
+        assert values == {'tests': {}}
+        assert not mock_HypocriteTest.called
+
+    def test_call_bad_end(self, mocker):
+        mock_HypocriteTest = mocker.patch.object(hypofile, 'HypocriteTest')
+        values = {'tests': {}}
+        start_coord = location.Coordinate('path', 23)
+        end_coord = location.Coordinate('path', 42)
+        start_toks = [
+            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'fix1'),
+            perfile.Token(perfile.TOK_CHAR, ','),
+            perfile.Token(perfile.TOK_CHAR, '!'),
+            perfile.Token(perfile.TOK_WORD, 'fix2'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+        end_toks = [perfile.Token(perfile.TOK_CHAR, '}')]
+        obj = hypofile.TestDirective(values, start_coord, start_toks)
+
+        with pytest.raises(perfile.ParseException):
+            obj(end_coord, 'buf', end_toks)
+
+        assert values == {'tests': {}}
+        assert not mock_HypocriteTest.called
+
+
+class TestBenchDirective(object):
+    def test_initial(self):
+        result = hypofile.HypoParser.DIRECTIVES['bench'].init()
+
+        assert isinstance(result, collections.OrderedDict)
+        assert result == {}
+
+    def test_init_base(self):
+        values = {'benches': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'bench_name'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'fix1'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        result = hypofile.BenchDirective(values, coord, toks)
+
+        assert result.name == 'bench_name'
+        assert result.cases is None
+        assert result.fixtures == [('fix1', True)]
+        assert values == {'benches': {}}
+
+    def test_init_with_cases(self):
+        values = {'benches': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'bench_name'),
+            perfile.Token(perfile.TOK_CHAR, '['),
+            perfile.Token(perfile.TOK_WORD, 'cases'),
+            perfile.Token(perfile.TOK_CHAR, ']'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException) as exc_info:
+            hypofile.BenchDirective(values, coord, toks)
+
+        assert 'Invalid %bench directive' in str(exc_info.value)
+        assert values == {'benches': {}}
+
+    def test_init_with_limits(self):
+        values = {'benches': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_WORD, 'bench_name'),
+            perfile.Token(perfile.TOK_WORD, 'timeout'),
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_CHAR, '1'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException) as exc_info:
+            hypofile.BenchDirective(values, coord, toks)
+
+        assert 'Invalid %bench directive' in str(exc_info.value)
+        assert values == {'benches': {}}
+
+    def test_call_base(self, mocker):
+        mock_HypocriteBench = mocker.patch.object(hypofile, 'HypocriteBench')
         mock_HypocriteTest = mocker.patch.object(hypofile, 'HypocriteTest')
-        values = {'tests': {}}
+        values = {'benches': {}}
         start_coord = location.Coordinate('path', 23)
         end_coord = location.Coordinate('path', 42)
         start_toks = [
-            perfile.Token(perfile.TOK_WORD, 'test_name'),
+            perfile.Token(perfile.TOK_WORD, 'bench_name'),
             perfile.Token(perfile.TOK_CHAR, '('),
-            perfile.Token(perfile.TOK_WORD, 'fix1'),
-            perfile.Token(perfile.TOK_CHAR, ','),
             perfile.Token(perfile.TOK_CHAR, '!'),
-            perfile.Token(perfile.TOK_WORD, 'fix2'),
+            perfile.Token(perfile.TOK_WORD, 'fix1'),
             perfile.Token(perfile.TOK_CHAR, ')'),
             perfile.Token(perfile.TOK_CHAR, '{'),
         ]
-        end_toks = None
-        obj = hypofile.TestDirective(values, start_coord, start_toks)
+        obj = hypofile.BenchDirective(values, start_coord, start_toks)
 
-        with pytest.raises(perfile.ParseException):
-            obj(end_coord, 'buf', end_toks)
+        result = obj(end_coord, 'buf', [])
 
-        assert values == {'tests': {}}
+        assert result is None
+        assert values == {
+            'benches': {
+                'bench_name': mock_HypocriteBench.return_value,
+            },
+        }
+        mock_HypocriteBench.assert_called_once_with(
+            location.CoordinateRange('path', 23, 42),
+            'bench_name',
+            'buf',
+            [('fix1', False)],
+        )
         assert not mock_HypocriteTest.called
 
-    def test_call_bad_end(self, mocker):
-        mock_HypocriteTest = mocker.patch.object(hypofile, 'HypocriteTest')
-        values = {'tests': {}}
+    def test_call_unclosed(self, mocker):
+        mock_HypocriteBench = mocker.patch.object(hypofile, 'HypocriteBench')
+        values = {'benches': {}}
         start_coord = location.Coordinate('path', 23)
         end_coord = location.Coordinate('path', 42)
         start_toks = [
-            perfile.Token(perfile.TOK_WORD, 'test_name'),
-            perfile.Token(perfile.TOK_CHAR, '('),
-            perfile.Token(perfile.TOK_WORD, 'fix1'),
-            perfile.Token(perfile.TOK_CHAR, ','),
-            perfile.Token(perfile.TOK_CHAR, '!'),
-            perfile.Token(perfile.TOK_WORD, 'fix2'),
-            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_WORD, 'bench_name'),
             perfile.Token(perfile.TOK_CHAR, '{'),
         ]
-        end_toks = [perfile.Token(perfile.TOK_CHAR, '}')]
-        obj = hypofile.TestDirective(values, start_coord, start_toks)
+        obj = hypofile.BenchDirective(values, start_coord, start_toks)
 
-        with pytest.raises(perfile.ParseException):
-            obj(end_coord, 'buf', end_toks)
+        with pytest.raises(perfile.ParseException) as exc_info:
+            obj(end_coord, 'buf', None)
 
-        assert values == {'tests': {}}
-        assert not mock_HypocriteTest.called
+        assert 'Unclosed %bench directive' in str(exc_info.value)
+        assert values == {'benches': {}}
+        assert not mock_HypocriteBench.called
 
 
 class TestFixtureDirective(object):
@@ -1154,6 +2058,73 @@ class TestFixtureDirective(object):
         assert result.block_start == coord
         assert values == {'fixtures': {}}
 
+    def test_init_scope(self):
+        values = {'fixtures': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'file'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_WORD, 'int'),
+            perfile.Token(perfile.TOK_WORD, 'fix_name'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        result = hypofile.FixtureDirective(values, coord, toks)
+
+        assert result.name == 'fix_name'
+        assert result.type_ == 'int'
+        assert result.scope == 'file'
+        assert values == {'fixtures': {}}
+
+    def test_init_scope_alias(self):
+        values = {'fixtures': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'suite'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_WORD, 'fix_name'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        result = hypofile.FixtureDirective(values, coord, toks)
+
+        assert result.name == 'fix_name'
+        assert result.type_ is None
+        assert result.scope == 'file'
+
+    def test_init_bad_scope(self):
+        values = {'fixtures': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'process'),
+            perfile.Token(perfile.TOK_CHAR, ')'),
+            perfile.Token(perfile.TOK_WORD, 'fix_name'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.FixtureDirective(values, coord, toks)
+
+        assert values == {'fixtures': {}}
+
+    def test_init_unclosed_scope(self):
+        values = {'fixtures': {}}
+        coord = location.Coordinate('path', 23)
+        toks = [
+            perfile.Token(perfile.TOK_CHAR, '('),
+            perfile.Token(perfile.TOK_WORD, 'file'),
+            perfile.Token(perfile.TOK_WORD, 'fix_name'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+
+        with pytest.raises(perfile.ParseException):
+            hypofile.FixtureDirective(values, coord, toks)
+
+        assert values == {'fixtures': {}}
+
     def test_init_trailing_tokens(self):
         values = {'fixtures': {}}
         coord = location.Coordinate('path', 23)
@@ -1236,6 +2207,7 @@ class TestFixtureDirective(object):
             'fix_name',
             'int',
             'buf',
+            scope='test',
         )
 
     def test_call_with_teardown(self, mocker):
@@ -1329,6 +2301,7 @@ class TestFixtureDirective(object):
             'int',
             'code',
             'buf',
+            scope='test',
         )
 
     def test_teardown_unclosed(self, mocker):
@@ -1375,7 +2348,7 @@ class TestFixtureDirective(object):
 
 
 def _make_fake_render(text):
-    def _fake_render(hfile, ctxt):
+    def _fake_render(hfile, ctxt, *args):
         ctxt.rendered.append(text)
 
     return _fake_render
@@ -1383,25 +2356,60 @@ def _make_fake_render(text):
 
 class TestHypoFile(object):
     def test_parse(self, mocker):
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mock_open = mocker.patch.object(
+            hypofile.io, 'open', return_value=handle
+        )
+        mock_parse_stream = mocker.patch.object(
+            hypofile.HypoFile, 'parse_stream'
+        )
+
+        result = hypofile.HypoFile.parse('some/path')
+
+        assert result == mock_parse_stream.return_value
+        mock_open.assert_called_once_with('some/path')
+        mock_parse_stream.assert_called_once_with(handle, 'some/path')
+
+    def test_parse_text(self, mocker):
+        mock_parse_stream = mocker.patch.object(
+            hypofile.HypoFile, 'parse_stream'
+        )
+
+        result = hypofile.HypoFile.parse_text(u'l1\r\nl2\rl3\n', 'some/path')
+
+        assert result == mock_parse_stream.return_value
+        stream, path = mock_parse_stream.call_args[0]
+        assert list(stream) == [u'l1\n', u'l2\n', u'l3\n']
+        assert path == 'some/path'
+
+    def test_parse_text_bytes(self, mocker):
+        mock_parse_stream = mocker.patch.object(
+            hypofile.HypoFile, 'parse_stream'
+        )
+
+        result = hypofile.HypoFile.parse_text(b'l1\nl2\n', 'some/path')
+
+        assert result == mock_parse_stream.return_value
+        stream, path = mock_parse_stream.call_args[0]
+        assert list(stream) == [u'l1\n', u'l2\n']
+
+    def test_parse_stream(self, mocker):
         parser = mocker.Mock(**{
             'parse.return_value': {'a': 1, 'b': 2, 'c': 3},
         })
         mock_HypoParser = mocker.patch.object(
             hypofile, 'HypoParser', return_value=parser
         )
-        handle = mocker.MagicMock()
-        handle.__enter__.return_value = handle
-        mock_open = mocker.patch.object(builtins, 'open', return_value=handle)
         mock_init = mocker.patch.object(
             hypofile.HypoFile, '__init__', return_value=None
         )
 
-        result = hypofile.HypoFile.parse('some/path')
+        result = hypofile.HypoFile.parse_stream('stream', 'some/path')
 
         assert isinstance(result, hypofile.HypoFile)
         mock_HypoParser.assert_called_once_with()
-        mock_open.assert_called_once_with('some/path', 'rU')
-        parser.parse.assert_called_once_with(handle, 'path')
+        parser.parse.assert_called_once_with('stream', 'path')
         mock_init.assert_called_once_with('some/path', a=1, b=2, c=3)
 
     def test_init(self):
@@ -1415,6 +2423,119 @@ class TestHypoFile(object):
         assert result.tests == 'tests'
         assert result.mocks == 'mocks'
         assert result.fixtures == 'fixtures'
+        assert result.benches == {}
+        assert result.fake_io is False
+        assert result._code is None
+        assert result._mock_helpers is None
+        assert result._fixture_owners is None
+
+    def test_init_benches(self):
+        result = hypofile.HypoFile(
+            'path', 'target', 'preamble', 'tests', 'mocks', 'fixtures',
+            'benches',
+        )
+
+        assert result.benches == 'benches'
+
+    def test_init_fake_io(self):
+        result = hypofile.HypoFile(
+            'path', 'target', 'preamble', 'tests', 'mocks', 'fixtures',
+            fake_io=['read'],
+        )
+
+        assert result.fake_io == ['read']
+
+    def test_fixture_owners(self, mocker):
+        tests = collections.OrderedDict()
+        tests['t1'] = mocker.Mock(fixtures=[('f1', True), ('f2', True)])
+        tests['t2'] = mocker.Mock(fixtures=[])
+        tests['t3'] = mocker.Mock(fixtures=[('f1', False), ('f2', True)])
+        tests['t4'] = mocker.Mock(fixtures=[('f2', True), ('f1', True)])
+        tests['t5'] = mocker.Mock(fixtures=[])
+        for name, test in tests.items():
+            test.name = name
+        obj = hypofile.HypoFile('some/path', 'target', [], tests, {}, {})
+
+        result = obj.fixture_owners
+
+        assert result == {
+            ('f1', 'f2'): 't1',
+            (): 't2',
+            ('f2', 'f1'): 't4',
+        }
+        assert obj._fixture_owners is result
+
+    def test_fixture_owners_cached(self):
+        obj = hypofile.HypoFile('some/path', 'target', [], {}, {}, {})
+        obj._fixture_owners = 'cached'
+
+        assert obj.fixture_owners == 'cached'
+
+    def test_code(self, mocker):
+        preamble = [mocker.Mock(code=['p1', 'p2'])]
+        tests = collections.OrderedDict()
+        tests['t1'] = mocker.Mock(code=['t1'])
+        tests['t2'] = mocker.Mock(code=['t2'])
+        fixtures = {
+            'f1': mocker.Mock(code=['f1'], teardown=['f1 teardown']),
+        }
+        benches = {'b1': mocker.Mock(code=['b1'])}
+        obj = hypofile.HypoFile(
+            'some/path', 'target', preamble, tests, {}, fixtures, benches
+        )
+
+        result = obj.code
+
+        assert result == 'p1\np2\nt1\nt2\nb1\nf1\nf1 teardown'
+        assert obj._code is result
+
+    def test_code_cached(self):
+        obj = hypofile.HypoFile('some/path', 'target', [], {}, {}, {})
+        obj._code = 'cached'
+
+        assert obj.code == 'cached'
+
+    def test_mock_helpers(self, mocker):
+        preamble = [mocker.Mock(code=['#define X hypo_mock_callcount_m1()'])]
+        tests = {
+            't1': mocker.Mock(code=[
+                'hypo_mock_addreturn_m1(5);',
+                'hypo_mock_checkcalls_m1(expected, 1);',
+                'hypo_mock_getarg_m1_sub(0, x);',
+                'hypo_mock_findcall_m1_sub(&query, 0);',
+                'hypo_mock_bogus_m1();',
+                'hypo_mock_addreturn_unknown(5);',
+                '_hypo_mock_getcall_m2(0);',
+            ]),
+        }
+        fixtures = {
+            'f1': mocker.Mock(code=['{ANYARG_M1_SUB_ARG, 0}'], teardown=None),
+            'f2': mocker.Mock(code=['hypo_mock_setreturns_m2(v, 2, 0);'],
+                              teardown=['hypo_mock_nospy_m2();']),
+        }
+        benches = {
+            'b1': mocker.Mock(code=['hypo_mock_addreturn_m3(1);']),
+        }
+        mocks = {'m1': 'mock1', 'm1_sub': 'mock2', 'm2': 'mock3', 'm3': 'x'}
+        obj = hypofile.HypoFile(
+            'some/path', 'target', preamble, tests, mocks, fixtures, benches
+        )
+
+        result = obj.mock_helpers
+
+        assert result == {
+            'm1': {'callcount', 'addreturn', 'checkcalls', 'expectcalls'},
+            'm1_sub': {'getarg', 'findcall', 'expectcalls'},
+            'm2': {'setreturns', 'nospy'},
+            'm3': {'addreturn'},
+        }
+        assert obj._mock_helpers is result
+
+    def test_mock_helpers_cached(self):
+        obj = hypofile.HypoFile('some/path', 'target', [], {}, {}, {})
+        obj._mock_helpers = 'cached'
+
+        assert obj.mock_helpers == 'cached'
 
     def test_render(self, mocker):
         preamble = [
@@ -1429,10 +2550,10 @@ class TestHypoFile(object):
             'render.side_effect': _make_fake_render('test1'),
         })
         mocks = {
-            'mock1': mocker.Mock(**{
+            'mock1': mocker.Mock(fake=None, **{
                 'render.side_effect': _make_fake_render('mock1'),
             }),
-            'mock2': mocker.Mock(**{
+            'mock2': mocker.Mock(fake=None, **{
                 'render.side_effect': _make_fake_render('mock2'),
             }),
         }
@@ -1444,10 +2565,13 @@ class TestHypoFile(object):
                 'render.side_effect': _make_fake_render('fix2'),
             }),
         }
-        ctxt = mocker.Mock(rendered=[])
+        ctxt = mocker.Mock(rendered=[], sections={})
         mock_RenderContext = mocker.patch.object(
             hypofile.template, 'RenderContext', return_value=ctxt
         )
+        mock_render_inline = mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
         mock_get_tmpl = mocker.patch.object(
             hypofile.template.Template, 'get_tmpl'
         )
@@ -1455,6 +2579,8 @@ class TestHypoFile(object):
         obj = hypofile.HypoFile(
             'some/path', 'target', preamble, tests, mocks, fixtures
         )
+        obj._code = ''
+        obj._mock_helpers = {'mock1': 'helpers1', 'mock2': 'helpers2'}
 
         result = obj.render('test_fname')
 
@@ -1464,8 +2590,8 @@ class TestHypoFile(object):
             pre.render.assert_called_once_with(obj, ctxt)
         for test in tests.values():
             test.render.assert_called_once_with(obj, ctxt)
-        for mock in mocks.values():
-            mock.render.assert_called_once_with(obj, ctxt)
+        mocks['mock1'].render.assert_called_once_with(obj, ctxt, 'helpers1')
+        mocks['mock2'].render.assert_called_once_with(obj, ctxt, 'helpers2')
         for fix in fixtures.values():
             fix.render.assert_called_once_with(obj, ctxt)
         assert ctxt.rendered == [
@@ -1474,7 +2600,247 @@ class TestHypoFile(object):
             'mock1', 'mock2',
             'fix1', 'fix2',
         ]
+        mock_render_inline.assert_called_once_with(ctxt)
+        assert ctxt.sections == {'runtime': 'decls', 'runtime_impl': 'impl'}
         mock_get_tmpl.assert_called_once_with(hypofile.HypoFile.TEMPLATE)
         tmpl.render.assert_called_once_with(
             ctxt, source='path', target='target', test_fname='test_fname'
         )
+
+    def test_render_profiler(self, mocker):
+        profiler = mocker.MagicMock()
+        mocker.patch.object(hypofile.template, 'RenderContext')
+        mocker.patch.object(hypofile.template.Template, 'get_tmpl')
+        mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        obj = hypofile.HypoFile(
+            'some/path', 'target', [], {'t1': mocker.Mock(code=[])},
+            {'m1': mocker.Mock(fake=None), 'm2': mocker.Mock(fake=None)}, {},
+        )
+
+        obj.render('test_fname', profiler)
+
+        profiler.phase.assert_has_calls([
+            mocker.call('render:preamble'),
+            mocker.call('render:tests'),
+            mocker.call('render:benches'),
+            mocker.call('render:mocks'),
+            mocker.call('render:fixtures'),
+            mocker.call('render:runtime'),
+            mocker.call('render:master'),
+        ], any_order=True)
+        profiler.count.assert_has_calls([
+            mocker.call('tests', 1),
+            mocker.call('mocks', 2),
+            mocker.call('fixtures', 0),
+            mocker.call('benches', 0),
+        ])
+
+    def test_render_ctxt(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mock_RenderContext = mocker.patch.object(
+            hypofile.template, 'RenderContext'
+        )
+        mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+        test = mocker.Mock(code=[])
+        obj = hypofile.HypoFile(
+            'some/path', 'target', [], {'t1': test}, {}, {},
+        )
+
+        result = obj.render('test_fname', ctxt=ctxt)
+
+        assert result == tmpl.render.return_value
+        assert not mock_RenderContext.called
+        test.render.assert_called_once_with(obj, ctxt)
+        tmpl.render.assert_called_once_with(
+            ctxt, source='path', target='target', test_fname='test_fname'
+        )
+
+    def test_render_benches(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mocker.patch.object(hypofile.template.Template, 'get_tmpl')
+        benches = collections.OrderedDict()
+        benches['b1'] = mocker.Mock(code=[])
+        benches['b2'] = mocker.Mock(code=[])
+        obj = hypofile.HypoFile(
+            'some/path', 'target', [], {}, {}, {}, benches,
+        )
+
+        obj.render('test_fname', ctxt=ctxt)
+
+        benches['b1'].render.assert_called_once_with(obj, ctxt)
+        benches['b2'].render.assert_called_once_with(obj, ctxt)
+
+    def test_render_track_allocs(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+        obj = hypofile.HypoFile('some/path', 'target', [], {}, {}, {})
+        obj._code = 'hypo_assert(x);'
+
+        obj.render('test_fname', ctxt=ctxt, track_allocs=True)
+
+        tmpl.render.assert_called_once_with(
+            ctxt, source='path', target='target', test_fname='test_fname',
+            track_allocs=True,
+        )
+
+    def test_render_track_allocs_referenced(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+        obj = hypofile.HypoFile('some/path', 'target', [], {}, {}, {})
+        obj._code = 'hypo_assert_max_allocs(3);'
+
+        obj.render('test_fname', ctxt=ctxt)
+
+        tmpl.render.assert_called_once_with(
+            ctxt, source='path', target='target', test_fname='test_fname',
+            track_allocs=True,
+        )
+
+    def test_render_clock_referenced(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mock_render_inline = mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mocker.patch.object(hypofile.template.Template, 'get_tmpl')
+        obj = hypofile.HypoFile('some/path', 'target', [], {}, {}, {})
+        obj._code = 'hypo_clock_advance(5, 0);'
+
+        obj.render('test_fname', ctxt=ctxt)
+
+        mock_render_inline.assert_called_once_with(ctxt, clock=True)
+
+    def test_render_clock_fake(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mock_render_inline = mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mocker.patch.object(hypofile.template.Template, 'get_tmpl')
+        mock = mocker.Mock(fake='hypo_clock_time')
+        obj = hypofile.HypoFile(
+            'some/path', 'target', [], {}, {'time': mock}, {},
+        )
+        obj._code = ''
+        obj._mock_helpers = {'time': set()}
+
+        obj.render('test_fname', ctxt=ctxt)
+
+        mock_render_inline.assert_called_once_with(ctxt, clock=True)
+
+    def test_render_fake_io(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mock_render_inline = mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+        obj = hypofile.HypoFile(
+            'some/path', 'target', [], {}, {}, {}, fake_io=['read'],
+        )
+        obj._code = 'hypo_assert(x);'
+
+        obj.render('test_fname', ctxt=ctxt)
+
+        tmpl.render.assert_called_once_with(
+            ctxt, source='path', target='target', test_fname='test_fname',
+            fake_io=['read'],
+        )
+        mock_render_inline.assert_called_once_with(ctxt, fake_io=True)
+
+    def test_render_fake_io_referenced(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mock_render_inline = mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+        obj = hypofile.HypoFile('some/path', 'target', [], {}, {}, {})
+        obj._code = 'hypo_io_file("f", "x", 1, 0);'
+
+        obj.render('test_fname', ctxt=ctxt)
+
+        tmpl.render.assert_called_once_with(
+            ctxt, source='path', target='target', test_fname='test_fname',
+        )
+        mock_render_inline.assert_called_once_with(ctxt, fake_io=True)
+
+    def test_render_fake_io_fake(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mock_render_inline = mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mocker.patch.object(hypofile.template.Template, 'get_tmpl')
+        mock = mocker.Mock(fake='hypo_io_read')
+        obj = hypofile.HypoFile(
+            'some/path', 'target', [], {}, {'read': mock}, {},
+        )
+        obj._code = ''
+        obj._mock_helpers = {'read': set()}
+
+        obj.render('test_fname', ctxt=ctxt)
+
+        mock_render_inline.assert_called_once_with(ctxt, fake_io=True)
+
+    def test_render_all_mock_helpers(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mocker.patch.object(hypofile.template.Template, 'get_tmpl')
+        mock = mocker.Mock(fake=None)
+        obj = hypofile.HypoFile(
+            'some/path', 'target', [], {}, {'m1': mock}, {},
+        )
+
+        obj.render('test_fname', ctxt=ctxt, all_mock_helpers=True)
+
+        mock.render.assert_called_once_with(obj, ctxt, None)
+        assert obj._mock_helpers is None
+
+    def test_render_runtime_header(self, mocker):
+        ctxt = mocker.Mock(sections={})
+        mock_render_inline = mocker.patch.object(
+            hypofile.runtime, 'render_inline', return_value=('decls', 'impl')
+        )
+        mock_get_tmpl = mocker.patch.object(
+            hypofile.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+        obj = hypofile.HypoFile('some/path', 'target', [], {}, {}, {})
+
+        result = obj.render('test_fname', ctxt=ctxt,
+                            runtime_header='hypo_runtime.h')
+
+        assert result == tmpl.render.return_value
+        assert not mock_render_inline.called
+        assert ctxt.sections == {}
+        tmpl.render.assert_called_once_with(
+            ctxt, source='path', target='target', test_fname='test_fname',
+            runtime_header='hypo_runtime.h',
+        )
@@ -269,3 +269,20 @@ class TestLineList(object):
             'l11\n'
             'l12\n'
         )
+
+    def test_iter_output(self):
+        obj = linelist.LineList(['l1', 'l2'])
+        obj.extend(['l3', 'l4'], location.Coordinate('some.path', 10))
+        obj.extend(['l5'])
+
+        result = list(obj.iter_output('dir/other.path'))
+
+        assert result == [
+            'l1\n',
+            'l2\n',
+            '#line 10 "some.path"\n',
+            'l3\n',
+            'l4\n',
+            '#line 7 "other.path"\n',
+            'l5\n',
+        ]
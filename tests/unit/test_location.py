@@ -1,8 +1,30 @@
+import copy
+import pickle
+
+import pytest
+
 from hypocrite import location
 
 other = object()
 
 
+class TestIntern(object):
+    def test_str(self):
+        path = ''.join(['file', '.name'])
+
+        result = location._intern(path)
+
+        assert result == 'file.name'
+        assert result is location._intern(''.join(['file', '.', 'name']))
+
+    def test_other(self):
+        path = bytearray(b'file.name')
+
+        result = location._intern(path)
+
+        assert result is path
+
+
 class TestCoordinate(object):
     def test_init(self):
         result = location.Coordinate('file.name', 23)
@@ -10,6 +32,52 @@ class TestCoordinate(object):
         assert result.path == 'file.name'
         assert result.lno == 23
 
+    def test_init_interned(self):
+        obj1 = location.Coordinate(''.join(['file', '.name']), 23)
+        obj2 = location.Coordinate(''.join(['file.', 'name']), 42)
+
+        assert obj1.path is obj2.path
+
+    def test_slots(self):
+        obj = location.Coordinate('file.name', 23)
+
+        assert not hasattr(obj, '__dict__')
+
+    def test_setattr(self):
+        obj = location.Coordinate('file.name', 23)
+
+        with pytest.raises(AttributeError):
+            obj.lno = 42
+        assert obj.lno == 23
+
+    def test_delattr(self):
+        obj = location.Coordinate('file.name', 23)
+
+        with pytest.raises(AttributeError):
+            del obj.lno
+        assert obj.lno == 23
+
+    def test_pickle(self):
+        obj = location.Coordinate('file.name', 23)
+
+        result = pickle.loads(pickle.dumps(obj))
+
+        assert result == obj
+
+    def test_copy(self):
+        obj = location.Coordinate('file.name', 23)
+
+        result = copy.copy(obj)
+
+        assert result == obj
+
+    def test_hash_equal(self):
+        obj1 = location.Coordinate('file.name', 23)
+        obj2 = location.Coordinate('file.name', 23)
+
+        assert hash(obj1) == hash(obj2)
+        assert len(set([obj1, obj2])) == 1
+
     def test_str(self):
         obj = location.Coordinate('file.name', 23)
 
@@ -136,6 +204,41 @@ class TestCoordinate(object):
 
         assert obj.line == '#line 23 "file.name"'
 
+    def test_line_cached(self, mocker):
+        obj = location.Coordinate('file.name', 23)
+
+        result = obj.line
+
+        assert obj.line is result
+
+    def test_follows_true(self):
+        obj1 = location.Coordinate('file.name', 23)
+        obj2 = location.Coordinate('file.name', 24)
+
+        assert obj2.follows(obj1)
+
+    def test_follows_same(self):
+        obj = location.Coordinate('file.name', 23)
+
+        assert not obj.follows(obj)
+
+    def test_follows_earlier(self):
+        obj1 = location.Coordinate('file.name', 23)
+        obj2 = location.Coordinate('file.name', 24)
+
+        assert not obj1.follows(obj2)
+
+    def test_follows_badpath(self):
+        obj1 = location.Coordinate('file.name', 23)
+        obj2 = location.Coordinate('other.name', 24)
+
+        assert not obj2.follows(obj1)
+
+    def test_follows_none(self):
+        obj = location.Coordinate('file.name', 23)
+
+        assert not obj.follows(None)
+
 
 class TestCoordinateRange(object):
     def test_init(self):
@@ -145,6 +248,25 @@ class TestCoordinateRange(object):
         assert result.start == 23
         assert result.end == 42
 
+    def test_slots(self):
+        obj = location.CoordinateRange('file.name', 23, 42)
+
+        assert not hasattr(obj, '__dict__')
+
+    def test_setattr(self):
+        obj = location.CoordinateRange('file.name', 23, 42)
+
+        with pytest.raises(AttributeError):
+            obj.start = 5
+        assert obj.start == 23
+
+    def test_pickle(self):
+        obj = location.CoordinateRange('file.name', 23, 42)
+
+        result = pickle.loads(pickle.dumps(obj))
+
+        assert result == obj
+
     def test_str_oneline(self):
         obj = location.CoordinateRange('file.name', 23, 23)
 
@@ -216,3 +338,10 @@ class TestCoordinateRange(object):
         obj = location.CoordinateRange('file.name', 23, 42)
 
         assert obj.__ne__(other)
+
+    def test_hash_equal(self):
+        obj1 = location.CoordinateRange('file.name', 23, 42)
+        obj2 = location.CoordinateRange('file.name', 23, 42)
+
+        assert hash(obj1) == hash(obj2)
+        assert len(set([obj1, obj2])) == 1
@@ -9,27 +9,319 @@ class TestMain(object):
         handle = mocker.MagicMock()
         handle.__enter__.return_value = handle
         mock_open = mocker.patch.object(builtins, 'open', return_value=handle)
+        profiler = mocker.MagicMock(enabled=False)
+        mocker.patch.object(main.metrics, 'NullProfiler',
+                            return_value=profiler)
+        mock_Profiler = mocker.patch.object(main.metrics, 'Profiler')
+        mock_preload = mocker.patch.object(main.template.Template, 'preload')
+        mock_RenderContext = mocker.patch.object(
+            main.template, 'RenderContext'
+        )
+        mock_write = mocker.patch.object(main.depfile, 'write')
 
         main.main('infile.hypo')
 
         mock_parse.assert_called_once_with('infile.hypo')
         hfile = mock_parse.return_value
-        hfile.render.assert_called_once_with('infile')
+        hfile.render.assert_called_once_with(
+            'infile', profiler, mock_RenderContext.return_value, None,
+            False, False
+        )
         mock_open.assert_called_once_with('infile.c', 'w')
         output = hfile.render.return_value
         output.output.assert_called_once_with(handle, 'infile.c')
+        assert not mock_write.called
+        assert not mock_Profiler.called
+        assert not mock_preload.called
+        assert not profiler.count.called
 
     def test_outfile(self, mocker):
         mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
         handle = mocker.MagicMock()
         handle.__enter__.return_value = handle
         mock_open = mocker.patch.object(builtins, 'open', return_value=handle)
+        profiler = mocker.MagicMock(enabled=False)
+        mocker.patch.object(main.metrics, 'NullProfiler',
+                            return_value=profiler)
+        mock_RenderContext = mocker.patch.object(
+            main.template, 'RenderContext'
+        )
 
         main.main('infile.hypo', 'outfile.x')
 
         mock_parse.assert_called_once_with('infile.hypo')
         hfile = mock_parse.return_value
-        hfile.render.assert_called_once_with('outfile')
+        hfile.render.assert_called_once_with(
+            'outfile', profiler, mock_RenderContext.return_value, None,
+            False, False
+        )
         mock_open.assert_called_once_with('outfile.x', 'w')
         output = hfile.render.return_value
         output.output.assert_called_once_with(handle, 'outfile.x')
+
+    def test_profile(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        mock_parse.return_value.render.return_value.__len__.return_value = 5
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mocker.patch.object(builtins, 'open', return_value=handle)
+        mock_NullProfiler = mocker.patch.object(main.metrics, 'NullProfiler')
+        profiler = mocker.MagicMock(enabled=True)
+        mock_Profiler = mocker.patch.object(
+            main.metrics, 'Profiler', return_value=profiler
+        )
+        mock_preload = mocker.patch.object(main.template.Template, 'preload')
+        mock_RenderContext = mocker.patch.object(
+            main.template, 'RenderContext'
+        )
+
+        main.main('infile.hypo', profile=True)
+
+        assert not mock_NullProfiler.called
+        mock_Profiler.assert_called_once_with(cprofile=False)
+        mock_preload.assert_called_once_with()
+        hfile = mock_parse.return_value
+        hfile.render.assert_called_once_with(
+            'infile', profiler, mock_RenderContext.return_value, None,
+            False, False
+        )
+        profiler.phase.assert_has_calls([
+            mocker.call('load'),
+            mocker.call('parse'),
+            mocker.call('output'),
+        ], any_order=True)
+        profiler.count.assert_called_once_with('lines', 5)
+        profiler.report.assert_called_once_with(main.sys.stderr)
+        assert not profiler.dump_json.called
+        assert not profiler.dump_stats.called
+
+    def test_profile_files(self, mocker):
+        mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mocker.patch.object(builtins, 'open', return_value=handle)
+        profiler = mocker.MagicMock(enabled=True)
+        mock_Profiler = mocker.patch.object(
+            main.metrics, 'Profiler', return_value=profiler
+        )
+        mocker.patch.object(main.template.Template, 'preload')
+
+        main.main('infile.hypo', profile_json='prof.json',
+                  profile_stats='prof.stats')
+
+        mock_Profiler.assert_called_once_with(cprofile=True)
+        assert not profiler.report.called
+        profiler.dump_json.assert_called_once_with('prof.json')
+        profiler.dump_stats.assert_called_once_with('prof.stats')
+
+    def test_depfile_auto(self, mocker):
+        mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mock_open = mocker.patch.object(builtins, 'open', return_value=handle)
+        mocker.patch.object(
+            main.template, 'RenderContext',
+            return_value=mocker.Mock(templates={'spam.tmpl', 'master.tmpl'}),
+        )
+        mocker.patch.object(
+            main.template.Template, 'filename',
+            side_effect=lambda x: 'tmpl/%s' % x,
+        )
+        mock_write = mocker.patch.object(main.depfile, 'write')
+
+        main.main('infile.hypo', 'out/outfile.x', depfile_auto=True)
+
+        mock_open.assert_has_calls([
+            mocker.call('out/outfile.x', 'w'),
+            mocker.call('out/outfile.d', 'w'),
+        ], any_order=True)
+        mock_write.assert_called_once_with(
+            handle, 'out/outfile.x',
+            ['infile.hypo', 'tmpl/master.tmpl', 'tmpl/spam.tmpl'],
+        )
+
+    def test_depfile_name(self, mocker):
+        mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mock_open = mocker.patch.object(builtins, 'open', return_value=handle)
+        mocker.patch.object(
+            main.template, 'RenderContext',
+            return_value=mocker.Mock(templates={'master.tmpl'}),
+        )
+        mocker.patch.object(
+            main.template.Template, 'filename',
+            side_effect=lambda x: 'tmpl/%s' % x,
+        )
+        mock_write = mocker.patch.object(main.depfile, 'write')
+
+        main.main('infile.hypo', depfile_auto=True, depfile_name='deps.d',
+                  depfile_target='target')
+
+        mock_open.assert_has_calls([
+            mocker.call('infile.c', 'w'),
+            mocker.call('deps.d', 'w'),
+        ], any_order=True)
+        mock_write.assert_called_once_with(
+            handle, 'target', ['infile.hypo', 'tmpl/master.tmpl'],
+        )
+
+    def test_runtime_header(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mocker.patch.object(builtins, 'open', return_value=handle)
+        mock_RenderContext = mocker.patch.object(
+            main.template, 'RenderContext'
+        )
+        mock_emit = mocker.patch.object(main.runtime, 'emit')
+
+        main.main('infile.hypo', runtime_header='inc/rt.h')
+
+        hfile = mock_parse.return_value
+        hfile.render.assert_called_once_with(
+            'infile', mocker.ANY, mock_RenderContext.return_value, 'inc/rt.h',
+            False, False
+        )
+        assert not mock_emit.called
+
+    def test_all_mock_helpers(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mocker.patch.object(builtins, 'open', return_value=handle)
+        mock_RenderContext = mocker.patch.object(
+            main.template, 'RenderContext'
+        )
+
+        main.main('infile.hypo', all_mock_helpers=True)
+
+        hfile = mock_parse.return_value
+        hfile.render.assert_called_once_with(
+            'infile', mocker.ANY, mock_RenderContext.return_value, None, True,
+            False
+        )
+
+    def test_track_allocs(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mocker.patch.object(builtins, 'open', return_value=handle)
+        mock_RenderContext = mocker.patch.object(
+            main.template, 'RenderContext'
+        )
+
+        main.main('infile.hypo', track_allocs=True)
+
+        hfile = mock_parse.return_value
+        hfile.render.assert_called_once_with(
+            'infile', mocker.ANY, mock_RenderContext.return_value, None,
+            False, True
+        )
+
+    def test_emit_runtime(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        mock_emit = mocker.patch.object(main.runtime, 'emit')
+
+        result = main.main(emit_runtime='some/dir')
+
+        assert result is None
+        mock_emit.assert_called_once_with(
+            'some/dir', header=main.runtime.HEADER
+        )
+        assert not mock_parse.called
+
+    def test_emit_runtime_infile(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mocker.patch.object(builtins, 'open', return_value=handle)
+        mock_emit = mocker.patch.object(main.runtime, 'emit')
+
+        main.main('infile.hypo', runtime_header='inc/rt.h',
+                  emit_runtime='some/dir')
+
+        mock_emit.assert_called_once_with('some/dir', header='rt.h')
+        mock_parse.assert_called_once_with('infile.hypo')
+
+    def test_persistent_worker(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        mock_Worker = mocker.patch.object(main.worker, 'Worker')
+
+        result = main.main(persistent_worker=True)
+
+        assert result is None
+        mock_Worker.assert_called_once_with()
+        mock_Worker.return_value.serve.assert_called_once_with(
+            main.sys.stdin, main.sys.stdout
+        )
+        assert not mock_parse.called
+
+    def test_bench_results(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        mock_run = mocker.patch.object(main.benchcmp, 'run', return_value=1)
+
+        result = main.main(bench_results=['r1.json', 'r2.json'],
+                           bench_baseline='base.json', bench_alpha=0.01,
+                           bench_threshold=10.0)
+
+        assert result == 1
+        mock_run.assert_called_once_with(
+            'base.json', ['r1.json', 'r2.json'], main.sys.stdout,
+            save_baseline=False, alpha=0.01, threshold=0.1,
+        )
+        assert not mock_parse.called
+
+    def test_bench_results_save(self, mocker):
+        mock_run = mocker.patch.object(main.benchcmp, 'run', return_value=0)
+
+        result = main.main(bench_results=['r1.json'],
+                           bench_baseline='base.json', bench_save=True)
+
+        assert result == 0
+        mock_run.assert_called_once_with(
+            'base.json', ['r1.json'], main.sys.stdout,
+            save_baseline=True, alpha=0.05, threshold=0.05,
+        )
+
+    def test_bench_results_invalid(self, mocker):
+        mocker.patch.object(
+            main.benchcmp, 'run',
+            side_effect=ValueError('r1.json: not a benchmark results file'),
+        )
+
+        result = main.main(bench_results=['r1.json'],
+                           bench_baseline='base.json')
+
+        assert result == 'r1.json: not a benchmark results file'
+
+    def test_bench_results_no_baseline(self, mocker):
+        mock_run = mocker.patch.object(main.benchcmp, 'run')
+
+        result = main.main(bench_results=['r1.json'])
+
+        assert result == 'A benchmark baseline file is required'
+        assert not mock_run.called
+
+    def test_fold_profile(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        mock_run = mocker.patch.object(main.folded, 'run')
+
+        result = main.main(fold_profile=['p1.txt', 'p2.txt'],
+                           addr2line='llvm-addr2line')
+
+        assert result is None
+        mock_run.assert_called_once_with(
+            ['p1.txt', 'p2.txt'], main.sys.stdout, 'llvm-addr2line',
+        )
+        assert not mock_parse.called
+
+    def test_no_infile(self, mocker):
+        mock_parse = mocker.patch.object(main.hypofile.HypoFile, 'parse')
+        mock_Worker = mocker.patch.object(main.worker, 'Worker')
+
+        result = main.main()
+
+        assert result == 'An input test file is required'
+        assert not mock_Worker.called
+        assert not mock_parse.called
@@ -0,0 +1,192 @@
+import json
+
+import pytest
+
+from hypocrite import metrics
+
+
+class TestPhaseMetrics(object):
+    def test_init(self):
+        result = metrics.PhaseMetrics('name')
+
+        assert result.name == 'name'
+        assert result.calls == 0
+        assert result.wall == 0.0
+        assert result.peak is None
+
+    def test_add(self):
+        obj = metrics.PhaseMetrics('name')
+
+        obj.add(1.5, None)
+        obj.add(2.0, 100)
+        obj.add(0.5, 50)
+
+        assert obj.calls == 3
+        assert obj.wall == 4.0
+        assert obj.peak == 100
+
+    def test_as_dict(self):
+        obj = metrics.PhaseMetrics('name')
+        obj.add(1.5, 100)
+
+        result = obj.as_dict()
+
+        assert result == {'calls': 1, 'wall': 1.5, 'peak': 100}
+
+
+class TestNullProfiler(object):
+    def test_phase(self):
+        obj = metrics.NullProfiler()
+
+        with obj.phase('name'):
+            pass
+
+        assert not obj.enabled
+
+    def test_count(self):
+        obj = metrics.NullProfiler()
+
+        obj.count('name', 5)
+
+
+class TestProfiler(object):
+    def test_init(self):
+        result = metrics.Profiler()
+
+        assert result.enabled
+        assert result.phases == {}
+        assert result.counts == {}
+        assert result.memory == bool(metrics.tracemalloc)
+        assert result.cprofile is None
+
+    def test_init_cprofile(self):
+        result = metrics.Profiler(memory=False, cprofile=True)
+
+        assert result.memory is False
+        assert result.cprofile is not None
+
+    def test_phase(self):
+        obj = metrics.Profiler()
+
+        with obj.phase('spam'):
+            data = [object() for _i in range(1000)]
+        with obj.phase('spam'):
+            pass
+        with obj.phase('eggs'):
+            pass
+
+        assert list(obj.phases) == ['spam', 'eggs']
+        assert obj.phases['spam'].calls == 2
+        assert obj.phases['eggs'].calls == 1
+        assert obj.phases['spam'].wall >= 0.0
+        if obj.memory:
+            assert obj.phases['spam'].peak > 0
+            assert not metrics.tracemalloc.is_tracing()
+        assert len(data) == 1000
+
+    @pytest.mark.skipif(
+        not hasattr(metrics.tracemalloc, 'reset_peak'),
+        reason='tracemalloc.reset_peak() is not available',
+    )
+    def test_phase_nested_peak(self):
+        obj = metrics.Profiler()
+
+        with obj.phase('outer'):
+            data = bytearray(1024 * 1024)
+            del data
+            with obj.phase('inner'):
+                pass
+            with obj.phase('inner'):
+                with obj.phase('innermost'):
+                    data = bytearray(512 * 1024)
+                    del data
+
+        assert obj.phases['outer'].peak >= 1024 * 1024
+        assert obj.phases['inner'].peak >= 512 * 1024
+        assert obj.phases['inner'].peak < 1024 * 1024
+        assert obj.phases['innermost'].peak >= 512 * 1024
+        assert obj._peaks == []
+
+    def test_phase_exception(self):
+        obj = metrics.Profiler(memory=False)
+
+        with pytest.raises(ValueError):
+            with obj.phase('spam'):
+                raise ValueError('test')
+
+        assert obj.phases['spam'].calls == 1
+        assert obj.phases['spam'].peak is None
+
+    def test_phase_cprofile(self):
+        obj = metrics.Profiler(memory=False, cprofile=True)
+
+        with obj.phase('outer'):
+            with obj.phase('inner'):
+                sorted(range(100))
+
+        assert obj._depth == 0
+        assert obj.cprofile.getstats()
+
+    def test_count(self):
+        obj = metrics.Profiler()
+
+        obj.count('spam', 2)
+        obj.count('eggs', 3)
+        obj.count('spam', 4)
+
+        assert obj.counts == {'spam': 6, 'eggs': 3}
+
+    def test_as_dict(self):
+        obj = metrics.Profiler(memory=False)
+        with obj.phase('spam'):
+            pass
+        obj.count('eggs', 3)
+
+        result = obj.as_dict()
+
+        assert list(result['phases']) == ['spam']
+        assert result['phases']['spam']['calls'] == 1
+        assert result['counts'] == {'eggs': 3}
+
+    def test_report(self, mocker):
+        stream = mocker.Mock()
+        obj = metrics.Profiler(memory=False)
+        with obj.phase('spam'):
+            pass
+        obj.phases['spam'].peak = 2048
+        obj.count('eggs', 3)
+
+        obj.report(stream)
+
+        text = ''.join(c[0][0] for c in stream.write.call_args_list)
+        assert 'spam' in text
+        assert '2.0' in text
+        assert 'eggs' in text
+
+    def test_dump_json(self, tmpdir):
+        path = str(tmpdir.join('metrics.json'))
+        obj = metrics.Profiler(memory=False)
+        obj.count('eggs', 3)
+
+        obj.dump_json(path)
+
+        with open(path) as f:
+            assert json.load(f) == {'phases': {}, 'counts': {'eggs': 3}}
+
+    def test_dump_stats(self, tmpdir):
+        path = tmpdir.join('metrics.stats')
+        obj = metrics.Profiler(memory=False, cprofile=True)
+        with obj.phase('spam'):
+            pass
+
+        obj.dump_stats(str(path))
+
+        assert path.check(file=1)
+
+    def test_dump_stats_disabled(self, tmpdir):
+        path = tmpdir.join('metrics.stats')
+        obj = metrics.Profiler(memory=False)
+
+        obj.dump_stats(str(path))
+
+        assert not path.check()
@@ -0,0 +1,119 @@
+from six.moves import builtins
+
+from hypocrite import runtime
+
+
+class TestRenderInline(object):
+    def test_base(self, mocker):
+        ctxts = []
+
+        def fake_render(name):
+            def render(ctxt, **kwargs):
+                ctxts.append(ctxt)
+                ctxt.templates.add(name)
+                ctxt.sections['banner'].append('%s banner' % name)
+                ctxt.output.append('%s %s' % (name, kwargs))
+                return ctxt.output
+            return mocker.Mock(**{'render.side_effect': render})
+        mock_get_tmpl = mocker.patch.object(
+            runtime.template.Template, 'get_tmpl', side_effect=fake_render,
+        )
+        ctxt = runtime.template.RenderContext()
+
+        result = runtime.render_inline(ctxt)
+
+        assert [list(lines) for lines in result] == [
+            ["runtime.h.tmpl {'linkage': 'static _HYPO_UNUSED'}"],
+            ["runtime.c.tmpl {'linkage': 'static _HYPO_UNUSED'}"],
+        ]
+        mock_get_tmpl.assert_has_calls([
+            mocker.call(runtime.HEADER_TEMPLATE),
+            mocker.call(runtime.SOURCE_TEMPLATE),
+        ])
+        assert len(ctxts) == 2
+        assert ctxts[0] is not ctxts[1]
+        assert ctxt not in ctxts
+        assert ctxt.templates == {'runtime.h.tmpl', 'runtime.c.tmpl'}
+        assert dict(ctxt.sections) == {}
+
+    def test_features(self, mocker):
+        mock_get_tmpl = mocker.patch.object(
+            runtime.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+        tmpl.render.return_value = ['line']
+        ctxt = runtime.template.RenderContext()
+
+        result = runtime.render_inline(ctxt, clock=True, fake_io=True)
+
+        assert result == (['line'], ['line'])
+        for call in tmpl.render.call_args_list:
+            assert call[1] == {
+                'linkage': 'static _HYPO_UNUSED', 'clock': True,
+                'fake_io': True,
+            }
+
+
+class TestRenderHeader(object):
+    def test_base(self, mocker):
+        mock_RenderContext = mocker.patch.object(
+            runtime.template, 'RenderContext'
+        )
+        mock_get_tmpl = mocker.patch.object(
+            runtime.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+
+        result = runtime.render_header('hdr.h')
+
+        assert result == tmpl.render.return_value
+        mock_get_tmpl.assert_called_once_with(runtime.HEADER_TEMPLATE)
+        tmpl.render.assert_called_once_with(
+            mock_RenderContext.return_value, shared='hdr.h',
+            linkage='extern', clock=True, fake_io=True,
+        )
+
+
+class TestRenderSource(object):
+    def test_base(self, mocker):
+        mock_RenderContext = mocker.patch.object(
+            runtime.template, 'RenderContext'
+        )
+        mock_get_tmpl = mocker.patch.object(
+            runtime.template.Template, 'get_tmpl'
+        )
+        tmpl = mock_get_tmpl.return_value
+
+        result = runtime.render_source('hdr.h')
+
+        assert result == tmpl.render.return_value
+        mock_get_tmpl.assert_called_once_with(runtime.SOURCE_TEMPLATE)
+        tmpl.render.assert_called_once_with(
+            mock_RenderContext.return_value, shared='hdr.h',
+            linkage='extern', clock=True, fake_io=True,
+        )
+
+
+class TestEmit(object):
+    def test_base(self, mocker):
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mock_open = mocker.patch.object(builtins, 'open', return_value=handle)
+        mock_render_header = mocker.patch.object(runtime, 'render_header')
+        mock_render_source = mocker.patch.object(runtime, 'render_source')
+
+        result = runtime.emit('some/dir', 'hdr.h', 'src.c')
+
+        assert result == ['some/dir/hdr.h', 'some/dir/src.c']
+        mock_render_header.assert_called_once_with('hdr.h')
+        mock_render_source.assert_called_once_with('hdr.h')
+        mock_open.assert_has_calls([
+            mocker.call('some/dir/hdr.h', 'w'),
+            mocker.call('some/dir/src.c', 'w'),
+        ], any_order=True)
+        mock_render_header.return_value.output.assert_called_once_with(
+            handle, 'some/dir/hdr.h'
+        )
+        mock_render_source.return_value.output.assert_called_once_with(
+            handle, 'some/dir/src.c'
+        )
@@ -93,6 +93,15 @@ class TestSection(object):
         assert result.name == 'name'
         assert result.requires == 'requires'
         assert result.contents == 'contents'
+        assert result.extras == []
+
+    def test_append(self):
+        obj = template.Section('range', 'name', 'requires', 'contents')
+
+        obj.append('section1')
+        obj.append('section2')
+
+        assert obj.extras == ['section1', 'section2']
 
     def test_render_missing(self):
         obj = template.Section('range', 'name', {'a', 'b'}, 'contents')
@@ -137,6 +146,38 @@ class TestSection(object):
             (10, 'line baz spam 4'),
         ]
 
+    def test_render_extras(self):
+        obj = template.Section(
+            'range', 'name', set(), linelist.LineList(['l1 {{a}}'], 1),
+        )
+        obj.append(template.Section(
+            'range', 'name', {'b'}, linelist.LineList(['l2 {{b}}'], 5),
+        ))
+        obj.append(template.Section(
+            'range', 'name', {'c'}, linelist.LineList(['l3 {{c}}'], 9),
+        ))
+
+        result = obj.render({'a': 'A', 'c': 'C'})
+
+        assert list(result.iter_coord()) == [
+            (1, 'l1 A'),
+            (9, 'l3 C'),
+        ]
+
+    def test_render_extras_missing(self):
+        obj = template.Section(
+            'range', 'name', {'a'}, linelist.LineList(['l1 {{a}}'], 1),
+        )
+        obj.append(template.Section(
+            'range', 'name', {'b'}, linelist.LineList(['l2 {{b}}'], 5),
+        ))
+        obj.append(template.Section(
+            'range', 'name', {'c'}, linelist.LineList(['l3 {{c}}'], 9),
+        ))
+
+        assert obj.render({}) is None
+        assert list(obj.render({'b': 'B'}).iter_coord()) == [(5, 'l2 B')]
+
 
 class TestInsertDirective(object):
     def test_initial(self):
@@ -633,6 +674,24 @@ class TestSectionDirective(object):
             'buf',
         )
 
+    def test_call_duplicate(self, mocker):
+        mock_Section = mocker.patch.object(template, 'Section')
+        existing = mocker.Mock()
+        values = {'sections': {'section': existing}}
+        start_coord = location.Coordinate('path', 23)
+        end_coord = location.Coordinate('path', 42)
+        start_toks = [
+            perfile.Token(perfile.TOK_WORD, 'section'),
+            perfile.Token(perfile.TOK_CHAR, '{'),
+        ]
+        obj = template.SectionDirective(values, start_coord, start_toks)
+
+        result = obj(end_coord, 'buf', [])
+
+        assert result is None
+        assert values == {'sections': {'section': existing}}
+        existing.append.assert_called_once_with(mock_Section.return_value)
+
     def test_call_unclosed(self, mocker):
         mock_Section = mocker.patch.object(template, 'Section')
         values = {'sections': {}}
@@ -692,6 +751,7 @@ class TestRenderContext(object):
         assert list(result.output) == []
         assert isinstance(result.sections, collections.defaultdict)
         assert list(result.sections['spam']) == []
+        assert result.templates == set()
 
 
 def _fake_elem_render(ctxt):
@@ -705,6 +765,7 @@ def _fake_elem_render(ctxt):
 class TestTemplate(object):
     def test_get_tmpl_cached(self, mocker):
         mocker.patch.dict(template.Template._tmpl_cache, clear=True)
+        mocker.patch.object(template.Template, '_preloaded', None)
         mock_resource_stream = mocker.patch.object(
             template.pkg_resources, 'resource_stream'
         )
@@ -727,6 +788,7 @@ class TestTemplate(object):
 
     def test_get_tmpl_uncached(self, mocker):
         mocker.patch.dict(template.Template._tmpl_cache, clear=True)
+        mocker.patch.object(template.Template, '_preloaded', None)
         mock_resource_stream = mocker.patch.object(
             template.pkg_resources, 'resource_stream'
         )
@@ -757,6 +819,106 @@ class TestTemplate(object):
         mock_init.assert_called_once_with('spam.c', a=1, b=2, c=3)
         assert template.Template._tmpl_cache == {'spam.c': result}
 
+    def test_get_tmpl_preloaded(self, mocker):
+        mocker.patch.dict(template.Template._tmpl_cache, clear=True)
+        mocker.patch.object(
+            template.Template, '_preloaded', {'spam.c': 'preloaded'}
+        )
+        mock_load = mocker.patch.object(template.Template, '_load')
+        mock_lock = mocker.patch.object(template.Template, '_tmpl_lock')
+
+        result = template.Template.get_tmpl('spam.c')
+
+        assert result == 'preloaded'
+        assert not mock_load.called
+        assert not mock_lock.__enter__.called
+
+    def test_get_tmpl_not_preloaded(self, mocker):
+        mocker.patch.dict(template.Template._tmpl_cache, clear=True)
+        mocker.patch.object(
+            template.Template, '_preloaded', {'spam.c': 'preloaded'}
+        )
+        mock_load = mocker.patch.object(template.Template, '_load')
+
+        result = template.Template.get_tmpl('eggs.c')
+
+        assert result == mock_load.return_value
+        mock_load.assert_called_once_with('eggs.c')
+        assert template.Template._tmpl_cache == {'eggs.c': result}
+
+    def test_get_tmpl_raced(self, mocker):
+        mocker.patch.dict(template.Template._tmpl_cache, clear=True)
+        mocker.patch.object(template.Template, '_preloaded', None)
+        mock_load = mocker.patch.object(template.Template, '_load')
+
+        def fake_enter(*args):
+            # Simulate another thread loading the template
+            template.Template._tmpl_cache['spam.c'] = 'raced'
+        mock_lock = mocker.patch.object(template.Template, '_tmpl_lock')
+        mock_lock.__enter__ = mocker.Mock(side_effect=fake_enter)
+        mock_lock.__exit__ = mocker.Mock(return_value=False)
+
+        result = template.Template.get_tmpl('spam.c')
+
+        assert result == 'raced'
+        assert not mock_load.called
+
+    def test_filename(self, mocker):
+        mock_resource_filename = mocker.patch.object(
+            template.pkg_resources, 'resource_filename',
+            return_value='/some/path/spam.c.tmpl',
+        )
+
+        result = template.Template.filename('spam.c.tmpl')
+
+        assert result == '/some/path/spam.c.tmpl'
+        mock_resource_filename.assert_called_once_with(
+            'hypocrite', template.TEMPLATES % 'spam.c.tmpl'
+        )
+
+    def test_preload(self, mocker):
+        mocker.patch.dict(
+            template.Template._tmpl_cache, {'spam.c.tmpl': 'cached'},
+            clear=True,
+        )
+        mocker.patch.object(template.Template, '_preloaded', None)
+        mock_resource_listdir = mocker.patch.object(
+            template.pkg_resources, 'resource_listdir',
+            return_value=['spam.c.tmpl', 'README', 'eggs.c.tmpl'],
+        )
+        mock_load = mocker.patch.object(
+            template.Template, '_load', side_effect=lambda x: 'loaded'
+        )
+
+        result = template.Template.preload()
+
+        assert result == ['eggs.c.tmpl', 'spam.c.tmpl']
+        mock_resource_listdir.assert_called_once_with(
+            'hypocrite', template.TEMPLATES % ''
+        )
+        mock_load.assert_called_once_with('eggs.c.tmpl')
+        assert dict(template.Template._preloaded) == {
+            'eggs.c.tmpl': 'loaded',
+            'spam.c.tmpl': 'cached',
+        }
+        with pytest.raises(TypeError):
+            template.Template._preloaded['eggs.c.tmpl'] = 'altered'
+
+    def test_preload_again(self, mocker):
+        mocker.patch.object(
+            template.Template, '_preloaded', {'spam.c.tmpl': 'preloaded'}
+        )
+        mock_resource_listdir = mocker.patch.object(
+            template.pkg_resources, 'resource_listdir'
+        )
+        mock_load = mocker.patch.object(template.Template, '_load')
+
+        result = template.Template.preload()
+
+        assert result == ['spam.c.tmpl']
+        assert not mock_resource_listdir.called
+        assert not mock_load.called
+
     def test_init(self):
         result = template.Template('name', 'structure', 'defines', 'sections')
 
@@ -818,3 +980,4 @@ class TestTemplate(object):
             'line 5',
             'line 6',
         ]
+        assert ctxt.templates == {'spam.c'}
@@ -0,0 +1,231 @@
+import json
+
+import pytest
+import six
+from six.moves import builtins
+
+from hypocrite import worker
+
+
+class TestArgumentParser(object):
+    def test_error(self):
+        parser = worker._ArgumentParser(prog='prog')
+
+        with pytest.raises(worker.WorkerArgumentError) as exc_info:
+            parser.error('some message')
+        assert six.text_type(exc_info.value) == 'prog: some message'
+
+
+class TestWorker(object):
+    def test_init(self):
+        result = worker.Worker()
+
+        assert result._cache == {}
+        args = result._parser.parse_args(['infile.hypo', '-O', 'out.c'])
+        assert args.infile == 'infile.hypo'
+        assert args.outfile == 'out.c'
+
+    def test_serve(self, mocker):
+        mock_preload = mocker.patch.object(worker.api, 'preload')
+        mock_handle = mocker.patch.object(
+            worker.Worker, 'handle',
+            side_effect=lambda req: {'requestId': req['requestId']},
+        )
+        instream = six.StringIO(
+            '{"requestId": 1}\n'
+            '\n'
+            'garbage\n'
+            '{"requestId": 2}\n'
+        )
+        outstream = six.StringIO()
+        obj = worker.Worker()
+
+        obj.serve(instream, outstream)
+
+        mock_preload.assert_called_once_with()
+        mock_handle.assert_has_calls([
+            mocker.call({'requestId': 1}),
+            mocker.call({'requestId': 2}),
+        ])
+        assert mock_handle.call_count == 2
+        responses = [
+            json.loads(line) for line in outstream.getvalue().splitlines()
+        ]
+        assert len(responses) == 3
+        assert responses[0] == {'requestId': 1}
+        assert responses[1]['exitCode'] == 1
+        assert responses[1]['output'].startswith('Invalid work request: ')
+        assert responses[2] == {'requestId': 2}
+
+    def test_handle(self, mocker):
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mock_open = mocker.patch.object(builtins, 'open', return_value=handle)
+        mock_load = mocker.patch.object(worker.Worker, 'load')
+        obj = worker.Worker()
+
+        result = obj.handle({
+            'arguments': ['in/infile.hypo'],
+            'inputs': [
+                {'path': 'in/infile.hypo', 'digest': 'abc'},
+                {'path': 'other', 'digest': 'def'},
+            ],
+            'requestId': 5,
+        })
+
+        assert result == {'exitCode': 0, 'output': '', 'requestId': 5}
+        mock_load.assert_called_once_with('in/infile.hypo', 'abc')
+        hfile = mock_load.return_value
+        hfile.render.assert_called_once_with(
+            'infile', runtime_header=None, all_mock_helpers=False,
+            track_allocs=False,
+        )
+        mock_open.assert_called_once_with('infile.c', 'w')
+        hfile.render.return_value.output.assert_called_once_with(
+            handle, 'infile.c'
+        )
+
+    def test_handle_sandbox(self, mocker):
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        mock_open = mocker.patch.object(builtins, 'open', return_value=handle)
+        mock_load = mocker.patch.object(worker.Worker, 'load')
+        obj = worker.Worker()
+
+        result = obj.handle({
+            'arguments': ['infile.hypo', '--output', 'out/test.c',
+                          '--runtime-header', 'rt.h', '--all-mock-helpers',
+                          '--track-allocs'],
+            'sandboxDir': 'sandbox',
+        })
+
+        assert result == {'exitCode': 0, 'output': '', 'requestId': 0}
+        mock_load.assert_called_once_with('sandbox/infile.hypo', None)
+        hfile = mock_load.return_value
+        hfile.render.assert_called_once_with(
+            'test', runtime_header='rt.h', all_mock_helpers=True,
+            track_allocs=True,
+        )
+        mock_open.assert_called_once_with('sandbox/out/test.c', 'w')
+        hfile.render.return_value.output.assert_called_once_with(
+            handle, 'out/test.c'
+        )
+
+    def test_handle_bad_args(self, mocker):
+        mock_load = mocker.patch.object(worker.Worker, 'load')
+        obj = worker.Worker()
+
+        result = obj.handle({'arguments': [], 'requestId': 5})
+
+        assert result['exitCode'] == 1
+        assert 'infile' in result['output']
+        assert result['requestId'] == 5
+        assert not mock_load.called
+
+    def test_handle_error(self, mocker):
+        mock_load = mocker.patch.object(
+            worker.Worker, 'load', side_effect=Exception('some error')
+        )
+        obj = worker.Worker()
+
+        result = obj.handle({'arguments': ['infile.hypo'], 'requestId': 5})
+
+        assert result == {
+            'exitCode': 1,
+            'output': 'some error',
+            'requestId': 5,
+        }
+        mock_load.assert_called_once_with('infile.hypo', None)
+
+    def test_load(self, mocker):
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        handle.read.return_value = b'text'
+        mock_open = mocker.patch.object(
+            worker.io, 'open', return_value=handle
+        )
+        mock_parse_text = mocker.patch.object(
+            worker.hypofile.HypoFile, 'parse_text'
+        )
+        obj = worker.Worker()
+
+        result = obj.load('infile.hypo')
+
+        assert result == mock_parse_text.return_value
+        mock_open.assert_called_once_with('infile.hypo', 'rb')
+        mock_parse_text.assert_called_once_with(b'text', 'infile.hypo')
+        assert obj._cache == {
+            'infile.hypo': (
+                worker.hashlib.sha256(b'text').hexdigest(),
+                mock_parse_text.return_value,
+            ),
+        }
+
+    def test_load_cached(self, mocker):
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        handle.read.return_value = b'text'
+        mock_open = mocker.patch.object(
+            worker.io, 'open', return_value=handle
+        )
+        mock_parse_text = mocker.patch.object(
+            worker.hypofile.HypoFile, 'parse_text'
+        )
+        obj = worker.Worker()
+        obj._cache['infile.hypo'] = (
+            worker.hashlib.sha256(b'text').hexdigest(), 'cached',
+        )
+
+        result = obj.load('infile.hypo')
+
+        assert result == 'cached'
+        mock_open.assert_called_once_with('infile.hypo', 'rb')
+        assert not mock_parse_text.called
+
+    def test_load_changed(self, mocker):
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        handle.read.return_value = b'text'
+        mocker.patch.object(worker.io, 'open', return_value=handle)
+        mock_parse_text = mocker.patch.object(
+            worker.hypofile.HypoFile, 'parse_text'
+        )
+        obj = worker.Worker()
+        obj._cache['infile.hypo'] = ('old', 'cached')
+
+        result = obj.load('infile.hypo')
+
+        assert result == mock_parse_text.return_value
+        mock_parse_text.assert_called_once_with(b'text', 'infile.hypo')
+
+    def test_load_digest_cached(self, mocker):
+        mock_open = mocker.patch.object(worker.io, 'open')
+        mock_parse_text = mocker.patch.object(
+            worker.hypofile.HypoFile, 'parse_text'
+        )
+        obj = worker.Worker()
+        obj._cache['infile.hypo'] = ('abc', 'cached')
+
+        result = obj.load('infile.hypo', 'abc')
+
+        assert result == 'cached'
+        assert not mock_open.called
+        assert not mock_parse_text.called
+
+    def test_load_digest_changed(self, mocker):
+        handle = mocker.MagicMock()
+        handle.__enter__.return_value = handle
+        handle.read.return_value = b'text'
+        mocker.patch.object(worker.io, 'open', return_value=handle)
+        mock_parse_text = mocker.patch.object(
+            worker.hypofile.HypoFile, 'parse_text'
+        )
+        obj = worker.Worker()
+        obj._cache['infile.hypo'] = ('abc', 'cached')
+
+        result = obj.load('infile.hypo', 'def')
+
+        assert result == mock_parse_text.return_value
+        assert obj._cache == {
+            'infile.hypo': ('def', mock_parse_text.return_value),
+        }